@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Decode a synthetic findScenes response with every installed JSON codec.
+
+Usage:
+    python benchmarks/bench_codec.py              # 100k scenes
+    python benchmarks/bench_codec.py --scenes 20000 --repeat 5
+
+The stdlib baseline mirrors the old ``resp.json()`` path: decode the body to
+``str`` first, then parse it.
+"""
+
+import argparse
+import gc
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from stash_connection_lib.codec import available_codecs  # noqa: E402
+
+
+def synthetic_payload(scenes: int, seed: int = 0) -> bytes:
+    """Build a findScenes response shaped like a real library export."""
+    rng = random.Random(seed)
+    tags = [{"id": str(i), "name": f"Tag {i}"} for i in range(500)]
+    performers = [{"id": str(i), "name": f"Performer {i}"} for i in range(2000)]
+    studios = [{"id": str(i), "name": f"Studio {i}"} for i in range(200)]
+    items = []
+    for i in range(scenes):
+        items.append(
+            {
+                "id": str(i),
+                "title": f"Scene {i} – {rng.random():.6f}",
+                "date": (
+                    f"20{rng.randint(10, 24)}"
+                    f"-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"
+                ),
+                "rating100": rng.choice([None, 20, 40, 60, 80, 100]),
+                "organized": rng.random() < 0.5,
+                "updated_at": "2024-05-01T12:00:00+00:00",
+                "studio": rng.choice(studios),
+                "tags": rng.sample(tags, 6),
+                "performers": rng.sample(performers, 2),
+                "files": [
+                    {
+                        "id": str(i),
+                        "path": f"/library/disk{i % 4}/studio/scene_{i:07d}.mp4",
+                        "size": rng.randint(10**8, 10**10),
+                        "duration": rng.uniform(60, 7200),
+                        "width": 1920,
+                        "height": 1080,
+                        "video_codec": "h264",
+                        "frame_rate": 29.97,
+                        "fingerprints": [
+                            {"type": "oshash", "value": f"{rng.getrandbits(64):016x}"},
+                            {"type": "phash", "value": f"{rng.getrandbits(64):016x}"},
+                        ],
+                    }
+                ],
+            }
+        )
+    body = {"data": {"findScenes": {"count": scenes, "scenes": items}}}
+    return json.dumps(body).encode()
+
+
+def best_of(fn, repeat: int) -> tuple:
+    """Return (best, median) seconds; GC is paused so it does not skew runs."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return min(timings), statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenes", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    raw = synthetic_payload(args.scenes)
+    print(f"payload: {args.scenes:,} scenes, {len(raw) / 2**20:.1f} MiB")
+
+    baseline, _ = best_of(lambda: json.loads(raw.decode("utf-8")), args.repeat)
+    print(f"{'resp.json() baseline':<22} {baseline * 1000:9.1f} ms   1.00x")
+    for name, codec in available_codecs().items():
+        best, median = best_of(lambda: codec.loads(raw), args.repeat)
+        print(
+            f"{name + ' (bytes)':<22} {best * 1000:9.1f} ms "
+            f"{baseline / best:6.2f}x   (median {median * 1000:.1f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
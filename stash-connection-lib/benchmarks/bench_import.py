@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Time a hook plugin's whole process: start Python, import, run one query.
+
+Usage:
+    python benchmarks/bench_import.py              # 10 runs per transport
+    python benchmarks/bench_import.py --repeat 30 --top 15
+
+Each run is a fresh interpreter, as Stash spawns for every hook, talking to
+a local FakeStash. The ``-X importtime`` table below lists the modules that
+dominate ``import`` on the stdlib path.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from stash_connection_lib.testing import FakeStash  # noqa: E402
+
+HOOK = """
+import json, sys
+from stash_connection_lib import get_connection
+conn = get_connection(json.loads(sys.argv[1]), transport=sys.argv[2])
+conn.query("query ($id: ID!) { findScene(id: $id) { id title } }", {"id": "1"})
+"""
+
+
+def run(args: list, env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def importtime(env: dict, top: int) -> None:
+    """Print the slowest top‑level imports of the stdlib path."""
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "from stash_connection_lib import get_connection",
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines()[1:]:
+        _, own, cumulative, name = (
+            part.strip() for part in line.replace(":", "|", 1).split("|")
+        )
+        rows.append((int(cumulative), int(own), name))
+    print(f"\n{'cumulative':>11} {'self':>8}  module (µs, -X importtime)")
+    for cumulative, own, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative:>11} {own:>8}  {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    baseline = statistics.median(run(["-c", "pass"], env) for _ in range(args.repeat))
+    print(f"{'python -c pass':<22} {baseline * 1000:7.1f} ms")
+    with FakeStash(scenes=10) as stash:
+        fragment = '{"Scheme": "http", "Host": "127.0.0.1", "Port": %d}' % stash.port
+        for transport in ("requests", "stdlib"):
+            hook = ["-c", HOOK, fragment, transport]
+            median = statistics.median(run(hook, env) for _ in range(args.repeat))
+            print(
+                f"{'hook, ' + transport:<22} {median * 1000:7.1f} ms"
+                f"   (+{(median - baseline) * 1000:.1f} ms over bare startup)"
+            )
+    importtime(env, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compare memory held by decoded scenes as raw dicts and as slot models.
+
+Usage:
+    python benchmarks/bench_models.py              # 100k scenes
+    python benchmarks/bench_models.py --scenes 20000
+
+Sizes are what ``tracemalloc`` sees still allocated once the list of scenes
+is built and everything else has been released.
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_codec import synthetic_payload  # noqa: E402
+from stash_connection_lib.models import Scene, iter_models  # noqa: E402
+from stash_connection_lib.streaming import iter_json_items  # noqa: E402
+
+PATH = "data.findScenes.scenes.item"
+
+
+def _held(build) -> tuple:
+    """Return (bytes still allocated by build()'s result, seconds taken)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return held, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenes", type=int, default=100_000)
+    args = parser.parse_args()
+
+    raw = synthetic_payload(args.scenes)
+    chunks = [raw[i : i + 65536] for i in range(0, len(raw), 65536)]
+    print(f"payload: {args.scenes:,} scenes, {len(raw) / 2**20:.1f} MiB")
+
+    runs = {
+        "dicts (json.loads)": lambda: json.loads(raw)["data"]["findScenes"]["scenes"],
+        "models (from dicts)": lambda: list(
+            iter_models(json.loads(raw)["data"]["findScenes"]["scenes"], Scene)
+        ),
+        "models (streamed)": lambda: list(
+            iter_models(iter_json_items(chunks, PATH), Scene)
+        ),
+    }
+    baseline = None
+    per = 100_000 / args.scenes
+    for label, build in runs.items():
+        held, elapsed = _held(build)
+        baseline = baseline or held
+        print(
+            f"{label:<22} {held * per / 2**20:8.1f} MiB per 100k scenes "
+            f"{baseline / held:6.2f}x smaller   ({elapsed:.2f} s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
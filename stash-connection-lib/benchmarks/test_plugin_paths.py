@@ -0,0 +1,158 @@
+"""
+Time the access patterns plugins in this repo run against a whole library.
+
+Each benchmark drives a real :class:`StashConnection` over HTTP against an
+in‑process :class:`~stash_connection_lib.testing.FakeStash`, once per library
+size, and records the server's request/byte counts in ``extra_info`` so a
+regression in round trips shows up next to a regression in time.
+
+Usage:
+    pip install pytest-benchmark
+    python -m pytest benchmarks/test_plugin_paths.py
+    STASH_BENCH_SIZES=1000 python -m pytest benchmarks/ --benchmark-only
+
+``STASH_BENCH_SIZES`` is a comma separated list of scene counts
+(default ``1000,10000,100000``).
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from stash_connection_lib import BulkWriter, ConfigSnapshot, LibraryMirror  # noqa: E402
+from stash_connection_lib.models import Scene, iter_models  # noqa: E402
+from stash_connection_lib.testing import FakeStash  # noqa: E402
+
+SIZES = [
+    int(n) for n in os.environ.get("STASH_BENCH_SIZES", "1000,10000,100000").split(",")
+]
+
+# Renamer, stashJellyfinExporter, scenesMovieDuration: every scene with files.
+SCENES = """
+query ($filter: FindFilterType, $scene_filter: SceneFilterType) {
+  findScenes(filter: $filter, scene_filter: $scene_filter) {
+    count
+    scenes {
+      id title date rating100 organized
+      files { path basename duration width height fingerprints { type value } }
+      studio { id name }
+      performers { id name }
+      tags { id name }
+    }
+  }
+}
+"""
+
+# stashNewPerformerScenes, performerSceneCompare: scenes per performer.
+PERFORMER_SCENES = """
+query ($id: ID!) {
+  findScenes(
+    filter: {per_page: -1}
+    scene_filter: {performers: {value: [$id], modifier: INCLUDES}}
+  ) { count scenes { id title } }
+}
+"""
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda n: f"{n}scenes")
+def stash(request):
+    with FakeStash(scenes=request.param) as stash:
+        yield stash
+
+
+def _run(benchmark, stash, fn, rounds=3):
+    """Benchmark *fn* and attach the server counters of its last round."""
+
+    def setup():
+        stash.reset_stats()
+
+    result = benchmark.pedantic(fn, setup=setup, rounds=rounds, iterations=1)
+    benchmark.extra_info.update(stash.stats())
+    return result
+
+
+def test_config_snapshot(benchmark, stash):
+    """Plugin start‑up: one configuration snapshot."""
+    conn = stash.connect()
+    snapshot = _run(benchmark, stash, lambda: ConfigSnapshot.fetch(conn), rounds=10)
+    assert snapshot.stashes
+
+
+def test_walk_scenes(benchmark, stash):
+    """Full library walk, page by page."""
+    conn = stash.connect()
+    count = _run(benchmark, stash, lambda: sum(1 for _ in conn.iter_pages(SCENES)))
+    assert count == len(stash.tables["scenes"])
+
+
+def test_stream_scenes(benchmark, stash):
+    """Full library in one ``per_page: -1`` response, parsed as it arrives."""
+    conn = stash.connect()
+    variables = {"filter": {"per_page": -1}}
+
+    def stream():
+        items = conn.stream_items(SCENES, variables, path="data.findScenes.scenes.item")
+        return sum(1 for _ in iter_models(items, Scene))
+
+    assert _run(benchmark, stash, stream) == len(stash.tables["scenes"])
+
+
+def test_scenes_per_performer(benchmark, stash):
+    """One ``findScenes`` per performer, batched into aliased documents."""
+    conn = stash.connect()
+    performer_ids = list(stash.tables["performers"])[:50]
+
+    def compare():
+        with conn.batch() as batch:
+            futures = [batch.add(PERFORMER_SCENES, {"id": i}) for i in performer_ids]
+        return [f.result()["data"]["findScenes"]["count"] for f in futures]
+
+    assert len(_run(benchmark, stash, compare)) == len(performer_ids)
+
+
+def test_resolve_tag_names(benchmark, stash):
+    """stashDBTagImport / bulkImportPerformers: names to ids."""
+    conn = stash.connect()
+    names = [t["name"].lower() for t in stash.tables["tags"].values()]
+
+    def resolve():
+        return conn.resolver("tag").resolve_many(names)
+
+    assert None not in _run(benchmark, stash, resolve).values()
+
+
+def test_bulk_studio_update(benchmark, stash):
+    """Movie-Fy Scene Studio Bulk Update: set one studio on 1% of scenes."""
+    conn = stash.connect()
+    studio = next(iter(stash.tables["studios"]))
+    scenes = list(stash.tables["scenes"])
+    scene_ids = scenes[: max(10, len(scenes) // 100)]
+
+    def update():
+        inputs = ({"id": i, "studio_id": studio} for i in scene_ids)
+        return BulkWriter(conn).run("sceneUpdate", inputs)
+
+    assert _run(benchmark, stash, update).ok
+
+
+def test_incremental_sync(benchmark, stash, tmp_path):
+    """Mirror refresh after a small batch of edits."""
+    conn = stash.connect()
+    with LibraryMirror(conn, tmp_path / "mirror.sqlite") as mirror:
+        mirror.sync()
+        edited = list(stash.tables["scenes"])[:100]
+        rounds = iter(range(2100, 2200))
+
+        def sync():
+            stamp = f"{next(rounds)}-01-01T00:00:00Z"
+            for scene_id in edited:
+                stash.tables["scenes"][scene_id]["updated_at"] = stamp
+            return mirror.sync(["scene"])
+
+        assert _run(benchmark, stash, sync)["scene"] >= len(edited)
@@ -207,7 +207,8 @@ def main():
 
     if args.test:
         print(
-            f"📋 Test with: pip install -i https://test.pypi.org/simple/ stash-connection-lib=={new_version}"
+            "📋 Test with: pip install -i https://test.pypi.org/simple/ "
+            f"stash-connection-lib=={new_version}"
         )
     else:
         print(f"📋 Install with: pip install stash-connection-lib=={new_version}")
@@ -1,12 +1,111 @@
-from .core import (
-    connect,
-    GET_STASH_API_KEY,
-    GET_STASH_BOXES,
-    GET_STASHES,
-    GET_PATHS,
-    GET_SCRAPER_SOURCES,
-    GET_PLUGIN_SOURCES,
-    StashConnection,
-)
+"""
+Names are imported from their submodules on first access, so a hook plugin
+that only needs ``get_connection`` does not pay for ``asyncio``, ``sqlite3``
+or the models it never touches.
+"""
 
+from typing import TYPE_CHECKING, Any, Dict, List
+
+_EXPORTS: Dict[str, str] = {
+    "connect": "core",
+    "get_connection": "core",
+    "invalidate_connection": "core",
+    "get_config_snapshot": "core",
+    "ConfigSnapshot": "core",
+    "GraphQLError": "core",
+    "response_data": "core",
+    "GET_STASH_API_KEY": "core",
+    "GET_STASH_BOXES": "core",
+    "GET_STASHES": "core",
+    "GET_PATHS": "core",
+    "GET_SCRAPER_SOURCES": "core",
+    "GET_PLUGIN_SOURCES": "core",
+    "StashConnection": "core",
+    "build_session": "core",
+    "QueryBatch": "batch",
+    "BulkReport": "bulk",
+    "BulkWriter": "bulk",
+    "ResponseCache": "cache",
+    "ClusterError": "cluster",
+    "StashCluster": "cluster",
+    "RateLimiter": "ratelimit",
+    "JobError": "jobs",
+    "JobManager": "jobs",
+    "AsyncStashConnection": "aio",
+    "iter_json_items": "streaming",
+    "Group": "models",
+    "Performer": "models",
+    "Scene": "models",
+    "SceneFile": "models",
+    "Studio": "models",
+    "Tag": "models",
+    "iter_models": "models",
+    "LibraryMirror": "mirror",
+    "NameResolver": "resolver",
+    "Uploader": "uploads",
+    "QueryValidationError": "schema",
+    "Schema": "schema",
+    "load_schema": "schema",
+    "PluginDaemon": "daemon",
+}
+
+__all__ = list(_EXPORTS)
 __version__ = "0.1.0"
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+if TYPE_CHECKING:
+    # Re-exported lazily by __getattr__; listed here for type checkers.
+    from .aio import AsyncStashConnection  # noqa: F401
+    from .batch import QueryBatch  # noqa: F401
+    from .bulk import BulkReport, BulkWriter  # noqa: F401
+    from .cache import ResponseCache  # noqa: F401
+    from .cluster import ClusterError, StashCluster  # noqa: F401
+    from .daemon import PluginDaemon  # noqa: F401
+    from .core import (  # noqa: F401
+        GET_PATHS,
+        GET_PLUGIN_SOURCES,
+        GET_SCRAPER_SOURCES,
+        GET_STASH_API_KEY,
+        GET_STASH_BOXES,
+        GET_STASHES,
+        ConfigSnapshot,
+        GraphQLError,
+        StashConnection,
+        build_session,
+        connect,
+        get_config_snapshot,
+        get_connection,
+        invalidate_connection,
+        response_data,
+    )
+    from .jobs import JobError, JobManager  # noqa: F401
+    from .mirror import LibraryMirror  # noqa: F401
+    from .models import (  # noqa: F401
+        Group,
+        Performer,
+        Scene,
+        SceneFile,
+        Studio,
+        Tag,
+        iter_models,
+    )
+    from .ratelimit import RateLimiter  # noqa: F401
+    from .resolver import NameResolver  # noqa: F401
+    from .schema import QueryValidationError, Schema, load_schema  # noqa: F401
+    from .streaming import iter_json_items  # noqa: F401
+    from .uploads import Uploader  # noqa: F401
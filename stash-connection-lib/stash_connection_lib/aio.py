@@ -0,0 +1,229 @@
+# aio.py
+"""
+asyncio counterpart of :class:`~stash_connection_lib.core.StashConnection`.
+
+Requires the optional ``aiohttp`` dependency
+(``pip install stash-connection-lib[async]``)::
+
+    import asyncio
+    from stash_connection_lib.aio import AsyncStashConnection
+
+    async def main(fragment, scene_ids):
+        async with AsyncStashConnection.from_fragment(fragment) as conn:
+            await conn.authenticate()
+            return await conn.gather_queries(
+                ("query($id: ID!) { findScene(id: $id) { title } }", {"id": i})
+                for i in scene_ids
+            )
+
+    asyncio.run(main(fragment, ["1", "2", "3"]))
+
+Fragment parsing, timeouts and the retry policy are shared with the
+synchronous client. A semaphore caps the number of requests in flight; pass
+the same one to several connections to give them a common budget.
+"""
+
+import asyncio
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .codec import JSONCodec, get_codec
+from .core import (
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_TIMEOUT,
+    _RETRY_STATUSES,
+    StashConnection,
+    Timeout,
+    _fragment_cookie,
+    _fragment_url,
+    _is_mutation,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    import aiohttp
+
+__all__ = ["AsyncStashConnection", "DEFAULT_MAX_CONCURRENCY"]
+
+#: Requests allowed in flight at once per connection (or shared semaphore).
+DEFAULT_MAX_CONCURRENCY = 8
+
+Operation = Union[str, Tuple[str, Optional[Dict[str, Any]]]]
+
+
+def _aiohttp() -> Any:
+    try:
+        import aiohttp
+    except ImportError as exc:  # pragma: no cover – depends on environment
+        raise ImportError(
+            "AsyncStashConnection needs aiohttp: "
+            "pip install stash-connection-lib[async]"
+        ) from exc
+    return aiohttp
+
+
+def _client_timeout(timeout: Timeout) -> "aiohttp.ClientTimeout":
+    aiohttp = _aiohttp()
+    if timeout is None:
+        return aiohttp.ClientTimeout(total=None)
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+    return aiohttp.ClientTimeout(total=timeout)
+
+
+class AsyncStashConnection:
+    """Pooled aiohttp client with bounded concurrency and GraphQL helpers."""
+
+    def __init__(
+        self,
+        url: str,
+        api_key: Optional[str] = None,
+        *,
+        cookies: Optional[Dict[str, str]] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        codec: Union[str, JSONCodec] = "auto",
+    ):
+        self.url = url.rstrip("/") + "/graphql"
+        self.api_key = api_key or ""
+        self.cookies = dict(cookies or {})
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_concurrency = max_concurrency
+        self.codec = get_codec(codec) if isinstance(codec, str) else codec
+        self._semaphore = semaphore
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    # ---------------------------------------------------------------------
+    # Construction helpers
+    # ---------------------------------------------------------------------
+    @classmethod
+    def from_fragment(
+        cls, fragment: Dict[str, Any], **options: Any
+    ) -> "AsyncStashConnection":
+        cookie = _fragment_cookie(fragment)
+        return cls(
+            _fragment_url(fragment),
+            cookies=dict([cookie]) if cookie else None,
+            **options,
+        )
+
+    @classmethod
+    def from_connection(
+        cls, conn: StashConnection, **options: Any
+    ) -> "AsyncStashConnection":
+        """Build an async twin of *conn*, reusing its API key and cookies."""
+        options.setdefault("timeout", conn.timeout)
+        options.setdefault("max_retries", conn.max_retries)
+        options.setdefault("backoff_factor", conn.backoff_factor)
+        options.setdefault("codec", conn.codec)
+        return cls(
+            conn.url[: -len("/graphql")],
+            conn.api_key,
+            cookies=conn.session.cookies.get_dict(),
+            **options,
+        )
+
+    async def __aenter__(self) -> "AsyncStashConnection":
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created on first use so it binds to the running event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _client(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            aiohttp = _aiohttp()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=_client_timeout(self.timeout),
+                cookies=self.cookies,
+            )
+        return self._session
+
+    # ---------------------------------------------------------------------
+    # Low‑level query helpers
+    # ---------------------------------------------------------------------
+    async def query(
+        self, query: str, variables: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """POST *query* and return the decoded JSON response.
+
+        Same retry policy as :meth:`StashConnection.query`.
+        """
+        aiohttp = _aiohttp()
+        headers = {"apiKey": self.api_key} if self.api_key else {}
+        payload: Dict[str, Any] = {"query": query}
+        if variables is not None:
+            payload["variables"] = variables
+        retries_left = 0 if _is_mutation(query) else self.max_retries
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    async with self._client().post(
+                        self.url, json=payload, headers=headers
+                    ) as resp:
+                        resp.raise_for_status()
+                        return self.codec.loads(await resp.read())
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= retries_left:
+                    raise
+            except aiohttp.ClientResponseError as exc:
+                if exc.status not in _RETRY_STATUSES or attempt >= retries_left:
+                    raise
+            await asyncio.sleep(self.backoff_factor * 2**attempt)
+            attempt += 1
+
+    async def authenticate(self) -> None:
+        """Populate **self.api_key** if the server exposes one."""
+        data = await self.query("query { configuration { general { apiKey } } }")
+        self.api_key = (
+            data.get("data", {})
+            .get("configuration", {})
+            .get("general", {})
+            .get("apiKey", "")
+        )
+
+    async def gather_queries(
+        self, operations: Iterable[Operation], return_exceptions: bool = False
+    ) -> List[Any]:
+        """Run many operations concurrently and return results in order.
+
+        Each operation is a query string or a ``(query, variables)`` pair. The
+        connection's semaphore keeps at most *max_concurrency* in flight.
+        """
+        calls = []
+        for operation in operations:
+            if isinstance(operation, str):
+                calls.append(self.query(operation))
+            else:
+                calls.append(self.query(*operation))
+        return await asyncio.gather(*calls, return_exceptions=return_exceptions)
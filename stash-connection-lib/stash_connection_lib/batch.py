@@ -0,0 +1,284 @@
+# batch.py
+"""
+Query batching via GraphQL aliasing.
+
+Operations added to a :class:`QueryBatch` are rewritten so every top‑level
+field gets a unique alias (``b0_findScene``, ``b1_findScene`` …) and every
+variable a unique name, then merged into a single document. One POST
+replaces *N*, and the response is split back into one result per operation::
+
+    with conn.batch(max_operations=50) as batch:
+        futures = [
+            batch.add(
+                "mutation($id: ID!) { sceneMarkerDestroy(id: $id) }", {"id": mid}
+            )
+            for mid in marker_ids
+        ]
+    for future in futures:
+        print(future.result())  # {"data": {"sceneMarkerDestroy": True}}
+
+Each future resolves to what :meth:`StashConnection.query` would have
+returned for that operation alone – a dict with ``data`` and, if that
+operation failed, its own ``errors``. Transport failures are set as the
+future's exception. A query document the server rejects outright is
+re-sent one operation at a time; a rejected mutation document is not, and
+every operation in it receives the server's errors.
+"""
+
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .graphql import (
+    Directive,
+    Document,
+    Field,
+    FragmentDefinition,
+    FragmentSpread,
+    InlineFragment,
+    OperationDefinition,
+    Selection,
+    Variable,
+    VariableDefinition,
+    parse,
+    print_document,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .core import StashConnection
+
+__all__ = ["QueryBatch", "DEFAULT_MAX_OPERATIONS"]
+
+#: Operations merged into one GraphQL document before it is sent.
+DEFAULT_MAX_OPERATIONS = 50
+
+
+class _Pending:
+    __slots__ = ("query", "operation", "fragments", "variables", "future")
+
+    def __init__(
+        self,
+        query: str,
+        operation: OperationDefinition,
+        fragments: Dict[str, FragmentDefinition],
+        variables: Dict[str, Any],
+        future: Future,
+    ):
+        self.query = query
+        self.operation = operation
+        self.fragments = fragments
+        self.variables = variables
+        self.future = future
+
+
+def _rename_value(value: Any, prefix: str) -> Any:
+    if isinstance(value, Variable):
+        return Variable(prefix + value.name)
+    if isinstance(value, list):
+        return [_rename_value(v, prefix) for v in value]
+    if isinstance(value, dict):
+        return {k: _rename_value(v, prefix) for k, v in value.items()}
+    return value
+
+
+def _rename_directives(directives: List[Directive], prefix: str) -> List[Directive]:
+    return [Directive(d.name, _rename_value(d.arguments, prefix)) for d in directives]
+
+
+def _rename_selections(
+    selections: Optional[List[Selection]], prefix: str
+) -> Optional[List[Selection]]:
+    if selections is None:
+        return None
+    renamed: List[Selection] = []
+    for sel in selections:
+        if isinstance(sel, Field):
+            renamed.append(
+                Field(
+                    sel.name,
+                    sel.alias,
+                    _rename_value(sel.arguments, prefix),
+                    _rename_directives(sel.directives, prefix),
+                    _rename_selections(sel.selection_set, prefix),
+                )
+            )
+        elif isinstance(sel, InlineFragment):
+            renamed.append(
+                InlineFragment(
+                    sel.type_condition,
+                    _rename_directives(sel.directives, prefix),
+                    _rename_selections(sel.selection_set, prefix) or [],
+                )
+            )
+        else:
+            renamed.append(
+                FragmentSpread(sel.name, _rename_directives(sel.directives, prefix))
+            )
+    return renamed
+
+
+def _print_fragment(fragment: FragmentDefinition) -> str:
+    return print_document(Document([fragment]))
+
+
+class QueryBatch:
+    """Collect operations and send them as aliased multi‑operation documents.
+
+    Consecutive operations of the same type (query or mutation) share a
+    document; switching type flushes, so mutations still run in the order
+    they were added. A document is also flushed once it holds
+    *max_operations* operations, or before an operation whose named
+    fragment differs from a queued one of the same name. Named fragments are
+    shared between operations and must not reference variables.
+    Operations with directives or top‑level fragments cannot be merged and
+    are refused by :meth:`add`.
+    """
+
+    def __init__(
+        self, conn: "StashConnection", max_operations: int = DEFAULT_MAX_OPERATIONS
+    ):
+        if max_operations < 1:
+            raise ValueError("max_operations must be at least 1")
+        self.conn = conn
+        self.max_operations = max_operations
+        self._pending: List[_Pending] = []
+        self.documents_sent = 0
+
+    def __enter__(self) -> "QueryBatch":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is None:
+            self.flush()
+        else:
+            for item in self._pending:
+                item.future.cancel()
+            self._pending = []
+
+    # ---------------------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------------------
+    def add(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Future:
+        """Queue one operation and return a future for its result."""
+        document = parse(query)
+        operation = document.operation()
+        if operation.operation == "subscription":
+            raise ValueError("subscriptions cannot be batched")
+        if operation.directives:
+            raise ValueError("operations with directives cannot be batched")
+        if not all(isinstance(sel, Field) for sel in operation.selection_set):
+            raise ValueError("top-level fragments cannot be batched")
+        if self._pending and (
+            self._pending[0].operation.operation != operation.operation
+            or self._conflicts(document.fragments)
+        ):
+            self.flush()
+        future: Future = Future()
+        self._pending.append(
+            _Pending(query, operation, document.fragments, variables or {}, future)
+        )
+        if len(self._pending) >= self.max_operations:
+            self.flush()
+        return future
+
+    def flush(self) -> None:
+        """Send everything queued so far."""
+        pending, self._pending = self._pending, []
+        if pending:
+            self._send(pending)
+
+    # ---------------------------------------------------------------------
+    # Internals
+    # ---------------------------------------------------------------------
+    def _conflicts(self, fragments: Dict[str, FragmentDefinition]) -> bool:
+        """Whether a queued operation defines one of *fragments* differently."""
+        for name, fragment in fragments.items():
+            printed = _print_fragment(fragment)
+            for item in self._pending:
+                known = item.fragments.get(name)
+                if known is not None and _print_fragment(known) != printed:
+                    return True
+        return False
+
+    def _merge(
+        self, pending: List[_Pending]
+    ) -> Tuple[str, Dict[str, Any], Dict[str, Tuple[int, str]]]:
+        """Return ``(query, variables, alias → (index, original key))``."""
+        selections: List[Selection] = []
+        var_defs: List[VariableDefinition] = []
+        variables: Dict[str, Any] = {}
+        fragments: Dict[str, FragmentDefinition] = {}
+        aliases: Dict[str, Tuple[int, str]] = {}
+        for index, item in enumerate(pending):
+            prefix = f"b{index}_"
+            op = item.operation
+            for var in op.variable_definitions:
+                var_defs.append(
+                    VariableDefinition(prefix + var.name, var.type, var.default_value)
+                )
+                if var.name in item.variables:
+                    variables[prefix + var.name] = item.variables[var.name]
+            for sel in _rename_selections(op.selection_set, prefix) or []:
+                assert isinstance(sel, Field)  # checked by add()
+                alias = prefix + sel.response_key
+                aliases[alias] = (index, sel.response_key)
+                sel.alias = alias
+                selections.append(sel)
+            for name, fragment in item.fragments.items():
+                fragments.setdefault(name, fragment)  # add() flushed on conflicts
+        operation = OperationDefinition(
+            pending[0].operation.operation, "Batch", var_defs, [], selections
+        )
+        document = Document([operation, *fragments.values()])
+        return print_document(document), variables, aliases
+
+    def _send(self, pending: List[_Pending]) -> None:
+        if len(pending) == 1:
+            self._send_single(pending[0])
+            return
+        try:
+            query, variables, aliases = self._merge(pending)
+            response = self.conn.query(query, variables)
+        except Exception as exc:
+            for item in pending:
+                item.future.set_exception(exc)
+            return
+        self.documents_sent += 1
+
+        data = response.get("data")
+        errors = response.get("errors") or []
+        rejected = data is None and errors and not any(e.get("path") for e in errors)
+        if rejected and pending[0].operation.operation == "query":
+            # The whole document was rejected before execution (e.g. a
+            # validation error in one operation) – retry one by one so only
+            # the culprit fails. Mutations are never replayed; each of them
+            # gets the document's errors instead.
+            for item in pending:
+                self._send_single(item)
+            return
+
+        results: List[Dict[str, Any]] = [{"data": {}} for _ in pending]
+        for alias, value in (data or {}).items():
+            index, key = aliases.get(alias, (None, alias))
+            if index is not None:
+                results[index]["data"][key] = value
+        for error in errors:
+            path = error.get("path") or []
+            target = aliases.get(path[0]) if path else None
+            if target is None:
+                for result in results:
+                    result.setdefault("errors", []).append(error)
+                continue
+            index, key = target
+            error = dict(error, path=[key, *path[1:]])
+            results[index].setdefault("errors", []).append(error)
+        for item, result in zip(pending, results):
+            item.future.set_result(result)
+
+    def _send_single(self, item: _Pending) -> None:
+        try:
+            response = self.conn.query(item.query, item.variables)
+        except Exception as exc:
+            item.future.set_exception(exc)
+            return
+        self.documents_sent += 1
+        item.future.set_result(response)
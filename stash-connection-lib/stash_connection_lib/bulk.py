@@ -0,0 +1,402 @@
+# bulk.py
+"""
+Bulk mutation executor.
+
+A :class:`BulkWriter` turns a stream of mutation inputs into as few requests
+as possible and runs them in parallel::
+
+    writer = BulkWriter(conn, max_workers=4)
+    report = writer.run("tagCreate", ({"name": n} for n in names), selection="id name")
+    print(report.summary())            # "998 succeeded, 2 failed in 4 documents"
+    for item in report.failed:
+        print(item.input, item.errors)
+
+Inputs are grouped two ways:
+
+* **Native bulk mutations.** For ``sceneUpdate``, ``performerUpdate``,
+  ``imageUpdate``, ``galleryUpdate``, ``groupUpdate`` and ``tagUpdate``,
+  items that set the same values on different ids are sent as one
+  ``bulk*Update`` call, when every field they set is supported by it.
+* **Aliased documents.** Everything else is merged into multi‑mutation
+  documents of *batch_size* operations via :class:`QueryBatch`.
+
+Documents run on up to *max_workers* threads. Items that fail are retried
+one by one (creates are not retried after a transport error, since the
+first attempt may have been applied), and every item ends up in the
+:class:`BulkReport` with its result or its errors.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .batch import QueryBatch
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .core import StashConnection
+
+__all__ = ["BulkWriter", "BulkReport", "ItemResult"]
+
+#: Mutations merged into one aliased document.
+DEFAULT_BATCH_SIZE = 50
+#: Documents in flight at once.
+DEFAULT_MAX_WORKERS = 4
+#: Individual re‑sends of an item after its batched attempt failed.
+DEFAULT_ITEM_RETRIES = 1
+
+_IDS = "ids"  # BulkUpdateIds fields take {ids, mode}
+
+
+class _BulkSpec:
+    __slots__ = ("mutation", "input_type", "fields")
+
+    def __init__(self, mutation: str, input_type: str, fields: Dict[str, str]):
+        self.mutation = mutation
+        self.input_type = input_type
+        self.fields = fields  # input key → "value" | _IDS
+
+
+def _bulk(mutation: str, values: str, ids: str) -> _BulkSpec:
+    fields = {name: "value" for name in values.split()}
+    fields.update({name: _IDS for name in ids.split()})
+    return _BulkSpec(mutation, mutation[0].upper() + mutation[1:] + "Input", fields)
+
+
+#: ``*Update`` mutation → its ``bulk*Update`` counterpart and the input
+#: fields both accept with the same meaning.
+_BULK: Dict[str, _BulkSpec] = {
+    "sceneUpdate": _bulk(
+        "bulkSceneUpdate",
+        "code details director date rating100 organized studio_id",
+        "performer_ids tag_ids gallery_ids group_ids",
+    ),
+    "performerUpdate": _bulk(
+        "bulkPerformerUpdate",
+        "disambiguation gender birthdate country ethnicity details favorite "
+        "rating100 ignore_auto_tag",
+        "tag_ids",
+    ),
+    "imageUpdate": _bulk(
+        "bulkImageUpdate",
+        "title code details photographer date rating100 organized studio_id",
+        "performer_ids tag_ids gallery_ids",
+    ),
+    "galleryUpdate": _bulk(
+        "bulkGalleryUpdate",
+        "code details photographer date rating100 organized studio_id",
+        "performer_ids tag_ids scene_ids",
+    ),
+    "groupUpdate": _bulk("bulkGroupUpdate", "director rating100 studio_id", "tag_ids"),
+    "tagUpdate": _bulk(
+        "bulkTagUpdate", "description favorite ignore_auto_tag", "parent_ids child_ids"
+    ),
+}
+
+
+class ItemResult:
+    """Outcome of one input: ``data`` on success, ``errors`` on failure."""
+
+    __slots__ = ("index", "input", "data", "errors", "attempts")
+
+    def __init__(self, index: int, input: Any):
+        self.index = index
+        self.input = input
+        self.data: Any = None
+        self.errors: List[Dict[str, Any]] = []
+        self.attempts = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __repr__(self) -> str:
+        state = "ok" if self.ok else f"failed: {self.errors[0].get('message')!r}"
+        return f"ItemResult({self.index}, {state})"
+
+
+class BulkReport:
+    """Per‑item results of :meth:`BulkWriter.run`, in input order."""
+
+    def __init__(self, results: List[ItemResult], documents_sent: int, elapsed: float):
+        self.results = results
+        self.documents_sent = documents_sent
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self) -> List[ItemResult]:
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> List[ItemResult]:
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def ok(self) -> bool:
+        return all(r.ok for r in self.results)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def summary(self) -> str:
+        failed = len(self.failed)
+        return (
+            f"{len(self.results) - failed} succeeded, {failed} failed "
+            f"in {self.documents_sent} documents ({self.elapsed:.2f}s)"
+        )
+
+
+def _error(exc: BaseException) -> Dict[str, Any]:
+    return {"message": str(exc) or type(exc).__name__, "exception": type(exc).__name__}
+
+
+class BulkWriter:
+    """Run many mutations of one kind with batching and bounded parallelism."""
+
+    def __init__(
+        self,
+        conn: "StashConnection",
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        item_retries: int = DEFAULT_ITEM_RETRIES,
+        use_bulk: bool = True,
+    ):
+        if batch_size < 1 or max_workers < 1:
+            raise ValueError("batch_size and max_workers must be at least 1")
+        self.conn = conn
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.item_retries = item_retries
+        self.use_bulk = use_bulk
+        self._lock = threading.Lock()
+        self._documents = 0
+
+    # ---------------------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------------------
+    def run(
+        self,
+        mutation: str,
+        inputs: Iterable[Any],
+        *,
+        selection: Optional[str] = "id",
+        argument: str = "input",
+        input_type: Optional[str] = None,
+    ) -> BulkReport:
+        """Apply *mutation* (e.g. ``"tagCreate"``) once per item of *inputs*.
+
+        Each item is passed as the *argument* variable, typed *input_type*
+        (default ``<Mutation>Input!``). *selection* is the field selection
+        of the result, or ``None`` for scalar results such as ``*Destroy``.
+        *inputs* is consumed lazily, a window of documents at a time.
+        """
+        input_type = input_type or mutation[0].upper() + mutation[1:] + "Input!"
+        body = f"{mutation}({argument}: ${argument})"
+        if selection:
+            body += f" {{ {selection} }}"
+        query = f"mutation (${argument}: {input_type}) {{ {body} }}"
+        call = _Call(mutation, query, argument, selection)
+
+        start = time.perf_counter()
+        self._documents = 0
+        results: List[ItemResult] = []
+        window = self.batch_size * self.max_workers
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="stash-bulk"
+        ) as pool:
+            pending: Deque[Future] = deque()
+            for chunk in _chunks(inputs, window, argument, len(results)):
+                results.extend(item for item, _ in chunk)
+                for job in self._plan(call, chunk):
+                    pending.append(pool.submit(*job))
+                # Keep at most two windows in flight so huge streams stay bounded.
+                while len(pending) > 2 * self.max_workers:
+                    pending.popleft().result()
+            for future in pending:
+                future.result()
+        return BulkReport(results, self._documents, time.perf_counter() - start)
+
+    # ---------------------------------------------------------------------
+    # Planning
+    # ---------------------------------------------------------------------
+    def _plan(
+        self, call: "_Call", chunk: List[Tuple[ItemResult, Dict[str, Any]]]
+    ) -> Iterator[tuple]:
+        spec = _BULK.get(call.mutation) if self.use_bulk else None
+        rest = chunk
+        if spec is not None and call.argument == "input":
+            groups: Dict[str, List[Tuple[ItemResult, Dict[str, Any]]]] = {}
+            rest = []
+            for entry in chunk:
+                key = _bulk_key(spec, entry[1][call.argument])
+                if key is None:
+                    rest.append(entry)
+                else:
+                    groups.setdefault(key, []).append(entry)
+            for members in groups.values():
+                if len(members) < 2:
+                    rest.extend(members)
+                    continue
+                for i in range(0, len(members), self.batch_size * 10):
+                    yield (
+                        self._send_bulk,
+                        call,
+                        spec,
+                        members[i : i + self.batch_size * 10],
+                    )
+        rest.sort(key=lambda entry: entry[0].index)
+        for i in range(0, len(rest), self.batch_size):
+            yield (self._send_batch, call, rest[i : i + self.batch_size])
+
+    # ---------------------------------------------------------------------
+    # Sending
+    # ---------------------------------------------------------------------
+    def _count(self, documents: int) -> None:
+        with self._lock:
+            self._documents += documents
+
+    def _send_batch(
+        self, call: "_Call", entries: List[Tuple[ItemResult, Dict[str, Any]]]
+    ) -> None:
+        batch = QueryBatch(self.conn, max_operations=len(entries))
+        futures = []
+        for item, variables in entries:
+            item.attempts += 1
+            futures.append(batch.add(call.query, variables))
+        batch.flush()
+        self._count(batch.documents_sent)
+        for (item, variables), future in zip(entries, futures):
+            exc = future.exception()
+            if exc is not None:
+                item.errors = [_error(exc)]
+                if call.idempotent:
+                    self._retry(call, item, variables)
+                continue
+            self._settle(call, item, future.result())
+            if not item.ok:
+                self._retry(call, item, variables)
+
+    def _send_bulk(
+        self,
+        call: "_Call",
+        spec: _BulkSpec,
+        entries: List[Tuple[ItemResult, Dict[str, Any]]],
+    ) -> None:
+        argument = call.argument
+        payload = _bulk_input(spec, entries[0][1][argument])
+        payload["ids"] = [variables[argument]["id"] for _, variables in entries]
+        query = (
+            f"mutation ($input: {spec.input_type}!) {{ {spec.mutation}(input: $input)"
+        )
+        query += f" {{ {call.selection} }} }}" if call.selection else " }"
+        for item, _ in entries:
+            item.attempts += 1
+        try:
+            response = self.conn.query(query, {"input": payload})
+        except Exception:
+            response = None
+        finally:
+            self._count(1)
+        data = (response or {}).get("data") or {}
+        updated = data.get(spec.mutation)
+        if response is None or response.get("errors") or updated is None:
+            # Let the per‑item path pinpoint which ids were rejected.
+            self._send_batch(call, entries)
+            return
+        by_id = {str(o.get("id")): o for o in updated} if call.selection else {}
+        for item, variables in entries:
+            item.data = by_id.get(str(variables[argument]["id"]))
+            item.errors = []
+
+    def _settle(
+        self, call: "_Call", item: ItemResult, response: Dict[str, Any]
+    ) -> None:
+        errors = response.get("errors") or []
+        data = (response.get("data") or {}).get(call.mutation)
+        if errors or (data is None and call.selection):
+            item.errors = errors or [{"message": f"{call.mutation} returned null"}]
+        else:
+            item.data, item.errors = data, []
+
+    def _retry(
+        self, call: "_Call", item: ItemResult, variables: Dict[str, Any]
+    ) -> None:
+        for _ in range(self.item_retries):
+            item.attempts += 1
+            try:
+                response = self.conn.query(call.query, variables)
+            except Exception as exc:
+                self._count(1)
+                item.errors = [_error(exc)]
+                if not call.idempotent:
+                    return
+                continue
+            self._count(1)
+            self._settle(call, item, response)
+            if item.ok:
+                return
+
+
+class _Call:
+    __slots__ = ("mutation", "query", "argument", "selection", "idempotent")
+
+    def __init__(
+        self, mutation: str, query: str, argument: str, selection: Optional[str]
+    ):
+        self.mutation = mutation
+        self.query = query
+        self.argument = argument
+        self.selection = selection
+        # Re-sending a create after a lost response could duplicate it.
+        self.idempotent = not mutation.endswith("Create")
+
+
+def _chunks(
+    inputs: Iterable[Any], size: int, argument: str, offset: int = 0
+) -> Iterator[List[Tuple[ItemResult, Dict[str, Any]]]]:
+    chunk: List[Tuple[ItemResult, Dict[str, Any]]] = []
+    index = offset
+    for value in inputs:
+        chunk.append((ItemResult(index, value), {argument: value}))
+        index += 1
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _bulk_key(spec: _BulkSpec, value: Any) -> Optional[str]:
+    """Group key for inputs that can share one bulk call, or None."""
+    if not isinstance(value, dict) or "id" not in value or len(value) < 2:
+        return None
+    fields: FrozenSet[str] = frozenset(value) - {"id"}
+    if not fields <= spec.fields.keys():
+        return None
+    return json.dumps({k: value[k] for k in sorted(fields)}, sort_keys=True)
+
+
+def _bulk_input(spec: _BulkSpec, value: Dict[str, Any]) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {}
+    for key, item in value.items():
+        if key == "id":
+            continue
+        if spec.fields[key] == _IDS:
+            payload[key] = {"ids": list(item or ()), "mode": "SET"}
+        else:
+            payload[key] = item
+    return payload
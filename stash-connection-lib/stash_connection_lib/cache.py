@@ -0,0 +1,255 @@
+# cache.py
+"""
+Persistent response cache for read‑only GraphQL operations.
+
+Plugins that match against stash‑box endpoints (StashDB, TPDB …) ask for
+the same performers and fingerprints on every run. A :class:`ResponseCache`
+keeps those responses in a SQLite file, so a rerun over an unchanged
+library barely touches the network::
+
+    cache = ResponseCache(ttls={"searchPerformer": 7 * 86400})
+    for box in GET_STASH_BOXES(fragment):
+        conn = StashConnection.from_stash_box(box, cache=cache)
+        conn.query(SEARCH_PERFORMER, {"term": name})   # served from disk next time
+
+Entries are keyed by endpoint, the normalized query text (whitespace and
+comments do not matter) and the variables. Each operation has its own
+time‑to‑live (*ttls*, falling back to *default_ttl*; ``0`` disables caching
+for that operation), responses with GraphQL errors are never stored, and
+the least recently used entries are evicted once the file holds more than
+*max_bytes* of responses. Mutations always go to the server.
+
+Set :attr:`ResponseCache.bypass` (or ``STASH_CONNECTION_CACHE_BYPASS=1``) to
+ignore cached entries for a run while still refreshing them.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Union
+
+from .graphql import GraphQLSyntaxError, parse, print_document
+from .instrumentation import operation_name
+
+__all__ = ["ResponseCache", "default_cache_path", "CACHE_DIR_ENV", "CACHE_BYPASS_ENV"]
+
+#: Directory for the default cache file.
+CACHE_DIR_ENV = "STASH_CONNECTION_CACHE_DIR"
+#: Set to ``1`` to skip cache reads (responses are still stored).
+CACHE_BYPASS_ENV = "STASH_CONNECTION_CACHE_BYPASS"
+#: Seconds a response stays valid unless *ttls* says otherwise.
+DEFAULT_TTL = 24 * 3600.0
+#: Total response bytes kept before least recently used entries go.
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+#: Access times are only rewritten when older than this, to spare writes.
+_TOUCH_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, operation TEXT NOT NULL,
+    body BLOB NOT NULL, size INTEGER NOT NULL, expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires);
+-- Running total of body sizes, so eviction checks never scan the table.
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO usage SELECT 0, COALESCE(SUM(size), 0) FROM responses;
+CREATE TRIGGER IF NOT EXISTS responses_added AFTER INSERT ON responses
+BEGIN UPDATE usage SET total = total + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS responses_removed AFTER DELETE ON responses
+BEGIN UPDATE usage SET total = total - OLD.size; END;
+"""
+
+
+def default_cache_path() -> str:
+    """``$STASH_CONNECTION_CACHE_DIR`` or the user cache directory."""
+    directory = os.environ.get(CACHE_DIR_ENV) or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "stash_connection_lib",
+    )
+    return os.path.join(directory, "responses.sqlite")
+
+
+@lru_cache(maxsize=256)
+def _normalize(query: str) -> str:
+    try:
+        return print_document(parse(query))
+    except GraphQLSyntaxError:
+        return " ".join(query.split())
+
+
+def _key(endpoint: str, query: str, variables: Optional[Dict[str, Any]]) -> str:
+    digest = hashlib.sha256()
+    digest.update(endpoint.encode())
+    digest.update(b"\0")
+    digest.update(_normalize(query).encode())
+    digest.update(b"\0")
+    if variables:
+        digest.update(
+            json.dumps(
+                variables, sort_keys=True, separators=(",", ":"), default=str
+            ).encode()
+        )
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """SQLite‑backed, size‑bounded LRU of raw GraphQL response bodies.
+
+    One instance may be shared by several connections and threads; several
+    processes may share the file.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike, None] = None,
+        *,
+        default_ttl: float = DEFAULT_TTL,
+        ttls: Optional[Dict[str, float]] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        bypass: Optional[bool] = None,
+    ):
+        self.path = os.fspath(path) if path is not None else default_cache_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.max_bytes = max_bytes
+        if bypass is None:
+            bypass = os.environ.get(CACHE_BYPASS_ENV, "") not in ("", "0")
+        self.bypass = bypass
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        # Rows dropped by INSERT OR REPLACE must fire responses_removed too.
+        self.db.execute("PRAGMA recursive_triggers=ON")
+        self.db.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def __enter__(self) -> "ResponseCache":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
+
+    # ---------------------------------------------------------------------
+    # Lookups
+    # ---------------------------------------------------------------------
+    def ttl_for(self, query: str) -> float:
+        """Seconds a response to *query* may be reused; ``0`` means never."""
+        return self.ttls.get(operation_name(query), self.default_ttl)
+
+    def get(
+        self, endpoint: str, query: str, variables: Optional[Dict[str, Any]] = None
+    ) -> Optional[bytes]:
+        """Return the cached body for this request, or ``None``."""
+        if self.bypass or self.ttl_for(query) <= 0:
+            return None
+        key = _key(endpoint, query, variables)
+        now = time.time()
+        with self._lock:
+            row = self.db.execute(
+                "SELECT body, expires, accessed FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if now - row[2] > _TOUCH_INTERVAL:
+                with self.db:
+                    self.db.execute(
+                        "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+                    )
+        return bytes(row[0])
+
+    def put(
+        self,
+        endpoint: str,
+        query: str,
+        variables: Optional[Dict[str, Any]],
+        body: bytes,
+    ) -> bool:
+        """Store *body* for this request; return whether it was cached."""
+        ttl = self.ttl_for(query)
+        if ttl <= 0 or len(body) > self.max_bytes:
+            return False
+        now = time.time()
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    _key(endpoint, query, variables),
+                    endpoint,
+                    operation_name(query),
+                    body,
+                    len(body),
+                    now + ttl,
+                    now,
+                ),
+            )
+            self.stores += 1
+            self._evict(now)
+        return True
+
+    def _evict(self, now: float) -> None:
+        self.db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        total = self.db.execute("SELECT total FROM usage").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in self.db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        ):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    # ---------------------------------------------------------------------
+    # Maintenance
+    # ---------------------------------------------------------------------
+    def clear(
+        self, endpoint: Optional[str] = None, operation: Optional[str] = None
+    ) -> int:
+        """Delete entries, optionally only for one endpoint and/or operation."""
+        clauses, params = [], []
+        if endpoint is not None:
+            clauses.append("endpoint = ?")
+            params.append(endpoint)
+        if operation is not None:
+            clauses.append("operation = ?")
+            params.append(operation)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock, self.db:
+            return self.db.execute(f"DELETE FROM responses{where}", params).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
@@ -0,0 +1,355 @@
+# changes.py
+"""
+Incremental "what changed since my last run" queries.
+
+:meth:`StashConnection.changes_since` returns a :class:`Changes` iterator over
+every object of one type updated after a cursor, oldest first, using a
+server‑side ``updated_at`` filter instead of downloading and sorting the
+whole library::
+
+    changes = conn.changes_since("scene", cursor_file="renamer.cursor")
+    for scene in changes:
+        rename(scene)
+    # the cursor file now holds the newest updated_at that was seen
+
+A cursor is the ``updated_at`` string of the newest object returned.
+``None`` means "from the beginning". Because timestamps only have
+one‑second resolution, the last second before the cursor is read again;
+objects already delivered in that second are listed in
+:attr:`Changes.delivered` and skipped when passed back as *delivered* (the
+cursor file stores both).
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Collection,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .core import StashConnection
+
+__all__ = [
+    "Changes",
+    "Entity",
+    "ENTITIES",
+    "ENTITY_TYPES",
+    "DEFAULT_CHANGES_PAGE",
+    "parse_time",
+]
+
+#: Entity types understood by :meth:`StashConnection.changes_since`.
+ENTITY_TYPES = ("tag", "studio", "performer", "group", "scene", "marker")
+
+#: Page size for delta queries.
+DEFAULT_CHANGES_PAGE = 1000
+
+#: Stash timestamps have one‑second resolution; re‑reading the last second
+#: catches objects saved in the same second as the cursor.
+_OVERLAP = timedelta(seconds=1)
+
+
+class Entity:
+    """How one entity type is listed: its ``find*`` root, filter and fields."""
+
+    __slots__ = ("name", "root", "filter_arg", "filter_type", "list_key", "fields")
+
+    def __init__(
+        self,
+        name: str,
+        root: str,
+        filter_arg: str,
+        filter_type: str,
+        list_key: str,
+        fields: str,
+    ):
+        self.name = name
+        self.root = root
+        self.filter_arg = filter_arg
+        self.filter_type = filter_type
+        self.list_key = list_key
+        self.fields = " ".join(fields.split())
+
+    def query(self, fields: Optional[str] = None) -> str:
+        fields = " ".join(fields.split()) if fields else self.fields
+        return (
+            f"query ($filter: FindFilterType, ${self.filter_arg}: {self.filter_type}) "
+            f"{{ {self.root}(filter: $filter, {self.filter_arg}: ${self.filter_arg}) "
+            f"{{ count {self.list_key} {{ {fields} }} }} }}"
+        )
+
+
+#: Entity type → how to query it; shared with :mod:`~stash_connection_lib.mirror`.
+ENTITIES: Dict[str, Entity] = {
+    e.name: e
+    for e in (
+        Entity(
+            "scene",
+            "findScenes",
+            "scene_filter",
+            "SceneFilterType",
+            "scenes",
+            """
+            id title code details director urls date rating100 organized
+            o_counter created_at updated_at
+            studio { id } tags { id } performers { id }
+            groups { group { id } scene_index }
+            files { id path basename size duration width height video_codec
+                    audio_codec format frame_rate bit_rate
+                    fingerprints { type value } }
+            """,
+        ),
+        Entity(
+            "performer",
+            "findPerformers",
+            "performer_filter",
+            "PerformerFilterType",
+            "performers",
+            """
+            id name disambiguation gender birthdate country ethnicity
+            alias_list urls favorite rating100 image_path
+            tags { id } created_at updated_at
+            """,
+        ),
+        Entity(
+            "tag",
+            "findTags",
+            "tag_filter",
+            "TagFilterType",
+            "tags",
+            "id name aliases description image_path parents { id } "
+            "created_at updated_at",
+        ),
+        Entity(
+            "studio",
+            "findStudios",
+            "studio_filter",
+            "StudioFilterType",
+            "studios",
+            """
+            id name url details rating100 favorite image_path
+            parent_studio { id } created_at updated_at
+            """,
+        ),
+        Entity(
+            "group",
+            "findGroups",
+            "group_filter",
+            "GroupFilterType",
+            "groups",
+            """
+            id name aliases date duration rating100 director synopsis urls
+            studio { id } tags { id } created_at updated_at
+            """,
+        ),
+        Entity(
+            "marker",
+            "findSceneMarkers",
+            "scene_marker_filter",
+            "SceneMarkerFilterType",
+            "scene_markers",
+            """
+            id title seconds scene { id } primary_tag { id } tags { id }
+            created_at updated_at
+            """,
+        ),
+    )
+}
+
+
+def parse_time(value: str) -> datetime:
+    """Parse a Stash timestamp; naive values are taken as UTC."""
+    # Python < 3.11 does not accept a trailing "Z".
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _changed(
+    conn: "StashConnection",
+    entity: Entity,
+    since: Optional[str],
+    per_page: int,
+    fields: Optional[str] = None,
+    delivered: Collection[str] = (),
+) -> Iterator[Dict[str, Any]]:
+    """Yield entities updated after *since*, oldest first.
+
+    Pages are anchored on the last timestamp seen rather than numbered from
+    one fixed query, so objects edited while the sync runs cannot shift an
+    unseen object onto an already fetched page. Ids in *delivered* are
+    skipped unless they were updated after *since*.
+    """
+    from .core import _page_items
+
+    fields = fields or entity.fields
+    for key in ("id", "updated_at"):  # needed for paging and the cursor
+        if key not in fields.split():
+            fields = f"{key} {fields}"
+    query = entity.query(fields)
+    since_time = parse_time(since) if since else None
+    lower = (since_time - _OVERLAP).isoformat() if since_time else None
+    seen: Set[Tuple[str, str]] = set()
+    page = 1
+    while True:
+        variables: Dict[str, Any] = {
+            "filter": {
+                "sort": "updated_at",
+                "direction": "ASC",
+                "per_page": per_page,
+                "page": page,
+            }
+        }
+        if lower is not None:
+            variables[entity.filter_arg] = {
+                "updated_at": {"value": lower, "modifier": "GREATER_THAN"}
+            }
+        _, items = _page_items(conn.query(query, variables))
+        fresh = [i for i in items if (i["id"], i["updated_at"]) not in seen]
+        for item in fresh:
+            seen.add((item["id"], item["updated_at"]))
+            if (
+                item["id"] in delivered
+                and since_time is not None
+                and parse_time(item["updated_at"]) <= since_time
+            ):
+                continue  # delivered by the run that set the cursor
+            yield item
+        if len(items) < per_page:
+            return
+        anchor = (parse_time(items[-1]["updated_at"]) - _OVERLAP).isoformat()
+        if fresh and anchor != lower:
+            lower, page = anchor, 1
+            floor = parse_time(anchor)
+            seen = {key for key in seen if parse_time(key[1]) > floor}
+        else:
+            # More than a page of objects share the anchor second.
+            page += 1
+
+
+def _later(a: Optional[str], b: str) -> str:
+    return b if a is None or parse_time(b) > parse_time(a) else a
+
+
+def read_cursor(
+    path: Union[str, os.PathLike], entity_type: str
+) -> Tuple[Optional[str], List[str]]:
+    """Return the cursor and delivered ids stored for *entity_type* in *path*."""
+    try:
+        with open(path, encoding="utf-8") as fh:
+            state = json.load(fh).get(entity_type)
+    except (OSError, ValueError):
+        return None, []
+    if isinstance(state, dict):
+        return state.get("cursor"), list(state.get("delivered") or ())
+    return state, []  # a bare cursor, as written by older versions
+
+
+def write_cursor(
+    path: Union[str, os.PathLike],
+    entity_type: str,
+    cursor: Optional[str],
+    delivered: Collection[str] = (),
+) -> None:
+    """Store *cursor* for *entity_type* in *path*, keeping other types' cursors."""
+    try:
+        with open(path, encoding="utf-8") as fh:
+            cursors = json.load(fh)
+    except (OSError, ValueError):
+        cursors = {}
+    cursors[entity_type] = {"cursor": cursor, "delivered": sorted(delivered)}
+    tmp = f"{os.fspath(path)}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(cursors, fh)
+    os.replace(tmp, path)
+
+
+class Changes:
+    """Iterator over objects updated after a cursor.
+
+    :attr:`cursor` advances as objects are consumed; once iteration finishes
+    it is written to *cursor_file* (when given), so an interrupted run
+    resumes from the last completed sync rather than skipping objects.
+    :attr:`delivered` holds the ids returned within the cursor's second;
+    pass both to the next run so those objects are not returned again.
+    """
+
+    def __init__(
+        self,
+        conn: "StashConnection",
+        entity_type: str,
+        cursor: Optional[str] = None,
+        *,
+        fields: Optional[str] = None,
+        per_page: int = DEFAULT_CHANGES_PAGE,
+        cursor_file: Optional[Union[str, os.PathLike]] = None,
+        delivered: Collection[str] = (),
+    ):
+        if entity_type not in ENTITIES:
+            raise ValueError(
+                f"unknown entity type {entity_type!r}; expected one of {ENTITY_TYPES}"
+            )
+        if cursor is None and cursor_file is not None:
+            cursor, delivered = read_cursor(cursor_file, entity_type)
+        self.conn = conn
+        self.entity_type = entity_type
+        self.since = cursor
+        self.cursor = cursor
+        self.fields = fields
+        self.per_page = per_page
+        self.cursor_file = cursor_file
+        self.count = 0
+        self._delivered = frozenset(delivered) if cursor else frozenset()
+        # id → updated_at of objects returned within the cursor's second
+        self._recent: Dict[str, datetime] = (
+            dict.fromkeys(self._delivered, parse_time(cursor)) if cursor else {}
+        )
+        self._iterator: Optional[Iterator[Dict[str, Any]]] = None
+
+    @property
+    def delivered(self) -> List[str]:
+        """Ids already returned whose ``updated_at`` falls in the cursor's second."""
+        return sorted(self._recent)
+
+    def __iter__(self) -> "Changes":
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        if self._iterator is None:
+            self._iterator = _changed(
+                self.conn,
+                ENTITIES[self.entity_type],
+                self.since,
+                self.per_page,
+                self.fields,
+                self._delivered,
+            )
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            if self.cursor_file is not None:
+                write_cursor(
+                    self.cursor_file, self.entity_type, self.cursor, self.delivered
+                )
+            raise
+        cursor = _later(self.cursor, item["updated_at"])
+        if cursor != self.cursor:
+            floor = parse_time(cursor) - _OVERLAP
+            self._recent = {k: v for k, v in self._recent.items() if v > floor}
+            self.cursor = cursor
+        self._recent[item["id"]] = parse_time(item["updated_at"])
+        self.count += 1
+        return item
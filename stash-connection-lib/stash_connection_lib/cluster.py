@@ -0,0 +1,353 @@
+# cluster.py
+"""
+Several Stash servers used as one library.
+
+Libraries split across instances – one per disk, say – are queried through
+a :class:`StashCluster`, which sends each request to every server at once
+and merges the answers, so a report takes as long as the slowest server
+rather than the sum of all of them::
+
+    cluster = StashCluster.from_fragments({"disk1": frag1, "disk2": frag2})
+
+    counts = cluster.query("{ findScenes { count } }")
+    total = sum(r["data"]["findScenes"]["count"] for r in counts.values())
+
+    for name, scene in cluster.iter_pages(FIND_SCENES, key="title"):
+        ...
+
+    cluster.mutate("/mnt/disk2/new/clip.mp4", SCENE_UPDATE, {"input": ...})
+
+Writes go to the one server whose library contains the file: each server's
+stash paths are read from its configuration (or given as *paths*), and a
+path belongs to the server with the longest matching prefix.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .core import StashConnection
+
+__all__ = ["StashCluster", "ClusterError"]
+
+T = TypeVar("T")
+
+_STASH_PATHS_QUERY = (
+    "query StashPaths { configuration { general { stashes { path } } } }"
+)
+
+
+class ClusterError(RuntimeError):
+    """Raised when some servers of a cluster call failed.
+
+    ``errors`` maps each failed server to its exception; ``results`` holds
+    what the other servers returned.
+    """
+
+    def __init__(self, errors: Dict[str, BaseException], results: Dict[str, Any]):
+        detail = "; ".join(f"{name}: {exc!r}" for name, exc in errors.items())
+        super().__init__(
+            f"{len(errors)} of {len(errors) + len(results)} servers failed: {detail}"
+        )
+        self.errors = errors
+        self.results = results
+
+
+def _normalize(path: str) -> str:
+    return path.replace("\\", "/").rstrip("/")
+
+
+class StashCluster:
+    """Connections to several Stash servers, queried concurrently.
+
+    *connections* maps a server name to its
+    :class:`~stash_connection_lib.core.StashConnection`; iteration order is
+    the order servers appear in merged results. *paths* maps names to
+    their library roots for :meth:`owner`, and defaults to each server's
+    configured stash paths.
+    """
+
+    def __init__(
+        self,
+        connections: Mapping[str, "StashConnection"],
+        *,
+        paths: Optional[Mapping[str, Iterable[str]]] = None,
+        max_workers: Optional[int] = None,
+    ):
+        if not connections:
+            raise ValueError("a cluster needs at least one connection")
+        self.connections: Dict[str, "StashConnection"] = dict(connections)
+        self.max_workers = max_workers or len(self.connections)
+        self._paths: Optional[Dict[str, List[str]]] = None
+        if paths is not None:
+            self._paths = {name: [_normalize(p) for p in paths[name]] for name in paths}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        #: Seconds each server took in the last :meth:`query` or :meth:`iter_pages`.
+        self.timings: Dict[str, float] = {}
+
+    @classmethod
+    def from_fragments(
+        cls,
+        fragments: Mapping[str, Dict[str, Any]],
+        *,
+        paths: Optional[Mapping[str, Iterable[str]]] = None,
+        max_workers: Optional[int] = None,
+        **options: Any,
+    ) -> "StashCluster":
+        """Connect to every server of *fragments* in parallel.
+
+        *options* are passed to :func:`~stash_connection_lib.core.connect`.
+        """
+        from .core import connect
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers or len(fragments) or 1,
+            thread_name_prefix="stash-cluster",
+        ) as pool:
+            futures = {
+                name: pool.submit(connect, fragment, **options)
+                for name, fragment in fragments.items()
+            }
+            connections = {name: future.result() for name, future in futures.items()}
+        return cls(connections, paths=paths, max_workers=max_workers)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.connections)
+
+    def __getitem__(self, name: str) -> "StashConnection":
+        return self.connections[name]
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    def __enter__(self) -> "StashCluster":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the worker threads; the connections stay usable."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    # ---------------------------------------------------------------------
+    # Fan‑out
+    # ---------------------------------------------------------------------
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="stash-cluster"
+                )
+            return self._pool
+
+    def map(
+        self,
+        call: Callable[["StashConnection"], T],
+        names: Optional[Iterable[str]] = None,
+    ) -> Dict[str, T]:
+        """Run *call(conn)* on every server (or *names*) concurrently.
+
+        Returns ``{name: result}`` in cluster order once all have finished,
+        or raises :class:`ClusterError` if any of them failed.
+        """
+        pool = self._executor()
+
+        def timed(name: str) -> T:
+            start = time.perf_counter()
+            try:
+                return call(self.connections[name])
+            finally:
+                self.timings[name] = time.perf_counter() - start
+
+        futures: Dict[str, Future] = {
+            name: pool.submit(timed, name) for name in (names or self.connections)
+        }
+        results: Dict[str, T] = {}
+        errors: Dict[str, BaseException] = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as exc:
+                errors[name] = exc
+        if errors:
+            raise ClusterError(errors, results)
+        return results
+
+    def query(
+        self, query: str, variables: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Send *query* to every server at once; ``{name: response}``."""
+        return self.map(lambda conn: conn.query(query, variables))
+
+    def iter_pages(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+        *,
+        key: Union[str, Callable[[Any], Any], None] = None,
+        **options: Any,
+    ) -> Iterator[Tuple[str, Any]]:
+        """Yield ``(name, entity)`` for each entity of a ``find*`` query on all servers.
+
+        Each server is walked with
+        :meth:`~stash_connection_lib.core.StashConnection.iter_pages`
+        (*options* as there) on its own thread. Without *key*, entities are
+        yielded as their pages arrive and only a few pages per server are
+        buffered. With *key* – a field name or a function of the entity –
+        the walks are collected and yielded sorted by it, ties in cluster
+        order, so the merged order is the same on every run.
+        """
+        if key is not None:
+            get = (lambda item: item.get(key)) if isinstance(key, str) else key
+            walks = self.map(
+                lambda conn: list(conn.iter_pages(query, variables, **options))
+            )
+            merged = [
+                (get(item), rank, name, item)
+                for rank, (name, items) in enumerate(walks.items())
+                for item in items
+            ]
+            merged.sort(key=lambda entry: (_sort_key(entry[0]), entry[1]))
+            for _, _, name, item in merged:
+                yield name, item
+            return
+        yield from self._fan_in(query, variables, options)
+
+    def _fan_in(
+        self, query: str, variables: Optional[Dict[str, Any]], options: Dict[str, Any]
+    ) -> Iterator[Tuple[str, Any]]:
+        from .core import DEFAULT_PER_PAGE
+
+        chunk = options.get("per_page") or DEFAULT_PER_PAGE
+        out: "queue.Queue[Tuple[str, Optional[List[Any]], Optional[BaseException]]]"
+        out = queue.Queue(maxsize=2 * len(self.connections))
+        stop = threading.Event()
+
+        def walk(name: str) -> None:
+            start = time.perf_counter()
+            conn = self.connections[name]
+            try:
+                items: List[Any] = []
+                for item in conn.iter_pages(query, variables, **options):
+                    items.append(item)
+                    if len(items) >= chunk:
+                        out.put((name, items, None))
+                        items = []
+                        if stop.is_set():
+                            break
+                out.put((name, items, None))
+                out.put((name, None, None))
+            except BaseException as exc:
+                out.put((name, None, exc))
+            finally:
+                self.timings[name] = time.perf_counter() - start
+
+        pool = self._executor()
+        running = len(self.connections)
+        for name in self.connections:
+            pool.submit(walk, name)
+        try:
+            while running:
+                name, items, error = out.get()
+                if error is not None:
+                    running -= 1
+                    raise ClusterError({name: error}, {})
+                if items is None:
+                    running -= 1
+                    continue
+                for item in items:
+                    yield name, item
+        finally:
+            stop.set()
+            while running:  # let the other walks finish their current page
+                if out.get()[1] is None:
+                    running -= 1
+
+    # ---------------------------------------------------------------------
+    # Routing by path
+    # ---------------------------------------------------------------------
+    def stash_paths(self, refresh: bool = False) -> Dict[str, List[str]]:
+        """Library roots per server, read from each server's configuration once."""
+        if self._paths is None or refresh:
+
+            def fetch(conn: "StashConnection") -> List[str]:
+                from .core import response_data
+
+                data = response_data(conn.query(_STASH_PATHS_QUERY))
+                stashes = data["configuration"]["general"]["stashes"]
+                return [_normalize(s["path"]) for s in stashes or ()]
+
+            self._paths = self.map(fetch)
+        return self._paths
+
+    def owner(self, path: Union[str, os.PathLike]) -> str:
+        """Name of the server whose library contains *path*.
+
+        The longest matching stash path wins; ``LookupError`` if none does.
+        """
+        target = _normalize(os.fspath(path))
+        best: Optional[Tuple[int, str]] = None
+        for name, roots in self.stash_paths().items():
+            for root in roots:
+                if target == root or target.startswith(root + "/"):
+                    if best is None or len(root) > best[0]:
+                        best = (len(root), name)
+        if best is None:
+            raise LookupError(f"no server in the cluster holds {target!r}")
+        return best[1]
+
+    def connection_for(self, path: Union[str, os.PathLike]) -> "StashConnection":
+        """The connection of the server that owns *path*."""
+        return self.connections[self.owner(path)]
+
+    def mutate(
+        self,
+        path: Union[str, os.PathLike],
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Send *query* only to the server that owns *path*."""
+        return self.connection_for(path).query(query, variables)
+
+    def partition(
+        self, items: Iterable[T], path: Callable[[T], str]
+    ) -> Dict[str, List[T]]:
+        """Group *items* by owning server, e.g. before a per‑server ``bulk()`` run."""
+        groups: Dict[str, List[T]] = {}
+        for item in items:
+            groups.setdefault(self.owner(path(item)), []).append(item)
+        return groups
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    """Order ``None`` last and numeric strings (ids) numerically."""
+    if value is None:
+        return (2, "")
+    if isinstance(value, str) and value.isdigit():
+        return (0, int(value))
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, str(value))
@@ -0,0 +1,103 @@
+# codec.py
+"""
+Pluggable JSON codecs for GraphQL responses.
+
+Library‑sized responses spend most of their client time in JSON decoding.
+:func:`get_codec` picks the fastest installed backend – ``orjson``, then
+``msgspec``, then the standard library – and every codec decodes straight
+from the response bytes, so no intermediate ``str`` copy of a multi‑hundred
+megabyte body is built by the fast backends.
+
+Install a fast backend with ``pip install stash-connection-lib[fast]``.
+"""
+
+import json
+from typing import Any, Callable, Dict, Union
+
+__all__ = ["JSONCodec", "get_codec", "available_codecs"]
+
+
+class JSONCodec:
+    """A named pair of ``loads(bytes)`` / ``dumps(obj) -> bytes`` callables."""
+
+    __slots__ = ("name", "_loads", "_dumps")
+
+    def __init__(
+        self,
+        name: str,
+        loads: Callable[[Union[bytes, str]], Any],
+        dumps: Callable[[Any], bytes],
+    ):
+        self.name = name
+        self._loads = loads
+        self._dumps = dumps
+
+    def loads(self, data: Union[bytes, bytearray, str]) -> Any:
+        return self._loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._dumps(obj)
+
+    def __repr__(self) -> str:
+        return f"JSONCodec({self.name!r})"
+
+
+def _stdlib() -> JSONCodec:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+    return JSONCodec("json", json.loads, dumps)
+
+
+def _orjson() -> JSONCodec:
+    import orjson
+
+    return JSONCodec("orjson", orjson.loads, orjson.dumps)
+
+
+def _msgspec() -> JSONCodec:
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+    return JSONCodec("msgspec", decoder.decode, encoder.encode)
+
+
+_FACTORIES: Dict[str, Callable[[], JSONCodec]] = {
+    "orjson": _orjson,
+    "msgspec": _msgspec,
+    "json": _stdlib,
+}
+_PREFERENCE = ("orjson", "msgspec", "json")
+_CACHE: Dict[str, JSONCodec] = {}
+
+
+def available_codecs() -> Dict[str, JSONCodec]:
+    """Return every codec whose backend is importable, fastest first."""
+    codecs = {}
+    for name in _PREFERENCE:
+        try:
+            codecs[name] = get_codec(name)
+        except ImportError:
+            continue
+    return codecs
+
+
+def get_codec(name: str = "auto") -> JSONCodec:
+    """Return the codec called *name* (``orjson``, ``msgspec`` or ``json``).
+
+    ``"auto"`` returns the fastest installed backend. Asking for a backend
+    that is not installed raises ``ImportError``.
+    """
+    if name == "auto":
+        for candidate in _PREFERENCE:
+            try:
+                return get_codec(candidate)
+            except ImportError:
+                continue
+    if name not in _FACTORIES:
+        raise ValueError(f"unknown JSON codec {name!r}")
+    codec = _CACHE.get(name)
+    if codec is None:
+        codec = _CACHE[name] = _FACTORIES[name]()
+    return codec
@@ -7,6 +7,8 @@ session for a quick cheat‑sheet.
 Exports
 -------
 * **connect(fragment)** → `StashConnection`
+* **get_connection(fragment)** → shared, already authenticated `StashConnection`
+* **get_config_snapshot(fragment)** → `ConfigSnapshot` of the whole configuration
 * **GET_STASH_API_KEY(fragment)** → `str`
 * **GET_STASH_BOXES(fragment)** → `list[dict]`
 * **GET_STASHES(fragment)** → `list[dict]`
@@ -16,13 +18,60 @@ Exports
 * **show_help()** → prints inline reference with copy‑pasteable examples
 """
 
+import atexit
+import json
+import math
+import os
+import re
+import socket
+import sys
 import textwrap
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from collections import deque
+from http.client import HTTPException
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Collection,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .codec import JSONCodec, get_codec
+from .dedupe import SingleFlight, TTLCache, request_key
+from .instrumentation import Hook, QueryEvent, QueryStats, append_stats
+from .transport import HTTPError, Session
+
+# Everything else is imported where it is used, keeping ``import`` fast
+# for hook plugins that live for a single query.
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    import requests
 
-import requests
+    from .batch import QueryBatch
+    from .bulk import BulkWriter
+    from .cache import ResponseCache
+    from .changes import Changes
+    from .ratelimit import RateLimiter
+    from .resolver import NameResolver
+    from .schema import Schema
+    from .uploads import Uploader, UploadBody
 
 __all__ = [
     "connect",
+    "get_connection",
+    "invalidate_connection",
+    "get_config_snapshot",
+    "ConfigSnapshot",
+    "GraphQLError",
+    "response_data",
     "GET_STASH_API_KEY",
     "GET_STASH_BOXES",
     "GET_STASHES",
@@ -32,6 +81,170 @@ __all__ = [
     "show_help",
 ]
 
+###############################################################################
+# Transport defaults
+###############################################################################
+
+#: ``(connect, read)`` timeout in seconds applied to every request.
+DEFAULT_TIMEOUT: Tuple[float, float] = (5.0, 60.0)
+#: Keep-alive connections kept per host.
+DEFAULT_POOL_SIZE = 10
+#: Extra attempts for idempotent (non-mutation) queries.
+DEFAULT_MAX_RETRIES = 3
+#: Sleep ``backoff_factor * 2 ** attempt`` seconds between retries.
+DEFAULT_BACKOFF_FACTOR = 0.5
+#: Page size used by :meth:`StashConnection.iter_pages`.
+DEFAULT_PER_PAGE = 250
+#: Bytes read per chunk by :meth:`StashConnection.stream_items`.
+DEFAULT_CHUNK_SIZE = 1 << 16
+#: Environment variable naming a JSON‑lines file every connection appends
+#: its :meth:`StashConnection.stats` to when the process exits.
+STATS_FILE_ENV = "STASH_CONNECTION_STATS"
+#: Environment variable choosing the default transport: ``requests`` or
+#: ``stdlib`` (``http.client``, nothing imported beyond the standard library).
+TRANSPORT_ENV = "STASH_CONNECTION_TRANSPORT"
+TRANSPORTS = ("requests", "stdlib")
+
+_RETRY_STATUSES = frozenset({502, 503, 504})
+_MUTATION_RE = re.compile(r"^\s*(?:#[^\n]*\n\s*)*mutation\b")
+
+Timeout = Union[float, Tuple[float, float], None]
+
+
+def _transport(name: Optional[str]) -> str:
+    name = name or os.environ.get(TRANSPORT_ENV) or "requests"
+    if name not in TRANSPORTS:
+        raise ValueError(f"unknown transport {name!r}; expected one of {TRANSPORTS}")
+    return name
+
+
+def _transport_errors() -> Tuple[Tuple[type, ...], Tuple[type, ...]]:
+    """``(connection errors, HTTP status errors)`` any loaded transport raises.
+
+    ``requests`` is only consulted once something imported it, so the
+    ``stdlib`` transport never pays for it.
+    """
+    connection: Tuple[type, ...] = (
+        ConnectionError,
+        TimeoutError,
+        socket.timeout,
+        HTTPException,
+    )
+    status: Tuple[type, ...] = (HTTPError,)
+    requests = sys.modules.get("requests")
+    if requests is not None:
+        connection += (requests.ConnectionError, requests.Timeout)
+        status += (requests.HTTPError,)
+    return connection, status
+
+
+def build_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    keep_alive: bool = True,
+    transport: Optional[str] = None,
+) -> Any:
+    """Return an HTTP session with a sized keep-alive connection pool.
+
+    *transport* ``"requests"`` (the default, or :data:`TRANSPORT_ENV`) gives a
+    ``requests.Session``; ``"stdlib"`` gives a :class:`transport.Session
+    <stash_connection_lib.transport.Session>` built on ``http.client``, for
+    hook plugins whose whole run is shorter than importing ``requests``.
+
+    Retries are handled by :meth:`StashConnection.query` (GraphQL always uses
+    POST, which urllib3 refuses to retry), so the adapter itself never retries.
+    """
+    if _transport(transport) == "stdlib":
+        session: Any = Session(pool_size)
+        if not keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+class GraphQLError(RuntimeError):
+    """Raised by iterating helpers when the server answers with ``errors``."""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        messages = "; ".join(str(e.get("message", e)) for e in errors)
+        super().__init__(messages or "GraphQL request failed")
+        self.errors = errors
+
+
+def response_data(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Return ``response["data"]``, raising :class:`GraphQLError` on ``errors``."""
+    if response.get("errors"):
+        raise GraphQLError(response["errors"])
+    return response["data"]
+
+
+def _page_items(response: Dict[str, Any]) -> Tuple[Optional[int], List[Any]]:
+    """Return ``(count, items)`` from a ``find*`` response.
+
+    The response must contain a single root field whose value holds the total
+    ``count`` and exactly one list of entities (``scenes``, ``performers`` …).
+    """
+    if response.get("errors"):
+        raise GraphQLError(response["errors"])
+    roots = list((response.get("data") or {}).values())
+    if len(roots) != 1 or not isinstance(roots[0], dict):
+        raise ValueError("paginated queries must select exactly one find* field")
+    result = roots[0]
+    lists = [value for value in result.values() if isinstance(value, list)]
+    if len(lists) != 1:
+        raise ValueError("find* result must contain exactly one entity list")
+    return result.get("count"), lists[0]
+
+
+def _count_bytes(resp: Any, event: QueryEvent, response: bool = True) -> None:
+    body = getattr(getattr(resp, "request", None), "body", None)
+    if isinstance(body, (bytes, str)):
+        event.request_bytes += len(body)
+    elif body is not None and f"{__package__}.uploads" in sys.modules:
+        from .uploads import UploadBody
+
+        if isinstance(body, UploadBody):
+            event.request_bytes += len(body)
+    if not response:
+        return  # reading .content would drain a streamed body
+    content = getattr(resp, "content", None)
+    if isinstance(content, bytes):
+        event.response_bytes += len(content)
+
+
+def _is_mutation(query: str) -> bool:
+    return bool(_MUTATION_RE.match(query))
+
+
+def _fragment_url(fragment: Dict[str, Any]) -> str:
+    scheme = fragment.get("Scheme", "http")
+    host = fragment.get("Host", "localhost")
+    if host == "0.0.0.0":
+        host = "localhost"
+    port = fragment.get("Port", 9999)
+    return f"{scheme}://{host}:{port}"
+
+
+def _fragment_cookie(fragment: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    cookie = fragment.get("SessionCookie")
+    if isinstance(cookie, dict):
+        name, value = cookie.get("Name"), cookie.get("Value")
+        if name and value:
+            return name, value
+    return None
+
+
 ###############################################################################
 # Core connection object
 ###############################################################################
@@ -41,46 +254,615 @@ class StashConnection:
     """Lightweight wrapper around *requests* session + GraphQL helpers."""
 
     def __init__(
-        self, url: str, session: requests.Session, api_key: Optional[str] = None
+        self,
+        url: str,
+        session: "requests.Session",
+        api_key: Optional[str] = None,
+        *,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        codec: Union[str, JSONCodec] = "auto",
+        single_flight: bool = False,
+        cache_ttl: float = 0.0,
+        cache: Optional["ResponseCache"] = None,
+        rate_limiter: Optional["RateLimiter"] = None,
+        validate_queries: bool = False,
     ):
         self.url = url.rstrip("/") + "/graphql"
         self.session = session
         self.api_key = api_key or ""
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.codec = get_codec(codec) if isinstance(codec, str) else codec
+        self._requests_sent = 0
+        self._retries = 0
+        self._stats = QueryStats()
+        self._pre_hooks: List[Hook] = []
+        self._post_hooks: List[Hook] = []
+        self._resolvers: Dict[str, "NameResolver"] = {}
+        self._flights = SingleFlight() if single_flight else None
+        self._response_cache = TTLCache(cache_ttl) if cache_ttl > 0 else None
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self._disk_hits = 0
+        self._fetched = 0
+        self.validate_queries = validate_queries
+        self._schema: Optional["Schema"] = None
+        self._schema_loader: Optional[int] = None  # thread fetching the schema
+        self._schema_lock = threading.Lock()
+        stats_file = os.environ.get(STATS_FILE_ENV)
+        if stats_file:
+            self.dump_stats_at_exit(stats_file)
 
     # ---------------------------------------------------------------------
     # Construction helpers
     # ---------------------------------------------------------------------
     @classmethod
-    def from_fragment(cls, fragment: Dict[str, Any]) -> "StashConnection":
-        scheme = fragment.get("Scheme", "http")
-        host = fragment.get("Host", "localhost")
-        if host == "0.0.0.0":
-            host = "localhost"
-        port = fragment.get("Port", 9999)
-        url = f"{scheme}://{host}:{port}"
-
-        session = requests.Session()
-        cookie = fragment.get("SessionCookie")
-        if isinstance(cookie, dict):
-            name, value = cookie.get("Name"), cookie.get("Value")
-            if name and value:
-                session.cookies.set(name, value)
-        return cls(url, session)
+    def from_fragment(
+        cls,
+        fragment: Dict[str, Any],
+        *,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        keep_alive: bool = True,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        codec: Union[str, JSONCodec] = "auto",
+        single_flight: bool = False,
+        cache_ttl: float = 0.0,
+        cache: Optional["ResponseCache"] = None,
+        rate_limiter: Optional["RateLimiter"] = None,
+        validate_queries: bool = False,
+        transport: Optional[str] = None,
+    ) -> "StashConnection":
+        session = build_session(
+            pool_size=pool_size, keep_alive=keep_alive, transport=transport
+        )
+        cookie = _fragment_cookie(fragment)
+        if cookie:
+            session.cookies.set(*cookie)
+        return cls(
+            _fragment_url(fragment),
+            session,
+            timeout=timeout,
+            max_retries=max_retries,
+            backoff_factor=backoff_factor,
+            codec=codec,
+            single_flight=single_flight,
+            cache_ttl=cache_ttl,
+            cache=cache,
+            rate_limiter=rate_limiter,
+            validate_queries=validate_queries,
+        )
+
+    @classmethod
+    def from_stash_box(
+        cls,
+        box: Dict[str, Any],
+        *,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        transport: Optional[str] = None,
+        **options: Any,
+    ) -> "StashConnection":
+        """Connect to a stash‑box endpoint as listed by :func:`GET_STASH_BOXES`.
+
+        *box* needs ``endpoint`` (``https://stashdb.org/graphql``) and
+        ``api_key``; *options* are the constructor's, e.g. ``cache`` or
+        ``rate_limiter``.
+        """
+        endpoint = box["endpoint"].rstrip("/")
+        if endpoint.endswith("/graphql"):
+            endpoint = endpoint[: -len("/graphql")]
+        return cls(
+            endpoint,
+            build_session(pool_size=pool_size, transport=transport),
+            box.get("api_key") or None,
+            **options,
+        )
 
     # ---------------------------------------------------------------------
     # Low‑level query helpers
     # ---------------------------------------------------------------------
     def query(
-        self, query: str, variables: Dict[str, Any] | None = None
+        self,
+        query: str,
+        variables: Dict[str, Any] | None = None,
+        *,
+        body: Optional["UploadBody"] = None,
     ) -> Dict[str, Any]:
+        """POST *query* and return the decoded JSON response.
+
+        Queries are retried with exponential backoff on connection errors,
+        timeouts and 502/503/504 responses; mutations are sent exactly once.
+        Each call is recorded in :meth:`stats` and passed to registered hooks.
+
+        With ``single_flight`` identical concurrent queries share one
+        request, and with ``cache_ttl`` error‑free query responses are reused
+        for that many seconds (any mutation clears the cache); see
+        :meth:`dedupe_stats`. A persistent :class:`ResponseCache` passed as
+        ``cache`` is consulted next, before the network.
+
+        With ``validate_queries`` the query is first checked against the
+        cached :meth:`schema`; an invalid one raises
+        :class:`~stash_connection_lib.schema.QueryValidationError` without a
+        request.
+
+        *body* replaces the JSON encoding of *query* and *variables* on the
+        wire, for requests streamed from disk (see :meth:`uploader`); such
+        requests bypass every cache.
+        """
+        if self.validate_queries and self._schema_loader != threading.get_ident():
+            self.schema().check(query)
+        event = QueryEvent(query, variables)
+        for hook in self._pre_hooks:
+            hook(event)
+        start = time.perf_counter()
+        try:
+            if body is not None:
+                result = self.decode(self._post(query, variables, event, body=body))
+            else:
+                result = self._send(query, variables, event)
+            if isinstance(result, dict) and result.get("errors"):
+                event.graphql_errors = len(result["errors"])
+            return result
+        except BaseException as exc:
+            event.error = exc
+            raise
+        finally:
+            event.duration = time.perf_counter() - start
+            self._stats.record(event)
+            for hook in self._post_hooks:
+                hook(event)
+
+    def _send(
+        self, query: str, variables: Optional[Dict[str, Any]], event: QueryEvent
+    ) -> Dict[str, Any]:
+        cache, flights, disk = self._response_cache, self._flights, self.cache
+        if cache is None and flights is None and disk is None:
+            return self.decode(self._post(query, variables, event))
+        if _is_mutation(query):
+            if cache is not None:
+                cache.clear()
+            return self.decode(self._post(query, variables, event))
+
+        key = request_key(query, variables)
+        if cache is not None:
+            body = cache.get(key)
+            if body is not None:
+                return self._load(body)
+
+        def fetch() -> Tuple[Any, Dict[str, Any]]:
+            if disk is not None:
+                body = disk.get(self.url, query, variables)
+                if body is not None:
+                    self._disk_hits += 1
+                    result = self._load(body)
+                    if cache is not None:
+                        cache.put(key, body)
+                    return body, result
+            resp = self._post(query, variables, event)
+            self._fetched += 1
+            result = self.decode(resp)
+            content = resp.content
+            body = content if isinstance(content, (bytes, bytearray)) else resp
+            if isinstance(result, dict) and not result.get("errors"):
+                if cache is not None:
+                    cache.put(key, body)
+                if disk is not None and body is not resp:
+                    disk.put(self.url, query, variables, bytes(body))
+            return body, result
+
+        if flights is None:
+            return fetch()[1]
+        (body, result), shared = flights.do(key, fetch)
+        # Followers decode their own copy so callers never share a dict.
+        return self._load(body) if shared else result
+
+    def _load(self, body: Any) -> Any:
+        """Decode a cached body: raw bytes, or a response to decode again."""
+        if isinstance(body, (bytes, bytearray)):
+            return self.codec.loads(body)
+        return self.decode(body)
+
+    def _post(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]],
+        event: QueryEvent,
+        stream: bool = False,
+        body: Optional["UploadBody"] = None,
+    ) -> "requests.Response":
+        """POST with the retry policy; return the successful response.
+
+        A 429 response means the server did not run the operation, so it is
+        retried – mutations included – after its ``Retry-After`` delay.
+        """
         headers = {"apiKey": self.api_key} if self.api_key else {}
         payload = {"query": query}
         if variables is not None:
             payload["variables"] = variables
-        resp = self.session.post(self.url, json=payload, headers=headers)
-        resp.raise_for_status()
+        if body is None:
+            send: Dict[str, Any] = {"json": payload}
+        else:
+            send = {"data": body}
+            headers["Content-Type"] = "application/json"
+            headers["Content-Length"] = str(len(body))
+        retries_left = 0 if _is_mutation(query) else self.max_retries
+        attempt = 0
+        kwargs = {"stream": True} if stream else {}
+        limiter = self.rate_limiter
+        connection_errors, status_errors = _transport_errors()
+        while True:
+            try:
+                if limiter is not None:
+                    limiter.acquire()
+                event.attempts += 1
+                if body is not None:
+                    body.seek(0)
+                resp = self.session.post(
+                    self.url,
+                    headers=headers,
+                    timeout=self.timeout,
+                    **send,
+                    **kwargs,
+                )
+                self._requests_sent += 1
+                _count_bytes(resp, event, response=not stream)
+                resp.raise_for_status()
+                return resp
+            except status_errors as exc:
+                status = getattr(exc.response, "status_code", None)
+                if status == 429 and attempt < self.max_retries:
+                    from .ratelimit import parse_retry_after
+
+                    delay = parse_retry_after(
+                        getattr(exc.response, "headers", {}).get("Retry-After")
+                    )
+                    if delay is None:
+                        delay = self.backoff_factor * 2**attempt
+                    if limiter is not None:
+                        limiter.penalize(delay)  # acquire() waits it out
+                    else:
+                        time.sleep(delay)
+                    self._retries += 1
+                    attempt += 1
+                    continue
+                if status not in _RETRY_STATUSES or attempt >= retries_left:
+                    raise
+            except connection_errors:
+                if attempt >= retries_left:
+                    raise
+            self._retries += 1
+            time.sleep(self.backoff_factor * 2**attempt)
+            attempt += 1
+
+    def decode(self, resp: "requests.Response") -> Any:
+        """Decode *resp* with :attr:`codec`, straight from the raw bytes."""
+        content = resp.content
+        if isinstance(content, (bytes, bytearray)):
+            return self.codec.loads(content)
         return resp.json()
 
+    # ---------------------------------------------------------------------
+    # Instrumentation
+    # ---------------------------------------------------------------------
+    def add_hook(self, pre: Optional[Hook] = None, post: Optional[Hook] = None) -> None:
+        """Register callbacks run before and after every :meth:`query`.
+
+        Both receive the call's :class:`QueryEvent`; *post* runs after the
+        timing, byte counts and error fields are filled in, even on failure.
+        """
+        if pre is not None:
+            self._pre_hooks.append(pre)
+        if post is not None:
+            self._post_hooks.append(post)
+
+    def remove_hook(self, hook: Hook) -> None:
+        """Unregister *hook* from the pre and post lists."""
+        self._pre_hooks = [h for h in self._pre_hooks if h != hook]
+        self._post_hooks = [h for h in self._post_hooks if h != hook]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return per‑operation counters, latency percentiles and byte totals."""
+        return self._stats.snapshot()
+
+    def reset_stats(self) -> None:
+        self._stats.reset()
+
+    def dump_stats_at_exit(self, path: Union[str, os.PathLike]) -> None:
+        """Append :meth:`stats` as one JSON line to *path* when Python exits."""
+        atexit.register(lambda: append_stats(path, self.url, self.stats()))
+
+    def batch(self, max_operations: Optional[int] = None) -> "QueryBatch":
+        """Return a :class:`QueryBatch` that merges operations into few requests.
+
+        Use it as a context manager; queued operations are sent on exit.
+        *max_operations* defaults to ``batch.DEFAULT_MAX_OPERATIONS``.
+        """
+        from .batch import DEFAULT_MAX_OPERATIONS, QueryBatch
+
+        return QueryBatch(self, max_operations or DEFAULT_MAX_OPERATIONS)
+
+    def bulk(self, **options: Any) -> "BulkWriter":
+        """Return a :class:`BulkWriter` for running many mutations at once."""
+        from .bulk import BulkWriter
+
+        return BulkWriter(self, **options)
+
+    def uploader(self, **options: Any) -> "Uploader":
+        """An :class:`~stash_connection_lib.uploads.Uploader` for image mutations."""
+        from .uploads import Uploader
+
+        return Uploader(self, **options)
+
+    def resolver(self, entity_type: str, **options: Any) -> "NameResolver":
+        """Return this connection's shared :class:`NameResolver` for *entity_type*.
+
+        *options* apply only when the resolver is first created.
+        """
+        resolver = self._resolvers.get(entity_type)
+        if resolver is None:
+            from .resolver import NameResolver
+
+            resolver = self._resolvers[entity_type] = NameResolver(
+                self, entity_type, **options
+            )
+        return resolver
+
+    def schema(self, refresh: bool = False, **options: Any) -> "Schema":
+        """Return the server's :class:`~stash_connection_lib.schema.Schema`.
+
+        Loaded once per connection through
+        :func:`~stash_connection_lib.schema.load_schema`, which introspects
+        only when the server version is not yet cached on disk; *options*
+        are passed on to it.
+        """
+        with self._schema_lock:
+            if self._schema is None or refresh:
+                from .schema import load_schema
+
+                self._schema_loader = threading.get_ident()
+                try:
+                    self._schema = load_schema(self, refresh=refresh, **options)
+                finally:
+                    self._schema_loader = None
+            return self._schema
+
+    def validate(self, query: str) -> List[str]:
+        """Return the problems the server's schema finds in *query*."""
+        return self.schema().validate(query)
+
+    def iter_pages(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+        *,
+        per_page: int = DEFAULT_PER_PAGE,
+        prefetch: int = 1,
+        filter_variable: str = "filter",
+    ) -> Iterator[Any]:
+        """Yield every entity of a ``find*`` query, one page at a time.
+
+        *query* must declare ``$filter: FindFilterType`` (or the variable
+        named by *filter_variable*) and select ``count`` plus one entity
+        list::
+
+            query ($filter: FindFilterType) {
+              findScenes(filter: $filter) { count scenes { id title } }
+            }
+
+        ``page`` and ``per_page`` are managed here; unless the caller's filter
+        sets ``sort``, results are ordered by ``id`` ascending so pages never
+        overlap. Up to *prefetch* following pages are requested on a
+        background thread while the caller works through the current one
+        (``0`` fetches strictly on demand). Only those pages are ever held in
+        memory, whatever the library size.
+        """
+        if per_page < 1:
+            raise ValueError("per_page must be at least 1")
+        base = dict(variables or {})
+        find_filter = dict(base.get(filter_variable) or {})
+        find_filter.setdefault("sort", "id")
+        find_filter.setdefault("direction", "ASC")
+        find_filter["per_page"] = per_page
+
+        def fetch(page: int) -> Dict[str, Any]:
+            page_vars = dict(base)
+            page_vars[filter_variable] = dict(find_filter, page=page)
+            return self.query(query, page_vars)
+
+        if prefetch < 1:
+            page = 1
+            while True:
+                count, items = _page_items(fetch(page))
+                yield from items
+                if len(items) < per_page or (
+                    count is not None and page * per_page >= count
+                ):
+                    return
+                page += 1
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stash-prefetch")
+        pending: Deque["Future"] = deque([pool.submit(fetch, 1)])
+        next_page, last_page = 2, None
+        try:
+            while pending:
+                count, items = _page_items(pending.popleft().result())
+                if last_page is None:
+                    if count is not None:
+                        last_page = max(math.ceil(count / per_page), 1)
+                    elif len(items) < per_page:
+                        last_page = next_page - 1
+                while len(pending) < prefetch and (
+                    next_page <= last_page if last_page is not None else not pending
+                ):
+                    pending.append(pool.submit(fetch, next_page))
+                    next_page += 1
+                yield from items
+        finally:
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    def changes_since(
+        self,
+        entity_type: str,
+        cursor: Optional[str] = None,
+        *,
+        fields: Optional[str] = None,
+        per_page: Optional[int] = None,
+        cursor_file: Optional[Union[str, os.PathLike]] = None,
+        delivered: Collection[str] = (),
+    ) -> "Changes":
+        """Iterate over *entity_type* objects updated after *cursor*.
+
+        *entity_type* is one of ``scene``, ``performer``, ``tag``,
+        ``studio``, ``group`` or ``marker``; *fields* replaces the default
+        selection (``id`` and ``updated_at`` are always added). Objects come
+        oldest first, fetched with a server‑side ``updated_at`` filter, so the
+        cost is proportional to the number of changes, not the library.
+
+        Read the new cursor from the returned iterator's ``cursor``
+        attribute and pass its ``delivered`` ids back with it, so objects
+        saved in the cursor's second are not returned twice; or pass
+        *cursor_file* to have both loaded before and saved after a complete
+        iteration::
+
+            for scene in conn.changes_since("scene", cursor_file="state.json"):
+                ...
+
+        *per_page* defaults to ``changes.DEFAULT_CHANGES_PAGE``.
+        """
+        from .changes import DEFAULT_CHANGES_PAGE, Changes
+
+        return Changes(
+            self,
+            entity_type,
+            cursor,
+            fields=fields,
+            per_page=per_page or DEFAULT_CHANGES_PAGE,
+            cursor_file=cursor_file,
+            delivered=delivered,
+        )
+
+    def stream_items(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+        *,
+        path: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[Any]:
+        """Yield each element of the list at *path* while the body downloads.
+
+        For responses too large to hold twice in memory – a single
+        ``findScenes(filter: {per_page: -1})`` on a big library::
+
+            for scene in conn.stream_items(query, path="data.findScenes.scenes.item"):
+                ...
+
+        The body is read in *chunk_size* pieces and parsed incrementally, so
+        memory stays around one element and the first one arrives long before
+        the download finishes. GraphQL ``errors`` in the body raise
+        :class:`GraphQLError` once the stream ends. The call is instrumented
+        like :meth:`query`; abandoning the iterator early closes the response.
+        """
+        if self.validate_queries and self._schema_loader != threading.get_ident():
+            self.schema().check(query)
+        event = QueryEvent(query, variables)
+        for hook in self._pre_hooks:
+            hook(event)
+        start = time.perf_counter()
+        resp = None
+        try:
+            from .streaming import iter_json_paths
+
+            resp = self._post(query, variables, event, stream=True)
+            errors: List[Dict[str, Any]] = []
+            for index, item in iter_json_paths(
+                self._read_chunks(resp, chunk_size, event), [path, "errors.item"]
+            ):
+                if index:
+                    errors.append(item)
+                else:
+                    yield item
+            if errors:
+                event.graphql_errors = len(errors)
+                raise GraphQLError(errors)
+        except GeneratorExit:
+            raise
+        except BaseException as exc:
+            event.error = exc
+            raise
+        finally:
+            if resp is not None:
+                resp.close()
+            event.duration = time.perf_counter() - start
+            self._stats.record(event)
+            for hook in self._post_hooks:
+                hook(event)
+
+    @staticmethod
+    def _read_chunks(
+        resp: "requests.Response", chunk_size: int, event: QueryEvent
+    ) -> Iterator[bytes]:
+        for chunk in resp.iter_content(chunk_size):
+            event.response_bytes += len(chunk)
+            yield chunk
+
+    def dedupe_stats(self) -> Dict[str, int]:
+        """Return single‑flight and response cache counters.
+
+        ``requests`` counts deduplicated queries that went to the server.
+
+        ``shared`` counts calls answered by another caller's in‑flight
+        request, ``cache_hits`` calls answered from the ``cache_ttl`` cache,
+        ``disk_hits`` calls answered by the persistent ``cache``; ``saved``
+        is their sum – requests that never reached the server.
+        """
+        flights, cache = self._flights, self._response_cache
+        shared = flights.shared if flights is not None else 0
+        hits = cache.hits if cache is not None else 0
+        disk_hits = self._disk_hits
+        return {
+            "requests": self._fetched,
+            "shared": shared,
+            "cache_hits": hits,
+            "cache_misses": cache.misses if cache is not None else 0,
+            "cached": len(cache) if cache is not None else 0,
+            "disk_hits": disk_hits,
+            "saved": shared + hits + disk_hits,
+        }
+
+    def clear_cache(self) -> None:
+        """Drop every response held by the ``cache_ttl`` cache."""
+        if self._response_cache is not None:
+            self._response_cache.clear()
+
+    def connection_stats(self) -> Dict[str, int]:
+        """Return request, retry and pooled-connection counters.
+
+        ``connections_reused`` is the number of requests that did not need a
+        fresh TCP/TLS handshake.
+        """
+        opened = getattr(self.session, "connections_opened", 0)
+        for adapter in set(self.session.adapters.values()):
+            pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+            if pools is None:
+                continue
+            for key in pools.keys():
+                opened += getattr(pools.get(key), "num_connections", 0)
+        return {
+            "requests": self._requests_sent,
+            "retries": self._retries,
+            "connections_opened": opened,
+            "connections_reused": max(self._requests_sent - opened, 0),
+        }
+
     def authenticate(self) -> None:
         """Populate **self.api_key** if the server exposes one."""
         data = self.query("query { configuration { general { apiKey } } }")
@@ -97,9 +879,13 @@ class StashConnection:
 ###############################################################################
 
 
-def connect(fragment: Dict[str, Any]) -> StashConnection:
-    """Return a ready‑to‑use :class:`StashConnection`. Ignores auth errors."""
-    conn = StashConnection.from_fragment(fragment)
+def connect(fragment: Dict[str, Any], **options: Any) -> StashConnection:
+    """Return a ready‑to‑use :class:`StashConnection`. Ignores auth errors.
+
+    Keyword *options* (``pool_size``, ``timeout``, ``max_retries`` …) are
+    forwarded to :meth:`StashConnection.from_fragment`.
+    """
+    conn = StashConnection.from_fragment(fragment, **options)
     try:
         conn.authenticate()
     except Exception:
@@ -107,90 +893,327 @@ def connect(fragment: Dict[str, Any]) -> StashConnection:
     return conn
 
 
-def GET_STASH_API_KEY(fragment: Dict[str, Any]) -> str:
-    return connect(fragment).api_key
+###############################################################################
+# Connection registry – one authenticated connection per server per process
+###############################################################################
 
+_REGISTRY: Dict[str, Tuple[Optional[Tuple[str, str]], StashConnection]] = {}
+_REGISTRY_LOCK = threading.Lock()
 
-def GET_STASH_BOXES(fragment: Dict[str, Any]) -> List[Dict[str, Any]]:
-    conn = connect(fragment)
-    data = conn.query(
-        """
-        query { configuration { general { stashBoxes { endpoint api_key name } } } }
+
+def _registered(
+    fragment: Dict[str, Any], authenticate: bool, options: Dict[str, Any]
+) -> Tuple[StashConnection, bool]:
+    """Return ``(connection, created)`` from the registry, creating it if needed."""
+    key = _fragment_url(fragment)
+    cookie = _fragment_cookie(fragment)
+    with _REGISTRY_LOCK:
+        entry = _REGISTRY.get(key)
+        if entry is not None and entry[0] == cookie:
+            return entry[1], False
+        if authenticate:
+            conn = connect(fragment, **options)
+        else:
+            conn = StashConnection.from_fragment(fragment, **options)
+        _REGISTRY[key] = (cookie, conn)
+        _SNAPSHOTS.pop(key, None)
+        return conn, True
+
+
+def get_connection(fragment: Dict[str, Any], **options: Any) -> StashConnection:
+    """Return the process‑wide :class:`StashConnection` for *fragment*.
+
+    The first call per server connects and authenticates (see :func:`connect`);
+    later calls reuse that connection. A different ``SessionCookie`` in the
+    fragment replaces the cached connection. *options* only apply when a new
+    connection is created.
+    """
+    return _registered(fragment, True, options)[0]
+
+
+def invalidate_connection(fragment: Optional[Dict[str, Any]] = None) -> None:
+    """Drop the registered connection and config snapshot for *fragment*.
+
+    Without a fragment every server is dropped. Call this after the server's
+    API key changes, e.g. following a ``generateAPIKey`` mutation, so the next
+    helper call re‑authenticates.
+    """
+    with _REGISTRY_LOCK:
+        if fragment is None:
+            _REGISTRY.clear()
+            _SNAPSHOTS.clear()
+        else:
+            _REGISTRY.pop(_fragment_url(fragment), None)
+            _SNAPSHOTS.pop(_fragment_url(fragment), None)
+
+
+###############################################################################
+# Configuration snapshot – all of ``configuration`` in one round trip
+###############################################################################
+
+_CONFIG_SNAPSHOT_QUERY = """
+query ConfigSnapshot {
+  configuration {
+    general {
+      apiKey username
+      stashes { path excludeVideo excludeImage }
+      stashBoxes { endpoint api_key name }
+      databasePath backupDirectoryPath generatedPath metadataPath
+      configFilePath scrapersPath pluginsPath cachePath blobsPath
+      ffmpegPath ffprobePath pythonPath
+      scraperPackageSources { name url local_path }
+      pluginPackageSources { name url local_path }
+      parallelTasks calculateMD5 videoFileNamingAlgorithm
+      createGalleriesFromFolders
+      videoExtensions imageExtensions galleryExtensions
+      excludes imageExcludes
+      logFile logLevel
+    }
+    interface {
+      language menuItems
+      css cssEnabled javascript javascriptEnabled
+    }
+    plugins
+  }
+}
+"""
+
+#: Narrow queries, one per helper, used when the server rejects the combined
+#: query – typically an older Stash that lacks one of its fields. Sections
+#: the server also rejects are left out of the snapshot.
+_CONFIG_SECTIONS = (
+    "general { apiKey username }",
+    "general { stashBoxes { endpoint api_key name } }",
+    "general { stashes { path excludeVideo excludeImage } }",
+    "general { databasePath backupDirectoryPath generatedPath metadataPath"
+    " configFilePath scrapersPath pluginsPath cachePath blobsPath"
+    " ffmpegPath ffprobePath }",
+    "general { scraperPackageSources { name url local_path } }",
+    "general { pluginPackageSources { name url local_path } }",
+    "interface { language }",
+    "plugins",
+)
+
+_PATH_FIELDS = (
+    "databasePath",
+    "backupDirectoryPath",
+    "generatedPath",
+    "metadataPath",
+    "configFilePath",
+    "scrapersPath",
+    "pluginsPath",
+    "cachePath",
+    "blobsPath",
+    "ffmpegPath",
+    "ffprobePath",
+)
+
+
+class ConfigSnapshot:
+    """The server's ``configuration`` tree, fetched with a single query.
+
+    Attribute accessors mirror the ``GET_*`` helpers and return empty
+    collections for anything the server did not send.
+    """
+
+    def __init__(
+        self, configuration: Dict[str, Any], fetched_at: Optional[float] = None
+    ):
+        self.configuration = configuration or {}
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    # ---------------------------------------------------------------------
+    # Fetching and persistence
+    # ---------------------------------------------------------------------
+    @classmethod
+    def fetch(cls, conn: StashConnection) -> "ConfigSnapshot":
+        """Query the configuration, raising :class:`GraphQLError` on errors.
+
+        If the server rejects the combined query as a whole (errors without
+        a ``path``), each helper's fields are fetched on their own instead.
         """
-    )
-    return (
-        data.get("data", {})
-        .get("configuration", {})
-        .get("general", {})
-        .get("stashBoxes", [])
-    )
+        data = conn.query(_CONFIG_SNAPSHOT_QUERY)
+        errors = data.get("errors")
+        if not errors:
+            return cls((data.get("data") or {}).get("configuration") or {})
+        if any(error.get("path") for error in errors):
+            raise GraphQLError(errors)
+        configuration: Dict[str, Any] = {}
+        for section in _CONFIG_SECTIONS:
+            data = conn.query(f"query {{ configuration {{ {section} }} }}")
+            errors = data.get("errors")
+            if errors and any(error.get("path") for error in errors):
+                raise GraphQLError(errors)
+            if errors:
+                continue  # a field this server does not have
+            _merge(configuration, (data.get("data") or {}).get("configuration") or {})
+        return cls(configuration)
 
+    @classmethod
+    def load(
+        cls, path: Union[str, os.PathLike], ttl: Optional[float] = None
+    ) -> Optional["ConfigSnapshot"]:
+        """Read a snapshot written by :meth:`save`.
 
-def GET_STASHES(fragment: Dict[str, Any]) -> List[Dict[str, Any]]:
-    conn = connect(fragment)
-    data = conn.query(
+        Returns ``None`` if the file is missing, unreadable or older than
+        *ttl* seconds.
         """
-        query { configuration { general { stashes { path excludeVideo excludeImage } } } }
+        try:
+            with open(path, encoding="utf-8") as fh:
+                raw = json.load(fh)
+            snapshot = cls(raw["configuration"], float(raw["fetched_at"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if ttl is not None and snapshot.age() > ttl:
+            return None
+        return snapshot
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        """Write the snapshot to *path* atomically.
+
+        The file holds the API key and stash‑box keys, so it is created
+        readable by the owner only.
         """
-    )
-    return (
-        data.get("data", {})
-        .get("configuration", {})
-        .get("general", {})
-        .get("stashes", [])
-    )
+        tmp = f"{os.fspath(path)}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(
+                {"fetched_at": self.fetched_at, "configuration": self.configuration},
+                fh,
+            )
+        os.replace(tmp, path)
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    # ---------------------------------------------------------------------
+    # Views
+    # ---------------------------------------------------------------------
+    @property
+    def general(self) -> Dict[str, Any]:
+        return self.configuration.get("general") or {}
+
+    @property
+    def interface(self) -> Dict[str, Any]:
+        return self.configuration.get("interface") or {}
+
+    @property
+    def plugins(self) -> Dict[str, Any]:
+        return self.configuration.get("plugins") or {}
+
+    @property
+    def api_key(self) -> str:
+        return self.general.get("apiKey") or ""
+
+    @property
+    def stash_boxes(self) -> List[Dict[str, Any]]:
+        return self.general.get("stashBoxes") or []
+
+    @property
+    def stashes(self) -> List[Dict[str, Any]]:
+        return self.general.get("stashes") or []
+
+    @property
+    def paths(self) -> Dict[str, Any]:
+        general = self.general
+        return {key: general[key] for key in _PATH_FIELDS if key in general}
+
+    @property
+    def scraper_sources(self) -> List[Dict[str, Any]]:
+        return self.general.get("scraperPackageSources") or []
+
+    @property
+    def plugin_sources(self) -> List[Dict[str, Any]]:
+        return self.general.get("pluginPackageSources") or []
+
+    def plugin_settings(self, plugin_id: str) -> Dict[str, Any]:
+        """Return the saved settings of one plugin (``{}`` if none)."""
+        return self.plugins.get(plugin_id) or {}
+
+
+def _merge(target: Dict[str, Any], source: Dict[str, Any]) -> None:
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+
+_SNAPSHOTS: Dict[str, ConfigSnapshot] = {}
+
+
+def get_config_snapshot(
+    fragment: Dict[str, Any],
+    *,
+    cache_path: Union[str, os.PathLike, None] = None,
+    ttl: Optional[float] = None,
+    refresh: bool = False,
+) -> ConfigSnapshot:
+    """Return the :class:`ConfigSnapshot` for *fragment*.
+
+    The snapshot is fetched once per process and shared by all ``GET_*``
+    helpers. With *cache_path* it is also persisted to disk and reused by
+    later processes until it is *ttl* seconds old. *refresh* forces a fetch.
+    The snapshot's API key authenticates the shared connection, so a cold
+    start costs a single GraphQL request. A failed fetch raises and is
+    neither cached nor persisted.
+    """
+    key = _fragment_url(fragment)
+    # Resolve the connection first: a rotated SessionCookie replaces it and
+    # drops the snapshot cached under the old one.
+    conn, created = _registered(fragment, False, {})
+    snapshot = None if refresh else _SNAPSHOTS.get(key)
+    if snapshot is not None:
+        return snapshot
+    if cache_path is not None and not refresh:
+        snapshot = ConfigSnapshot.load(cache_path, ttl)
+    if snapshot is None:
+        try:
+            snapshot = ConfigSnapshot.fetch(conn)
+        except Exception:
+            if created:
+                invalidate_connection(fragment)
+            raise
+        if cache_path is not None:
+            snapshot.save(cache_path)
+    if created:
+        conn.api_key = snapshot.api_key
+    _SNAPSHOTS[key] = snapshot
+    return snapshot
+
+
+def GET_STASH_API_KEY(fragment: Dict[str, Any]) -> str:
+    try:
+        return get_config_snapshot(fragment).api_key
+    except Exception:
+        return ""  # API key is optional
+
+
+def GET_STASH_BOXES(fragment: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return get_config_snapshot(fragment).stash_boxes
+
+
+def GET_STASHES(fragment: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return get_config_snapshot(fragment).stashes
 
 
 def GET_PATHS(fragment: Dict[str, Any]) -> Dict[str, Any]:
-    conn = connect(fragment)
-    data = conn.query(
-        """
-        query { configuration { general {
-          databasePath backupDirectoryPath generatedPath metadataPath
-          configFilePath scrapersPath pluginsPath cachePath blobsPath
-          ffmpegPath ffprobePath
-        } } }
-        """
-    )
-    return data.get("data", {}).get("configuration", {}).get("general", {})
+    return get_config_snapshot(fragment).paths
 
 
 def GET_SCRAPER_SOURCES(fragment: Dict[str, Any]) -> List[Dict[str, Any]]:
-    conn = connect(fragment)
-    data = conn.query(
-        """
-        query { configuration { general { scraperPackageSources { name url local_path } } } }
-        """
-    )
-    return (
-        data.get("data", {})
-        .get("configuration", {})
-        .get("general", {})
-        .get("scraperPackageSources", [])
-    )
+    return get_config_snapshot(fragment).scraper_sources
 
 
 def GET_PLUGIN_SOURCES(fragment: Dict[str, Any]) -> List[Dict[str, Any]]:
-    conn = connect(fragment)
-    data = conn.query(
-        """
-        query { configuration { general { pluginPackageSources { name url local_path } } } }
-        """
-    )
-    return (
-        data.get("data", {})
-        .get("configuration", {})
-        .get("general", {})
-        .get("pluginPackageSources", [])
-    )
+    return get_config_snapshot(fragment).plugin_sources
 
 
 ###############################################################################
 # Inline help – call stash_connection_lib.show_help() in REPL
 ###############################################################################
 
-_HELP_TEXT = textwrap.dedent(
-    """
+_HELP_TEXT = textwrap.dedent("""
     📚 stash_connection_lib quick‑reference
     =====================================
 
@@ -225,8 +1248,7 @@ _HELP_TEXT = textwrap.dedent(
 
     This library never throws if the API key is missing – you’ll simply get an
     empty string and unauthenticated queries.
-    """
-)
+    """)
 
 
 def show_help() -> None:  # noqa: D401 – imperative verb
@@ -0,0 +1,447 @@
+# daemon.py
+"""
+Resident worker that runs plugin hook handlers in one warm process.
+
+Stash starts a new interpreter for every hook event, so a bulk edit of
+5 000 scenes means 5 000 imports, config reads and authentications. With
+the daemon, plugin YAML runs :mod:`stash_connection_lib.shim`, which
+forwards each event over a local socket to a :class:`PluginDaemon`. The
+daemon keeps connections, config snapshots and caches between events::
+
+    # handlers.py, next to the plugin's YAML
+    def on_scene_update(conn, payload):
+        scene_id = payload["args"]["hookContext"]["id"]
+        ...
+        return "renamed"
+
+Handlers are named ``module:function`` or ``path/to/file.py:function``
+(relative to the plugin directory) and receive the shared, authenticated
+:class:`~stash_connection_lib.core.StashConnection` for the event's
+``server_connection`` plus the full plugin input.
+
+Events for the same handler, hook type and object that are still queued
+are coalesced, so the handler runs once on the latest input. At most
+*max_workers* events run at once, and never two for the same object.
+The daemon exits after *idle_timeout* seconds without events. A waiting
+shim gets an error reply if its handler has not finished within
+*wait_timeout* seconds; the handler itself keeps running.
+
+Run it by hand with ``python -m stash_connection_lib.daemon serve``; the
+shim starts one on demand. ``stats`` and ``stop`` talk to a running one.
+"""
+
+import argparse
+import hashlib
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+import traceback
+import types
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .shim import daemon_dir, request
+
+__all__ = ["PluginDaemon", "load_handler", "run_inline"]
+
+#: Handlers run at the same time.
+DEFAULT_MAX_WORKERS = 4
+#: Seconds without events before the daemon exits.
+DEFAULT_IDLE_TIMEOUT = 600.0
+#: Seconds a ``wait`` request blocks for its handler's result.
+DEFAULT_WAIT_TIMEOUT = 300.0
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[Any, Dict[str, Any]], Any]
+
+_HANDLERS: Dict[Tuple[str, str, str], Tuple[float, Handler]] = {}
+_HANDLERS_LOCK = threading.Lock()
+_CONNECT_LOCK = threading.Lock()
+
+
+def _handler_path(cwd: str, target: str) -> Optional[str]:
+    """File of *target* (``file.py`` or dotted module) inside *cwd*, if any."""
+    if target.endswith(".py"):
+        return os.path.abspath(os.path.join(cwd, target))
+    base = os.path.join(os.path.abspath(cwd), *target.split("."))
+    for path in (base + ".py", os.path.join(base, "__init__.py")):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _plugin_package(directory: str) -> str:
+    """Name of a namespace package for *directory*, one per plugin directory.
+
+    Handler modules are loaded beneath it, so two plugins shipping a
+    ``handlers.py`` never share a ``sys.modules`` entry, and relative
+    imports between a plugin's files resolve without touching ``sys.path``.
+    """
+    name = "_stash_plugin_" + hashlib.sha1(directory.encode()).hexdigest()[:12]
+    if name not in sys.modules:
+        package = types.ModuleType(name)
+        package.__path__ = [directory]
+        sys.modules[name] = package
+    return name
+
+
+def load_handler(spec: str, cwd: str = ".") -> Handler:
+    """Import the handler named by *spec*, reloading files that changed.
+
+    Modules are looked up in *cwd* first and loaded privately for that
+    directory; only names not found there are imported normally.
+    """
+    target, sep, name = spec.rpartition(":")
+    if not sep or not target or not name:
+        raise ValueError(
+            f"handler must be 'module:function' or 'file.py:function', not {spec!r}"
+        )
+    path = _handler_path(cwd, target)
+    mtime = os.path.getmtime(path) if path else 0.0
+    key = (os.path.abspath(cwd), target, name)
+    with _HANDLERS_LOCK:
+        cached = _HANDLERS.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        if path:
+            directory, filename = os.path.split(path)
+            locations = None
+            if filename == "__init__.py":
+                locations = [directory]
+                directory, filename = os.path.split(directory)
+            stem = os.path.splitext(filename)[0]
+            module_name = f"{_plugin_package(directory)}.{stem}"
+            module_spec = importlib.util.spec_from_file_location(
+                module_name, path, submodule_search_locations=locations
+            )
+            if module_spec is None or module_spec.loader is None:
+                raise ImportError(f"cannot load handler file {path!r}")
+            module = importlib.util.module_from_spec(module_spec)
+            sys.modules[module_name] = module
+            try:
+                module_spec.loader.exec_module(module)
+            except BaseException:
+                sys.modules.pop(module_name, None)
+                raise
+        else:
+            module = importlib.import_module(target)
+        handler = getattr(module, name)
+        _HANDLERS[key] = (mtime, handler)
+        return handler
+
+
+def _connection(payload: Dict[str, Any]) -> Any:
+    from .core import get_config_snapshot, get_connection
+
+    fragment = payload.get("server_connection")
+    if not fragment:
+        return None
+    with _CONNECT_LOCK:  # concurrent first events share one snapshot fetch
+        get_config_snapshot(fragment)  # authenticates with the snapshot's API key
+        return get_connection(fragment)
+
+
+def run_inline(spec: str, payload: Dict[str, Any], cwd: str = ".") -> Dict[str, Any]:
+    """Run one event in this process; return ``{"output": …}`` or ``{"error": …}``."""
+    try:
+        return {"output": load_handler(spec, cwd)(_connection(payload), payload)}
+    except Exception as exc:
+        log.error("handler %s failed:\n%s", spec, traceback.format_exc())
+        return {"error": f"{type(exc).__name__}: {exc}"}
+
+
+def _event_key(spec: str, payload: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    context = (payload.get("args") or {}).get("hookContext") or {}
+    if context.get("id") is None:
+        return None  # tasks and id‑less hooks are never merged
+    server = json.dumps(payload.get("server_connection"), sort_keys=True)
+    return (spec, server, context.get("type"), str(context["id"]))
+
+
+class _Event:
+    __slots__ = ("key", "spec", "cwd", "payload", "futures")
+
+    def __init__(self, key: Any, spec: str, cwd: str, payload: Dict[str, Any]):
+        self.key = key
+        self.spec = spec
+        self.cwd = cwd
+        self.payload = payload
+        self.futures: List[Future] = []
+
+
+class PluginDaemon:
+    """Queue, coalesce and run hook events from :mod:`~stash_connection_lib.shim`."""
+
+    def __init__(
+        self,
+        *,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        wait_timeout: float = DEFAULT_WAIT_TIMEOUT,
+        directory: Optional[str] = None,
+    ):
+        self.max_workers = max_workers
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.directory = directory or daemon_dir()
+        self.received = 0
+        self.coalesced = 0
+        self.processed = 0
+        self.failed = 0
+        self.started = time.time()
+        self._pending: "OrderedDict[Any, _Event]" = OrderedDict()
+        self._running: set = set()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._last_event = time.monotonic()
+        self._token = secrets.token_hex(16)
+        self._sock: Optional[socket.socket] = None
+        self._workers: List[threading.Thread] = []
+
+    # ---------------------------------------------------------------------
+    # Queue
+    # ---------------------------------------------------------------------
+    def submit(self, spec: str, payload: Dict[str, Any], cwd: str = ".") -> Future:
+        """Queue one event; the future resolves to its ``output``/``error`` reply."""
+        future: Future = Future()
+        key = _event_key(spec, payload)
+        with self._cond:
+            self.received += 1
+            self._last_event = time.monotonic()
+            event = self._pending.get(key) if key is not None else None
+            if event is not None:
+                self.coalesced += 1
+                event.payload, event.cwd = payload, cwd  # latest input wins
+            else:
+                event = _Event(key if key is not None else object(), spec, cwd, payload)
+                self._pending[event.key] = event
+            event.futures.append(future)
+            self._cond.notify()
+        return future
+
+    def _next(self) -> Optional[_Event]:
+        with self._cond:
+            while True:
+                for key, event in self._pending.items():
+                    if key not in self._running:
+                        del self._pending[key]
+                        self._running.add(key)
+                        return event
+                if self._stopping:
+                    return None
+                self._cond.wait()
+
+    def _work(self) -> None:
+        while True:
+            event = self._next()
+            if event is None:
+                return
+            reply = run_inline(event.spec, event.payload, event.cwd)
+            with self._cond:
+                self._running.discard(event.key)
+                self.processed += 1
+                self.failed += "error" in reply
+                self._last_event = time.monotonic()
+                self._cond.notify_all()
+            for future in event.futures:
+                future.set_result(reply)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "received": self.received,
+                "coalesced": self.coalesced,
+                "processed": self.processed,
+                "failed": self.failed,
+                "pending": len(self._pending),
+                "running": len(self._running),
+                "uptime": round(time.time() - self.started, 1),
+                "pid": os.getpid(),
+            }
+
+    # ---------------------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------------------
+    def start_workers(self) -> None:
+        for i in range(self.max_workers):
+            worker = threading.Thread(
+                target=self._work, name=f"stash-hook-{i}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, wait: bool = True) -> None:
+        """Finish queued events, then let :meth:`serve` return."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _idle(self) -> bool:
+        with self._cond:
+            busy = self._pending or self._running
+            return not busy and time.monotonic() - self._last_event > self.idle_timeout
+
+    def serve(self) -> bool:
+        """Listen until stopped or idle; ``False`` if another daemon owns the socket."""
+        os.makedirs(self.directory, exist_ok=True)
+        lock = open(os.path.join(self.directory, "daemon.lock"), "a+")
+        try:
+            if not _try_lock(lock):
+                return False
+            self._sock = self._listen()
+            self.start_workers()
+            log.info("daemon %d listening", os.getpid())
+            while not self._stopping and not self._idle():
+                try:
+                    client, _ = self._sock.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(
+                    target=self._answer, args=(client,), daemon=True
+                ).start()
+            self.stop()
+            return True
+        finally:
+            self._close()
+            lock.close()
+
+    def _listen(self) -> socket.socket:
+        address: Dict[str, Any] = {"token": self._token, "pid": os.getpid()}
+        if hasattr(socket, "AF_UNIX"):
+            path = os.path.join(self.directory, "daemon.sock")
+            if os.path.exists(path):
+                os.unlink(path)  # left by a daemon that died; we hold the lock
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(path)
+            os.chmod(path, 0o600)
+            address.update(family="unix", path=path)
+        else:  # pragma: no cover - Windows
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(("127.0.0.1", 0))
+            address.update(family="tcp", port=sock.getsockname()[1])
+        sock.listen(64)
+        sock.settimeout(1.0)
+        target = os.path.join(self.directory, "address.json")
+        tmp = f"{target}.{os.getpid()}"
+        with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            json.dump(address, f)
+        os.replace(tmp, target)
+        return sock
+
+    def _close(self) -> None:
+        if self._sock is None:
+            return
+        target = os.path.join(self.directory, "address.json")
+        try:
+            with open(target, encoding="utf-8") as f:
+                if json.load(f).get("pid") == os.getpid():
+                    os.unlink(target)
+        except (OSError, ValueError):
+            pass
+        path = self._sock.getsockname()
+        self._sock.close()
+        if isinstance(path, str) and path and os.path.exists(path):
+            os.unlink(path)
+        self._sock = None
+
+    def _answer(self, client: socket.socket) -> None:
+        with client:
+            try:
+                client.settimeout(10.0)
+                data = b""
+                while not data.endswith(b"\n"):
+                    chunk = client.recv(1 << 16)
+                    if not chunk:
+                        break
+                    data += chunk
+                message = json.loads(data)
+                client.settimeout(None)
+                reply = json.dumps(self._reply(message), default=str)
+                client.sendall(reply.encode() + b"\n")
+            except (OSError, ValueError) as exc:
+                log.warning("bad request: %s", exc)
+
+    def _reply(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        if not secrets.compare_digest(str(message.get("token", "")), self._token):
+            return {"error": "invalid daemon token"}
+        command = message.get("command")
+        if command == "stats":
+            return self.stats()
+        if command == "stop":
+            threading.Thread(target=self.stop, daemon=True).start()
+            return {"stopping": True}
+        future = self.submit(
+            message["handler"], message.get("payload") or {}, message.get("cwd") or "."
+        )
+        if message.get("wait"):
+            try:
+                return future.result(self.wait_timeout)
+            except FutureTimeout:
+                return {"error": f"handler still running after {self.wait_timeout:g}s"}
+        return {"queued": True}
+
+
+def _try_lock(handle: Any) -> bool:
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover - Windows
+        import msvcrt
+
+        try:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m stash_connection_lib.daemon")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="run the daemon in the foreground")
+    serve.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS)
+    serve.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT)
+    serve.add_argument("--wait-timeout", type=float, default=DEFAULT_WAIT_TIMEOUT)
+    sub.add_parser("stats", help="print a running daemon's counters")
+    sub.add_parser("stop", help="finish queued events and exit")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        logging.basicConfig(
+            level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+        )
+        daemon = PluginDaemon(
+            max_workers=args.workers,
+            idle_timeout=args.idle_timeout,
+            wait_timeout=args.wait_timeout,
+        )
+        if not daemon.serve():
+            print("another daemon is already running", file=sys.stderr)
+        return 0
+    try:
+        print(json.dumps(request({"command": args.command}, timeout=10.0)))
+    except (OSError, ValueError):
+        print("no daemon running", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
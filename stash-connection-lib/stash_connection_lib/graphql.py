@@ -0,0 +1,574 @@
+# graphql.py
+"""
+Minimal GraphQL document parser and printer.
+
+Only the executable subset of the language is supported (operations,
+fragments, variables, directives and literal values) – enough to rewrite,
+validate and serve the queries Stash plugins send. Type system definitions
+are not parsed.
+
+Values are plain Python objects (``int``, ``float``, ``str``, ``bool``,
+``None``, ``list`` and ``dict``) except variables and enum values, which use
+:class:`Variable` and :class:`EnumValue` so they survive a print round trip.
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, NoReturn, Optional, Tuple, Union
+
+__all__ = [
+    "GraphQLSyntaxError",
+    "Document",
+    "OperationDefinition",
+    "FragmentDefinition",
+    "VariableDefinition",
+    "Field",
+    "FragmentSpread",
+    "InlineFragment",
+    "Directive",
+    "Variable",
+    "EnumValue",
+    "parse",
+    "print_document",
+    "print_value",
+]
+
+
+class GraphQLSyntaxError(ValueError):
+    """Raised when a document cannot be parsed."""
+
+    def __init__(self, message: str, source: str, position: int):
+        line = source.count("\n", 0, position) + 1
+        column = position - (source.rfind("\n", 0, position) + 1) + 1
+        super().__init__(f"{message} (line {line}, column {column})")
+        self.position = position
+
+
+###############################################################################
+# AST
+###############################################################################
+
+
+class Variable:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Variable) and other.name == self.name
+
+    def __hash__(self) -> int:
+        return hash(("$", self.name))
+
+    def __repr__(self) -> str:
+        return f"Variable({self.name!r})"
+
+
+class EnumValue:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, EnumValue) and other.name == self.name
+
+    def __hash__(self) -> int:
+        return hash(("enum", self.name))
+
+    def __repr__(self) -> str:
+        return f"EnumValue({self.name!r})"
+
+
+class Directive:
+    __slots__ = ("name", "arguments")
+
+    def __init__(self, name: str, arguments: Dict[str, Any]):
+        self.name = name
+        self.arguments = arguments
+
+
+class Field:
+    __slots__ = ("alias", "name", "arguments", "directives", "selection_set")
+
+    def __init__(
+        self,
+        name: str,
+        alias: Optional[str] = None,
+        arguments: Optional[Dict[str, Any]] = None,
+        directives: Optional[List[Directive]] = None,
+        selection_set: Optional[List["Selection"]] = None,
+    ):
+        self.name = name
+        self.alias = alias
+        self.arguments = arguments or {}
+        self.directives = directives or []
+        self.selection_set = selection_set
+
+    @property
+    def response_key(self) -> str:
+        return self.alias or self.name
+
+
+class FragmentSpread:
+    __slots__ = ("name", "directives")
+
+    def __init__(self, name: str, directives: Optional[List[Directive]] = None):
+        self.name = name
+        self.directives = directives or []
+
+
+class InlineFragment:
+    __slots__ = ("type_condition", "directives", "selection_set")
+
+    def __init__(
+        self,
+        type_condition: Optional[str],
+        directives: List[Directive],
+        selection_set: List["Selection"],
+    ):
+        self.type_condition = type_condition
+        self.directives = directives
+        self.selection_set = selection_set
+
+
+Selection = Union[Field, FragmentSpread, InlineFragment]
+
+
+class VariableDefinition:
+    __slots__ = ("name", "type", "default_value")
+
+    _NO_DEFAULT = object()
+
+    def __init__(self, name: str, type: str, default_value: Any = _NO_DEFAULT):
+        self.name = name
+        self.type = type  # printed type reference, e.g. "[ID!]!"
+        self.default_value = default_value
+
+    @property
+    def has_default(self) -> bool:
+        return self.default_value is not VariableDefinition._NO_DEFAULT
+
+
+class OperationDefinition:
+    __slots__ = (
+        "operation",
+        "name",
+        "variable_definitions",
+        "directives",
+        "selection_set",
+    )
+
+    def __init__(
+        self,
+        operation: str,
+        name: Optional[str],
+        variable_definitions: List[VariableDefinition],
+        directives: List[Directive],
+        selection_set: List[Selection],
+    ):
+        self.operation = operation
+        self.name = name
+        self.variable_definitions = variable_definitions
+        self.directives = directives
+        self.selection_set = selection_set
+
+
+class FragmentDefinition:
+    __slots__ = ("name", "type_condition", "directives", "selection_set")
+
+    def __init__(
+        self,
+        name: str,
+        type_condition: str,
+        directives: List[Directive],
+        selection_set: List[Selection],
+    ):
+        self.name = name
+        self.type_condition = type_condition
+        self.directives = directives
+        self.selection_set = selection_set
+
+
+class Document:
+    __slots__ = ("definitions",)
+
+    def __init__(
+        self, definitions: List[Union[OperationDefinition, FragmentDefinition]]
+    ):
+        self.definitions = definitions
+
+    @property
+    def operations(self) -> List[OperationDefinition]:
+        return [d for d in self.definitions if isinstance(d, OperationDefinition)]
+
+    @property
+    def fragments(self) -> Dict[str, FragmentDefinition]:
+        return {
+            d.name: d for d in self.definitions if isinstance(d, FragmentDefinition)
+        }
+
+    def operation(self, name: Optional[str] = None) -> OperationDefinition:
+        """Return the operation called *name*, or the only one if *name* is None."""
+        operations = self.operations
+        if name is None:
+            if len(operations) != 1:
+                raise ValueError("document must contain exactly one operation")
+            return operations[0]
+        for op in operations:
+            if op.name == name:
+                return op
+        raise ValueError(f"unknown operation {name!r}")
+
+
+###############################################################################
+# Lexer
+###############################################################################
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ignored>[\s,\ufeff]+|\#[^\n\r]*)
+  | (?P<block>\"\"\"(?:\\\"\"\"|(?!\"\"\")[\s\S])*\"\"\")
+  | (?P<string>"(?:[^"\\\n\r]|\\.)*")
+  | (?P<spread>\.\.\.)
+  | (?P<punct>[!$&():=@\[\]{|}])
+  | (?P<float>-?(?:0|[1-9][0-9]*)(?:\.[0-9]+(?:[eE][+-]?[0-9]+)?|[eE][+-]?[0-9]+))
+  | (?P<int>-?(?:0|[1-9][0-9]*))
+  | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+    """,
+    re.VERBOSE,
+)
+
+Token = Tuple[str, str, int]
+
+
+def _tokenize(source: str) -> List[Token]:
+    tokens: List[Token] = []
+    pos, end = 0, len(source)
+    while pos < end:
+        match = _TOKEN_RE.match(source, pos)
+        if match is None:
+            raise GraphQLSyntaxError(
+                f"unexpected character {source[pos]!r}", source, pos
+            )
+        kind = match.lastgroup
+        if kind != "ignored":
+            value = match.group()
+            tokens.append((kind if kind != "punct" else value, value, pos))
+        pos = match.end()
+    tokens.append(("<EOF>", "", end))
+    return tokens
+
+
+def _block_string_value(raw: str) -> str:
+    lines = raw[3:-3].replace('\\"""', '"""').splitlines()
+    indents = [
+        len(line) - len(line.lstrip(" \t")) for line in lines[1:] if line.strip()
+    ]
+    common = min(indents) if indents else 0
+    lines = lines[:1] + [line[common:] for line in lines[1:]]
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return "\n".join(lines)
+
+
+###############################################################################
+# Parser
+###############################################################################
+
+
+class _Parser:
+    def __init__(self, source: str):
+        self.source = source
+        self.tokens = _tokenize(source)
+        self.index = 0
+
+    # -- token helpers ----------------------------------------------------
+    def peek(self, kind: str, value: Optional[str] = None) -> bool:
+        tok_kind, tok_value, _ = self.tokens[self.index]
+        return tok_kind == kind and (value is None or tok_value == value)
+
+    def advance(self) -> Token:
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, kind: str, value: Optional[str] = None) -> str:
+        if not self.peek(kind, value):
+            self.fail(f"expected {value or kind}")
+        return self.advance()[1]
+
+    def fail(self, message: str) -> NoReturn:
+        kind, value, pos = self.tokens[self.index]
+        found = value or kind
+        raise GraphQLSyntaxError(f"{message}, found {found!r}", self.source, pos)
+
+    # -- definitions ------------------------------------------------------
+    def document(self) -> Document:
+        definitions: List[Union[OperationDefinition, FragmentDefinition]] = []
+        while not self.peek("<EOF>"):
+            definitions.append(self.definition())
+        if not definitions:
+            self.fail("expected a definition")
+        return Document(definitions)
+
+    def definition(self) -> Union[OperationDefinition, FragmentDefinition]:
+        if self.peek("{"):
+            return OperationDefinition("query", None, [], [], self.selection_set())
+        if self.peek("name", "fragment"):
+            self.advance()
+            name = self.expect("name")
+            self.expect("name", "on")
+            type_condition = self.expect("name")
+            return FragmentDefinition(
+                name, type_condition, self.directives(), self.selection_set()
+            )
+        if self.peek("name") and self.tokens[self.index][1] in (
+            "query",
+            "mutation",
+            "subscription",
+        ):
+            operation = self.advance()[1]
+            name = self.advance()[1] if self.peek("name") else None
+            variables = self.variable_definitions()
+            return OperationDefinition(
+                operation, name, variables, self.directives(), self.selection_set()
+            )
+        self.fail("expected an operation or fragment")
+
+    def variable_definitions(self) -> List[VariableDefinition]:
+        definitions: List[VariableDefinition] = []
+        if not self.peek("("):
+            return definitions
+        self.advance()
+        while not self.peek(")"):
+            self.expect("$")
+            name = self.expect("name")
+            self.expect(":")
+            type_ref = self.type_reference()
+            if self.peek("="):
+                self.advance()
+                definitions.append(VariableDefinition(name, type_ref, self.value(True)))
+            else:
+                definitions.append(VariableDefinition(name, type_ref))
+            self.directives()
+        self.advance()
+        if not definitions:
+            self.fail("expected a variable definition")
+        return definitions
+
+    def type_reference(self) -> str:
+        if self.peek("["):
+            self.advance()
+            inner = self.type_reference()
+            self.expect("]")
+            type_ref = f"[{inner}]"
+        else:
+            type_ref = self.expect("name")
+        if self.peek("!"):
+            self.advance()
+            type_ref += "!"
+        return type_ref
+
+    def directives(self) -> List[Directive]:
+        directives: List[Directive] = []
+        while self.peek("@"):
+            self.advance()
+            directives.append(Directive(self.expect("name"), self.arguments()))
+        return directives
+
+    # -- selections -------------------------------------------------------
+    def selection_set(self) -> List[Selection]:
+        self.expect("{")
+        selections: List[Selection] = []
+        while not self.peek("}"):
+            selections.append(self.selection())
+        self.advance()
+        if not selections:
+            self.fail("expected a selection")
+        return selections
+
+    def selection(self) -> Selection:
+        if self.peek("spread"):
+            self.advance()
+            if self.peek("name") and not self.peek("name", "on"):
+                return FragmentSpread(self.advance()[1], self.directives())
+            type_condition = None
+            if self.peek("name", "on"):
+                self.advance()
+                type_condition = self.expect("name")
+            return InlineFragment(
+                type_condition, self.directives(), self.selection_set()
+            )
+        name = self.expect("name")
+        alias = None
+        if self.peek(":"):
+            self.advance()
+            alias, name = name, self.expect("name")
+        arguments = self.arguments()
+        directives = self.directives()
+        selection_set = self.selection_set() if self.peek("{") else None
+        return Field(name, alias, arguments, directives, selection_set)
+
+    def arguments(self) -> Dict[str, Any]:
+        arguments: Dict[str, Any] = {}
+        if not self.peek("("):
+            return arguments
+        self.advance()
+        while not self.peek(")"):
+            name = self.expect("name")
+            self.expect(":")
+            arguments[name] = self.value(False)
+        self.advance()
+        return arguments
+
+    # -- values -----------------------------------------------------------
+    def value(self, const: bool) -> Any:
+        kind, raw, _ = self.tokens[self.index]
+        if kind == "$":
+            if const:
+                self.fail("unexpected variable in constant value")
+            self.advance()
+            return Variable(self.expect("name"))
+        if kind == "int":
+            self.advance()
+            return int(raw)
+        if kind == "float":
+            self.advance()
+            return float(raw)
+        if kind == "string":
+            self.advance()
+            return json.loads(raw)
+        if kind == "block":
+            self.advance()
+            return _block_string_value(raw)
+        if kind == "name":
+            self.advance()
+            if raw == "true":
+                return True
+            if raw == "false":
+                return False
+            if raw == "null":
+                return None
+            return EnumValue(raw)
+        if kind == "[":
+            self.advance()
+            items = []
+            while not self.peek("]"):
+                items.append(self.value(const))
+            self.advance()
+            return items
+        if kind == "{":
+            self.advance()
+            fields = {}
+            while not self.peek("}"):
+                name = self.expect("name")
+                self.expect(":")
+                fields[name] = self.value(const)
+            self.advance()
+            return fields
+        self.fail("expected a value")
+
+
+@lru_cache(maxsize=512)
+def parse(source: str) -> Document:
+    """Parse *source* into a :class:`Document`.
+
+    Results are cached, so treat the returned tree as read‑only.
+    """
+    return _Parser(source).document()
+
+
+###############################################################################
+# Printer
+###############################################################################
+
+
+def print_value(value: Any) -> str:
+    if isinstance(value, Variable):
+        return f"${value.name}"
+    if isinstance(value, EnumValue):
+        return value.name
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if value is None:
+        return "null"
+    if isinstance(value, (int, float)):
+        return json.dumps(value)
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, list):
+        return "[" + ", ".join(print_value(v) for v in value) + "]"
+    if isinstance(value, dict):
+        inner = ", ".join(f"{k}: {print_value(v)}" for k, v in value.items())
+        return "{" + inner + "}"
+    raise TypeError(f"cannot print GraphQL value {value!r}")
+
+
+def _print_arguments(arguments: Dict[str, Any]) -> str:
+    if not arguments:
+        return ""
+    inner = ", ".join(f"{k}: {print_value(v)}" for k, v in arguments.items())
+    return f"({inner})"
+
+
+def _print_directives(directives: List[Directive]) -> str:
+    return "".join(f" @{d.name}{_print_arguments(d.arguments)}" for d in directives)
+
+
+def _print_selection_set(selections: Optional[List[Selection]]) -> str:
+    if not selections:
+        return ""
+    return "{ " + " ".join(_print_selection(s) for s in selections) + " }"
+
+
+def _print_selection(selection: Selection) -> str:
+    if isinstance(selection, FragmentSpread):
+        return f"...{selection.name}{_print_directives(selection.directives)}"
+    if isinstance(selection, InlineFragment):
+        on = f" on {selection.type_condition}" if selection.type_condition else ""
+        return (
+            f"...{on}{_print_directives(selection.directives)} "
+            f"{_print_selection_set(selection.selection_set)}"
+        )
+    text = f"{selection.alias}: {selection.name}" if selection.alias else selection.name
+    text += _print_arguments(selection.arguments)
+    text += _print_directives(selection.directives)
+    if selection.selection_set:
+        text += " " + _print_selection_set(selection.selection_set)
+    return text
+
+
+def _print_definition(
+    definition: Union[OperationDefinition, FragmentDefinition],
+) -> str:
+    if isinstance(definition, FragmentDefinition):
+        return (
+            f"fragment {definition.name} on {definition.type_condition}"
+            f"{_print_directives(definition.directives)} "
+            f"{_print_selection_set(definition.selection_set)}"
+        )
+    head = definition.operation
+    if definition.name:
+        head += f" {definition.name}"
+    if definition.variable_definitions:
+        parts = []
+        for var in definition.variable_definitions:
+            part = f"${var.name}: {var.type}"
+            if var.has_default:
+                part += f" = {print_value(var.default_value)}"
+            parts.append(part)
+        head += "(" + ", ".join(parts) + ")"
+    head += _print_directives(definition.directives)
+    return f"{head} {_print_selection_set(definition.selection_set)}"
+
+
+def print_document(document: Document) -> str:
+    """Return compact GraphQL source for *document*."""
+    return "\n".join(_print_definition(d) for d in document.definitions)
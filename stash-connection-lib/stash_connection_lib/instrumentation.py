@@ -0,0 +1,169 @@
+# instrumentation.py
+"""
+Per‑query instrumentation for :class:`~stash_connection_lib.core.StashConnection`.
+
+Every call to ``conn.query()`` produces one :class:`QueryEvent`. Events are
+aggregated per operation name by :class:`QueryStats` (exposed as
+``conn.stats()``) and handed to any pre/post hooks registered with
+``conn.add_hook()``.
+
+The operation name is the GraphQL operation name when there is one
+(``query FindScenes(...)`` → ``FindScenes``), otherwise the first root field
+(``{ findScenes(...) }`` → ``findScenes``).
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+__all__ = ["QueryEvent", "QueryStats", "Hook", "operation_name", "append_stats"]
+
+#: Latency samples kept per operation for percentile estimates.
+MAX_SAMPLES = 2048
+
+_NAMED_OP_RE = re.compile(
+    r"^\s*(?:#[^\n]*\n\s*)*(?:query|mutation|subscription)\s+(\w+)"
+)
+_FIRST_FIELD_RE = re.compile(r"\{\s*(?:#[^\n]*\n\s*)*(?:\w+\s*:\s*)?(\w+)")
+
+
+def operation_name(query: str) -> str:
+    """Return the label stats are keyed by for *query*."""
+    match = _NAMED_OP_RE.match(query) or _FIRST_FIELD_RE.search(query)
+    return match.group(1) if match else "anonymous"
+
+
+class QueryEvent:
+    """One logical ``query()`` call, including any retries.
+
+    Pre‑hooks see the request fields only; ``duration``, the byte counts,
+    ``error`` and ``graphql_errors`` are filled in before post‑hooks run.
+    """
+
+    __slots__ = (
+        "operation",
+        "query",
+        "variables",
+        "started",
+        "duration",
+        "request_bytes",
+        "response_bytes",
+        "attempts",
+        "error",
+        "graphql_errors",
+    )
+
+    def __init__(self, query: str, variables: Optional[Dict[str, Any]] = None) -> None:
+        self.operation = operation_name(query)
+        self.query = query
+        self.variables = variables
+        self.started = time.time()
+        self.duration = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.attempts = 0
+        self.error: Optional[BaseException] = None
+        self.graphql_errors = 0
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or self.graphql_errors > 0
+
+
+Hook = Callable[[QueryEvent], None]
+
+
+class _OperationStats:
+    __slots__ = ("count", "errors", "total", "maximum", "samples", "sent", "received")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.samples: List[float] = []
+        self.sent = 0
+        self.received = 0
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class QueryStats:
+    """Thread‑safe counters aggregated per operation name."""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES) -> None:
+        self.max_samples = max_samples
+        self._ops: Dict[str, _OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, event: QueryEvent) -> None:
+        with self._lock:
+            ops = self._ops.get(event.operation)
+            if ops is None:
+                ops = self._ops[event.operation] = _OperationStats()
+            ops.count += 1
+            ops.errors += event.failed
+            ops.total += event.duration
+            ops.maximum = max(ops.maximum, event.duration)
+            ops.sent += event.request_bytes
+            ops.received += event.response_bytes
+            # Reservoir sampling keeps percentiles unbiased with bounded memory.
+            if len(ops.samples) < self.max_samples:
+                ops.samples.append(event.duration)
+            else:
+                slot = random.randrange(ops.count)
+                if slot < self.max_samples:
+                    ops.samples[slot] = event.duration
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return ``{operation: {count, errors, error_rate, …_ms, …_bytes}}``."""
+        with self._lock:
+            result = {}
+            for name, ops in sorted(self._ops.items()):
+                ordered = sorted(ops.samples)
+                result[name] = {
+                    "count": ops.count,
+                    "errors": ops.errors,
+                    "error_rate": ops.errors / ops.count,
+                    "total_ms": ops.total * 1000,
+                    "mean_ms": ops.total * 1000 / ops.count,
+                    "p50_ms": _percentile(ordered, 0.50) * 1000,
+                    "p95_ms": _percentile(ordered, 0.95) * 1000,
+                    "p99_ms": _percentile(ordered, 0.99) * 1000,
+                    "max_ms": ops.maximum * 1000,
+                    "request_bytes": ops.sent,
+                    "response_bytes": ops.received,
+                }
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ops.clear()
+
+
+def append_stats(
+    path: Union[str, os.PathLike], url: str, stats: Dict[str, Dict[str, Any]]
+) -> None:
+    """Append one JSON line describing this process' stats to *path*.
+
+    Lines carry the pid and command line, so several plugin processes can
+    share one file.
+    """
+    record = {
+        "time": time.time(),
+        "pid": os.getpid(),
+        "argv": sys.argv,
+        "url": url,
+        "stats": stats,
+    }
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(record) + "\n")
@@ -0,0 +1,439 @@
+# jobs.py
+"""
+Submit Stash background jobs and wait for them to finish.
+
+``metadataScan`` and ``metadataGenerate`` return a job id immediately; the
+work happens later in Stash's job queue. A :class:`JobManager` submits them
+and blocks until they are done, so follow‑up steps never race the scan::
+
+    jobs = JobManager(conn)
+    job = jobs.scan(["/media/new", "/media/new/sub", "/media/other"])
+    job.wait(progress=lambda j: print(j["status"], j.get("progress")))
+    # one job for ["/media/new", "/media/other"]
+
+Requests are coalesced: paths inside another requested path are dropped,
+and a request already covered by a job of ours that is still queued
+returns that job instead of submitting a new one. ``generate`` does the
+same for scene and marker ids.
+
+Waiting uses the ``jobsSubscribe`` GraphQL subscription over a
+``graphql-transport-ws`` websocket when the optional ``websocket-client``
+package is installed (``pip install stash-connection-lib[ws]``), polling
+``findJob`` during quiet periods so a lost message cannot hang the caller.
+Without it, or if the socket fails, ``findJob`` is polled with backoff.
+"""
+
+import itertools
+import json
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from .core import response_data
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .core import StashConnection
+
+__all__ = ["JobManager", "Job", "JobError", "coalesce_paths"]
+
+#: First ``findJob`` poll interval in seconds.
+DEFAULT_POLL_INTERVAL = 0.5
+#: Longest pause between ``findJob`` polls.
+DEFAULT_MAX_POLL_INTERVAL = 5.0
+#: Job states after which a job never changes again.
+TERMINAL_STATUSES = frozenset({"FINISHED", "CANCELLED", "FAILED"})
+
+_JOB_FIELDS = "id status subTasks description progress error startTime endTime"
+_FIND_JOB = f"query ($id: ID!) {{ findJob(input: {{id: $id}}) {{ {_JOB_FIELDS} }} }}"
+_SUBSCRIBE = f"subscription {{ jobsSubscribe {{ type job {{ {_JOB_FIELDS} }} }} }}"
+_MUTATIONS = {
+    "scan": "mutation ($input: ScanMetadataInput!) { metadataScan(input: $input) }",
+    "generate": (
+        "mutation ($input: GenerateMetadataInput!) { metadataGenerate(input: $input) }"
+    ),
+}
+
+Progress = Callable[[Dict[str, Any]], None]
+
+
+class JobError(RuntimeError):
+    """Raised by :meth:`Job.wait` when a job failed or was cancelled."""
+
+    def __init__(self, job: Dict[str, Any]):
+        self.job = job
+        detail = f": {job['error']}" if job.get("error") else ""
+        super().__init__(
+            f"job {job.get('id')} {str(job.get('status')).lower()}{detail}"
+        )
+
+
+def _is_under(path: str, parent: str) -> bool:
+    return path == parent or path.startswith((parent + "/", parent + "\\"))
+
+
+def _clean(path: str) -> str:
+    stripped = path.rstrip("/\\")
+    return stripped or path
+
+
+def coalesce_paths(paths: Iterable[str]) -> List[str]:
+    """Drop duplicates and paths nested in another path, keeping order."""
+    cleaned = list(dict.fromkeys(_clean(p) for p in paths))
+    return [
+        path
+        for path in cleaned
+        if not any(path != other and _is_under(path, other) for other in cleaned)
+    ]
+
+
+class Job:
+    """Handle on a submitted job; ``input`` is what was sent to Stash."""
+
+    def __init__(
+        self, manager: "JobManager", job_id: str, kind: str, input: Dict[str, Any]
+    ):
+        self.manager = manager
+        self.id = str(job_id)
+        self.kind = kind
+        self.input = input
+        self.last: Optional[Dict[str, Any]] = None
+
+    def status(self) -> Optional[Dict[str, Any]]:
+        """Fetch the job's current state, or ``None`` once Stash forgot it."""
+        return self.manager.find(self.id)
+
+    def wait(
+        self,
+        timeout: Optional[float] = None,
+        progress: Optional[Progress] = None,
+        raise_on_failure: bool = True,
+    ) -> Dict[str, Any]:
+        """Block until the job ends and return its final state."""
+        return self.manager.wait([self], timeout, progress, raise_on_failure)[self.id]
+
+    def __repr__(self) -> str:
+        return f"Job({self.id!r}, {self.kind!r})"
+
+
+class JobManager:
+    """Submit scan/generate jobs with coalescing and await their completion."""
+
+    def __init__(
+        self,
+        conn: "StashConnection",
+        *,
+        subscriptions: bool = True,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        max_poll_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+    ):
+        self.conn = conn
+        self.subscriptions = subscriptions
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._lock = threading.Lock()
+        self._submitted: List[Job] = []
+
+    # ---------------------------------------------------------------------
+    # Submission
+    # ---------------------------------------------------------------------
+    def scan(self, paths: Optional[Iterable[str]] = None, **options: Any) -> Job:
+        """Scan *paths* (every library path when omitted).
+
+        *options* are further ``ScanMetadataInput`` fields, such as
+        ``scanGeneratePhashes=True``.
+        """
+        input = dict(options)
+        if paths is not None:
+            input["paths"] = coalesce_paths(paths)
+        return self._submit("scan", input)
+
+    def generate(
+        self,
+        scene_ids: Optional[Iterable[Union[str, int]]] = None,
+        marker_ids: Optional[Iterable[Union[str, int]]] = None,
+        **options: Any,
+    ) -> Job:
+        """Generate for *scene_ids* / *marker_ids* (everything when omitted).
+
+        *options* are ``GenerateMetadataInput`` flags, e.g. ``covers=True``.
+        """
+        input = dict(options)
+        if scene_ids is not None:
+            input["sceneIDs"] = sorted({str(i) for i in scene_ids}, key=_id_order)
+        if marker_ids is not None:
+            input["markerIDs"] = sorted({str(i) for i in marker_ids}, key=_id_order)
+        return self._submit("generate", input)
+
+    def _submit(self, kind: str, input: Dict[str, Any]) -> Job:
+        with self._lock:
+            for job in self._submitted:
+                if job.kind == kind and _covers(job.input, input) and self._queued(job):
+                    return job
+            data = response_data(self.conn.query(_MUTATIONS[kind], {"input": input}))
+            job = Job(self, data[next(iter(data))], kind, input)
+            self._submitted = [j for j in self._submitted if not _done(j.last)]
+            self._submitted.append(job)
+            return job
+
+    def _queued(self, job: Job) -> bool:
+        job.last = self.find(job.id)
+        return job.last is not None and job.last.get("status") == "READY"
+
+    # ---------------------------------------------------------------------
+    # Waiting
+    # ---------------------------------------------------------------------
+    def find(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return response_data(self.conn.query(_FIND_JOB, {"id": str(job_id)}))["findJob"]
+
+    def wait(
+        self,
+        jobs: Sequence[Union[Job, str]],
+        timeout: Optional[float] = None,
+        progress: Optional[Progress] = None,
+        raise_on_failure: bool = True,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Wait for every job in *jobs*; return ``{id: final state}``.
+
+        *progress* is called with each state update. A job Stash no longer
+        knows about is reported as ``{"id": …, "status": None}``.
+        :class:`TimeoutError` is raised after *timeout* seconds.
+        """
+        ids = [job.id if isinstance(job, Job) else str(job) for job in jobs]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results: Dict[str, Dict[str, Any]] = {}
+        socket = self._open_socket() if self.subscriptions else None
+        if socket is not None:
+            try:
+                self._wait_socket(socket, ids, results, deadline, progress)
+            except _SocketError:
+                pass  # fall back to polling what is left
+            finally:
+                socket.close()
+        self._wait_poll(ids, results, deadline, progress)
+        for job in jobs:
+            if isinstance(job, Job):
+                job.last = results[job.id]
+        if raise_on_failure:
+            for job_id in ids:
+                if results[job_id].get("status") in ("FAILED", "CANCELLED"):
+                    raise JobError(results[job_id])
+        return results
+
+    def _poll(
+        self,
+        ids: List[str],
+        results: Dict[str, Dict[str, Any]],
+        progress: Optional[Progress],
+    ) -> None:
+        for job_id in ids:
+            if job_id in results:
+                continue
+            job = self.find(job_id)
+            if job is None:
+                job = {"id": job_id, "status": None}
+            elif progress is not None:
+                progress(job)
+            if job["status"] is None or _done(job):
+                results[job_id] = job
+
+    def _wait_poll(
+        self,
+        ids: List[str],
+        results: Dict[str, Dict[str, Any]],
+        deadline: Optional[float],
+        progress: Optional[Progress],
+    ) -> None:
+        interval = self.poll_interval
+        while True:
+            self._poll(ids, results, progress)
+            if len(results) == len(ids):
+                return
+            pause = interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"jobs {sorted(set(ids) - set(results))} still running"
+                    )
+                pause = min(pause, remaining)
+            time.sleep(pause)
+            interval = min(interval * 1.5, self.max_poll_interval)
+
+    def _wait_socket(
+        self,
+        socket: "_JobSocket",
+        ids: List[str],
+        results: Dict[str, Dict[str, Any]],
+        deadline: Optional[float],
+        progress: Optional[Progress],
+    ) -> None:
+        socket.subscribe(_SUBSCRIBE)
+        # Jobs that ended before the subscription started send no update.
+        self._poll(ids, results, progress)
+        while len(results) < len(ids):
+            wait = self.max_poll_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"jobs {sorted(set(ids) - set(results))} still running"
+                    )
+                wait = min(wait, remaining)
+            update = socket.next(wait)
+            if update is None:
+                self._poll(ids, results, progress)  # quiet period: double-check
+                continue
+            job = update["job"]
+            if job["id"] not in ids or job["id"] in results:
+                continue
+            if progress is not None:
+                progress(job)
+            if _done(job):
+                results[job["id"]] = job
+            elif update["type"] == "REMOVE":
+                results[job["id"]] = self.find(job["id"]) or job
+
+    def _open_socket(self) -> Optional["_JobSocket"]:
+        """Connect the subscription socket, or ``None`` if that is not possible."""
+        try:
+            import websocket  # websocket-client
+        except ImportError:
+            return None
+        url = "ws" + self.conn.url[len("http") :]
+        headers = [f"ApiKey: {self.conn.api_key}"] if self.conn.api_key else []
+        try:
+            cookies = self.conn.session.cookies.get_dict()
+            cookie = "; ".join(f"{name}={value}" for name, value in cookies.items())
+            ws = websocket.create_connection(
+                url,
+                subprotocols=["graphql-transport-ws"],
+                header=headers,
+                cookie=cookie or None,
+                timeout=self.max_poll_interval,
+            )
+            socket = _JobSocket(ws, websocket.WebSocketTimeoutException)
+            socket.init(self.conn.api_key)
+            return socket
+        except Exception:
+            return None
+
+
+class _SocketError(Exception):
+    pass
+
+
+class _JobSocket:
+    """Minimal ``graphql-transport-ws`` client over a websocket-client socket."""
+
+    def __init__(self, ws: Any, timeout_error: type = TimeoutError):
+        self.ws = ws
+        self.timeout_error = timeout_error
+        self._ids = itertools.count(1)
+        self._sub: Optional[str] = None
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        try:
+            self.ws.send(json.dumps(message))
+        except Exception as exc:
+            raise _SocketError(str(exc)) from exc
+
+    def _recv(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            self.ws.settimeout(timeout)
+            raw = self.ws.recv()
+        except self.timeout_error:
+            return None
+        except Exception as exc:
+            raise _SocketError(str(exc)) from exc
+        if not raw:
+            raise _SocketError("socket closed")
+        try:
+            message = json.loads(raw)
+        except ValueError as exc:
+            raise _SocketError("malformed message") from exc
+        if message.get("type") == "ping":
+            self._send({"type": "pong"})
+            return {}
+        return message
+
+    def init(self, api_key: str = "") -> None:
+        self._send(
+            {
+                "type": "connection_init",
+                "payload": {"ApiKey": api_key} if api_key else {},
+            }
+        )
+        while True:
+            message = self._recv(DEFAULT_MAX_POLL_INTERVAL)
+            if message is None:
+                raise _SocketError("no connection_ack")
+            if message.get("type") == "connection_ack":
+                return
+            if message:
+                raise _SocketError(f"unexpected {message.get('type')!r} during init")
+
+    def subscribe(self, query: str) -> None:
+        self._sub = str(next(self._ids))
+        self._send({"id": self._sub, "type": "subscribe", "payload": {"query": query}})
+
+    def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Return the next ``jobsSubscribe`` update, or ``None`` on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            message = self._recv(max(deadline - time.monotonic(), 0.001))
+            if message is None:
+                return None
+            kind = message.get("type")
+            if kind == "next" and message.get("id") == self._sub:
+                payload = message.get("payload") or {}
+                if payload.get("errors"):
+                    raise _SocketError(payload["errors"][0].get("message"))
+                return payload["data"]["jobsSubscribe"]
+            if kind in ("error", "complete"):
+                raise _SocketError(f"subscription ended: {message}")
+
+    def close(self) -> None:
+        try:
+            if self._sub is not None:
+                self._send({"id": self._sub, "type": "complete"})
+            self.ws.close()
+        except Exception:
+            pass
+
+
+def _done(job: Optional[Dict[str, Any]]) -> bool:
+    return job is not None and job.get("status") in TERMINAL_STATUSES
+
+
+def _id_order(value: str) -> Any:
+    return (0, int(value), "") if value.isdigit() else (1, 0, value)
+
+
+def _covers(queued: Dict[str, Any], wanted: Dict[str, Any]) -> bool:
+    """Whether a job with input *queued* also does everything *wanted* asks."""
+    lists = ("paths", "sceneIDs", "markerIDs")
+    if {k: v for k, v in queued.items() if k not in lists} != {
+        k: v for k, v in wanted.items() if k not in lists
+    }:
+        return False
+    for key in lists:
+        if key not in queued:
+            continue  # no restriction: the queued job covers everything
+        if key not in wanted:
+            return False
+        if key == "paths":
+            if not all(any(_is_under(p, q) for q in queued[key]) for p in wanted[key]):
+                return False
+        elif not set(wanted[key]) <= set(queued[key]):
+            return False
+    return True
@@ -0,0 +1,499 @@
+# mirror.py
+"""
+Local SQLite replica of a Stash library.
+
+Read‑heavy plugins (exporters, renamers, duplicate finders) usually start by
+downloading every scene over GraphQL. A :class:`LibraryMirror` keeps scenes,
+files, performers, tags, studios, groups and markers in a SQLite file and
+only pulls what changed since the previous run::
+
+    from stash_connection_lib import get_connection
+    from stash_connection_lib.mirror import LibraryMirror
+
+    with LibraryMirror(get_connection(fragment), "library.sqlite") as mirror:
+        mirror.sync()                      # first run: everything, then deltas
+        scene = mirror.scene_by_path("/media/clip.mp4")
+        for scene in mirror.scenes_with_tag(tag.id):
+            ...
+
+Each entity type has its own cursor: the largest ``updated_at`` seen. A sync
+reads :meth:`StashConnection.changes_since` from that cursor, upserts what it
+returns and moves the cursor forward. Stash keeps no record of deleted
+objects, so after the delta the local and server counts are compared and,
+if they disagree, the id lists are reconciled.
+
+Lookups return the models from :mod:`stash_connection_lib.models` (markers
+are plain dicts); :meth:`LibraryMirror.execute` runs arbitrary SQL against
+the indexed tables.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import timezone
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .changes import (
+    DEFAULT_CHANGES_PAGE,
+    ENTITIES,
+    ENTITY_TYPES,
+    Entity,
+    parse_time,
+)
+from .models import Group, Model, Performer, Scene, Studio, Tag
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .core import StashConnection
+
+__all__ = ["LibraryMirror", "ENTITY_TYPES"]
+
+_MODELS = {
+    "scene": Scene,
+    "performer": Performer,
+    "tag": Tag,
+    "studio": Studio,
+    "group": Group,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    entity TEXT PRIMARY KEY, cursor TEXT, synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS scenes (
+    id INTEGER PRIMARY KEY, title TEXT, date TEXT, rating100 INTEGER,
+    organized INTEGER, studio_id INTEGER, updated_at TEXT, data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scenes_title ON scenes (title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS scenes_studio ON scenes (studio_id);
+CREATE INDEX IF NOT EXISTS scenes_updated ON scenes (updated_at);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY, scene_id INTEGER NOT NULL, path TEXT, size INTEGER,
+    duration REAL, oshash TEXT, phash TEXT, md5 TEXT
+);
+CREATE INDEX IF NOT EXISTS files_scene ON files (scene_id);
+CREATE INDEX IF NOT EXISTS files_path ON files (path);
+CREATE INDEX IF NOT EXISTS files_oshash ON files (oshash);
+CREATE INDEX IF NOT EXISTS files_phash ON files (phash);
+CREATE INDEX IF NOT EXISTS files_md5 ON files (md5);
+CREATE TABLE IF NOT EXISTS scene_tags (
+    scene_id INTEGER NOT NULL, tag_id INTEGER NOT NULL,
+    PRIMARY KEY (scene_id, tag_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scene_tags_tag ON scene_tags (tag_id);
+CREATE TABLE IF NOT EXISTS scene_performers (
+    scene_id INTEGER NOT NULL, performer_id INTEGER NOT NULL,
+    PRIMARY KEY (scene_id, performer_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scene_performers_performer
+    ON scene_performers (performer_id);
+CREATE TABLE IF NOT EXISTS scene_groups (
+    scene_id INTEGER NOT NULL, group_id INTEGER NOT NULL, scene_index INTEGER,
+    PRIMARY KEY (scene_id, group_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scene_groups_group ON scene_groups (group_id);
+CREATE TABLE IF NOT EXISTS performers (
+    id INTEGER PRIMARY KEY, name TEXT, updated_at TEXT, data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS performers_name ON performers (name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY, name TEXT, updated_at TEXT, data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tags_name ON tags (name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS studios (
+    id INTEGER PRIMARY KEY, name TEXT, parent_id INTEGER, updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS studios_name ON studios (name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY, name TEXT, studio_id INTEGER, updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS groups_name ON groups (name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS markers (
+    id INTEGER PRIMARY KEY, scene_id INTEGER, primary_tag_id INTEGER,
+    seconds REAL, updated_at TEXT, data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS markers_scene ON markers (scene_id);
+CREATE INDEX IF NOT EXISTS markers_tag ON markers (primary_tag_id);
+"""
+
+#: Entity type → table holding it.
+_TABLES = {
+    "scene": "scenes",
+    "performer": "performers",
+    "tag": "tags",
+    "studio": "studios",
+    "group": "groups",
+    "marker": "markers",
+}
+
+
+#: Entity type → rows in other tables that belong to or point at it.
+_LINKS = {
+    "scene": (
+        ("files", "scene_id"),
+        ("scene_tags", "scene_id"),
+        ("scene_performers", "scene_id"),
+        ("scene_groups", "scene_id"),
+    ),
+    "tag": (("scene_tags", "tag_id"),),
+    "performer": (("scene_performers", "performer_id"),),
+    "group": (("scene_groups", "group_id"),),
+}
+
+
+def _utc(value: Optional[str]) -> Optional[str]:
+    """Normalise a timestamp so that string order is time order."""
+    if not value:
+        return None
+    return parse_time(value).astimezone(timezone.utc).isoformat()
+
+
+def _ref(value: Optional[Dict[str, Any]]) -> Optional[int]:
+    return int(value["id"]) if value else None
+
+
+class LibraryMirror:
+    """SQLite replica of a Stash library, kept current by :meth:`sync`."""
+
+    def __init__(
+        self,
+        conn: "StashConnection",
+        path: Union[str, os.PathLike] = ":memory:",
+        *,
+        per_page: int = DEFAULT_CHANGES_PAGE,
+    ):
+        self.conn = conn
+        self.path = path
+        self.per_page = per_page
+        self.db = sqlite3.connect(os.fspath(path))
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+
+    def __enter__(self) -> "LibraryMirror":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    # ---------------------------------------------------------------------
+    # Synchronisation
+    # ---------------------------------------------------------------------
+    def cursor(self, entity_type: str) -> Optional[str]:
+        """Return the ``updated_at`` cursor stored for *entity_type*."""
+        row = self.db.execute(
+            "SELECT cursor FROM sync_state WHERE entity = ?", (entity_type,)
+        ).fetchone()
+        return row["cursor"] if row else None
+
+    def sync(
+        self, entity_types: Sequence[str] = ENTITY_TYPES, prune: bool = True
+    ) -> Dict[str, int]:
+        """Pull everything updated since the last sync; return rows upserted.
+
+        With *prune* (the default) objects deleted on the server are removed
+        locally, at the cost of one ``count`` query per entity type and an id
+        listing when the counts disagree.
+        """
+        changed = {}
+        for name in entity_types:
+            entity = ENTITIES[name]
+            start = self.cursor(name)
+            changes = self.conn.changes_since(name, start, per_page=self.per_page)
+            upserted = 0
+            batch: List[Dict[str, Any]] = []
+            for item in changes:
+                if start is not None and self._unchanged(name, item, start):
+                    continue  # re-read by the overlap window
+                batch.append(item)
+                if len(batch) >= self.per_page:
+                    upserted += self._store(name, batch, changes.cursor)
+                    batch = []
+            upserted += self._store(name, batch, changes.cursor)
+            if prune:
+                self._prune(entity)
+            changed[name] = upserted
+        return changed
+
+    def _unchanged(self, entity_type: str, item: Dict[str, Any], since: str) -> bool:
+        if parse_time(item["updated_at"]) > parse_time(since):
+            return False
+        row = self.db.execute(
+            f"SELECT updated_at FROM {_TABLES[entity_type]} WHERE id = ?",
+            (int(item["id"]),),
+        ).fetchone()
+        return row is not None and row[0] == _utc(item["updated_at"])
+
+    def _store(
+        self, entity_type: str, items: List[Dict[str, Any]], cursor: Optional[str]
+    ) -> int:
+        with self.db:
+            getattr(self, f"_upsert_{entity_type}")(items)
+            self.db.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (entity_type, cursor, time.time()),
+            )
+        return len(items)
+
+    def _prune(self, entity: Entity) -> None:
+        from .core import _page_items
+
+        table = _TABLES[entity.name]
+        server, _ = _page_items(
+            self.conn.query(entity.query("id"), {"filter": {"per_page": 0}})
+        )
+        local = self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if server is None or server == local:
+            return
+        ids = self.conn.iter_pages(entity.query("id"), per_page=self.per_page)
+        live = {int(item["id"]) for item in ids}
+        stale = [
+            (row[0],)
+            for row in self.db.execute(f"SELECT id FROM {table}")
+            if row[0] not in live
+        ]
+        with self.db:
+            self._delete(entity.name, stale)
+
+    # ---------------------------------------------------------------------
+    # Writers
+    # ---------------------------------------------------------------------
+    def _delete(self, entity_type: str, ids: List[Tuple[int]]) -> None:
+        for table, column in _LINKS.get(entity_type, ()):
+            self.db.executemany(f"DELETE FROM {table} WHERE {column} = ?", ids)
+        self.db.executemany(f"DELETE FROM {_TABLES[entity_type]} WHERE id = ?", ids)
+
+    def _upsert_scene(self, items: List[Dict[str, Any]]) -> None:
+        self._delete("scene", [(int(s["id"]),) for s in items])
+        self.db.executemany(
+            "INSERT INTO scenes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    int(s["id"]),
+                    s.get("title"),
+                    s.get("date"),
+                    s.get("rating100"),
+                    s.get("organized"),
+                    _ref(s.get("studio")),
+                    _utc(s.get("updated_at")),
+                    json.dumps(s),
+                )
+                for s in items
+            ],
+        )
+        files, tags, performers, groups = [], [], [], []
+        for s in items:
+            scene_id = int(s["id"])
+            for f in s.get("files") or ():
+                hashes = {fp["type"]: fp["value"] for fp in f.get("fingerprints") or ()}
+                files.append(
+                    (
+                        int(f["id"]),
+                        scene_id,
+                        f.get("path"),
+                        f.get("size"),
+                        f.get("duration"),
+                        hashes.get("oshash"),
+                        hashes.get("phash"),
+                        hashes.get("md5"),
+                    )
+                )
+            tags.extend((scene_id, int(t["id"])) for t in s.get("tags") or ())
+            performers.extend(
+                (scene_id, int(p["id"])) for p in s.get("performers") or ()
+            )
+            groups.extend(
+                (scene_id, int(g["group"]["id"]), g.get("scene_index"))
+                for g in s.get("groups") or ()
+            )
+        self.db.executemany(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", files
+        )
+        self.db.executemany("INSERT OR IGNORE INTO scene_tags VALUES (?, ?)", tags)
+        self.db.executemany(
+            "INSERT OR IGNORE INTO scene_performers VALUES (?, ?)", performers
+        )
+        self.db.executemany(
+            "INSERT OR REPLACE INTO scene_groups VALUES (?, ?, ?)", groups
+        )
+
+    def _upsert_named(self, table: str, items: List[Dict[str, Any]]) -> None:
+        self.db.executemany(
+            f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?)",
+            [
+                (int(i["id"]), i.get("name"), _utc(i.get("updated_at")), json.dumps(i))
+                for i in items
+            ],
+        )
+
+    def _upsert_performer(self, items: List[Dict[str, Any]]) -> None:
+        self._upsert_named("performers", items)
+
+    def _upsert_tag(self, items: List[Dict[str, Any]]) -> None:
+        self._upsert_named("tags", items)
+
+    def _upsert_studio(self, items: List[Dict[str, Any]]) -> None:
+        self.db.executemany(
+            "INSERT OR REPLACE INTO studios VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    int(i["id"]),
+                    i.get("name"),
+                    _ref(i.get("parent_studio")),
+                    _utc(i.get("updated_at")),
+                    json.dumps(i),
+                )
+                for i in items
+            ],
+        )
+
+    def _upsert_group(self, items: List[Dict[str, Any]]) -> None:
+        self.db.executemany(
+            "INSERT OR REPLACE INTO groups VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    int(i["id"]),
+                    i.get("name"),
+                    _ref(i.get("studio")),
+                    _utc(i.get("updated_at")),
+                    json.dumps(i),
+                )
+                for i in items
+            ],
+        )
+
+    def _upsert_marker(self, items: List[Dict[str, Any]]) -> None:
+        self.db.executemany(
+            "INSERT OR REPLACE INTO markers VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    int(i["id"]),
+                    _ref(i.get("scene")),
+                    _ref(i.get("primary_tag")),
+                    i.get("seconds"),
+                    _utc(i.get("updated_at")),
+                    json.dumps(i),
+                )
+                for i in items
+            ],
+        )
+
+    # ---------------------------------------------------------------------
+    # Lookups
+    # ---------------------------------------------------------------------
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        """Run read‑only SQL against the mirror and return the rows."""
+        return self.db.execute(sql, params).fetchall()
+
+    def _decode(self, entity_type: str, rows: Iterable[sqlite3.Row]) -> List[Any]:
+        model = _MODELS.get(entity_type)
+        decoded = (json.loads(row["data"]) for row in rows)
+        return [model.from_dict(d) if model else d for d in decoded]
+
+    def _select(self, entity_type: str, where: str, params: Sequence[Any]) -> List[Any]:
+        table = _TABLES[entity_type]
+        return self._decode(
+            entity_type,
+            self.db.execute(f"SELECT data FROM {table} WHERE {where}", params),
+        )
+
+    def get(self, entity_type: str, entity_id: Union[int, str]) -> Any:
+        """Return one entity by id, or ``None``."""
+        found = self._select(entity_type, "id = ?", (int(entity_id),))
+        return found[0] if found else None
+
+    def all(self, entity_type: str) -> Iterator[Any]:
+        """Iterate over every stored entity of *entity_type*."""
+        table = _TABLES[entity_type]
+        rows = self.db.execute(f"SELECT data FROM {table} ORDER BY id")
+        while True:
+            chunk = rows.fetchmany(1000)
+            if not chunk:
+                return
+            yield from self._decode(entity_type, chunk)
+
+    def count(self, entity_type: str) -> int:
+        table = _TABLES[entity_type]
+        return self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def scene(self, scene_id: Union[int, str]) -> Optional[Scene]:
+        return self.get("scene", scene_id)
+
+    def scene_by_path(self, path: str) -> Optional[Scene]:
+        found = self._select(
+            "scene", "id IN (SELECT scene_id FROM files WHERE path = ?)", (path,)
+        )
+        return found[0] if found else None
+
+    def scenes_under(self, directory: str) -> List[Scene]:
+        """Scenes with a file below *directory*."""
+        prefix = directory.rstrip("/\\") + "/"
+        return self._select(
+            "scene",
+            "id IN (SELECT scene_id FROM files WHERE substr(path, 1, ?) = ?)",
+            (len(prefix), prefix),
+        )
+
+    def scenes_by_fingerprint(self, value: str, kind: str = "oshash") -> List[Scene]:
+        """Scenes with a file whose ``oshash``/``phash``/``md5`` is *value*."""
+        if kind not in ("oshash", "phash", "md5"):
+            raise ValueError(f"unknown fingerprint type {kind!r}")
+        return self._select(
+            "scene", f"id IN (SELECT scene_id FROM files WHERE {kind} = ?)", (value,)
+        )
+
+    def scenes_with_tag(self, tag_id: Union[int, str]) -> List[Scene]:
+        return self._select(
+            "scene",
+            "id IN (SELECT scene_id FROM scene_tags WHERE tag_id = ?)",
+            (int(tag_id),),
+        )
+
+    def scenes_with_performer(self, performer_id: Union[int, str]) -> List[Scene]:
+        return self._select(
+            "scene",
+            "id IN (SELECT scene_id FROM scene_performers WHERE performer_id = ?)",
+            (int(performer_id),),
+        )
+
+    def scenes_in_group(self, group_id: Union[int, str]) -> List[Scene]:
+        return self._select(
+            "scene",
+            "id IN (SELECT scene_id FROM scene_groups WHERE group_id = ?)",
+            (int(group_id),),
+        )
+
+    def scenes_for_studio(self, studio_id: Union[int, str]) -> List[Scene]:
+        return self._select("scene", "studio_id = ?", (int(studio_id),))
+
+    def markers_for_scene(self, scene_id: Union[int, str]) -> List[Dict[str, Any]]:
+        return self._select("marker", "scene_id = ? ORDER BY seconds", (int(scene_id),))
+
+    def find(self, entity_type: str, name: str) -> List[Model]:
+        """Case‑insensitive exact name lookup for performers, tags, studios, groups."""
+        if entity_type not in ("performer", "tag", "studio", "group"):
+            raise ValueError(f"{entity_type!r} has no name column")
+        return self._select(entity_type, "name = ? COLLATE NOCASE", (name,))
+
+    def latest(self, entity_type: str, limit: int = 1) -> List[Any]:
+        """The *limit* most recently updated entities, newest first."""
+        return self._select(
+            entity_type, "1 ORDER BY updated_at DESC, id DESC LIMIT ?", (limit,)
+        )
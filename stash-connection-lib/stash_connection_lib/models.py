@@ -0,0 +1,415 @@
+# models.py
+"""
+Compact, slot‑based models for Stash entities.
+
+A decoded GraphQL scene is a tree of dicts: every scene carries its own copy
+of each tag, studio and performer dict plus one hash table per object. At
+library scale that dominates a plugin's memory. The classes here store the
+same data in ``__slots__`` instances, keep lists as tuples, intern repeated
+strings (names, codecs, fingerprint types) and – through a shared
+:class:`ModelPool` – reuse one :class:`Tag`/:class:`Studio`/:class:`Performer`
+object for every scene that references it::
+
+    scenes = list(iter_models(conn.iter_pages(query), Scene))
+    scenes[0].studio is scenes[1].studio   # same Studio, stored once
+
+Models are built from response dicts lazily, one item at a time as the
+iterable is consumed, so they compose with :meth:`StashConnection.iter_pages`
+and :meth:`StashConnection.stream_items` without ever holding the dict form of
+the whole library. Only selected fields are set; unselected ones read as
+``None``. Keys without a modelled slot are kept in ``extra`` so
+:meth:`Model.to_dict` returns the original shape.
+"""
+
+import sys
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+__all__ = [
+    "Model",
+    "ModelPool",
+    "Scene",
+    "SceneFile",
+    "Performer",
+    "Tag",
+    "Studio",
+    "Group",
+    "SceneGroup",
+    "iter_models",
+]
+
+M = TypeVar("M", bound="Model")
+
+# Field kinds. Nested models are given as the class (one) or ``(class,)``
+# (a list of them).
+VALUE = "value"
+INTERN = "intern"  # repeated strings shared via sys.intern
+VALUES = "values"  # list of scalars, stored as a tuple
+INTERNS = "interns"  # list of repeated strings, stored as an interned tuple
+#: Stands for the class being defined, for self‑referencing fields.
+SELF: Any = object()
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ModelPool:
+    """Shares one instance per ``(class, id)`` across decoded objects.
+
+    Pass the same pool to every :meth:`Model.from_dict` call of a batch (or
+    let :func:`iter_models` do it) so a tag referenced by 10 000 scenes is
+    stored once. When a later reference selects more fields, they are added
+    to the shared instance.
+    """
+
+    def __init__(self) -> None:
+        self._objects: Dict[Tuple[type, Any], Tuple["Model", Set[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def get(self, cls: Type[M], data: Dict[str, Any]) -> M:
+        key = (cls, data.get("id"))
+        if key[1] is None:
+            return cls.from_dict(data, self)
+        entry = self._objects.get(key)
+        if entry is None:
+            model = cls.from_dict(data, self)
+            self._objects[key] = (model, set(data))
+            return model
+        model, known = entry
+        if not data.keys() <= known:
+            model._update(data, self)
+            known.update(data)
+        return model  # type: ignore[return-value]
+
+
+class Model:
+    """Base class: decoding, ``to_dict`` and equality from ``_schema``."""
+
+    __slots__ = ("_present", "extra")
+
+    #: Field name → kind, in slot order.
+    _schema: ClassVar[Dict[str, Any]] = {}
+    #: Whether nested references of this type are shared through a pool.
+    _pooled: ClassVar[bool] = False
+    _bits: ClassVar[Dict[str, int]] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        for name, kind in cls._schema.items():
+            if kind is SELF:
+                cls._schema[name] = cls
+            elif kind == (SELF,):
+                cls._schema[name] = (cls,)
+        cls._bits = {name: 1 << i for i, name in enumerate(cls._schema)}
+
+    def __init__(self, **fields: Any) -> None:
+        self._present = 0
+        self.extra: Optional[Dict[str, Any]] = None
+        for name, value in fields.items():
+            if name not in self._schema:
+                raise TypeError(f"{type(self).__name__} has no field {name!r}")
+            setattr(self, name, value)
+            self._present |= self._bits[name]
+
+    # ---------------------------------------------------------------------
+    # Decoding
+    # ---------------------------------------------------------------------
+    @classmethod
+    def from_dict(
+        cls: Type[M], data: Dict[str, Any], pool: Optional[ModelPool] = None
+    ) -> M:
+        """Build a model from one GraphQL response object."""
+        self = cls.__new__(cls)
+        self._present = 0
+        self.extra = None
+        self._update(data, pool)
+        return self
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for empty slots: unselected fields read as None.
+        if name in self._schema:
+            return None
+        raise AttributeError(
+            f"{type(self).__name__!r} object has no attribute {name!r}"
+        )
+
+    def _update(self, data: Dict[str, Any], pool: Optional[ModelPool]) -> None:
+        schema, bits = self._schema, self._bits
+        for key, value in data.items():
+            kind = schema.get(key)
+            if kind is None:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+                continue
+            self._present |= bits[key]
+            if value is None or kind is VALUE:
+                setattr(self, key, value)
+            elif kind is INTERN:
+                setattr(self, key, _intern(value))
+            elif kind is VALUES:
+                setattr(self, key, tuple(value))
+            elif kind is INTERNS:
+                setattr(self, key, tuple([_intern(v) for v in value]))
+            elif isinstance(kind, tuple):
+                sub = kind[0]
+                if sub._pooled and pool is not None:
+                    get = pool.get
+                    setattr(self, key, tuple([get(sub, v) for v in value]))
+                else:
+                    setattr(self, key, tuple([sub.from_dict(v, pool) for v in value]))
+            else:
+                setattr(self, key, _decode(kind, value, pool))
+
+    # ---------------------------------------------------------------------
+    # Introspection and conversion
+    # ---------------------------------------------------------------------
+    def selected(self) -> Tuple[str, ...]:
+        """Names of the fields present in the decoded response."""
+        present = self._present
+        fields = tuple(n for n, bit in self._bits.items() if present & bit)
+        return fields + tuple(self.extra or ())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the response‑shaped dict this model was decoded from."""
+        result: Dict[str, Any] = {}
+        present = self._present
+        for name, bit in self._bits.items():
+            if present & bit:
+                result[name] = _encode(getattr(self, name))
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        label = getattr(self, "name", None) or getattr(self, "title", None)
+        id_ = getattr(self, "id", None)
+        return f"{type(self).__name__}(id={id_!r}" + (f", {label!r})" if label else ")")
+
+
+def _decode(cls: Type[Model], value: Any, pool: Optional[ModelPool]) -> Any:
+    if not isinstance(value, dict):
+        return value
+    if cls._pooled and pool is not None:
+        return pool.get(cls, value)
+    return cls.from_dict(value, pool)
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_encode(v) for v in value]
+    return value
+
+
+def iter_models(
+    items: Iterable[Dict[str, Any]],
+    cls: Type[M],
+    pool: Optional[ModelPool] = None,
+) -> Iterator[M]:
+    """Decode *items* into *cls* one at a time, sharing referenced entities."""
+    pool = ModelPool() if pool is None else pool
+    for item in items:
+        yield cls.from_dict(item, pool)
+
+
+###############################################################################
+# Entities
+###############################################################################
+
+
+class Tag(Model):
+    _schema = {
+        "id": VALUE,
+        "name": INTERN,
+        "sort_name": INTERN,
+        "description": VALUE,
+        "aliases": INTERNS,
+        "ignore_auto_tag": VALUE,
+        "favorite": VALUE,
+        "image_path": VALUE,
+        "scene_count": VALUE,
+        "parents": (SELF,),
+        "children": (SELF,),
+        "created_at": VALUE,
+        "updated_at": VALUE,
+    }
+    __slots__ = tuple(_schema)
+    _pooled = True
+
+
+class Studio(Model):
+    _schema = {
+        "id": VALUE,
+        "name": INTERN,
+        "url": VALUE,
+        "urls": VALUES,
+        "aliases": INTERNS,
+        "details": VALUE,
+        "parent_studio": SELF,
+        "rating100": VALUE,
+        "favorite": VALUE,
+        "image_path": VALUE,
+        "scene_count": VALUE,
+        "stash_ids": VALUES,
+        "tags": (Tag,),
+        "created_at": VALUE,
+        "updated_at": VALUE,
+    }
+    __slots__ = tuple(_schema)
+    _pooled = True
+
+
+class Performer(Model):
+    _schema = {
+        "id": VALUE,
+        "name": INTERN,
+        "disambiguation": VALUE,
+        "gender": INTERN,
+        "birthdate": VALUE,
+        "country": INTERN,
+        "ethnicity": INTERN,
+        "alias_list": INTERNS,
+        "urls": VALUES,
+        "favorite": VALUE,
+        "rating100": VALUE,
+        "image_path": VALUE,
+        "scene_count": VALUE,
+        "stash_ids": VALUES,
+        "tags": (Tag,),
+        "created_at": VALUE,
+        "updated_at": VALUE,
+    }
+    __slots__ = tuple(_schema)
+    _pooled = True
+
+
+class Group(Model):
+    """A group (formerly *movie*)."""
+
+    _schema = {
+        "id": VALUE,
+        "name": INTERN,
+        "aliases": VALUE,
+        "date": VALUE,
+        "duration": VALUE,
+        "rating100": VALUE,
+        "director": INTERN,
+        "synopsis": VALUE,
+        "urls": VALUES,
+        "front_image_path": VALUE,
+        "back_image_path": VALUE,
+        "scene_count": VALUE,
+        "studio": Studio,
+        "tags": (Tag,),
+        "created_at": VALUE,
+        "updated_at": VALUE,
+    }
+    __slots__ = tuple(_schema)
+    _pooled = True
+
+
+class SceneGroup(Model):
+    """A scene's ``{group {…}, scene_index}`` membership entry."""
+
+    _schema = {"group": Group, "scene_index": VALUE}
+    __slots__ = tuple(_schema)
+
+
+class SceneFile(Model):
+    _schema = {
+        "id": VALUE,
+        "path": VALUE,
+        "basename": VALUE,
+        "size": VALUE,
+        "duration": VALUE,
+        "width": VALUE,
+        "height": VALUE,
+        "video_codec": INTERN,
+        "audio_codec": INTERN,
+        "format": INTERN,
+        "frame_rate": VALUE,
+        "bit_rate": VALUE,
+        "mod_time": VALUE,
+        "fingerprints": VALUES,
+        "created_at": VALUE,
+        "updated_at": VALUE,
+    }
+    __slots__ = tuple(_schema)
+
+    def _update(self, data: Dict[str, Any], pool: Optional[ModelPool]) -> None:
+        super()._update(data, pool)
+        if self.fingerprints:
+            # {type, value} dicts → (type, value) pairs with interned types.
+            self.fingerprints = tuple(
+                (sys.intern(f["type"]), f["value"]) if isinstance(f, dict) else f
+                for f in self.fingerprints
+            )
+
+    def fingerprint(self, kind: str) -> Optional[str]:
+        """Return the ``oshash``/``md5``/``phash`` value, if selected."""
+        for fp_type, value in self.fingerprints or ():
+            if fp_type == kind:
+                return value
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = super().to_dict()
+        if self.fingerprints:
+            result["fingerprints"] = [
+                {"type": t, "value": v} for t, v in self.fingerprints
+            ]
+        return result
+
+
+class Scene(Model):
+    _schema = {
+        "id": VALUE,
+        "title": VALUE,
+        "code": VALUE,
+        "details": VALUE,
+        "director": INTERN,
+        "urls": VALUES,
+        "date": INTERN,
+        "rating100": VALUE,
+        "organized": VALUE,
+        "o_counter": VALUE,
+        "play_count": VALUE,
+        "play_duration": VALUE,
+        "resume_time": VALUE,
+        "created_at": VALUE,
+        "updated_at": VALUE,
+        "files": (SceneFile,),
+        "studio": Studio,
+        "tags": (Tag,),
+        "performers": (Performer,),
+        "groups": (SceneGroup,),
+        "stash_ids": VALUES,
+    }
+    __slots__ = tuple(_schema)
+
+    @property
+    def group_list(self) -> Tuple[Group, ...]:
+        """The scene's groups without their ``scene_index`` wrappers."""
+        return tuple(g.group for g in self.groups or () if g.group is not None)
@@ -0,0 +1,203 @@
+# ratelimit.py
+"""
+Token‑bucket rate limiting shared by every process on the machine.
+
+Several plugins talking to the same stash‑box endpoint at once each stay
+under their own limit but together get throttled. A :class:`RateLimiter`
+keeps its bucket in a small state file, guarded by an OS file lock, so all
+processes using the same endpoint draw from one budget::
+
+    limiter = RateLimiter("https://stashdb.org/graphql", rate=2.0, burst=5)
+    conn = StashConnection.from_stash_box(box, rate_limiter=limiter)
+
+The connection takes a token before every HTTP attempt. When the server
+answers ``429 Too Many Requests`` the request is retried after its
+``Retry-After`` delay, during which *no* process sends to that endpoint,
+and the shared rate is halved. It then recovers linearly to the configured
+rate over *recovery* seconds, so throughput settles just under the limit
+the server actually enforces.
+"""
+
+import email.utils
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Union
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+    import msvcrt
+
+from .cache import default_cache_path
+
+__all__ = ["RateLimiter", "parse_retry_after"]
+
+#: Requests per second allowed by default.
+DEFAULT_RATE = 1.0
+#: Requests that may be sent back to back after an idle period.
+DEFAULT_BURST = 5
+#: Seconds to climb from a halved rate back to the full rate.
+DEFAULT_RECOVERY = 60.0
+#: Lowest fraction of *rate* repeated 429s can push the bucket to.
+MIN_SCALE = 1 / 16
+#: Pause applied on a 429 without a usable ``Retry-After``.
+DEFAULT_PENALTY = 5.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait for a ``Retry-After`` header (delta or HTTP date)."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def _state_dir() -> str:
+    return os.path.join(os.path.dirname(default_cache_path()), "ratelimit")
+
+
+class _FileLock:
+    """Exclusive lock on an open file, held for a ``with`` block."""
+
+    def __init__(self, handle: Any):
+        self.handle = handle
+
+    def __enter__(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX)
+        else:  # pragma: no cover - Windows
+            self.handle.seek(0)
+            msvcrt.locking(self.handle.fileno(), msvcrt.LK_LOCK, 1)
+
+    def __exit__(self, *exc: Any) -> None:
+        if fcntl is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+        else:  # pragma: no cover - Windows
+            self.handle.seek(0)
+            msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class RateLimiter:
+    """Token bucket for one endpoint, shared through a locked state file.
+
+    With ``shared=False`` the bucket lives in this process only.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        *,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        recovery: float = DEFAULT_RECOVERY,
+        path: Union[str, os.PathLike, None] = None,
+        shared: bool = True,
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.endpoint = endpoint
+        self.rate = rate
+        self.burst = burst
+        self.recovery = recovery
+        self.path: Optional[str] = None
+        if shared:
+            if path is None:
+                digest = hashlib.sha256(endpoint.encode()).hexdigest()[:16]
+                path = os.path.join(_state_dir(), f"{digest}.json")
+            self.path = os.fspath(path)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._local: Dict[str, float] = {}
+        self.waited = 0.0
+        self.throttled = 0
+
+    # ---------------------------------------------------------------------
+    # Shared state
+    # ---------------------------------------------------------------------
+    def _update(self, change: Any) -> Any:
+        """Run *change(state, now)* on the refilled state and persist it."""
+        with self._lock:
+            if self.path is None:
+                return self._apply(self._local, change)
+            with open(self.path, "a+") as handle, _FileLock(handle):
+                handle.seek(0)
+                try:
+                    state = json.loads(handle.read() or "{}")
+                except ValueError:
+                    state = {}  # a crashed writer left a torn file
+                result = self._apply(state, change)
+                handle.seek(0)
+                handle.truncate()
+                handle.write(json.dumps(state))
+                handle.flush()
+                return result
+
+    def _apply(self, state: Dict[str, float], change: Any) -> Any:
+        now = time.time()
+        scale = state.get("scale", 1.0)
+        updated = state.get("updated", now)
+        elapsed = max(now - updated, 0.0)
+        tokens = state.get("tokens", float(self.burst))
+        tokens = min(float(self.burst), tokens + elapsed * self.rate * scale)
+        scale = min(1.0, scale + elapsed / self.recovery * (1.0 - MIN_SCALE))
+        state.update(tokens=tokens, scale=scale, updated=now)
+        state.setdefault("blocked_until", 0.0)
+        return change(state, now)
+
+    def _take(self, state: Dict[str, float], now: float) -> float:
+        if state["blocked_until"] > now:
+            return state["blocked_until"] - now
+        if state["tokens"] >= 1.0:
+            state["tokens"] -= 1.0
+            return 0.0
+        return (1.0 - state["tokens"]) / (self.rate * state["scale"])
+
+    # ---------------------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------------------
+    def acquire(self) -> float:
+        """Block until a request may be sent; return the seconds waited."""
+        waited = 0.0
+        while True:
+            delay = self._update(self._take)
+            if delay <= 0:
+                self.waited += waited
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """Record a 429: pause every process and halve the shared rate."""
+        pause = DEFAULT_PENALTY if retry_after is None else retry_after
+
+        def change(state: Dict[str, float], now: float) -> None:
+            state["blocked_until"] = max(state["blocked_until"], now + pause)
+            state["scale"] = max(MIN_SCALE, state["scale"] / 2)
+            state["tokens"] = 0.0
+
+        self.throttled += 1
+        self._update(change)
+
+    def state(self) -> Dict[str, float]:
+        """Current tokens, rate and pause, as seen by every process."""
+
+        def snapshot(state: Dict[str, float], now: float) -> Dict[str, float]:
+            return {
+                "tokens": state["tokens"],
+                "rate": self.rate * state["scale"],
+                "blocked_for": max(state["blocked_until"] - now, 0.0),
+            }
+
+        return self._update(snapshot)
@@ -0,0 +1,350 @@
+# resolver.py
+"""
+Bulk name → id resolution for performers, tags, studios and groups.
+
+Import plugins typically look names up one request at a time. A
+:class:`NameResolver` answers many lookups from a case‑folded index of names
+and aliases instead::
+
+    performers = conn.resolver("performer")
+    ids = performers.resolve_many(["Jane Doe", "jane doe", "J. Doe"])
+    # {"Jane Doe": "12", "jane doe": "12", "J. Doe": "12"}
+
+    performers.add(created)          # after performerCreate, keep it current
+
+Small lookups are sent as one aliased document of ``INCLUDES`` filters (via
+:meth:`StashConnection.batch`); once a lookup needs more than
+*load_threshold* names the whole name list is fetched once and every later
+lookup is answered locally. :meth:`NameResolver.find_many` fetches full
+objects by id in one query, behind a bounded LRU cache.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from .core import response_data
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .core import StashConnection
+
+__all__ = ["NameResolver", "RESOLVABLE_TYPES"]
+
+#: Names looked up in one call before the full name list is loaded instead.
+DEFAULT_LOAD_THRESHOLD = 100
+#: Objects kept by :meth:`NameResolver.find_many`.
+DEFAULT_CACHE_SIZE = 4096
+#: Page size used when loading every name.
+_LOAD_PAGE = 5000
+
+
+class _Spec:
+    __slots__ = (
+        "root",
+        "list_key",
+        "filter_arg",
+        "filter_type",
+        "alias_field",
+        "fields",
+        "alias_filter",
+    )
+
+    def __init__(
+        self,
+        root: str,
+        list_key: str,
+        filter_arg: str,
+        filter_type: str,
+        alias_field: str,
+        fields: str,
+        alias_filter: Optional[str] = "aliases",
+    ):
+        self.root = root
+        self.list_key = list_key
+        self.filter_arg = filter_arg
+        self.filter_type = filter_type
+        self.alias_field = alias_field
+        self.fields = fields
+        self.alias_filter = alias_filter
+
+
+_SPECS = {
+    "performer": _Spec(
+        "findPerformers",
+        "performers",
+        "performer_filter",
+        "PerformerFilterType",
+        "alias_list",
+        "id name disambiguation alias_list",
+    ),
+    "tag": _Spec(
+        "findTags", "tags", "tag_filter", "TagFilterType", "aliases", "id name aliases"
+    ),
+    "studio": _Spec(
+        "findStudios",
+        "studios",
+        "studio_filter",
+        "StudioFilterType",
+        "aliases",
+        "id name aliases",
+    ),
+    "group": _Spec(
+        "findGroups",
+        "groups",
+        "group_filter",
+        "GroupFilterType",
+        "aliases",
+        "id name aliases",
+        alias_filter=None,  # GroupFilterType cannot filter on aliases
+    ),
+}
+
+#: Entity types :class:`NameResolver` understands.
+RESOLVABLE_TYPES = tuple(_SPECS)
+
+
+def _fold(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def _aliases(value: Any) -> List[str]:
+    # Groups store aliases as one comma separated string.
+    if isinstance(value, str):
+        return [a.strip() for a in value.split(",") if a.strip()]
+    return list(value or ())
+
+
+class NameResolver:
+    """Case‑insensitive name/alias → id index for one entity type.
+
+    Primary names win over aliases, and among equal matches the lowest id
+    wins; :meth:`candidates` returns every match. Thread‑safe.
+    """
+
+    def __init__(
+        self,
+        conn: "StashConnection",
+        entity_type: str,
+        *,
+        load_threshold: int = DEFAULT_LOAD_THRESHOLD,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ):
+        if entity_type not in _SPECS:
+            raise ValueError(
+                f"cannot resolve {entity_type!r}; expected one of {RESOLVABLE_TYPES}"
+            )
+        self.conn = conn
+        self.entity_type = entity_type
+        self.load_threshold = load_threshold
+        self.cache_size = cache_size
+        self._spec = _SPECS[entity_type]
+        self._lock = threading.RLock()
+        self._names: Dict[str, Set[str]] = {}  # folded name → ids
+        self._aliases: Dict[str, Set[str]] = {}  # folded alias → ids
+        self._indexed: Dict[str, Dict[str, Any]] = {}  # id → {id, name, aliases}
+        self._misses: Set[str] = set()  # folded names known not to exist
+        self._loaded = False
+        # (id, selection) → object, least recently used first
+        self._objects: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self.queries = 0
+
+    # ---------------------------------------------------------------------
+    # Index maintenance
+    # ---------------------------------------------------------------------
+    def add(self, entity: Dict[str, Any]) -> None:
+        """Index one object (``id``, ``name`` and aliases), e.g. after a create."""
+        spec = self._spec
+        with self._lock:
+            self._unindex(entity["id"])
+            self._indexed[entity["id"]] = entity
+            folded = _fold(entity.get("name") or "")
+            self._names.setdefault(folded, set()).add(entity["id"])
+            self._misses.discard(folded)
+            for alias in _aliases(entity.get(spec.alias_field)):
+                folded = _fold(alias)
+                self._aliases.setdefault(folded, set()).add(entity["id"])
+                self._misses.discard(folded)
+
+    def _unindex(self, entity_id: str) -> None:
+        old = self._indexed.pop(entity_id, None)
+        if old is None:
+            return
+        keys = [(self._names, old.get("name") or "")] + [
+            (self._aliases, a) for a in _aliases(old.get(self._spec.alias_field))
+        ]
+        for index, name in keys:
+            ids = index.get(_fold(name))
+            if ids is not None:
+                ids.discard(entity_id)
+                if not ids:
+                    del index[_fold(name)]
+
+    def invalidate(self, names: Iterable[str] = (), ids: Iterable[str] = ()) -> None:
+        """Forget *names* / *ids*; with neither, drop everything.
+
+        Call after creating, renaming or deleting objects outside
+        :meth:`add`, so stale negatives and ids are not served.
+        """
+        names, ids = list(names), list(ids)
+        with self._lock:
+            if not names and not ids:
+                self._names.clear()
+                self._aliases.clear()
+                self._indexed.clear()
+                self._misses.clear()
+                self._objects.clear()
+                self._loaded = False
+                return
+            for name in names:
+                folded = _fold(name)
+                self._misses.discard(folded)
+                for entity_id in self._names.get(folded, set()) | self._aliases.get(
+                    folded, set()
+                ):
+                    ids.append(entity_id)
+            for entity_id in ids:
+                self._unindex(entity_id)
+            dropped = set(ids)
+            for key in [key for key in self._objects if key[0] in dropped]:
+                del self._objects[key]
+            # A removed name may now belong to an object we never saw.
+            self._loaded = False
+
+    def load(self) -> None:
+        """Fetch every name and alias of this type in a few large pages."""
+        spec = self._spec
+        query = (
+            f"query ($filter: FindFilterType) {{ {spec.root}(filter: $filter) "
+            f"{{ count {spec.list_key} {{ {spec.fields} }} }} }}"
+        )
+        items = list(self.conn.iter_pages(query, per_page=_LOAD_PAGE))
+        with self._lock:
+            self.queries += max(1, -(-len(items) // _LOAD_PAGE))
+            self._names.clear()
+            self._aliases.clear()
+            self._indexed.clear()
+            self._misses.clear()
+            for item in items:
+                self.add(item)
+            self._loaded = True
+
+    # ---------------------------------------------------------------------
+    # Lookups
+    # ---------------------------------------------------------------------
+    def candidates(self, name: str) -> List[str]:
+        """Every id whose name or alias matches *name*, primary names first."""
+        self.resolve_many([name])
+        folded = _fold(name)
+        with self._lock:
+            primary = sorted(self._names.get(folded, ()), key=int)
+            aliases = sorted(self._aliases.get(folded, set()) - set(primary), key=int)
+        return primary + aliases
+
+    def resolve(self, name: str) -> Optional[str]:
+        return self.resolve_many([name])[name]
+
+    def resolve_many(self, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Map each of *names* to an id, or ``None`` when nothing matches."""
+        names = list(names)
+        with self._lock:
+            missing = {
+                folded
+                for folded in map(_fold, names)
+                if folded not in self._names
+                and folded not in self._aliases
+                and folded not in self._misses
+            }
+            if missing and not self._loaded:
+                if len(missing) > self.load_threshold:
+                    self.load()
+                else:
+                    self._lookup(sorted(missing))
+            result: Dict[str, Optional[str]] = {}
+            for name in names:
+                folded = _fold(name)
+                ids = self._names.get(folded) or self._aliases.get(folded)
+                result[name] = min(ids, key=int) if ids else None
+            return result
+
+    def _lookup(self, folded_names: Sequence[str]) -> None:
+        """Query *folded_names* with one aliased INCLUDES filter per name."""
+        spec = self._spec
+        query = (
+            f"query ($filter: FindFilterType, $f: {spec.filter_type}) "
+            f"{{ {spec.root}(filter: $filter, {spec.filter_arg}: $f) "
+            f"{{ {spec.list_key} {{ {spec.fields} }} }} }}"
+        )
+        futures = []
+        with self.conn.batch() as batch:
+            for name in folded_names:
+                criterion = {"value": name, "modifier": "INCLUDES"}
+                entity_filter: Dict[str, Any] = {"name": criterion}
+                if spec.alias_filter:
+                    entity_filter["OR"] = {spec.alias_filter: criterion}
+                variables = {"filter": {"per_page": -1}, "f": entity_filter}
+                futures.append(batch.add(query, variables))
+        self.queries += batch.documents_sent
+        for future in futures:
+            for item in response_data(future.result())[spec.root][spec.list_key]:
+                self.add(item)
+        for name in folded_names:
+            if name not in self._names and name not in self._aliases:
+                self._misses.add(name)
+
+    def find_many(
+        self, ids: Iterable[str], fields: Optional[str] = None
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Fetch objects by id in one query; cached ids are not re‑requested.
+
+        *fields* defaults to the id/name/alias selection; objects are cached
+        per selection, so a different *fields* fetches again. Unknown ids map
+        to ``None``.
+        """
+        spec = self._spec
+        ids = [str(i) for i in ids]
+        selection = " ".join((fields or spec.fields).split())
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        with self._lock:
+            wanted = []
+            for entity_id in dict.fromkeys(ids):
+                item = self._objects.get((entity_id, selection))
+                if item is None:
+                    wanted.append(entity_id)
+                else:
+                    self._objects.move_to_end((entity_id, selection))
+                    found[entity_id] = item
+            if wanted:
+                query = (
+                    f"query ($ids: [ID!]) "
+                    f"{{ {spec.root}(ids: $ids, filter: {{per_page: -1}}) "
+                    f"{{ {spec.list_key} {{ {selection} }} }} }}"
+                )
+                data = response_data(self.conn.query(query, {"ids": wanted}))
+                self.queries += 1
+                fetched = {
+                    str(item["id"]): item for item in data[spec.root][spec.list_key]
+                }
+                for entity_id in wanted:
+                    found[entity_id] = fetched.get(entity_id)
+                for item in fetched.values():
+                    self._remember(item, selection)
+        return {entity_id: found[entity_id] for entity_id in ids}
+
+    def _remember(self, item: Dict[str, Any], selection: str) -> None:
+        key = (str(item["id"]), selection)
+        self._objects[key] = item
+        self._objects.move_to_end(key)
+        while len(self._objects) > self.cache_size:
+            self._objects.popitem(last=False)
+        if "name" in item and self._spec.alias_field in item:
+            self.add(item)
@@ -0,0 +1,547 @@
+# schema.py
+"""
+Introspected schema, cached on disk, and offline query validation.
+
+Fetching the schema is the most expensive request a plugin can make, so it
+is done once per server *version*: the introspection result is stored under
+the cache directory keyed by ``version { version hash }``, and the version
+itself is re-checked at most every *version_ttl* seconds. A hook run
+against an unchanged server therefore loads the schema from a local file
+without any request::
+
+    schema = conn.schema()
+    schema.check("{ findScene(id: 1) { titel } }")
+    # QueryValidationError: Scene has no field 'titel' (did you mean 'title'?)
+
+:meth:`Schema.check` parses and validates each distinct query string once
+and keeps the result in an LRU, so validating the same query on every call
+costs a dictionary lookup. Pass ``validate_queries=True`` to
+:class:`~stash_connection_lib.core.StashConnection` to check every query
+before it is sent.
+
+The rules cover the mistakes hand-written plugin queries actually make:
+unknown types, fields, arguments and fragments, missing or extra
+sub-selections, missing required arguments, bad enum and input object
+literals, and undefined, unused or mistyped variables.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .core import GraphQLError
+from .graphql import (
+    Directive,
+    Document,
+    EnumValue,
+    Field,
+    FragmentSpread,
+    GraphQLSyntaxError,
+    InlineFragment,
+    Variable,
+    VariableDefinition,
+    parse,
+)
+
+if TYPE_CHECKING:
+    from .core import StashConnection
+
+__all__ = [
+    "Schema",
+    "QueryValidationError",
+    "load_schema",
+    "INTROSPECTION_QUERY",
+    "VERSION_QUERY",
+]
+
+#: Seconds a server's version is trusted before it is asked again.
+DEFAULT_VERSION_TTL = 300.0
+#: Distinct query strings whose validation result is kept per schema.
+DEFAULT_COMPILED_SIZE = 512
+
+INTROSPECTION_QUERY = """
+query IntrospectionQuery {
+  __schema {
+    queryType { name }
+    mutationType { name }
+    subscriptionType { name }
+    types {
+      kind name
+      fields(includeDeprecated: true) {
+        name
+        args { name defaultValue type { ...TypeRef } }
+        type { ...TypeRef }
+      }
+      inputFields { name defaultValue type { ...TypeRef } }
+      enumValues(includeDeprecated: true) { name }
+      possibleTypes { name }
+    }
+  }
+}
+fragment TypeRef on __Type {
+  kind name
+  ofType { kind name ofType { kind name ofType { kind name ofType { kind name } } } }
+}
+"""
+
+VERSION_QUERY = "query Version { version { version hash } }"
+
+_COMPOSITE = frozenset(("OBJECT", "INTERFACE", "UNION"))
+_INPUT = frozenset(("SCALAR", "ENUM", "INPUT_OBJECT"))
+_BUILTIN_SCALARS: Dict[str, Tuple[type, ...]] = {
+    "Int": (int,),
+    "Float": (int, float),
+    "String": (str,),
+    "Boolean": (bool,),
+    "ID": (str, int),
+}
+_CONDITIONS = ("include", "skip")
+
+
+class QueryValidationError(GraphQLError):
+    """Raised by :meth:`Schema.check` for a query the server would reject.
+
+    ``errors`` has the same ``[{"message": ...}]`` shape as a server error
+    response.
+    """
+
+    def __init__(self, messages: Iterable[str]):
+        super().__init__([{"message": message} for message in messages])
+
+
+###############################################################################
+# Schema model
+###############################################################################
+
+
+def _type_string(ref: Dict[str, Any]) -> str:
+    """Print an introspection type reference as ``[ID!]!``."""
+    kind = ref.get("kind")
+    if kind == "NON_NULL":
+        return _type_string(ref["ofType"]) + "!"
+    if kind == "LIST":
+        return f"[{_type_string(ref['ofType'])}]"
+    return ref["name"]
+
+
+def _named(type_ref: str) -> str:
+    return type_ref.strip("[]!")
+
+
+class InputValue:
+    __slots__ = ("name", "type", "has_default")
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.name: str = raw["name"]
+        self.type = _type_string(raw["type"])
+        self.has_default = raw.get("defaultValue") is not None
+
+    @property
+    def required(self) -> bool:
+        return self.type.endswith("!") and not self.has_default
+
+
+class SchemaField:
+    __slots__ = ("name", "type", "args")
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.name: str = raw["name"]
+        self.type = _type_string(raw["type"])
+        self.args = {a["name"]: InputValue(a) for a in raw.get("args") or ()}
+
+
+class SchemaType:
+    __slots__ = ("kind", "name", "fields", "input_fields", "enum_values", "possible")
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.kind: str = raw["kind"]
+        self.name: str = raw["name"]
+        self.fields = {f["name"]: SchemaField(f) for f in raw.get("fields") or ()}
+        self.input_fields = {
+            f["name"]: InputValue(f) for f in raw.get("inputFields") or ()
+        }
+        self.enum_values = frozenset(v["name"] for v in raw.get("enumValues") or ())
+        self.possible = frozenset(t["name"] for t in raw.get("possibleTypes") or ())
+
+
+class Schema:
+    """A server's type system, built from an introspection result.
+
+    *introspection* is the ``__schema`` object, or a response containing it.
+    """
+
+    def __init__(
+        self,
+        introspection: Dict[str, Any],
+        *,
+        compiled_size: int = DEFAULT_COMPILED_SIZE,
+    ):
+        raw = introspection.get("data", introspection)
+        raw = raw.get("__schema", raw)
+        self.introspection = {"__schema": raw}
+        self.types = {t["name"]: SchemaType(t) for t in raw["types"]}
+        self.roots: Dict[str, Optional[SchemaType]] = {
+            operation: self.types.get((raw.get(f"{operation}Type") or {}).get("name"))
+            for operation in ("query", "mutation", "subscription")
+        }
+        self.compile = lru_cache(maxsize=compiled_size)(self._compile)
+
+    def field(self, type_name: str, field_name: str) -> Optional[SchemaField]:
+        """Return ``type_name.field_name``, or ``None`` if either is unknown."""
+        schema_type = self.types.get(type_name)
+        return schema_type.fields.get(field_name) if schema_type else None
+
+    # ---------------------------------------------------------------------
+    # Validation
+    # ---------------------------------------------------------------------
+    def _compile(self, query: str) -> Tuple[Optional[Document], Tuple[str, ...]]:
+        try:
+            document = parse(query)
+        except GraphQLSyntaxError as exc:
+            return None, (str(exc),)
+        return document, tuple(_Validator(self, document).run())
+
+    def validate(self, query: str) -> List[str]:
+        """Return the problems with *query*; empty if the server would accept it."""
+        return list(self.compile(query)[1])
+
+    def check(self, query: str) -> Document:
+        """Return the parsed *query*; raise :class:`QueryValidationError` if invalid."""
+        document, errors = self.compile(query)
+        if errors:
+            raise QueryValidationError(errors)
+        assert document is not None
+        return document
+
+
+class _Validator:
+    """One pass over a document, collecting error messages."""
+
+    def __init__(self, schema: Schema, document: Document):
+        self.schema = schema
+        self.document = document
+        self.fragments = document.fragments
+        self.errors: List[str] = []
+        self.defined: Dict[str, VariableDefinition] = {}
+        self.used: Set[str] = set()
+        self.spread: Set[str] = set()
+        self.visiting: Set[str] = set()
+
+    def error(self, message: str) -> None:
+        if message not in self.errors:
+            self.errors.append(message)
+
+    def run(self) -> List[str]:
+        types = self.schema.types
+        for op in self.document.operations:
+            root = self.schema.roots[op.operation]
+            if root is None:
+                self.error(f"schema does not support {op.operation} operations")
+                continue
+            self.defined = {v.name: v for v in op.variable_definitions}
+            self.used = set()
+            for var in op.variable_definitions:
+                var_type = types.get(_named(var.type))
+                if var_type is None:
+                    self.error(f"variable ${var.name} has unknown type {var.type}")
+                elif var_type.kind not in _INPUT:
+                    self.error(
+                        f"variable ${var.name} type {var.type} is not an input type"
+                    )
+            self.directives(op.directives)
+            self.selections(root, op.selection_set)
+            for name in self.defined:
+                if name not in self.used:
+                    self.error(f"variable ${name} is never used")
+        for name, fragment in self.fragments.items():
+            if name not in self.spread:
+                self.error(f"fragment {name} is never used")
+                self.defined, self.used = {}, set()
+                target = self.condition(fragment.type_condition, f"fragment {name}")
+                if target is not None:
+                    self.selections(target, fragment.selection_set)
+        return self.errors
+
+    def condition(self, type_name: str, where: str) -> Optional[SchemaType]:
+        target = self.schema.types.get(type_name)
+        if target is None:
+            self.error(f"{where} has unknown type condition {type_name}")
+        elif target.kind not in _COMPOSITE:
+            self.error(f"{where} cannot condition on {target.kind.lower()} {type_name}")
+            return None
+        return target
+
+    def selections(self, parent: SchemaType, selections: List[Any]) -> None:
+        for selection in selections:
+            self.directives(selection.directives)
+            if isinstance(selection, Field):
+                self.field(parent, selection)
+            elif isinstance(selection, FragmentSpread):
+                self.fragment_spread(selection)
+            elif isinstance(selection, InlineFragment):
+                target: Optional[SchemaType] = parent
+                if selection.type_condition:
+                    target = self.condition(selection.type_condition, "inline fragment")
+                if target is not None:
+                    self.selections(target, selection.selection_set)
+
+    def field(self, parent: SchemaType, node: Field) -> None:
+        if node.name == "__typename" or (
+            node.name in ("__schema", "__type") and parent is self.schema.roots["query"]
+        ):
+            for value in node.arguments.values():
+                self.mark_used(value)
+            return
+        field = parent.fields.get(node.name)
+        if field is None:
+            message = f"{parent.name} has no field {node.name!r}"
+            close = _suggest(node.name, parent.fields)
+            self.error(f"{message} (did you mean {close!r}?)" if close else message)
+            for value in node.arguments.values():
+                self.mark_used(value)
+            return
+        where = f"{parent.name}.{node.name}"
+        self.arguments(field.args, node.arguments, where)
+        child = self.schema.types.get(_named(field.type))
+        if child is None:
+            return
+        if child.kind in _COMPOSITE:
+            if not node.selection_set:
+                self.error(f"field {where} of type {field.type} needs a selection")
+            else:
+                self.selections(child, node.selection_set)
+        elif node.selection_set:
+            self.error(
+                f"field {where} is a {child.kind.lower()} and takes no selection"
+            )
+
+    def fragment_spread(self, node: FragmentSpread) -> None:
+        fragment = self.fragments.get(node.name)
+        if fragment is None:
+            self.error(f"unknown fragment {node.name}")
+            return
+        self.spread.add(node.name)
+        if node.name in self.visiting:
+            self.error(f"fragment {node.name} spreads itself")
+            return
+        target = self.condition(fragment.type_condition, f"fragment {node.name}")
+        if target is None:
+            return
+        self.visiting.add(node.name)
+        self.directives(fragment.directives)
+        self.selections(target, fragment.selection_set)
+        self.visiting.discard(node.name)
+
+    def directives(self, directives: List[Directive]) -> None:
+        for directive in directives:
+            if directive.name in _CONDITIONS:
+                args = {"if": _BOOLEAN}
+                self.arguments(args, directive.arguments, f"@{directive.name}")
+            else:
+                for value in directive.arguments.values():
+                    self.mark_used(value)
+
+    def arguments(
+        self, expected: Dict[str, InputValue], given: Dict[str, Any], where: str
+    ) -> None:
+        for name, value in given.items():
+            arg = expected.get(name)
+            if arg is None:
+                self.error(f"{where} has no argument {name!r}")
+                self.mark_used(value)
+            else:
+                self.value(value, arg.type, f"{where}({name}:)")
+        for arg in expected.values():
+            if arg.required and arg.name not in given:
+                self.error(f"{where} requires argument {arg.name!r} of type {arg.type}")
+
+    def mark_used(self, value: Any) -> None:
+        if isinstance(value, Variable):
+            self.used.add(value.name)
+            if value.name not in self.defined:
+                self.error(f"variable ${value.name} is not defined")
+        elif isinstance(value, list):
+            for item in value:
+                self.mark_used(item)
+        elif isinstance(value, dict):
+            for item in value.values():
+                self.mark_used(item)
+
+    def value(self, value: Any, type_ref: str, where: str) -> None:
+        if isinstance(value, Variable):
+            self.mark_used(value)
+            var = self.defined.get(value.name)
+            if var is not None and not _compatible(var.type, type_ref, var.has_default):
+                self.error(
+                    f"variable ${var.name} of type {var.type} cannot be used "
+                    f"where {type_ref} is expected"
+                )
+            return
+        if value is None:
+            if type_ref.endswith("!"):
+                self.error(f"{where} cannot be null")
+            return
+        type_ref = type_ref.rstrip("!")
+        if type_ref.startswith("["):
+            for item in value if isinstance(value, list) else [value]:
+                self.value(item, type_ref[1:-1], where)
+            return
+        target = self.schema.types.get(type_ref)
+        if target is None:
+            return
+        if target.kind == "ENUM":
+            if not isinstance(value, EnumValue) or value.name not in target.enum_values:
+                self.error(f"{where} expects a {type_ref} value, got {_literal(value)}")
+        elif target.kind == "INPUT_OBJECT":
+            if not isinstance(value, dict):
+                self.error(
+                    f"{where} expects a {type_ref} object, got {_literal(value)}"
+                )
+                self.mark_used(value)
+                return
+            for name, item in value.items():
+                field = target.input_fields.get(name)
+                if field is None:
+                    self.error(f"{type_ref} has no field {name!r}")
+                    self.mark_used(item)
+                else:
+                    self.value(item, field.type, f"{where}.{name}")
+            for field in target.input_fields.values():
+                if field.required and field.name not in value:
+                    self.error(
+                        f"{where} requires field {field.name!r} of type {field.type}"
+                    )
+        else:
+            allowed = _BUILTIN_SCALARS.get(type_ref)
+            if allowed is None:
+                self.mark_used(value)  # custom scalars (Time, Map, Any) take anything
+                return
+            if not isinstance(value, allowed) or (
+                isinstance(value, bool) != (type_ref == "Boolean")
+            ):
+                self.error(f"{where} expects {type_ref}, got {_literal(value)}")
+                self.mark_used(value)
+
+
+_BOOLEAN = InputValue(
+    {"name": "if", "type": {"kind": "NON_NULL", "ofType": {"name": "Boolean"}}}
+)
+
+
+def _compatible(variable: str, location: str, has_default: bool) -> bool:
+    """Whether a ``$var: variable`` may be passed where *location* is expected."""
+    if location.endswith("!") and not variable.endswith("!"):
+        if not has_default:
+            return False
+        location = location[:-1]
+    return _subtype(variable, location)
+
+
+def _subtype(variable: str, location: str) -> bool:
+    if location.endswith("!"):
+        return variable.endswith("!") and _subtype(variable[:-1], location[:-1])
+    if variable.endswith("!"):
+        return _subtype(variable[:-1], location)
+    if location.startswith("["):
+        return variable.startswith("[") and _subtype(variable[1:-1], location[1:-1])
+    return not variable.startswith("[") and variable == location
+
+
+def _suggest(name: str, candidates: Iterable[str]) -> Optional[str]:
+    import difflib
+
+    close = difflib.get_close_matches(name, list(candidates), n=1, cutoff=0.7)
+    return close[0] if close else None
+
+
+def _literal(value: Any) -> str:
+    from .graphql import print_value
+
+    return print_value(value)
+
+
+###############################################################################
+# Disk cache keyed by server version
+###############################################################################
+
+_SCHEMAS: Dict[str, Schema] = {}
+_LOCK = threading.Lock()
+
+
+def _schema_dir() -> str:
+    from .cache import default_cache_path
+
+    return os.path.join(os.path.dirname(default_cache_path()), "schema")
+
+
+def _write_json(path: str, data: Any) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Any:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _version_key(conn: "StashConnection") -> str:
+    """``<version>-<hash>`` of the server, or a digest of its URL if it has none."""
+    response = conn.query(VERSION_QUERY)
+    version = (
+        (response.get("data") or {}).get("version")
+        if not response.get("errors")
+        else None
+    )
+    if not version:
+        return "url-" + hashlib.sha256(conn.url.encode()).hexdigest()[:16]
+    key = f"{version.get('version') or 'unknown'}-{version.get('hash') or ''}"
+    return re.sub(r"[^0-9A-Za-z._-]+", "_", key).strip("-_")
+
+
+def load_schema(
+    conn: "StashConnection",
+    *,
+    directory: Optional[str] = None,
+    version_ttl: float = DEFAULT_VERSION_TTL,
+    refresh: bool = False,
+) -> Schema:
+    """Return the schema of *conn*'s server, introspecting only on a new version.
+
+    *directory* defaults to ``schema/`` next to the response cache. The
+    server version is looked up at most every *version_ttl* seconds;
+    *refresh* asks for it now and re-introspects.
+    """
+    directory = directory or _schema_dir()
+    index_path = os.path.join(directory, "versions.json")
+    with _LOCK:
+        index = _read_json(index_path) or {}
+        entry = index.get(conn.url) or {}
+        key = entry.get("key")
+        if refresh or not key or time.time() - entry.get("checked", 0) > version_ttl:
+            key = _version_key(conn)
+            index[conn.url] = {"key": key, "checked": time.time()}
+            _write_json(index_path, index)
+        path = os.path.join(directory, f"{key}.json")
+        schema = None if refresh else _SCHEMAS.get(path)
+        if schema is not None:
+            return schema
+        raw = None if refresh else _read_json(path)
+        if raw is None:
+            response = conn.query(INTROSPECTION_QUERY)
+            if response.get("errors"):
+                raise GraphQLError(response["errors"])
+            raw = response["data"]
+            _write_json(path, raw)
+        schema = _SCHEMAS[path] = Schema(raw)
+        return schema
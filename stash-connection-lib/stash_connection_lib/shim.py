@@ -0,0 +1,152 @@
+# shim.py
+"""
+Entry point plugin YAML runs instead of the plugin script.
+
+Forwards the plugin input Stash writes to stdin to the resident
+:class:`~stash_connection_lib.daemon.PluginDaemon`, starting it on first
+use, and prints the daemon's reply in the ``{"output": …}`` / ``{"error":
+…}`` form Stash expects::
+
+    exec:
+      - python
+      - -m
+      - stash_connection_lib.shim
+      - "{pluginDir}/handlers.py:on_scene_update"
+
+Hook events are acknowledged as soon as they are queued; task runs (no
+``hookContext``) wait for the handler's result. ``--wait`` / ``--no-wait``
+override that. If the daemon cannot be started the handler runs in this
+process, exactly as without the daemon.
+
+Only the standard library is imported here, so the per‑event cost is an
+interpreter start and one local socket round trip.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+__all__ = ["daemon_dir", "request", "main"]
+
+#: Seconds the shim waits for a daemon it started to accept connections.
+STARTUP_TIMEOUT = 5.0
+
+
+def daemon_dir() -> str:
+    """Directory holding the daemon's address, lock and log files.
+
+    Mirrors :func:`~stash_connection_lib.cache.default_cache_path` without
+    importing it.
+    """
+    base = os.environ.get("STASH_CONNECTION_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "stash_connection_lib",
+    )
+    return os.path.join(base, "daemon")
+
+
+def request(message: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Send one message to the running daemon and return its reply.
+
+    Raises ``OSError`` (or ``ValueError`` for a malformed address file) when
+    no daemon is listening.
+    """
+    with open(os.path.join(daemon_dir(), "address.json"), encoding="utf-8") as f:
+        address = json.load(f)
+    if address["family"] == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        target: Any = address["path"]
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        target = ("127.0.0.1", address["port"])
+    with sock:
+        sock.settimeout(timeout)
+        sock.connect(target)
+        message = dict(message, token=address["token"])
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(1 << 16)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    if not chunks:
+        raise ConnectionResetError("daemon closed the connection without replying")
+    return json.loads(b"".join(chunks))
+
+
+def _start_daemon() -> None:
+    os.makedirs(daemon_dir(), exist_ok=True)
+    log = open(os.path.join(daemon_dir(), "daemon.log"), "ab")
+    options: Dict[str, Any] = {}
+    if os.name == "nt":  # pragma: no cover - Windows
+        options["creationflags"] = 0x00000008 | 0x00000200  # DETACHED, NEW_GROUP
+    else:
+        options["start_new_session"] = True
+    with log:
+        subprocess.Popen(
+            [sys.executable, "-m", "stash_connection_lib.daemon", "serve"],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            close_fds=True,
+            **options,
+        )
+
+
+def forward(message: Dict[str, Any], start: bool = True) -> Optional[Dict[str, Any]]:
+    """Deliver *message*, starting the daemon if needed; ``None`` if impossible."""
+    timeout = None if message.get("wait") else 10.0
+    try:
+        return request(message, timeout)
+    except (OSError, ValueError):
+        if not start:
+            return None
+    _start_daemon()
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        try:
+            return request(message, timeout)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    wait: Optional[bool] = None
+    for flag, value in (("--wait", True), ("--no-wait", False)):
+        if flag in args:
+            args.remove(flag)
+            wait = value
+    if len(args) != 1:
+        print(
+            "usage: python -m stash_connection_lib.shim [--wait|--no-wait] HANDLER",
+            file=sys.stderr,
+        )
+        return 2
+    raw = sys.stdin.read()
+    payload = json.loads(raw) if raw.strip() else {}
+    if wait is None:
+        wait = "hookContext" not in (payload.get("args") or {})
+    message = {"handler": args[0], "cwd": os.getcwd(), "payload": payload, "wait": wait}
+
+    reply = forward(message)
+    if reply is None:
+        from .daemon import run_inline
+
+        reply = run_inline(args[0], payload, os.getcwd())
+    if "queued" in reply:
+        reply = {"output": "queued"}
+    print(json.dumps(reply))
+    return 1 if "error" in reply else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# streaming.py
+"""
+Incremental extraction of list elements from a JSON byte stream.
+
+:func:`iter_json_items` walks the document as chunks arrive and yields each
+element of the array at a dotted path (ijson style – ``item`` stands for
+"every element of this array")::
+
+    for scene in iter_json_items(resp.iter_content(65536),
+                                 "data.findScenes.scenes.item"):
+        ...
+
+Only the containers on the way to the target are tracked in Python; every
+other value – including each matched element – is handed to the C
+accelerated ``json`` scanner as soon as it is complete. Memory therefore
+scales with the largest single element plus one chunk, not with the
+document, and the first element is available after the first few kilobytes.
+"""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+__all__ = ["iter_json_items", "iter_json_paths", "ItemScanner"]
+
+_WHITESPACE = " \t\r\n"
+# ``raw_decode("12.")`` returns 12; these mean the number was cut mid‑chunk.
+_NUMBER_TAIL = frozenset("0123456789.eE+-")
+
+#: Consumed characters kept in the buffer before it is compacted.
+_COMPACT_AT = 1 << 16
+
+Path = Union[str, Sequence[str]]
+
+
+def _split(path: Path) -> Tuple[str, ...]:
+    return tuple(path.split(".")) if isinstance(path, str) else tuple(path)
+
+
+class ItemScanner:
+    """Push‑style scanner: :meth:`feed` bytes, get ``(path_index, item)`` back.
+
+    *paths* are dotted paths such as ``"data.findScenes.scenes.item"``;
+    each completed element is returned decoded, together with the index of
+    the path it matched.
+    """
+
+    def __init__(self, paths: Sequence[Path]):
+        self.targets = [_split(p) for p in paths]
+        self._prefixes = {t[:n] for t in self.targets for n in range(len(t))}
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self.stack: List[List[Any]] = []  # [is_object, slot]
+        self.state = "value"  # value | key | colon | sep | done
+        # Unconsumed characters needed before an incomplete value is retried,
+        # so a huge element is re‑scanned O(log n) times, not once per chunk.
+        self._retry_at = 0
+
+    # ---------------------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------------------
+    def feed(self, chunk: bytes) -> List[Tuple[int, Any]]:
+        self._pending.append(self._text.decode(chunk))
+        self._pending_size += len(self._pending[-1])
+        if len(self.buf) - self.pos + self._pending_size < self._retry_at:
+            return []  # still inside a large partial value; wait for more
+        self._join()
+        return self._run(final=False)
+
+    def close(self) -> List[Tuple[int, Any]]:
+        """Flush the final element; raise ``ValueError`` if input is truncated."""
+        self._pending.append(self._text.decode(b"", final=True))
+        self._join()
+        found = self._run(final=True)
+        if self.state != "done":
+            raise ValueError("truncated JSON document")
+        return found
+
+    # ---------------------------------------------------------------------
+    # Internals
+    # ---------------------------------------------------------------------
+    def _join(self) -> None:
+        consumed = self.pos if self.pos >= _COMPACT_AT else 0
+        self.buf = self.buf[consumed:] + "".join(self._pending)
+        self.pos -= consumed
+        self._pending, self._pending_size = [], 0
+
+    def _value_end(self, pos: int, final: bool) -> Optional[Tuple[Any, int]]:
+        """Decode the value at *pos*, or return None if it is still partial."""
+        buf = self.buf
+        try:
+            value, end = self._decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise ValueError("truncated JSON document") from None
+            self._retry_at = 2 * (len(buf) - pos)
+            return None
+        if (
+            not final
+            and buf[pos] not in '"[{'
+            and (end == len(buf) or buf[end] in _NUMBER_TAIL)
+        ):
+            return None  # a number or literal may continue in the next chunk
+        return value, end
+
+    def _after_value(self) -> None:
+        self.state = "sep" if self.stack else "done"
+
+    def _pop(self, pos: int) -> None:
+        self.stack.pop()
+        self.pos = pos + 1
+        self._after_value()
+
+    def _run(self, final: bool) -> List[Tuple[int, Any]]:
+        found: List[Tuple[int, Any]] = []
+        buf, size = self.buf, len(self.buf)
+        stack, targets = self.stack, self.targets
+        while True:
+            pos = self.pos
+            while pos < size and buf[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos >= size or self.state == "done":
+                return found
+            char = buf[pos]
+            state = self.state
+
+            if state == "value":
+                if char == "]" and stack and not stack[-1][0]:
+                    self._pop(pos)
+                    continue
+                path = tuple(frame[1] for frame in stack)
+                if char in "{[" and path in self._prefixes and path not in targets:
+                    is_object = char == "{"
+                    stack.append([is_object, None if is_object else "item"])
+                    self.state = "key" if is_object else "value"
+                    self.pos = pos + 1
+                    continue
+                decoded = self._value_end(pos, final)
+                if decoded is None:
+                    return found
+                value, self.pos = decoded
+                if path in targets:
+                    found.append((targets.index(path), value))
+                self._after_value()
+            elif state == "key":
+                if char == "}":
+                    self._pop(pos)
+                    continue
+                if char != '"':
+                    raise ValueError(f"expected object key at offset {pos}")
+                decoded = self._value_end(pos, final)
+                if decoded is None:
+                    return found
+                stack[-1][1], self.pos = decoded
+                self.state = "colon"
+            elif state == "colon":
+                if char != ":":
+                    raise ValueError(f"expected ':' at offset {pos}")
+                self.pos = pos + 1
+                self.state = "value"
+            elif char == ",":
+                self.pos = pos + 1
+                self.state = "key" if stack[-1][0] else "value"
+            elif char in "}]":
+                self._pop(pos)
+            else:
+                raise ValueError(f"expected ',' or closing bracket at offset {pos}")
+
+
+def iter_json_paths(
+    chunks: Iterable[bytes], paths: Sequence[Path]
+) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(path_index, item)`` for elements matching any of *paths*."""
+    scanner = ItemScanner(paths)
+    for chunk in chunks:
+        if chunk:
+            yield from scanner.feed(chunk)
+    yield from scanner.close()
+
+
+def iter_json_items(chunks: Iterable[bytes], path: Path) -> Iterator[Any]:
+    """Yield every element of the array at *path* as *chunks* arrive."""
+    for _, item in iter_json_paths(chunks, [path]):
+        yield item
@@ -0,0 +1,1202 @@
+# testing.py
+"""
+In‑process fake Stash server for tests and benchmarks.
+
+:class:`FakeStash` seeds a deterministic synthetic library – scenes with
+files and fingerprints, performers, tags, studios, groups and markers – and
+answers GraphQL over real HTTP on ``127.0.0.1``, so everything between a
+plugin and the socket (sessions, retries, codecs, caches) runs for real::
+
+    from stash_connection_lib.testing import FakeStash
+
+    with FakeStash(scenes=10_000) as stash:
+        conn = stash.connect()                     # or get_connection(stash.fragment)
+        titles = [s["title"] for s in conn.iter_pages(FIND_SCENES)]
+        print(stash.stats())
+        # {'requests': 40, 'request_bytes': 9120, 'response_bytes': 4203311,
+        #  'operations': {'findScenes': 40}}
+
+The executor understands the parts of the schema plugins use: the ``find*``
+queries with paging, sorting, ``ids`` and the common filter criteria
+(``name``/``title``/``path``/``aliases`` strings, ``updated_at`` and
+``created_at`` timestamps, ``tags``/``performers``/``studios`` ids and
+``AND``/``OR``/``NOT``), ``configuration``, ``stats``, ``version``,
+``findJob``, and the create/update/destroy mutations for scenes, performers,
+tags, studios, groups and markers, plus their ``bulk*Update`` forms. Queries
+may alias fields and use fragments. Pass *introspection* to answer
+``__schema`` for code that loads the schema. Anything else is answered with a
+GraphQL error naming what is missing, never with silently wrong data.
+
+:class:`QueryRecorder` and :func:`assert_request_scaling` catch per‑entity
+request loops – N+1 patterns – before they reach a real library::
+
+    def run(stash):
+        my_plugin.main(stash.fragment)
+
+    assert_request_scaling(run, sizes=(100, 1000, 10000))   # O(pages) or fail
+"""
+
+import json
+import random
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .graphql import (
+    EnumValue,
+    Field,
+    FragmentDefinition,
+    FragmentSpread,
+    GraphQLSyntaxError,
+    InlineFragment,
+    Variable,
+    parse,
+    print_document,
+)
+from .instrumentation import operation_name
+
+__all__ = [
+    "FakeStash",
+    "FakeStashError",
+    "NPlusOneError",
+    "QueryRecorder",
+    "assert_request_scaling",
+    "query_shape",
+]
+
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_WORDS = (
+    "amber beach city dawn ember forest garden harbor island jungle lagoon "
+    "meadow night ocean prairie quarry river summit tundra valley willow"
+).split()
+
+
+class FakeStashError(Exception):
+    """A GraphQL error raised while resolving a field."""
+
+
+def _timestamp(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _now() -> str:
+    return _timestamp(datetime.now(timezone.utc))
+
+
+###############################################################################
+# Types – how linked fields of each object type are resolved
+###############################################################################
+
+# (type, field) -> (child type, table, key holding the linked id(s))
+_LINKS: Dict[Tuple[str, str], Tuple[str, str, str]] = {
+    ("Scene", "studio"): ("Studio", "studios", "_studio"),
+    ("Scene", "tags"): ("Tag", "tags", "_tags"),
+    ("Scene", "performers"): ("Performer", "performers", "_performers"),
+    ("Performer", "tags"): ("Tag", "tags", "_tags"),
+    ("Tag", "parents"): ("Tag", "tags", "_parents"),
+    ("Tag", "children"): ("Tag", "tags", "_children"),
+    ("Studio", "parent_studio"): ("Studio", "studios", "_parent"),
+    ("Group", "studio"): ("Studio", "studios", "_studio"),
+    ("Group", "tags"): ("Tag", "tags", "_tags"),
+    ("SceneMarker", "scene"): ("Scene", "scenes", "_scene"),
+    ("SceneMarker", "primary_tag"): ("Tag", "tags", "_primary_tag"),
+    ("SceneMarker", "tags"): ("Tag", "tags", "_tags"),
+}
+# Root find fields: root -> (type, table, filter argument, list key)
+_FINDS = {
+    "findScenes": ("Scene", "scenes", "scene_filter", "scenes"),
+    "findPerformers": ("Performer", "performers", "performer_filter", "performers"),
+    "findTags": ("Tag", "tags", "tag_filter", "tags"),
+    "findStudios": ("Studio", "studios", "studio_filter", "studios"),
+    "findGroups": ("Group", "groups", "group_filter", "groups"),
+    "findSceneMarkers": (
+        "SceneMarker",
+        "markers",
+        "scene_marker_filter",
+        "scene_markers",
+    ),
+}
+_FIND_ONE = {
+    "findScene": ("Scene", "scenes"),
+    "findPerformer": ("Performer", "performers"),
+    "findTag": ("Tag", "tags"),
+    "findStudio": ("Studio", "studios"),
+    "findGroup": ("Group", "groups"),
+}
+# Mutation prefix -> (type, table, input fields stored as links)
+_MUTABLE = {
+    "scene": (
+        "Scene",
+        "scenes",
+        {"studio_id": "_studio", "tag_ids": "_tags", "performer_ids": "_performers"},
+    ),
+    "performer": ("Performer", "performers", {"tag_ids": "_tags"}),
+    "tag": ("Tag", "tags", {"parent_ids": "_parents", "child_ids": "_children"}),
+    "studio": ("Studio", "studios", {"parent_id": "_parent"}),
+    "group": ("Group", "groups", {"studio_id": "_studio", "tag_ids": "_tags"}),
+    "sceneMarker": (
+        "SceneMarker",
+        "markers",
+        {"scene_id": "_scene", "primary_tag_id": "_primary_tag", "tag_ids": "_tags"},
+    ),
+}
+_STRING_CRITERIA = {
+    "name",
+    "title",
+    "aliases",
+    "path",
+    "details",
+    "code",
+    "url",
+    "disambiguation",
+}
+_TIME_CRITERIA = {"updated_at", "created_at", "date"}
+_ID_CRITERIA = {
+    "tags": "_tags",
+    "performers": "_performers",
+    "studios": "_studio",
+    "parents": "_parents",
+}
+
+
+class FakeStash:
+    """A seeded in‑memory Stash library behind a local GraphQL endpoint."""
+
+    def __init__(
+        self,
+        scenes: int = 1000,
+        *,
+        performers: Optional[int] = None,
+        tags: Optional[int] = None,
+        studios: Optional[int] = None,
+        groups: Optional[int] = None,
+        markers: Optional[int] = None,
+        seed: int = 0,
+        api_key: str = "",
+        introspection: Optional[Dict[str, Any]] = None,
+    ):
+        self.api_key = api_key
+        self.introspection = introspection
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = {
+            name: {}
+            for name in ("scenes", "performers", "tags", "studios", "groups", "markers")
+        }
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.configuration = self._configuration()
+        self._lock = threading.RLock()
+        self._ids = Counter()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.reset_stats()
+        self.seed(
+            scenes,
+            performers=max(10, scenes // 10) if performers is None else performers,
+            tags=max(10, min(2000, scenes // 20)) if tags is None else tags,
+            studios=max(5, scenes // 100) if studios is None else studios,
+            groups=max(5, scenes // 50) if groups is None else groups,
+            markers=scenes // 5 if markers is None else markers,
+            seed=seed,
+        )
+
+    # ---------------------------------------------------------------------
+    # Library
+    # ---------------------------------------------------------------------
+    def _next_id(self, table: str) -> str:
+        self._ids[table] += 1
+        return str(self._ids[table])
+
+    def _configuration(self) -> Dict[str, Any]:
+        return {
+            "general": {
+                "apiKey": self.api_key,
+                "username": "",
+                "stashes": [
+                    {"path": "/media", "excludeVideo": False, "excludeImage": False}
+                ],
+                "stashBoxes": [
+                    {
+                        "endpoint": "https://stashdb.org/graphql",
+                        "api_key": "box",
+                        "name": "StashDB",
+                    }
+                ],
+                "databasePath": "/config/stash-go.sqlite",
+                "generatedPath": "/generated",
+                "metadataPath": "/metadata",
+                "configFilePath": "/config/config.yml",
+                "scrapersPath": "/config/scrapers",
+                "pluginsPath": "/config/plugins",
+                "cachePath": "/cache",
+                "blobsPath": "/blobs",
+                "scraperPackageSources": [],
+                "pluginPackageSources": [],
+                "parallelTasks": 1,
+                "videoExtensions": ["mp4", "mkv"],
+                "imageExtensions": ["jpg", "png"],
+                "galleryExtensions": ["zip"],
+                "excludes": [],
+                "imageExcludes": [],
+                "logLevel": "Info",
+            },
+            "interface": {"language": "en-GB", "menuItems": [], "cssEnabled": False},
+            "plugins": {},
+        }
+
+    def seed(
+        self,
+        scenes: int,
+        *,
+        performers: int,
+        tags: int,
+        studios: int,
+        groups: int,
+        markers: int,
+        seed: int = 0,
+    ) -> None:
+        """Add a synthetic library of the given size (deterministic per *seed*)."""
+        rng = random.Random(seed)
+        clock = [0]
+
+        def stamp() -> str:
+            clock[0] += 1
+            return _timestamp(_EPOCH + timedelta(seconds=clock[0]))
+
+        def words(n: int) -> str:
+            return " ".join(rng.choice(_WORDS) for _ in range(n)).title()
+
+        def add(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+            row["id"] = self._next_id(table)
+            row["created_at"] = row["updated_at"] = stamp()
+            self.tables[table][row["id"]] = row
+            return row
+
+        with self._lock:
+            tag_ids = [
+                add(
+                    "tags",
+                    {
+                        "name": f"{words(2)} {i}",
+                        "aliases": [],
+                        "description": "",
+                        "favorite": False,
+                        "_parents": [],
+                        "_children": [],
+                    },
+                )["id"]
+                for i in range(tags)
+            ]
+            studio_ids: List[str] = []
+            for i in range(studios):
+                parent = (
+                    rng.choice(studio_ids)
+                    if studio_ids and rng.random() < 0.3
+                    else None
+                )
+                studio_ids.append(
+                    add(
+                        "studios",
+                        {
+                            "name": f"{words(1)} Studio {i}",
+                            "aliases": [],
+                            "url": f"https://studio{i}.example",
+                            "_parent": parent,
+                        },
+                    )["id"]
+                )
+            performer_ids = [
+                add(
+                    "performers",
+                    {
+                        "name": f"{words(2)} {i}",
+                        "disambiguation": None,
+                        "alias_list": [f"{words(1)} {i}"] if rng.random() < 0.3 else [],
+                        "gender": rng.choice(["FEMALE", "MALE", "NON_BINARY"]),
+                        "favorite": rng.random() < 0.1,
+                        "rating100": rng.choice([None, 20, 40, 60, 80, 100]),
+                        "country": rng.choice(["US", "GB", "DE", "JP"]),
+                        "_tags": rng.sample(tag_ids, min(2, len(tag_ids))),
+                    },
+                )["id"]
+                for i in range(performers)
+            ]
+            group_ids = [
+                add(
+                    "groups",
+                    {
+                        "name": f"{words(3)} {i}",
+                        "aliases": "",
+                        "date": "2020-01-01",
+                        "duration": 3600,
+                        "director": words(2),
+                        "_studio": rng.choice(studio_ids) if studio_ids else None,
+                        "_tags": [],
+                    },
+                )["id"]
+                for i in range(groups)
+            ]
+            scene_ids = []
+            for i in range(scenes):
+                folder = rng.choice(_WORDS)
+                scene_id = self._ids["scenes"] + 1
+                year, month, day = (
+                    rng.randint(2010, 2024),
+                    rng.randint(1, 12),
+                    rng.randint(1, 28),
+                )
+                row = add(
+                    "scenes",
+                    {
+                        "title": f"{words(3)} {i}",
+                        "code": None,
+                        "details": words(12),
+                        "director": None,
+                        "urls": [],
+                        "date": f"{year}-{month:02d}-{day:02d}",
+                        "rating100": rng.choice([None, 20, 40, 60, 80, 100]),
+                        "organized": rng.random() < 0.2,
+                        "o_counter": 0,
+                        "play_count": 0,
+                        "_studio": rng.choice(studio_ids) if studio_ids else None,
+                        "_tags": rng.sample(
+                            tag_ids, min(rng.randint(0, 6), len(tag_ids))
+                        ),
+                        "_performers": rng.sample(
+                            performer_ids, min(rng.randint(0, 3), len(performer_ids))
+                        ),
+                        "_groups": (
+                            [
+                                {
+                                    "group": rng.choice(group_ids),
+                                    "scene_index": rng.randint(1, 10),
+                                }
+                            ]
+                            if group_ids and rng.random() < 0.1
+                            else []
+                        ),
+                        "files": [
+                            {
+                                "id": str(scene_id),
+                                "path": f"/media/{folder}/scene_{scene_id:07d}.mp4",
+                                "basename": f"scene_{scene_id:07d}.mp4",
+                                "size": rng.randint(10**8, 4 * 10**9),
+                                "duration": round(rng.uniform(60, 3600), 2),
+                                "video_codec": "h264",
+                                "audio_codec": "aac",
+                                "format": "mp4",
+                                "width": 1920,
+                                "height": 1080,
+                                "frame_rate": 29.97,
+                                "bit_rate": rng.randint(2_000_000, 12_000_000),
+                                "fingerprints": [
+                                    {
+                                        "type": "oshash",
+                                        "value": f"{rng.getrandbits(64):016x}",
+                                    },
+                                    {
+                                        "type": "phash",
+                                        "value": f"{rng.getrandbits(64):016x}",
+                                    },
+                                ],
+                            }
+                        ],
+                        "paths": {
+                            kind: f"http://localhost/scene/{scene_id}/{kind}"
+                            for kind in ("screenshot", "preview", "stream")
+                        },
+                    },
+                )
+                scene_ids.append(row["id"])
+            for i in range(markers if scene_ids and tag_ids else 0):
+                add(
+                    "markers",
+                    {
+                        "title": words(2),
+                        "seconds": round(rng.uniform(0, 600), 1),
+                        "end_seconds": None,
+                        "_scene": rng.choice(scene_ids),
+                        "_primary_tag": rng.choice(tag_ids),
+                        "_tags": [],
+                    },
+                )
+
+    def reset_stats(self) -> None:
+        self.requests = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.operations: Counter = Counter()
+        self.recorded = QueryRecorder()
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests, bytes in/out and per‑root‑field counts since the last reset."""
+        return {
+            "requests": self.requests,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "operations": dict(self.operations),
+        }
+
+    # ---------------------------------------------------------------------
+    # HTTP
+    # ---------------------------------------------------------------------
+    def start(self) -> "FakeStash":
+        """Serve on an ephemeral local port until :meth:`stop`."""
+        if self._server is None:
+            self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+            self._server.daemon_threads = True
+            self._thread = threading.Thread(
+                target=self._server.serve_forever,
+                args=(0.05,),  # poll often so stop() returns promptly
+                name="fake-stash",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeStash":
+        return self.start()
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.stop()
+
+    @property
+    def port(self) -> int:
+        if self._server is None:
+            raise RuntimeError("FakeStash is not running; call start()")
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def fragment(self) -> Dict[str, Any]:
+        """A plugin ``server_connection`` fragment pointing at this server."""
+        return {"Scheme": "http", "Host": "127.0.0.1", "Port": self.port}
+
+    def connect(self, **options: Any) -> Any:
+        """Return a :class:`StashConnection` to this server.
+
+        *options* are passed on to :meth:`StashConnection.from_fragment`.
+        """
+        from .core import StashConnection
+
+        conn = StashConnection.from_fragment(self.fragment, **options)
+        conn.api_key = self.api_key
+        return conn
+
+    def handle(self, body: bytes, api_key: str = "") -> Tuple[int, bytes]:
+        """Answer one raw HTTP request body; return ``(status, response body)``."""
+        with self._lock:
+            self.requests += 1
+            self.request_bytes += len(body)
+        if self.api_key and api_key != self.api_key:
+            return 401, b'{"errors": [{"message": "unauthorized"}]}'
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400, b'{"errors": [{"message": "invalid JSON body"}]}'
+        self.recorded.record(payload.get("query") or "", payload.get("variables"))
+        result = self.execute(
+            payload.get("query") or "",
+            payload.get("variables"),
+            payload.get("operationName"),
+        )
+        out = json.dumps(result, separators=(",", ":")).encode()
+        with self._lock:
+            self.response_bytes += len(out)
+        return 200, out
+
+    # ---------------------------------------------------------------------
+    # Execution
+    # ---------------------------------------------------------------------
+    def execute(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+        operation_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Run *query* against the library, as the HTTP endpoint would."""
+        try:
+            document = parse(query)
+            operation = document.operation(operation_name)
+        except (GraphQLSyntaxError, ValueError) as exc:
+            return {"errors": [{"message": str(exc)}]}
+        context = _Context(self, variables or {}, document.fragments)
+        data: Dict[str, Any] = {}
+        errors: List[Dict[str, Any]] = []
+        with self._lock:
+            for field in context.fields(operation.selection_set, operation.operation):
+                self.operations[field.name] += 1
+                try:
+                    if operation.operation == "mutation":
+                        data[field.response_key] = self._mutate(context, field)
+                    else:
+                        data[field.response_key] = self._query(context, field)
+                except FakeStashError as exc:
+                    data[field.response_key] = None
+                    errors.append({"message": str(exc), "path": [field.response_key]})
+        result: Dict[str, Any] = {"data": data}
+        if errors:
+            result["errors"] = errors
+        return result
+
+    def _query(self, context: "_Context", field: Field) -> Any:
+        args = context.arguments(field)
+        name = field.name
+        if name in _FINDS:
+            type_name, table, filter_arg, list_key = _FINDS[name]
+            rows = list(self.tables[table].values())
+            ids = args.get("ids") or args.get("scene_ids")
+            if ids is not None:
+                wanted = {str(i) for i in ids}
+                rows = [r for r in rows if r["id"] in wanted]
+            if args.get(filter_arg):
+                rows = [r for r in rows if self._matches(r, args[filter_arg])]
+            find_filter = args.get("filter") or {}
+            if find_filter.get("q"):
+                q = find_filter["q"].casefold()
+                rows = [r for r in rows if q in _label(r).casefold()]
+            rows = _sorted(
+                rows, find_filter.get("sort") or "id", find_filter.get("direction")
+            )
+            count = len(rows)
+            per_page = find_filter.get("per_page", 25)
+            if per_page == 0:
+                rows = []
+            elif per_page > 0:
+                page = max(find_filter.get("page", 1), 1)
+                rows = rows[(page - 1) * per_page : page * per_page]
+            result = {"count": count, list_key: rows}
+            return context.project_root(result, field, {list_key: type_name})
+        if name in _FIND_ONE:
+            type_name, table = _FIND_ONE[name]
+            row = self.tables[table].get(str(args.get("id")))
+            return (
+                None
+                if row is None
+                else context.project(row, type_name, field.selection_set)
+            )
+        if name == "__schema" and self.introspection is not None:
+            # Served as given: the ``__schema`` object a test wants clients to see.
+            return self.introspection.get("__schema", self.introspection)
+        if name == "configuration":
+            return context.project(
+                self.configuration, "ConfigResult", field.selection_set
+            )
+        if name == "version":
+            return context.project(
+                {"version": "v0.27.0-fake", "hash": "fake"},
+                "Version",
+                field.selection_set,
+            )
+        if name == "stats":
+            counts = {
+                "scene_count": len(self.tables["scenes"]),
+                "performer_count": len(self.tables["performers"]),
+                "tag_count": len(self.tables["tags"]),
+                "studio_count": len(self.tables["studios"]),
+                "group_count": len(self.tables["groups"]),
+                "scenes_size": sum(
+                    f["size"]
+                    for s in self.tables["scenes"].values()
+                    for f in s["files"]
+                ),
+            }
+            return context.project(counts, "StatsResultType", field.selection_set)
+        if name == "findJob":
+            job = self.jobs.get(str((args.get("input") or {}).get("id")))
+            return (
+                None
+                if job is None
+                else context.project(job, "Job", field.selection_set)
+            )
+        raise FakeStashError(f"FakeStash does not implement query field {name!r}")
+
+    def _matches(self, row: Dict[str, Any], criteria: Dict[str, Any]) -> bool:
+        for key, criterion in criteria.items():
+            if key == "AND":
+                ok = self._matches(row, criterion)
+            elif key == "OR":
+                continue  # handled below, across the whole filter
+            elif key == "NOT":
+                ok = not self._matches(row, criterion)
+            elif key in _STRING_CRITERIA:
+                ok = _match_string(_strings(row, key), criterion)
+            elif key in _TIME_CRITERIA:
+                ok = _match_ordered(row.get(key), criterion)
+            elif key in _ID_CRITERIA:
+                ok = _match_ids(row.get(_ID_CRITERIA[key]), criterion)
+            else:
+                raise FakeStashError(
+                    f"FakeStash does not implement filter criterion {key!r}"
+                )
+            if not ok:
+                return "OR" in criteria and self._matches(row, criteria["OR"])
+        return True
+
+    def _mutate(self, context: "_Context", field: Field) -> Any:
+        args = context.arguments(field)
+        name = field.name
+        if name in (
+            "metadataScan",
+            "metadataGenerate",
+            "metadataAutoTag",
+            "metadataClean",
+        ):
+            job_id = str(len(self.jobs) + 1)
+            self.jobs[job_id] = {
+                "id": job_id,
+                "status": "FINISHED",
+                "progress": 1.0,
+                "description": name,
+                "subTasks": [],
+                "error": None,
+                "startTime": _now(),
+                "endTime": _now(),
+            }
+            return job_id
+        bulk = name.startswith("bulk") and name.endswith("Update")
+        if bulk:
+            prefix = name[4].lower() + name[5 : -len("Update")]
+        else:
+            for action in ("Create", "Update", "Destroy"):
+                if name.endswith(action):
+                    prefix = name[: -len(action)]
+                    break
+            else:
+                raise FakeStashError(f"FakeStash does not implement mutation {name!r}")
+        if prefix not in _MUTABLE:
+            raise FakeStashError(f"FakeStash does not implement mutation {name!r}")
+        type_name, table, links = _MUTABLE[prefix]
+        rows = self.tables[table]
+        value = args.get("input", args)
+        if name.endswith("Destroy"):
+            ids = (
+                [str(value["id"])]
+                if "id" in value
+                else [str(i) for i in value.get("ids", ())]
+            )
+            for row_id in ids:
+                if rows.pop(row_id, None) is None:
+                    raise FakeStashError(f"{type_name} {row_id} not found")
+            return True
+        if bulk:
+            updated = []
+            for row_id in value.get("ids") or ():
+                row = rows.get(str(row_id))
+                if row is None:
+                    raise FakeStashError(f"{type_name} {row_id} not found")
+                _apply(
+                    row,
+                    {k: v for k, v in value.items() if k != "ids"},
+                    links,
+                    bulk=True,
+                )
+                updated.append(row)
+            return [context.project(r, type_name, field.selection_set) for r in updated]
+        if name.endswith("Create"):
+            if prefix in ("tag", "studio", "performer") and any(
+                r.get("name", "").casefold() == str(value.get("name", "")).casefold()
+                for r in rows.values()
+            ):
+                raise FakeStashError(
+                    f"{type_name} with name {value.get('name')!r} already exists"
+                )
+            row = {"id": self._next_id(table), "created_at": _now()}
+            for link in links.values():
+                row[link] = (
+                    None
+                    if link in ("_studio", "_parent", "_scene", "_primary_tag")
+                    else []
+                )
+            if prefix == "scene":
+                row.update(files=[], _groups=[])
+            rows[row["id"]] = row
+        else:
+            row = rows.get(str(value.get("id")))
+            if row is None:
+                raise FakeStashError(f"{type_name} {value.get('id')} not found")
+        _apply(row, {k: v for k, v in value.items() if k != "id"}, links)
+        return context.project(row, type_name, field.selection_set)
+
+
+###############################################################################
+# Execution helpers
+###############################################################################
+
+
+class _Context:
+    """Variables and fragments of one request, plus field projection."""
+
+    def __init__(
+        self,
+        stash: FakeStash,
+        variables: Dict[str, Any],
+        fragments: Dict[str, FragmentDefinition],
+    ):
+        self.stash = stash
+        self.variables = variables
+        self.fragments = fragments
+
+    def value(self, value: Any) -> Any:
+        if isinstance(value, Variable):
+            return self.variables.get(value.name)
+        if isinstance(value, EnumValue):
+            return value.name
+        if isinstance(value, list):
+            return [self.value(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self.value(v) for k, v in value.items()}
+        return value
+
+    def arguments(self, field: Field) -> Dict[str, Any]:
+        return {k: self.value(v) for k, v in field.arguments.items()}
+
+    def fields(self, selections: Optional[List[Any]], type_name: str) -> List[Field]:
+        """Flatten fragments into the list of fields to resolve."""
+        out: List[Field] = []
+        for selection in selections or ():
+            if isinstance(selection, Field):
+                out.append(selection)
+            elif isinstance(selection, FragmentSpread):
+                fragment = self.fragments.get(selection.name)
+                if fragment is None:
+                    raise FakeStashError(f"unknown fragment {selection.name!r}")
+                out.extend(self.fields(fragment.selection_set, type_name))
+            elif isinstance(selection, InlineFragment):
+                if selection.type_condition in (None, type_name):
+                    out.extend(self.fields(selection.selection_set, type_name))
+        return out
+
+    def project_root(
+        self, result: Dict[str, Any], field: Field, types: Dict[str, str]
+    ) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for child in self.fields(field.selection_set, "FindResult"):
+            value = result.get(child.name)
+            if child.name in types and value is not None:
+                value = [
+                    self.project(row, types[child.name], child.selection_set)
+                    for row in value
+                ]
+            out[child.response_key] = value
+        return out
+
+    def project(
+        self, obj: Dict[str, Any], type_name: str, selections: Optional[List[Any]]
+    ) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        tables = self.stash.tables
+        for field in self.fields(selections, type_name):
+            name = field.name
+            link = _LINKS.get((type_name, name))
+            if name == "__typename":
+                value: Any = type_name
+            elif link is not None:
+                child_type, table, key = link
+                ref = obj.get(key)
+                if isinstance(ref, list):
+                    rows = [tables[table][i] for i in ref if i in tables[table]]
+                    value = [
+                        self.project(r, child_type, field.selection_set) for r in rows
+                    ]
+                else:
+                    row = tables[table].get(ref) if ref is not None else None
+                    value = (
+                        None
+                        if row is None
+                        else self.project(row, child_type, field.selection_set)
+                    )
+            elif type_name == "Scene" and name in ("groups", "movies"):
+                value = self._scene_groups(
+                    obj, field, "group" if name == "groups" else "movie"
+                )
+            elif name == "scene_count" and type_name in (
+                "Tag",
+                "Performer",
+                "Studio",
+                "Group",
+            ):
+                value = _scene_count(tables["scenes"], type_name, obj["id"])
+            else:
+                value = obj.get(name)
+                if field.selection_set is not None and value is not None:
+                    if isinstance(value, list):
+                        value = [
+                            self.project(v, name, field.selection_set) for v in value
+                        ]
+                    elif isinstance(value, dict):
+                        value = self.project(value, name, field.selection_set)
+            out[field.response_key] = value
+        return out
+
+    def _scene_groups(self, scene: Dict[str, Any], field: Field, key: str) -> List[Any]:
+        groups = self.stash.tables["groups"]
+        out = []
+        for entry in scene.get("_groups", ()):
+            group = groups.get(entry["group"])
+            if group is None:
+                continue
+            item: Dict[str, Any] = {}
+            for child in self.fields(field.selection_set, "SceneGroup"):
+                if child.name == key:
+                    item[child.response_key] = self.project(
+                        group, "Group", child.selection_set
+                    )
+                else:
+                    item[child.response_key] = entry.get(child.name)
+            out.append(item)
+        return out
+
+
+def _scene_count(
+    scenes: Dict[str, Dict[str, Any]], type_name: str, entity_id: str
+) -> int:
+    if type_name == "Studio":
+        return sum(1 for s in scenes.values() if s["_studio"] == entity_id)
+    if type_name == "Group":
+        return sum(
+            1
+            for s in scenes.values()
+            if any(g["group"] == entity_id for g in s["_groups"])
+        )
+    key = "_tags" if type_name == "Tag" else "_performers"
+    return sum(1 for s in scenes.values() if entity_id in s[key])
+
+
+def _label(row: Dict[str, Any]) -> str:
+    if "name" in row:
+        return row["name"] or ""
+    parts = [row.get("title") or ""] + [f["path"] for f in row.get("files", ())]
+    return " ".join(parts)
+
+
+def _strings(row: Dict[str, Any], key: str) -> List[str]:
+    if key == "path":
+        return [f["path"] for f in row.get("files", ())]
+    if key == "aliases":
+        value = row.get("alias_list", row.get("aliases"))
+    else:
+        value = row.get(key)
+    if isinstance(value, list):
+        return [v for v in value if v]
+    if isinstance(value, str) and key == "aliases":
+        return [a.strip() for a in value.split(",") if a.strip()]
+    return [value] if value else []
+
+
+def _match_string(values: List[str], criterion: Dict[str, Any]) -> bool:
+    target = str(criterion.get("value", "")).casefold()
+    modifier = criterion.get("modifier", "EQUALS")
+    folded = [v.casefold() for v in values]
+    if modifier == "EQUALS":
+        return target in folded
+    if modifier == "NOT_EQUALS":
+        return target not in folded
+    if modifier == "INCLUDES":
+        return any(all(word in v for word in target.split()) for v in folded)
+    if modifier == "EXCLUDES":
+        return not any(target in v for v in folded)
+    if modifier == "IS_NULL":
+        return not values
+    if modifier == "NOT_NULL":
+        return bool(values)
+    raise FakeStashError(f"FakeStash does not implement string modifier {modifier!r}")
+
+
+def _match_ordered(value: Optional[str], criterion: Dict[str, Any]) -> bool:
+    modifier = criterion.get("modifier", "EQUALS")
+    target = criterion.get("value")
+    if modifier in ("IS_NULL", "NOT_NULL"):
+        return (value is None) == (modifier == "IS_NULL")
+    if value is None or target is None:
+        return False
+    if len(target) == 10 and len(value) > 10:
+        value = value[:10]  # date criterion on a timestamp column
+    elif "T" in target and not target.endswith("Z"):
+        from .changes import parse_time
+
+        target = _timestamp(parse_time(target))
+    if modifier == "GREATER_THAN":
+        return value > target
+    if modifier == "LESS_THAN":
+        return value < target
+    if modifier == "EQUALS":
+        return value == target
+    if modifier == "BETWEEN":
+        return target <= value <= criterion.get("value2", target)
+    raise FakeStashError(f"FakeStash does not implement time modifier {modifier!r}")
+
+
+def _match_ids(value: Any, criterion: Dict[str, Any]) -> bool:
+    have = set(value if isinstance(value, list) else [value] if value else [])
+    wanted = {str(v) for v in criterion.get("value") or ()}
+    modifier = criterion.get("modifier", "INCLUDES")
+    if modifier == "INCLUDES":
+        return bool(have & wanted)
+    if modifier == "INCLUDES_ALL":
+        return wanted <= have
+    if modifier == "EXCLUDES":
+        return not have & wanted
+    if modifier == "IS_NULL":
+        return not have
+    if modifier == "NOT_NULL":
+        return bool(have)
+    raise FakeStashError(f"FakeStash does not implement id modifier {modifier!r}")
+
+
+def _sorted(
+    rows: List[Dict[str, Any]], sort: str, direction: Optional[str]
+) -> List[Dict[str, Any]]:
+    reverse = direction == "DESC"
+    if sort == "id":
+        return sorted(rows, key=lambda r: int(r["id"]), reverse=reverse)
+    if sort == "random":
+        return rows
+    if sort == "path":
+
+        def key(r: Dict[str, Any]) -> Any:
+            return r["files"][0]["path"] if r.get("files") else ""
+
+    else:
+
+        def key(r: Dict[str, Any]) -> Any:
+            return (r.get(sort) is None, r.get(sort) or "", int(r["id"]))
+
+    return sorted(rows, key=key, reverse=reverse)
+
+
+def _apply(
+    row: Dict[str, Any],
+    values: Dict[str, Any],
+    links: Dict[str, str],
+    bulk: bool = False,
+) -> None:
+    for key, value in values.items():
+        if key in links:
+            link = links[key]
+            if isinstance(value, dict):  # BulkUpdateIds
+                ids = [str(i) for i in value.get("ids") or ()]
+                current = list(row.get(link) or ())
+                mode = value.get("mode", "SET")
+                if mode == "ADD":
+                    ids = current + [i for i in ids if i not in current]
+                elif mode == "REMOVE":
+                    ids = [i for i in current if i not in ids]
+                value = ids
+            elif isinstance(value, list):
+                value = [str(i) for i in value]
+            elif value is not None:
+                value = str(value)
+            row[link] = value
+        elif key in ("group_ids", "groups", "movies"):
+            row["_groups"] = [
+                {
+                    "group": str(g["group_id"] if isinstance(g, dict) else g),
+                    "scene_index": (
+                        g.get("scene_index") if isinstance(g, dict) else None
+                    ),
+                }
+                for g in value or ()
+            ]
+        else:
+            row[key] = value
+    row["updated_at"] = _now()
+
+
+def _handler(stash: FakeStash) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        wbufsize = -1  # headers and body in one write, or Nagle stalls each reply
+
+        def do_POST(self) -> None:  # noqa: N802 - http.server naming
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            status, out = stash.handle(body, self.headers.get("ApiKey") or "")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+            self.wfile.flush()
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+###############################################################################
+# Request counting – N+1 detection
+###############################################################################
+
+_LITERAL_RE = re.compile(
+    r'"(?:\\.|[^"\\])*"|(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?'
+)
+
+
+class NPlusOneError(AssertionError):
+    """Raised when requests repeat per entity or grow faster than allowed."""
+
+
+@lru_cache(maxsize=1024)
+def query_shape(query: str) -> str:
+    """*query* normalised with literals replaced by ``?``.
+
+    Two requests have the same shape when they differ only in variables or
+    inline literal values – ``findScene(id: 1)`` and ``findScene(id: 2)``.
+    """
+    try:
+        text = print_document(parse(query))
+    except GraphQLSyntaxError:
+        text = " ".join(query.split())
+    return _LITERAL_RE.sub("?", text)
+
+
+def _unpaged(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _unpaged(v) for k, v in value.items() if k != "page"}
+    if isinstance(value, list):
+        return [_unpaged(v) for v in value]
+    return value
+
+
+def _page(value: Any) -> int:
+    if isinstance(value, dict):
+        page = value.get("page")
+        if isinstance(page, int):
+            return page
+        return max((_page(v) for v in value.values()), default=0)
+    return 0
+
+
+class QueryRecorder:
+    """The sequence of operations a connection sent, grouped by shape.
+
+    Attach it to a connection as a post hook, or use it as a context
+    manager that does so::
+
+        with QueryRecorder(conn) as recorded:
+            run_plugin(conn)
+        recorded.assert_no_repeats(threshold=10)
+
+    Consecutive pages of one walk – calls that differ only in a ``page``
+    variable – count once, so paging never looks like a per‑entity loop.
+    :class:`FakeStash` keeps one of these as ``stash.recorded``.
+    """
+
+    def __init__(self, conn: Any = None):
+        self.conn = conn
+        self.operations: List[Tuple[str, str]] = []  # (operation, shape)
+        self.counts: Counter = Counter()  # shape -> calls, continuation pages excluded
+        self._names: Dict[str, str] = {}
+        self._walks: set = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "QueryRecorder":
+        if self.conn is not None:
+            self.conn.add_hook(post=self)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if self.conn is not None:
+            self.conn.remove_hook(self)
+
+    def __call__(self, event: Any) -> None:
+        self.record(event.query, event.variables)
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def record(self, query: str, variables: Optional[Dict[str, Any]] = None) -> None:
+        """Add one request for *query* with *variables*."""
+        shape = query_shape(query)
+        walk = (shape, json.dumps(_unpaged(variables), sort_keys=True, default=str))
+        with self._lock:
+            self.operations.append((operation_name(query), shape))
+            self._names.setdefault(shape, operation_name(query))
+            if _page(variables) > 1 and walk in self._walks:
+                return
+            self._walks.add(walk)
+            self.counts[shape] += 1
+
+    def repeated(self, threshold: int = 10) -> List[Tuple[str, int]]:
+        """``(operation, calls)`` for shapes sent at least *threshold* times."""
+        with self._lock:
+            return [
+                (self._names[shape], calls)
+                for shape, calls in self.counts.most_common()
+                if calls >= threshold
+            ]
+
+    def assert_no_repeats(self, threshold: int = 10) -> None:
+        """Raise :class:`NPlusOneError` if any shape reached *threshold* calls."""
+        repeated = self.repeated(threshold)
+        if repeated:
+            listed = ", ".join(f"{name} ×{calls}" for name, calls in repeated)
+            raise NPlusOneError(
+                f"same-shape operations sent {threshold}+ times: {listed}"
+            )
+
+
+def assert_request_scaling(
+    run: Callable[[FakeStash], Any],
+    sizes: Tuple[int, ...] = (100, 1000, 10000),
+    *,
+    allowed: str = "pages",
+    walks: int = 4,
+    per_page: int = 250,
+    slack: int = 2,
+    **library: Any,
+) -> Dict[int, int]:
+    """Fail if *run* sends more requests on a bigger library than it should.
+
+    *run* is called once per scene count in *sizes* with a running
+    :class:`FakeStash` seeded to that size (*library* is passed on to it),
+    and the requests the server receives are counted. With *allowed* set
+    to ``"constant"`` the count may not grow by more than *slack*; with
+    ``"pages"`` it may grow by up to *walks* full paginated walks at
+    *per_page*. A per‑entity loop grows ~*per_page* times faster than
+    that and raises :class:`NPlusOneError` naming the repeated operations.
+    Returns ``{size: requests}``.
+    """
+    if allowed not in ("constant", "pages"):
+        raise ValueError(f"allowed must be 'constant' or 'pages', not {allowed!r}")
+    counts: Dict[int, int] = {}
+    repeats: List[Tuple[str, int]] = []
+    sizes = tuple(sorted(sizes))
+    for size in sizes:
+        with FakeStash(scenes=size, **library) as stash:
+            run(stash)
+            counts[size] = stash.requests
+            repeats = stash.recorded.repeated(threshold=2)
+    base, first = sizes[0], counts[sizes[0]]
+
+    def pages(n: int) -> int:
+        return -(-n // per_page)
+
+    for size in sizes[1:]:
+        budget = first + slack
+        if allowed == "pages":
+            budget += walks * (pages(size) - pages(base))
+        if counts[size] > budget:
+            table = ", ".join(f"{n}: {c}" for n, c in counts.items())
+            listed = ", ".join(f"{name} ×{calls}" for name, calls in repeats[:5])
+            bound = "1" if allowed == "constant" else "pages"
+            raise NPlusOneError(
+                f"requests grew faster than O({bound})"
+                f" with library size ({table} scenes: requests); at {size} scenes"
+                f" {counts[size]} exceed the budget of {budget}"
+                + (f"; most repeated: {listed}" if listed else "")
+            )
+    return counts
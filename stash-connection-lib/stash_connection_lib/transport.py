@@ -0,0 +1,270 @@
+# transport.py
+"""
+Standard‑library HTTP transport for short‑lived plugin processes.
+
+Hook plugins start a fresh interpreter for every scene or image update, and
+importing ``requests`` (with ``urllib3``, ``charset_normalizer``, ``idna`` and
+``certifi``) costs more than the one or two queries such a process sends.
+:class:`Session` covers the part of the ``requests.Session`` interface
+:class:`~stash_connection_lib.core.StashConnection` uses on top of
+``http.client``, with keep‑alive connections pooled per host::
+
+    conn = get_connection(fragment, transport="stdlib")
+
+or ``STASH_CONNECTION_TRANSPORT=stdlib`` in the environment. The TLS context
+is only built for ``https`` URLs.
+"""
+
+import json
+import threading
+from http.client import HTTPConnection, HTTPException, HTTPResponse
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+__all__ = ["HTTPError", "Response", "Session"]
+
+Timeout = Union[float, Tuple[float, float], None]
+
+#: Exceptions after which a reused keep‑alive connection is retried once on a
+#: fresh one – the server closed it while it sat idle in the pool.
+_STALE = (ConnectionResetError, BrokenPipeError, HTTPException)
+
+
+class HTTPError(OSError):
+    """Raised by :meth:`Response.raise_for_status` for 4xx and 5xx answers."""
+
+    def __init__(self, message: str, response: "Response"):
+        super().__init__(message)
+        self.response = response
+
+
+class _Request:
+    __slots__ = ("body",)
+
+    def __init__(self, body: Any):
+        self.body = body
+
+
+class _Cookies(dict):
+    """The ``set(name, value)`` / ``get_dict()`` subset of a cookie jar."""
+
+    def set(self, name: str, value: str) -> None:
+        self[name] = value
+
+    def get_dict(self) -> Dict[str, str]:
+        return dict(self)
+
+    def header(self) -> str:
+        return "; ".join(f"{name}={value}" for name, value in self.items())
+
+
+class Response:
+    """A finished (or, with ``stream=True``, streaming) HTTP response."""
+
+    def __init__(
+        self,
+        raw: HTTPResponse,
+        url: str,
+        body: Any,
+        release: Any,
+        stream: bool,
+    ):
+        self.raw = raw
+        self.url = url
+        self.status_code = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers  # case‑insensitive ``.get``
+        self.request = _Request(body)
+        self._release = release
+        self._content: Optional[bytes] = None
+        if not stream:
+            self._content = raw.read()
+            self.close()
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = b"".join(self.iter_content(1 << 16))
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", "replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+        if self._content is not None:
+            yield self._content
+            return
+        try:
+            while True:
+                chunk = self.raw.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            kind = "Client" if self.status_code < 500 else "Server"
+            raise HTTPError(
+                f"{self.status_code} {kind} Error: {self.reason} for url: {self.url}",
+                self,
+            )
+
+    def close(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            # http.client marks a fully read response closed; anything else
+            # left unread on the socket rules the connection out for reuse.
+            release(self.raw.will_close or not self.raw.isclosed())
+
+
+class Session:
+    """Keep‑alive ``http.client`` connections behind a ``requests``‑like ``post``.
+
+    Connections are pooled per scheme, host and port, up to *pool_size*
+    idle ones each, and are safe to share between threads: each request
+    checks a connection out of the pool for its duration.
+    """
+
+    def __init__(self, pool_size: int = 10):
+        self.pool_size = pool_size
+        self.headers: Dict[str, str] = {"User-Agent": "stash-connection-lib"}
+        self.cookies = _Cookies()
+        self.adapters: Dict[str, Any] = {}
+        self.connections_opened = 0
+        self._idle: Dict[Tuple[str, str, int], List[HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._ssl_context: Any = None
+
+    def __enter__(self) -> "Session":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.close()
+
+    def post(
+        self,
+        url: str,
+        json: Any = None,
+        data: Union[bytes, BinaryIO, None] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Timeout = None,
+        stream: bool = False,
+    ) -> Response:
+        """Send one POST; connection failures raise ``OSError`` subclasses.
+
+        *data* may be a seekable file object; pass its ``Content-Length``
+        in *headers* to avoid chunked encoding.
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname or "localhost", parts.port or 0)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        send = dict(self.headers)
+        if json is not None:
+            data = _dumps(json)
+            send["Content-Type"] = "application/json"
+        if self.cookies:
+            send["Cookie"] = self.cookies.header()
+        send.update(headers or {})
+        body = data or b""
+        connect_timeout, read_timeout = (
+            timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        )
+
+        conn, reused = self._checkout(key, connect_timeout)
+        try:
+            raw = self._request(conn, path, body, send, read_timeout)
+        except _STALE:
+            conn.close()
+            if not reused:
+                raise
+            conn, _ = self._checkout(key, connect_timeout, fresh=True)
+            if hasattr(body, "seek"):
+                body.seek(0)
+            try:
+                raw = self._request(conn, path, body, send, read_timeout)
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            conn.close()
+            raise
+
+        def release(closed: bool) -> None:
+            self._checkin(key, conn, closed)
+
+        return Response(raw, url, body, release, stream)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+    # ---------------------------------------------------------------------
+    # Pool
+    # ---------------------------------------------------------------------
+    def _checkout(
+        self, key: Tuple[str, str, int], timeout: Optional[float], fresh: bool = False
+    ) -> Tuple[HTTPConnection, bool]:
+        if not fresh:
+            with self._lock:
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop(), True
+        scheme, host, port = key
+        if scheme == "https":
+            from http.client import HTTPSConnection
+
+            conn: HTTPConnection = HTTPSConnection(
+                host, port or None, timeout=timeout, context=self._context()
+            )
+        else:
+            conn = HTTPConnection(host, port or None, timeout=timeout)
+        with self._lock:
+            self.connections_opened += 1
+        return conn, False
+
+    def _checkin(
+        self, key: Tuple[str, str, int], conn: HTTPConnection, closed: bool
+    ) -> None:
+        if not closed:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.pool_size:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def _context(self) -> Any:
+        if self._ssl_context is None:
+            import ssl
+
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    @staticmethod
+    def _request(
+        conn: HTTPConnection,
+        path: str,
+        body: Any,
+        headers: Dict[str, str],
+        read_timeout: Optional[float],
+    ) -> HTTPResponse:
+        if conn.sock is None:
+            conn.connect()
+        conn.sock.settimeout(read_timeout)
+        conn.request("POST", path, body=body, headers=headers)
+        return conn.getresponse()
+
+
+def _dumps(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
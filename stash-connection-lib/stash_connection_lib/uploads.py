@@ -0,0 +1,383 @@
+# uploads.py
+"""
+Streaming image uploads for ``cover_image``, ``image`` and similar fields.
+
+Stash takes images as base64 ``data:`` URIs inside the mutation's JSON,
+which plugins usually build as one huge string – the file, its base64 copy
+and the JSON body all in memory at once. An :class:`Uploader` instead
+encodes each image once into a spooled temporary file and streams the
+request body from it in small chunks::
+
+    uploads = conn.uploader()
+    uploads.mutate(
+        "mutation ($input: SceneUpdateInput!) { sceneUpdate(input: $input) { id } }",
+        {"input": {"id": scene_id, "cover_image": uploads.image("/covers/42.jpg")}},
+    )
+
+Sources are local paths or ``http(s)://`` / ``file://`` URLs; remote
+images are downloaded without Stash's session cookies. Each source is read
+once per run, and identical content from different sources is stored once
+(keyed by SHA‑256), so setting the same cover on a hundred scenes reads
+and encodes it a single time. Encoded images stay in memory only up to
+*memory_limit* bytes in total; larger or older ones are moved to disk,
+and at most *max_cached* images are kept.
+"""
+
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from tempfile import SpooledTemporaryFile
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .core import StashConnection
+
+__all__ = ["Uploader", "Upload", "UploadBody"]
+
+#: Bytes of encoded images kept in memory before spooling to disk.
+DEFAULT_MEMORY_LIMIT = 4 << 20
+#: Encoded images remembered for reuse within a run.
+DEFAULT_MAX_CACHED = 64
+#: Raw bytes read and encoded per step; a multiple of 3 so chunks join.
+CHUNK_SIZE = 3 << 15
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+def _sniff(head: bytes) -> Optional[str]:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+class Upload:
+    """A file or URL to be sent as a ``data:`` URI; see :meth:`Uploader.image`."""
+
+    __slots__ = ("source", "content_type")
+
+    def __init__(
+        self, source: Union[str, os.PathLike], content_type: Optional[str] = None
+    ):
+        self.source = os.fspath(source)
+        self.content_type = content_type
+
+    def __repr__(self) -> str:
+        return f"Upload({self.source!r})"
+
+
+class _Blob:
+    """One encoded image: ``data:<type>;base64,`` header plus spooled body."""
+
+    __slots__ = ("digest", "header", "spool", "size", "raw_size", "lock")
+
+    def __init__(
+        self, digest: str, header: bytes, spool: Any, size: int, raw_size: int
+    ):
+        self.digest = digest
+        self.header = header
+        self.spool = spool
+        self.size = size  # encoded bytes in the spool
+        self.raw_size = raw_size
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.header) + self.size
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        if offset < len(self.header):
+            return self.header[offset : offset + size]
+        with self.lock:
+            self.spool.seek(offset - len(self.header))
+            return self.spool.read(size)
+
+    def in_memory(self) -> bool:
+        return not getattr(self.spool, "_rolled", True)
+
+
+class UploadBody:
+    """A JSON request body read piecewise from literal bytes and encoded images.
+
+    File‑like (``read``, ``seek``, ``tell``, ``len``) so both transports
+    send it with a ``Content-Length`` and never hold it whole.
+    """
+
+    def __init__(self, parts: List[Union[bytes, _Blob]]):
+        self._parts = parts
+        self._length = sum(len(part) for part in parts)
+        self._index = 0
+        self._offset = 0
+        self._position = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(1 << 16)
+            if not chunk:
+                return
+            yield chunk
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, position: int, whence: int = 0) -> int:
+        if (position, whence) != (0, 0):
+            raise OSError("upload bodies can only be rewound to the start")
+        self._index = self._offset = self._position = 0
+        return 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length - self._position
+        out: List[bytes] = []
+        while size > 0 and self._index < len(self._parts):
+            part = self._parts[self._index]
+            if isinstance(part, bytes):
+                chunk = part[self._offset : self._offset + size]
+            else:
+                chunk = part.read_at(self._offset, size)
+            if not chunk:
+                self._index += 1
+                self._offset = 0
+                continue
+            out.append(chunk)
+            self._offset += len(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+        return b"".join(out)
+
+
+class Uploader:
+    """Turns :class:`Upload` placeholders in mutation variables into streamed images.
+
+    Use one per run (or as a context manager) so repeated images are read
+    and encoded once; :meth:`close` deletes the spooled files.
+    """
+
+    def __init__(
+        self,
+        conn: "StashConnection",
+        *,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+        max_cached: int = DEFAULT_MAX_CACHED,
+        max_size: Optional[int] = None,
+        timeout: Optional[float] = 30.0,
+    ):
+        self.conn = conn
+        self.memory_limit = memory_limit
+        self.max_cached = max(max_cached, 1)
+        self.max_size = max_size
+        self.timeout = timeout
+        self._blobs: "OrderedDict[str, _Blob]" = OrderedDict()  # digest → blob
+        self._sources: Dict[Tuple[str, Any], str] = {}  # source key → digest
+        self._lock = threading.Lock()
+        self._counts = {"uploads": 0, "encoded": 0, "reused": 0, "bytes_read": 0}
+
+    def __enter__(self) -> "Uploader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            blobs, self._blobs = list(self._blobs.values()), OrderedDict()
+            self._sources.clear()
+        for blob in blobs:
+            blob.spool.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Return upload counters.
+
+        ``uploads`` images sent, ``encoded`` distinct images, ``reused``
+        sends served by an earlier encoding, raw ``bytes_read`` and the
+        encoded ``memory_bytes`` currently held in memory.
+        """
+        with self._lock:
+            memory = sum(b.size for b in self._blobs.values() if b.in_memory())
+            return dict(self._counts, memory_bytes=memory)
+
+    @staticmethod
+    def image(
+        source: Union[str, os.PathLike], content_type: Optional[str] = None
+    ) -> Upload:
+        """Placeholder for *source* to put in the variables of :meth:`mutate`.
+
+        *content_type* defaults to the server's header, the file name, or
+        the image's magic bytes.
+        """
+        return Upload(source, content_type)
+
+    # ---------------------------------------------------------------------
+    # Requests
+    # ---------------------------------------------------------------------
+    def mutate(
+        self, query: str, variables: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Send *query* with every :class:`Upload` in *variables* streamed in."""
+        body, shown = self.body(query, variables)
+        return self.conn.query(query, shown, body=body)
+
+    def body(
+        self, query: str, variables: Optional[Dict[str, Any]] = None
+    ) -> Tuple[UploadBody, Optional[Dict[str, Any]]]:
+        """Return the streamed request body and the variables as hooks see them.
+
+        In the latter each image is replaced by a short ``<image …>`` note.
+        """
+        blobs: List[_Blob] = []
+
+        def swap(value: Any, marker: bool) -> Any:
+            if isinstance(value, Upload):
+                if marker:
+                    blobs.append(self._blob(value))
+                    return f"\x00upload:{len(blobs) - 1}\x00"
+                blob = blobs[len(shown_blobs)]
+                shown_blobs.append(blob)
+                return f"<image {blob.raw_size} bytes sha256:{blob.digest[:12]}>"
+            if isinstance(value, dict):
+                return {k: swap(v, marker) for k, v in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [swap(v, marker) for v in value]
+            return value
+
+        payload: Dict[str, Any] = {"query": query}
+        if variables is not None:
+            payload["variables"] = swap(variables, True)
+        shown_blobs: List[_Blob] = []
+        shown = swap(variables, False) if variables is not None else None
+        encoded = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+        parts: List[Union[bytes, _Blob]] = []
+        for index, blob in enumerate(blobs):
+            before, encoded = encoded.split(f"\\u0000upload:{index}\\u0000", 1)
+            parts.extend((before.encode(), blob))
+        parts.append(encoded.encode())
+        with self._lock:
+            self._counts["uploads"] += len(blobs)
+        return UploadBody(parts), shown
+
+    # ---------------------------------------------------------------------
+    # Encoding
+    # ---------------------------------------------------------------------
+    def _source_key(self, source: str) -> Tuple[str, Any]:
+        if "://" in source:
+            return (source, None)
+        path = os.path.abspath(source)
+        st = os.stat(path)
+        return (path, (st.st_size, st.st_mtime_ns))
+
+    def _blob(self, upload: Upload) -> _Blob:
+        key = self._source_key(upload.source)
+        with self._lock:
+            digest = self._sources.get(key)
+            blob = self._blobs.get(digest) if digest else None
+            if blob is not None:
+                self._blobs.move_to_end(digest)
+                self._counts["reused"] += 1
+                return blob
+        blob = self._encode(upload)
+        with self._lock:
+            self._sources[key] = blob.digest
+            existing = self._blobs.get(blob.digest)
+            if existing is not None:  # same bytes from another source
+                blob.spool.close()
+                self._blobs.move_to_end(blob.digest)
+                self._counts["reused"] += 1
+                return existing
+            self._blobs[blob.digest] = blob
+            self._counts["encoded"] += 1
+            self._trim()
+            return blob
+
+    def _trim(self) -> None:
+        """Evict beyond *max_cached* and spill to disk beyond *memory_limit*."""
+        while len(self._blobs) > self.max_cached:
+            _, old = self._blobs.popitem(last=False)
+            self._sources = {k: d for k, d in self._sources.items() if d != old.digest}
+            # Not closed here: a body being sent may still read it; the
+            # temporary file goes away with the last reference.
+        in_memory = [b for b in self._blobs.values() if b.in_memory()]
+        total = sum(b.size for b in in_memory)
+        for blob in in_memory:  # oldest first
+            if total <= self.memory_limit:
+                break
+            with blob.lock:
+                blob.spool.rollover()
+            total -= blob.size
+
+    def _open(self, source: str) -> Tuple[BinaryIO, Optional[str]]:
+        """Open *source*; the content type is only trusted if it is an image."""
+        guessed = mimetypes.guess_type(source)[0]
+        if "://" not in source:
+            stream: BinaryIO = open(source, "rb")
+        else:
+            from urllib.request import Request, urlopen
+
+            request = Request(source, headers={"User-Agent": "stash-connection-lib"})
+            stream = urlopen(request, timeout=self.timeout)
+            served = stream.headers.get_content_type()
+            guessed = served if served.startswith("image/") else guessed
+        return stream, guessed if guessed and guessed.startswith("image/") else None
+
+    def _encode(self, upload: Upload) -> _Blob:
+        source, content_type = self._open(upload.source)
+        spool = SpooledTemporaryFile(max_size=self.memory_limit)
+        digest = hashlib.sha256()
+        head = b""
+        raw_size = size = 0
+        pending = b""
+        try:
+            with source:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    raw_size += len(chunk)
+                    if self.max_size is not None and raw_size > self.max_size:
+                        raise ValueError(
+                            f"{upload.source} is larger than {self.max_size} bytes"
+                        )
+                    digest.update(chunk)
+                    if len(head) < 16:
+                        head += chunk[:16]
+                    pending += chunk
+                    usable = len(pending) - len(pending) % 3
+                    if usable:
+                        size += spool.write(base64.b64encode(pending[:usable]))
+                        pending = pending[usable:]
+            if pending:
+                size += spool.write(base64.b64encode(pending))
+        except BaseException:
+            spool.close()
+            raise
+        with self._lock:
+            self._counts["bytes_read"] += raw_size
+        content_type = upload.content_type or content_type or _sniff(head)
+        header = f"data:{content_type or 'application/octet-stream'};base64,"
+        return _Blob(digest.hexdigest(), header.encode(), spool, size, raw_size)
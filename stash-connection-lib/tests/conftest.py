@@ -0,0 +1,62 @@
+import re
+
+import pytest
+from stash_connection_lib.changes import parse_time
+from stash_connection_lib.core import invalidate_connection
+
+
+@pytest.fixture(autouse=True)
+def clear_connection_registry():
+    """Give every test a fresh process‑wide connection registry."""
+    invalidate_connection()
+    yield
+    invalidate_connection()
+
+
+_ROOT_RE = re.compile(r"\{\s*(find\w+)\(")
+_LIST_KEYS = {
+    "findScenes": "scenes",
+    "findPerformers": "performers",
+    "findTags": "tags",
+    "findStudios": "studios",
+    "findGroups": "groups",
+    "findSceneMarkers": "scene_markers",
+}
+
+
+class FakeLibrary:
+    """Answers find* queries with updated_at filtering, sorting and paging."""
+
+    def __init__(self):
+        self.tables = {key: {} for key in _LIST_KEYS}
+        self.clock = 0
+        self.queries = []
+        self.last_query = None
+
+    def save(self, root, obj):
+        self.clock += 1
+        minute, second = divmod(self.clock, 60)
+        obj = dict(obj, updated_at=f"2024-01-01T00:{minute:02d}:{second:02d}Z")
+        self.tables[root][obj["id"]] = obj
+        return obj
+
+    def query(self, query, variables=None):
+        variables = variables or {}
+        root = _ROOT_RE.search(query).group(1)
+        self.queries.append((root, variables))
+        self.last_query = query
+        rows = list(self.tables[root].values())
+        for name, value in variables.items():
+            if name != "filter" and value and "updated_at" in value:
+                since = parse_time(value["updated_at"]["value"])
+                rows = [r for r in rows if parse_time(r["updated_at"]) > since]
+        find_filter = variables.get("filter") or {}
+        sort = find_filter.get("sort", "id")
+        key = (lambda r: int(r["id"])) if sort == "id" else (lambda r: r[sort])
+        rows.sort(key=key, reverse=find_filter.get("direction") == "DESC")
+        per_page = find_filter.get("per_page", 25)
+        page = find_filter.get("page", 1)
+        selected = rows[(page - 1) * per_page : page * per_page] if per_page > 0 else []
+        if "{ id }" in query.split(_LIST_KEYS[root])[-1][:10]:
+            selected = [{"id": r["id"]} for r in selected]
+        return {"data": {root: {"count": len(rows), _LIST_KEYS[root]: selected}}}
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+from stash_connection_lib.aio import AsyncStashConnection  # noqa: E402
+from stash_connection_lib.core import StashConnection, build_session  # noqa: E402
+
+
+def _run(handler, scenario):
+    """Serve *handler* on a local port and await *scenario(base_url)*."""
+
+    async def main():
+        app = web.Application()
+        app.router.add_post("/graphql", handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            return await scenario(str(server.make_url("")).rstrip("/"))
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+class TestAsyncStashConnection:
+    """Test cases for AsyncStashConnection."""
+
+    def test_from_fragment(self):
+        """Test fragment parsing is shared with the sync client."""
+        fragment = {
+            "Host": "0.0.0.0",
+            "Port": 9999,
+            "SessionCookie": {"Name": "session", "Value": "abc"},
+        }
+        conn = AsyncStashConnection.from_fragment(fragment, max_concurrency=2)
+        assert conn.url == "http://localhost:9999/graphql"
+        assert conn.cookies == {"session": "abc"}
+        assert conn.max_concurrency == 2
+
+    @pytest.mark.parametrize("transport", ["requests", "stdlib"])
+    def test_from_connection_shares_auth(self, transport):
+        """Test the async twin reuses the API key and cookies."""
+        session = build_session(transport=transport)
+        session.cookies.set("session", "abc")
+        sync = StashConnection("http://stash:9999", session, "key", timeout=3.0)
+        conn = AsyncStashConnection.from_connection(sync)
+        assert conn.url == "http://stash:9999/graphql"
+        assert conn.api_key == "key"
+        assert conn.cookies == {"session": "abc"}
+        assert conn.timeout == 3.0
+
+    def test_query_and_authenticate(self):
+        """Test queries send the API key and cookies once authenticated."""
+        seen = []
+
+        async def handler(request):
+            body = await request.json()
+            seen.append((request.headers.get("apiKey"), request.cookies.get("s")))
+            if "apiKey" in body["query"]:
+                return web.json_response(
+                    {"data": {"configuration": {"general": {"apiKey": "k"}}}}
+                )
+            return web.json_response({"data": {"echo": body.get("variables")}})
+
+        async def scenario(url):
+            async with AsyncStashConnection(url, cookies={"s": "1"}) as conn:
+                await conn.authenticate()
+                return await conn.query("{ echo }", {"x": 1})
+
+        assert _run(handler, scenario) == {"data": {"echo": {"x": 1}}}
+        assert seen == [(None, "1"), ("k", "1")]
+
+    def test_gather_queries_respects_concurrency(self):
+        """Test fan‑out keeps order and never exceeds max_concurrency."""
+        state = {"active": 0, "peak": 0}
+
+        async def handler(request):
+            body = await request.json()
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return web.json_response(
+                {"data": {"n": (body.get("variables") or {}).get("n")}}
+            )
+
+        async def scenario(url):
+            async with AsyncStashConnection(url, max_concurrency=3) as conn:
+                ops = [("query($n: Int) { n }", {"n": i}) for i in range(12)]
+                return await conn.gather_queries(["{ n }", *ops])
+
+        results = _run(handler, scenario)
+        assert [r["data"]["n"] for r in results] == [None, *range(12)]
+        assert state["peak"] <= 3
+
+    def test_retries_gateway_errors(self):
+        """Test 503 responses are retried for queries only."""
+        calls = []
+
+        async def handler(request):
+            calls.append(1)
+            if len(calls) == 1:
+                return web.Response(status=503)
+            return web.json_response({"data": {"ok": True}})
+
+        async def scenario(url):
+            async with AsyncStashConnection(url, backoff_factor=0) as conn:
+                return await conn.query("{ ok }")
+
+        assert _run(handler, scenario) == {"data": {"ok": True}}
+        assert len(calls) == 2
+
+    def test_mutation_not_retried(self):
+        """Test mutations fail on the first server error."""
+        calls = []
+
+        async def handler(request):
+            calls.append(1)
+            return web.Response(status=503)
+
+        async def scenario(url):
+            async with AsyncStashConnection(url, backoff_factor=0) as conn:
+                results = await conn.gather_queries(
+                    ["mutation { a }"], return_exceptions=True
+                )
+                return results[0]
+
+        assert isinstance(_run(handler, scenario), aiohttp.ClientResponseError)
+        assert len(calls) == 1
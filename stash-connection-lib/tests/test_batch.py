@@ -0,0 +1,231 @@
+from unittest.mock import Mock
+
+import pytest
+import requests
+from stash_connection_lib.core import StashConnection
+from stash_connection_lib.graphql import parse
+
+
+def _connection(monkeypatch, responder):
+    """Return a connection whose POSTs are answered by *responder(payload)*."""
+    conn = StashConnection("http://localhost:9999", requests.Session())
+    sent = []
+
+    def mock_post(*args, **kwargs):
+        sent.append(kwargs["json"])
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = responder(kwargs["json"])
+        return response
+
+    monkeypatch.setattr(conn.session, "post", mock_post)
+    return conn, sent
+
+
+def _echo_ids(payload):
+    """Answer every aliased ``findScene`` with the id it was asked for."""
+    op = parse(payload["query"]).operation()
+    data = {}
+    for field in op.selection_set:
+        var = field.arguments["id"].name
+        data[field.response_key] = {"id": payload["variables"][var]}
+    return {"data": data}
+
+
+class TestQueryBatch:
+    """Test cases for conn.batch()."""
+
+    QUERY = "query FindScene($id: ID!) { findScene(id: $id) { id } }"
+
+    def test_merges_operations_into_one_request(self, monkeypatch):
+        """Test N operations become one aliased document."""
+        conn, sent = _connection(monkeypatch, _echo_ids)
+        with conn.batch() as batch:
+            futures = [batch.add(self.QUERY, {"id": str(i)}) for i in range(3)]
+
+        assert len(sent) == 1
+        assert sent[0]["variables"] == {"b0_id": "0", "b1_id": "1", "b2_id": "2"}
+        assert "b2_findScene: findScene(id: $b2_id)" in sent[0]["query"]
+        assert [f.result() for f in futures] == [
+            {"data": {"findScene": {"id": str(i)}}} for i in range(3)
+        ]
+
+    def test_max_operations_splits_documents(self, monkeypatch):
+        """Test documents are flushed every max_operations operations."""
+        conn, sent = _connection(monkeypatch, _echo_ids)
+        with conn.batch(max_operations=2) as batch:
+            futures = [batch.add(self.QUERY, {"id": str(i)}) for i in range(5)]
+        assert len(sent) == 3
+        assert futures[4].result()["data"]["findScene"]["id"] == "4"
+        assert batch.documents_sent == 3
+
+    def test_single_operation_is_sent_verbatim(self, monkeypatch):
+        """Test a lone operation is not rewritten."""
+        conn, sent = _connection(monkeypatch, lambda p: {"data": {"findScene": None}})
+        with conn.batch() as batch:
+            future = batch.add(self.QUERY, {"id": "7"})
+        assert sent == [{"query": self.QUERY, "variables": {"id": "7"}}]
+        assert future.result() == {"data": {"findScene": None}}
+
+    def test_mutations_keep_order_with_queries(self, monkeypatch):
+        """Test switching between queries and mutations flushes."""
+        conn, sent = _connection(monkeypatch, lambda p: {"data": {}})
+        with conn.batch() as batch:
+            batch.add('mutation { a: tagCreate(input: {name: "x"}) { id } }')
+            batch.add('mutation { tagCreate(input: {name: "y"}) { id } }')
+            batch.add("{ stats { scene_count } }")
+        assert [p["query"].split()[0] for p in sent] == ["mutation", "{"]
+
+    def test_alias_and_original_key_preserved(self, monkeypatch):
+        """Test user aliases survive the round trip."""
+
+        def responder(payload):
+            return {"data": {"b0_mine": 1, "b1_stats": 2}}
+
+        conn, sent = _connection(monkeypatch, responder)
+        with conn.batch() as batch:
+            first = batch.add("{ mine: stats { scene_count } }")
+            second = batch.add("{ stats { scene_count } }")
+        assert "b0_mine: stats" in sent[0]["query"]
+        assert first.result() == {"data": {"mine": 1}}
+        assert second.result() == {"data": {"stats": 2}}
+
+    def test_errors_are_routed_by_alias(self, monkeypatch):
+        """Test per‑alias errors only reach their own future."""
+
+        def responder(payload):
+            return {
+                "data": {"b0_findScene": {"id": "1"}, "b1_findScene": None},
+                "errors": [{"message": "not found", "path": ["b1_findScene", "id"]}],
+            }
+
+        conn, _ = _connection(monkeypatch, responder)
+        with conn.batch() as batch:
+            ok = batch.add(self.QUERY, {"id": "1"})
+            bad = batch.add(self.QUERY, {"id": "2"})
+        assert "errors" not in ok.result()
+        assert bad.result()["errors"] == [
+            {"message": "not found", "path": ["findScene", "id"]}
+        ]
+
+    def test_rejected_document_falls_back_to_single_sends(self, monkeypatch):
+        """Test a validation failure retries each operation on its own."""
+
+        def responder(payload):
+            if "b0_" in payload["query"]:
+                return {"data": None, "errors": [{"message": "bad field"}]}
+            if "nope" in payload["query"]:
+                return {"data": None, "errors": [{"message": "bad field"}]}
+            return {"data": {"stats": {"scene_count": 3}}}
+
+        conn, sent = _connection(monkeypatch, responder)
+        with conn.batch() as batch:
+            good = batch.add("{ stats { scene_count } }")
+            bad = batch.add("{ nope }")
+        assert len(sent) == 3
+        assert good.result() == {"data": {"stats": {"scene_count": 3}}}
+        assert bad.result()["errors"] == [{"message": "bad field"}]
+
+    def test_execution_errors_are_not_replayed(self, monkeypatch):
+        """Test errors with a path are routed even when data is null."""
+
+        def responder(payload):
+            return {
+                "data": None,
+                "errors": [{"message": "not null", "path": ["b1_findScene"]}],
+            }
+
+        conn, sent = _connection(monkeypatch, responder)
+        with conn.batch() as batch:
+            first = batch.add(self.QUERY, {"id": "1"})
+            second = batch.add(self.QUERY, {"id": "2"})
+        assert len(sent) == 1
+        assert first.result() == {"data": {}}
+        assert second.result()["errors"] == [
+            {"message": "not null", "path": ["findScene"]}
+        ]
+
+    def test_rejected_mutations_are_not_replayed(self, monkeypatch):
+        """Test a rejected mutation document is sent exactly once."""
+        error = {"message": "bad field"}
+        conn, sent = _connection(
+            monkeypatch, lambda p: {"data": None, "errors": [error]}
+        )
+        with conn.batch() as batch:
+            futures = [
+                batch.add('mutation { tagCreate(input: {name: "x"}) { id } }'),
+                batch.add('mutation { tagCreate(input: {name: "y"}) { nope } }'),
+            ]
+        assert len(sent) == 1
+        assert [f.result()["errors"] for f in futures] == [[error], [error]]
+
+    def test_transport_error_fails_every_future(self, monkeypatch):
+        """Test HTTP failures are set as the futures' exception."""
+        conn = StashConnection("http://localhost:9999", requests.Session())
+
+        def mock_post(*args, **kwargs):
+            raise requests.HTTPError("boom")
+
+        monkeypatch.setattr(conn.session, "post", mock_post)
+        with conn.batch() as batch:
+            futures = [batch.add(self.QUERY, {"id": str(i)}) for i in range(2)]
+        for future in futures:
+            with pytest.raises(requests.HTTPError):
+                future.result()
+
+    def test_fragments_are_shared(self, monkeypatch):
+        """Test identical named fragments are emitted once."""
+        query = (
+            "query($id: ID!) { findScene(id: $id) { ...S } } "
+            "fragment S on Scene { id }"
+        )
+        conn, sent = _connection(monkeypatch, lambda p: {"data": {}})
+        with conn.batch() as batch:
+            batch.add(query, {"id": "1"})
+            batch.add(query, {"id": "2"})
+        assert sent[0]["query"].count("fragment S on Scene") == 1
+
+    def test_exception_inside_block_cancels(self, monkeypatch):
+        """Test nothing is sent when the with‑block raises."""
+        conn, sent = _connection(monkeypatch, _echo_ids)
+        with pytest.raises(RuntimeError):
+            with conn.batch() as batch:
+                future = batch.add(self.QUERY, {"id": "1"})
+                raise RuntimeError
+        assert sent == []
+        assert future.cancelled()
+
+    def test_subscriptions_are_rejected(self, monkeypatch):
+        """Test subscriptions cannot be batched."""
+        conn, _ = _connection(monkeypatch, _echo_ids)
+        with pytest.raises(ValueError):
+            conn.batch().add("subscription { jobsSubscribe { type } }")
+
+    def test_unbatchable_operations_fail_only_their_caller(self, monkeypatch):
+        """Test add() refuses what cannot be merged; the rest still runs."""
+        conn, sent = _connection(monkeypatch, _echo_ids)
+        with conn.batch() as batch:
+            first = batch.add(self.QUERY, {"id": "1"})
+            with pytest.raises(ValueError, match="top-level fragments"):
+                batch.add("query { ...Q } fragment Q on Query { stats { n } }")
+            with pytest.raises(ValueError, match="directives"):
+                batch.add("query Q @cached { stats { n } }")
+            second = batch.add(self.QUERY, {"id": "2"})
+        assert len(sent) == 1
+        assert second.result() == {"data": {"findScene": {"id": "2"}}}
+        assert first.result() == {"data": {"findScene": {"id": "1"}}}
+
+    def test_conflicting_fragments_flush(self, monkeypatch):
+        """Test a differently defined fragment starts a new document."""
+        conn, sent = _connection(monkeypatch, lambda p: {"data": {}})
+        query = (
+            "query($id: ID!) {{ findScene(id: $id) {{ ...S }} }} "
+            "fragment S on Scene {{ {} }}"
+        )
+        with conn.batch() as batch:
+            batch.add(query.format("id"), {"id": "1"})
+            batch.add(query.format("id"), {"id": "2"})
+            batch.add(query.format("title"), {"id": "3"})
+            batch.add(query.format("title"), {"id": "4"})
+        assert len(sent) == 2
+        assert "fragment S on Scene { title }" in sent[1]["query"]
@@ -0,0 +1,176 @@
+import threading
+
+import pytest
+import requests
+from stash_connection_lib.bulk import BulkWriter
+from stash_connection_lib.core import StashConnection
+from stash_connection_lib.graphql import Variable, parse
+
+
+def _resolve(value, variables):
+    if isinstance(value, Variable):
+        return variables.get(value.name)
+    if isinstance(value, dict):
+        return {k: _resolve(v, variables) for k, v in value.items()}
+    return value
+
+
+class FakeMutations:
+    """Applies tag, scene and marker mutations to in-memory rows."""
+
+    def __init__(self):
+        self.tags = {}
+        self.scenes = {str(i): {"id": str(i), "rating100": None} for i in range(1, 21)}
+        self.markers = {str(i) for i in range(1, 6)}
+        self.documents = []
+        self.flaky = set()  # tag names that fail on their first attempt
+        self.lock = threading.Lock()
+
+    def query(self, query, variables=None):
+        with self.lock:
+            return self._query(query, variables or {})
+
+    def _query(self, query, variables):
+        self.documents.append(query)
+        data, errors = {}, []
+        for field in parse(query).operation().selection_set:
+            (value,) = _resolve(field.arguments, variables).values()
+            key = field.response_key
+            try:
+                data[key] = getattr(self, field.name)(value)
+            except ValueError as exc:
+                data[key] = None
+                errors.append({"message": str(exc), "path": [key]})
+        response = {"data": data}
+        if errors:
+            response["errors"] = errors
+        return response
+
+    def tagCreate(self, value):
+        if value["name"] == "bad":
+            raise ValueError("invalid name")
+        if value["name"] in self.flaky:
+            self.flaky.discard(value["name"])
+            raise ValueError("database is locked")
+        tag = {"id": str(len(self.tags) + 1), "name": value["name"]}
+        self.tags[tag["id"]] = tag
+        return tag
+
+    def sceneUpdate(self, value):
+        if value["id"] not in self.scenes:
+            raise ValueError("scene not found")
+        self.scenes[value["id"]].update(value)
+        return {"id": value["id"]}
+
+    def sceneMarkerDestroy(self, marker_id):
+        if marker_id not in self.markers:
+            raise ValueError("marker not found")
+        self.markers.discard(marker_id)
+        return True
+
+    def bulkSceneUpdate(self, value):
+        if any(i not in self.scenes for i in value["ids"]):
+            raise ValueError("scene not found")
+        for scene_id in value["ids"]:
+            update = {k: v for k, v in value.items() if k != "ids"}
+            for name, ids in update.items():
+                if isinstance(ids, dict):
+                    assert ids["mode"] == "SET"
+                    update[name] = ids["ids"]
+            self.scenes[scene_id].update(update)
+        return [{"id": i} for i in value["ids"]]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeMutations()
+    conn = StashConnection("http://localhost:9999", requests.Session())
+    monkeypatch.setattr(conn, "query", fake.query)
+    return fake, conn
+
+
+class TestBulkWriter:
+    """Test grouping, parallel execution and per-item retries."""
+
+    def test_creates_are_batched(self, server):
+        fake, conn = server
+        names = [f"tag {i}" for i in range(25)]
+        report = BulkWriter(conn, batch_size=10, max_workers=3).run(
+            "tagCreate", ({"name": n} for n in names), selection="id name"
+        )
+        assert report.ok
+        assert len(report) == 25
+        assert report.documents_sent == 3
+        assert [r.data["name"] for r in report.results] == names
+        assert sorted(t["name"] for t in fake.tags.values()) == sorted(names)
+
+    def test_failures_are_reported_per_item(self, server):
+        fake, conn = server
+        fake.flaky.add("flaky")
+        inputs = [{"name": "a"}, {"name": "bad"}, {"name": "flaky"}, {"name": "b"}]
+        report = conn.bulk(batch_size=10).run("tagCreate", inputs)
+        assert [r.index for r in report.failed] == [1]
+        assert report.failed[0].errors[0]["message"] == "invalid name"
+        assert report.failed[0].attempts == 2
+        assert report.results[2].ok and report.results[2].attempts == 2
+        assert "3 succeeded, 1 failed" in report.summary()
+
+    def test_identical_updates_use_native_bulk(self, server):
+        fake, conn = server
+        inputs = [
+            {"id": str(i), "rating100": 80, "tag_ids": ["1"]} for i in range(1, 13)
+        ]
+        inputs.append({"id": "13", "rating100": 20})
+        report = BulkWriter(conn, batch_size=5).run("sceneUpdate", inputs)
+        assert report.ok
+        assert sum("bulkSceneUpdate" in d for d in fake.documents) == 1
+        assert fake.scenes["12"] == {"id": "12", "rating100": 80, "tag_ids": ["1"]}
+        assert fake.scenes["13"]["rating100"] == 20
+        assert report.results[0].data == {"id": "1"}
+
+    def test_rejected_bulk_falls_back_to_items(self, server):
+        fake, conn = server
+        inputs = [{"id": i, "rating100": 60} for i in ("1", "2", "99")]
+        report = BulkWriter(conn).run("sceneUpdate", inputs)
+        assert [r.index for r in report.failed] == [2]
+        assert fake.scenes["1"]["rating100"] == 60
+        assert fake.scenes["2"]["rating100"] == 60
+
+    def test_unsupported_fields_skip_bulk(self, server):
+        fake, conn = server
+        inputs = [{"id": str(i), "title": "same"} for i in range(1, 4)]
+        assert BulkWriter(conn).run("sceneUpdate", inputs).ok
+        assert not any("bulkSceneUpdate" in d for d in fake.documents)
+
+    def test_other_argument_names(self, server):
+        fake, conn = server
+        report = BulkWriter(conn).run(
+            "sceneMarkerDestroy",
+            ["1", "2", "9"],
+            selection=None,
+            argument="id",
+            input_type="ID!",
+        )
+        assert [r.index for r in report.failed] == [2]
+        assert report.results[0].data is True
+        assert fake.markers == {"3", "4", "5"}
+        assert "($b0_id: ID!" in fake.documents[0]
+
+    def test_transport_errors_do_not_repeat_creates(self, server, monkeypatch):
+        fake, conn = server
+        calls = []
+
+        def down(query, variables=None):
+            calls.append(query)
+            raise requests.ConnectionError("connection reset")
+
+        monkeypatch.setattr(conn, "query", down)
+        report = BulkWriter(conn).run("tagCreate", [{"name": "a"}, {"name": "b"}])
+        assert len(report.failed) == 2
+        assert report.failed[0].errors[0]["exception"] == "ConnectionError"
+        assert len(calls) == 1
+
+    def test_invalid_options(self, server):
+        _, conn = server
+        with pytest.raises(ValueError):
+            BulkWriter(conn, max_workers=0)
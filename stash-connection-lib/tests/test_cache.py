@@ -0,0 +1,132 @@
+from unittest.mock import Mock
+
+import pytest
+from stash_connection_lib.cache import ResponseCache, default_cache_path
+from stash_connection_lib.core import StashConnection
+
+BOX = {
+    "endpoint": "https://stashdb.org/graphql",
+    "api_key": "secret",
+    "name": "StashDB",
+}
+SEARCH = "query SearchPerformer($term: String!) { searchPerformer(term: $term) { id } }"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with ResponseCache(tmp_path / "responses.sqlite") as cache:
+        yield cache
+
+
+@pytest.fixture
+def box(cache, monkeypatch):
+    conn = StashConnection.from_stash_box(BOX, cache=cache)
+    conn.posts = []
+    conn.body = b'{"data": {"searchPerformer": [{"id": "abc"}]}}'
+
+    def mock_post(*args, **kwargs):
+        conn.posts.append(kwargs)
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.content = conn.body
+        return response
+
+    monkeypatch.setattr(conn.session, "post", mock_post)
+    return conn
+
+
+class TestResponseCache:
+    """Test the persistent response cache and its StashConnection wiring."""
+
+    def test_from_stash_box(self, box):
+        assert box.url == "https://stashdb.org/graphql"
+        assert box.api_key == "secret"
+
+    def test_rerun_is_served_from_disk(self, box, cache, tmp_path, monkeypatch):
+        box.query(SEARCH, {"term": "jane"})
+        assert cache.stats()["entries"] == 1
+
+        # A new process: new connection, same cache file.
+        with ResponseCache(tmp_path / "responses.sqlite") as reopened:
+            conn = StashConnection.from_stash_box(BOX, cache=reopened)
+            monkeypatch.setattr(conn.session, "post", Mock(side_effect=AssertionError))
+            result = conn.query(
+                "# comment\nquery SearchPerformer($term: String!) "
+                "{ searchPerformer(term: $term) { id } }",
+                {"term": "jane"},
+            )
+            assert result == {"data": {"searchPerformer": [{"id": "abc"}]}}
+            assert conn.dedupe_stats()["disk_hits"] == 1
+        assert len(box.posts) == 1
+
+    def test_key_includes_endpoint_and_variables(self, box, cache):
+        box.query(SEARCH, {"term": "jane"})
+        box.query(SEARCH, {"term": "john"})
+        other = dict(BOX, endpoint="https://theporndb.net/graphql")
+        assert (
+            cache.get(
+                StashConnection.from_stash_box(other).url, SEARCH, {"term": "jane"}
+            )
+            is None
+        )
+        assert len(box.posts) == 2
+
+    def test_per_operation_ttl(self, box, cache, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("stash_connection_lib.cache.time.time", lambda: now[0])
+        cache.ttls["SearchPerformer"] = 60
+        box.query(SEARCH, {"term": "jane"})
+        now[0] += 59
+        box.query(SEARCH, {"term": "jane"})
+        now[0] += 2
+        box.query(SEARCH, {"term": "jane"})
+        assert len(box.posts) == 2
+
+    def test_zero_ttl_disables_operation(self, box, cache):
+        cache.ttls["SearchPerformer"] = 0
+        box.query(SEARCH, {"term": "jane"})
+        box.query(SEARCH, {"term": "jane"})
+        assert len(box.posts) == 2
+        assert cache.stats()["entries"] == 0
+
+    def test_errors_and_mutations_are_not_cached(self, box, cache):
+        box.body = b'{"data": null, "errors": [{"message": "rate limited"}]}'
+        box.query(SEARCH, {"term": "jane"})
+        box.query("mutation { submitFingerprint(input: {}) }")
+        assert cache.stats()["entries"] == 0
+
+    def test_bypass_refreshes_entries(self, box, cache):
+        box.query(SEARCH, {"term": "jane"})
+        cache.bypass = True
+        box.body = b'{"data": {"searchPerformer": []}}'
+        assert box.query(SEARCH, {"term": "jane"}) == {"data": {"searchPerformer": []}}
+        cache.bypass = False
+        assert box.query(SEARCH, {"term": "jane"}) == {"data": {"searchPerformer": []}}
+        assert len(box.posts) == 2
+
+    def test_bypass_from_environment(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("STASH_CONNECTION_CACHE_BYPASS", "1")
+        with ResponseCache(tmp_path / "c.sqlite") as cache:
+            assert cache.bypass
+
+    def test_lru_eviction(self, cache):
+        cache.max_bytes = 25
+        for i, body in enumerate([b"a" * 10, b"b" * 10, b"c" * 10]):
+            cache.put("e", SEARCH, {"i": i}, body)
+        assert cache.get("e", SEARCH, {"i": 0}) is None
+        assert cache.get("e", SEARCH, {"i": 2}) == b"c" * 10
+        assert cache.stats()["evictions"] == 1
+        assert cache.clear(endpoint="e") == 2
+
+    def test_running_total_tracks_replacements(self, cache):
+        cache.put("e", SEARCH, {"i": 0}, b"a" * 10)
+        cache.put("e", SEARCH, {"i": 0}, b"b" * 4)
+        cache.put("e", SEARCH, {"i": 1}, b"c" * 6)
+        (total,) = cache.db.execute("SELECT total FROM usage").fetchone()
+        assert total == cache.stats()["bytes"] == 10
+        cache.clear()
+        assert cache.db.execute("SELECT total FROM usage").fetchone() == (0,)
+
+    def test_default_path_honours_environment(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("STASH_CONNECTION_CACHE_DIR", str(tmp_path))
+        assert default_cache_path() == str(tmp_path / "responses.sqlite")
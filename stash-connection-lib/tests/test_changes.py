@@ -0,0 +1,97 @@
+import json
+
+import pytest
+import requests
+from conftest import FakeLibrary
+from stash_connection_lib.core import StashConnection
+
+
+@pytest.fixture
+def library(monkeypatch):
+    fake = FakeLibrary()
+    for i in range(1, 11):
+        fake.save("findScenes", {"id": str(i), "title": f"Scene {i}"})
+    conn = StashConnection("http://localhost:9999", requests.Session())
+    monkeypatch.setattr(conn, "query", fake.query)
+    return fake, conn
+
+
+class TestChangesSince:
+    """Test StashConnection.changes_since()."""
+
+    def test_from_the_beginning(self, library):
+        fake, conn = library
+        changes = conn.changes_since("scene", per_page=4)
+        assert [s["id"] for s in changes] == [str(i) for i in range(1, 11)]
+        assert changes.cursor == fake.tables["findScenes"]["10"]["updated_at"]
+        assert changes.count == 10
+
+    def test_only_newer_objects_are_returned(self, library):
+        fake, conn = library
+        first = conn.changes_since("scene")
+        list(first)
+        assert first.delivered == ["10"]
+        fake.save("findScenes", {"id": "3", "title": "renamed"})
+        fake.queries.clear()
+
+        changes = conn.changes_since("scene", first.cursor, delivered=first.delivered)
+
+        assert [s["title"] for s in changes] == ["renamed"]
+        variables = fake.queries[0][1]
+        assert variables["filter"]["sort"] == "updated_at"
+        assert variables["scene_filter"]["updated_at"]["modifier"] == "GREATER_THAN"
+
+    def test_same_second_objects_are_not_missed(self, library):
+        fake, conn = library
+        first = conn.changes_since("scene")
+        list(first)
+        late = dict(fake.tables["findScenes"]["10"], id="11", title="late")
+        fake.tables["findScenes"]["11"] = late  # saved in the cursor's second
+        again = conn.changes_since("scene", first.cursor, delivered=first.delivered)
+        assert [s["id"] for s in again] == ["11"]
+        assert again.delivered == ["10", "11"]
+
+    def test_custom_fields_keep_cursor_keys(self, library):
+        fake, conn = library
+        list(conn.changes_since("scene", fields="title"))
+        assert "scenes { updated_at id title }" in fake.last_query
+
+    def test_cursor_file_round_trip(self, library, tmp_path):
+        fake, conn = library
+        path = tmp_path / "cursor.json"
+        assert len(list(conn.changes_since("scene", cursor_file=path))) == 10
+        assert json.loads(path.read_text()) == {
+            "scene": {
+                "cursor": fake.tables["findScenes"]["10"]["updated_at"],
+                "delivered": ["10"],
+            }
+        }
+
+        fake.save("findScenes", {"id": "11", "title": "new"})
+        again = conn.changes_since("scene", cursor_file=path)
+        assert again.since == fake.tables["findScenes"]["10"]["updated_at"]
+        assert [s["id"] for s in again] == ["11"]
+        assert list(conn.changes_since("scene", cursor_file=path)) == []
+
+    def test_bare_cursor_file_is_read(self, library, tmp_path):
+        fake, conn = library
+        path = tmp_path / "cursor.json"
+        path.write_text(
+            json.dumps({"scene": fake.tables["findScenes"]["9"]["updated_at"]})
+        )
+        assert [s["id"] for s in conn.changes_since("scene", cursor_file=path)] == [
+            "9",
+            "10",
+        ]
+
+    def test_cursor_file_untouched_until_complete(self, library, tmp_path):
+        _, conn = library
+        path = tmp_path / "cursor.json"
+        changes = conn.changes_since("scene", per_page=3, cursor_file=path)
+        next(changes)
+        assert not path.exists()
+
+    def test_unknown_entity_type(self, library):
+        _, conn = library
+        with pytest.raises(ValueError):
+            conn.changes_since("image")
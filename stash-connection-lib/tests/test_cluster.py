@@ -0,0 +1,132 @@
+import time
+
+import pytest
+from stash_connection_lib.cluster import ClusterError, StashCluster
+from stash_connection_lib.testing import FakeStash
+
+FIND_SCENES = """
+query ($filter: FindFilterType) {
+  findScenes(filter: $filter) { count scenes { id title } }
+}
+"""
+COUNT = "{ findScenes(filter: {per_page: 0}) { count } }"
+SIZES = {"disk1": 30, "disk2": 45, "disk3": 12}
+
+
+@pytest.fixture
+def stashes():
+    servers = {}
+    try:
+        for seed, (name, scenes) in enumerate(SIZES.items()):
+            stash = servers[name] = FakeStash(scenes=scenes, seed=seed).start()
+            stash.configuration["general"]["stashes"] = [
+                {"path": f"/mnt/{name}", "excludeVideo": False, "excludeImage": False}
+            ]
+        yield servers
+    finally:
+        for stash in servers.values():
+            stash.stop()
+
+
+@pytest.fixture
+def cluster(stashes):
+    fragments = {name: stash.fragment for name, stash in stashes.items()}
+    with StashCluster.from_fragments(fragments) as cluster:
+        yield cluster
+
+
+class TestFanOut:
+    """Test queries run on every server concurrently and merge."""
+
+    def test_query_every_server(self, cluster):
+        counts = {
+            name: response["data"]["findScenes"]["count"]
+            for name, response in cluster.query(COUNT).items()
+        }
+        assert counts == SIZES
+
+    def test_latency_is_the_slowest_server(self, cluster):
+        for delay, conn in zip((0.1, 0.2, 0.3), cluster.connections.values()):
+            conn.add_hook(pre=lambda event, delay=delay: time.sleep(delay))
+        start = time.perf_counter()
+        cluster.query(COUNT)
+        assert time.perf_counter() - start < 0.5
+        assert max(cluster.timings, key=cluster.timings.get) == "disk3"
+
+    def test_pages_are_merged(self, cluster, stashes):
+        pairs = list(cluster.iter_pages(FIND_SCENES, per_page=10))
+        expected = {
+            (name, scene_id)
+            for name, stash in stashes.items()
+            for scene_id in stash.tables["scenes"]
+        }
+        assert {(name, scene["id"]) for name, scene in pairs} == expected
+        assert len(pairs) == len(expected)
+
+    def test_key_gives_a_stable_order(self, cluster):
+        first = list(cluster.iter_pages(FIND_SCENES, key="title", per_page=20))
+        titles = [scene["title"] for _, scene in first]
+        assert titles == sorted(titles)
+        assert list(cluster.iter_pages(FIND_SCENES, key="title")) == first
+        by_id = [
+            (scene["id"], name)
+            for name, scene in cluster.iter_pages(FIND_SCENES, key="id")
+        ]
+        assert by_id[:3] == [("1", "disk1"), ("1", "disk2"), ("1", "disk3")]
+
+    def test_abandoned_walk_stops(self, cluster):
+        walk = cluster.iter_pages(FIND_SCENES, per_page=5)
+        assert len([next(walk) for _ in range(7)]) == 7
+        walk.close()
+        assert (
+            sum(r["data"]["findScenes"]["count"] for r in cluster.query(COUNT).values())
+            == 87
+        )
+
+    def test_failures_keep_other_results(self, cluster):
+        cluster["disk2"].url = "http://127.0.0.1:1/graphql"
+        cluster["disk2"].max_retries = 0
+        with pytest.raises(ClusterError) as info:
+            cluster.query(COUNT)
+        assert set(info.value.errors) == {"disk2"}
+        assert set(info.value.results) == {"disk1", "disk3"}
+        with pytest.raises(ClusterError):
+            list(cluster.iter_pages(FIND_SCENES))
+
+
+class TestRouting:
+    """Test writes go to the server owning the file's path."""
+
+    def test_owner_by_stash_path(self, cluster):
+        assert cluster.stash_paths() == {name: [f"/mnt/{name}"] for name in SIZES}
+        assert cluster.owner("/mnt/disk2/a/b.mp4") == "disk2"
+        assert cluster.owner("/mnt/disk3") == "disk3"
+        with pytest.raises(LookupError):
+            cluster.owner("/mnt/disk22/clip.mp4")
+
+    def test_longest_prefix_wins(self, cluster):
+        paths = {"disk1": ["/data"], "disk2": ["/data/extra/"], "disk3": []}
+        routed = StashCluster(cluster.connections, paths=paths)
+        assert routed.owner("/data/extra/x.mp4") == "disk2"
+        assert routed.owner(r"\data\x.mp4") == "disk1"
+
+    def test_mutation_reaches_only_the_owner(self, cluster, stashes):
+        for stash in stashes.values():
+            stash.reset_stats()
+        update = (
+            "mutation ($input: SceneUpdateInput!) "
+            "{ sceneUpdate(input: $input) { id title } }"
+        )
+        result = cluster.mutate(
+            "/mnt/disk2/x.mp4", update, {"input": {"id": "3", "title": "moved"}}
+        )
+        assert result["data"]["sceneUpdate"] == {"id": "3", "title": "moved"}
+        assert stashes["disk2"].tables["scenes"]["3"]["title"] == "moved"
+        assert [stashes[name].stats()["requests"] for name in SIZES] == [1, 2, 1]
+
+    def test_partition(self, cluster):
+        files = ["/mnt/disk1/a.mp4", "/mnt/disk3/b.mp4", "/mnt/disk1/c.mp4"]
+        assert cluster.partition(files, path=str) == {
+            "disk1": ["/mnt/disk1/a.mp4", "/mnt/disk1/c.mp4"],
+            "disk3": ["/mnt/disk3/b.mp4"],
+        }
@@ -0,0 +1,58 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+import requests
+from stash_connection_lib.codec import JSONCodec, available_codecs, get_codec
+from stash_connection_lib.core import StashConnection
+
+PAYLOAD = {"data": {"findScenes": {"count": 1, "scenes": [{"id": "1", "title": "é"}]}}}
+
+
+class TestCodecs:
+    """Test codec selection and round trips."""
+
+    def test_stdlib_always_available(self):
+        assert "json" in available_codecs()
+        assert get_codec("json").name == "json"
+
+    def test_auto_prefers_fastest_installed(self):
+        assert get_codec("auto") is next(iter(available_codecs().values()))
+
+    def test_codecs_are_cached(self):
+        assert get_codec("json") is get_codec("json")
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError):
+            get_codec("yaml")
+
+    @pytest.mark.parametrize("name", list(available_codecs()))
+    def test_round_trip_from_bytes(self, name):
+        """Test each installed codec decodes bytes and encodes to bytes."""
+        codec = get_codec(name)
+        raw = json.dumps(PAYLOAD).encode()
+        assert codec.loads(raw) == PAYLOAD
+        assert json.loads(codec.dumps(PAYLOAD)) == PAYLOAD
+
+
+class TestConnectionDecoding:
+    """Test StashConnection decodes with its codec."""
+
+    def test_decodes_raw_content(self, monkeypatch):
+        """Test the codec is fed the raw response bytes."""
+        seen = []
+        codec = JSONCodec("spy", lambda raw: seen.append(raw) or PAYLOAD, json.dumps)
+        conn = StashConnection("http://localhost:9999", requests.Session(), codec=codec)
+
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.content = b'{"data": {}}'
+        monkeypatch.setattr(conn.session, "post", lambda *a, **k: response)
+
+        assert conn.query("{ a }") == PAYLOAD
+        assert seen == [b'{"data": {}}']
+        response.json.assert_not_called()
+
+    def test_codec_by_name(self):
+        conn = StashConnection.from_fragment({}, codec="json")
+        assert conn.codec is get_codec("json")
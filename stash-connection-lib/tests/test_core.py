@@ -1,7 +1,10 @@
+import threading
 from unittest.mock import Mock
 
+import pytest
 import requests
 from stash_connection_lib.core import (
+    DEFAULT_TIMEOUT,
     GET_PATHS,
     GET_PLUGIN_SOURCES,
     GET_SCRAPER_SOURCES,
@@ -9,7 +12,14 @@ from stash_connection_lib.core import (
     GET_STASH_BOXES,
     GET_STASHES,
     StashConnection,
+    ConfigSnapshot,
+    GraphQLError,
+    build_session,
     connect,
+    get_config_snapshot,
+    get_connection,
+    invalidate_connection,
+    response_data,
 )
 
 
@@ -210,6 +220,12 @@ class TestConnectFunction:
 class TestConvenienceFunctions:
     """Test cases for convenience functions."""
 
+    def test_response_data(self):
+        """Test response_data unwraps data and raises on errors."""
+        assert response_data({"data": {"a": 1}}) == {"a": 1}
+        with pytest.raises(GraphQLError, match="nope"):
+            response_data({"data": None, "errors": [{"message": "nope"}]})
+
     def test_get_stash_api_key(self, monkeypatch):
         """Test GET_STASH_API_KEY function."""
         fragment = {"Scheme": "http", "Host": "localhost", "Port": 9999}
@@ -516,3 +532,483 @@ class TestEdgeCases:
         # Should handle JSON error gracefully and return empty string
         api_key = GET_STASH_API_KEY(fragment)
         assert api_key == ""
+
+
+class TestTransport:
+    """Test pooling, timeouts and retries of the HTTP transport."""
+
+    def _response(self, payload=None, error=None):
+        response = Mock()
+        response.raise_for_status.side_effect = error
+        response.json.return_value = payload or {"data": {}}
+        return response
+
+    def test_build_session_mounts_sized_pool(self):
+        """Test build_session mounts one pooled adapter for both schemes."""
+        session = build_session(pool_size=4)
+        adapter = session.get_adapter("http://localhost:9999")
+        assert adapter is session.get_adapter("https://localhost:9999")
+        assert adapter._pool_maxsize == 4
+        assert adapter.max_retries.total == 0
+
+    def test_build_session_without_keep_alive(self):
+        """Test keep_alive=False asks the server to close connections."""
+        session = build_session(keep_alive=False)
+        assert session.headers["Connection"] == "close"
+
+    def test_from_fragment_transport_options(self):
+        """Test from_fragment forwards transport options."""
+        conn = StashConnection.from_fragment(
+            {}, pool_size=2, timeout=3.0, max_retries=1, backoff_factor=0
+        )
+        assert conn.timeout == 3.0
+        assert conn.max_retries == 1
+        assert conn.session.get_adapter(conn.url)._pool_maxsize == 2
+
+    def test_query_passes_default_timeout(self, monkeypatch):
+        """Test every request carries the connection timeout."""
+        conn = StashConnection("http://localhost:9999", requests.Session())
+        seen = {}
+
+        def mock_post(*args, **kwargs):
+            seen.update(kwargs)
+            return self._response()
+
+        monkeypatch.setattr(conn.session, "post", mock_post)
+        conn.query("query { stats { scene_count } }")
+        assert seen["timeout"] == DEFAULT_TIMEOUT
+
+    def test_query_retries_connection_errors(self, monkeypatch):
+        """Test idempotent queries are retried with backoff."""
+        conn = StashConnection(
+            "http://localhost:9999", requests.Session(), backoff_factor=0.5
+        )
+        outcomes = [requests.ConnectionError("reset"), requests.Timeout("slow")]
+        sleeps = []
+
+        def mock_post(*args, **kwargs):
+            if outcomes:
+                raise outcomes.pop(0)
+            return self._response({"data": {"ok": True}})
+
+        monkeypatch.setattr(conn.session, "post", mock_post)
+        monkeypatch.setattr("stash_connection_lib.core.time.sleep", sleeps.append)
+        assert conn.query("query { ok }") == {"data": {"ok": True}}
+        assert sleeps == [0.5, 1.0]
+        assert conn.connection_stats()["retries"] == 2
+
+    def test_query_retries_gateway_errors(self, monkeypatch):
+        """Test 503 responses are retried but 400 responses are not."""
+        conn = StashConnection("http://localhost:9999", requests.Session())
+        unavailable = requests.HTTPError(response=Mock(status_code=503))
+        bad_request = requests.HTTPError(response=Mock(status_code=400))
+        responses = [
+            self._response(error=unavailable),
+            self._response(error=bad_request),
+        ]
+
+        monkeypatch.setattr(conn.session, "post", lambda *a, **k: responses.pop(0))
+        monkeypatch.setattr("stash_connection_lib.core.time.sleep", lambda _: None)
+        try:
+            conn.query("query { ok }")
+        except requests.HTTPError as exc:
+            assert exc is bad_request
+        else:
+            raise AssertionError("expected HTTPError")
+        assert responses == []
+
+    def test_query_gives_up_after_max_retries(self, monkeypatch):
+        """Test the last error is raised once retries are exhausted."""
+        conn = StashConnection(
+            "http://localhost:9999", requests.Session(), max_retries=2
+        )
+        calls = []
+
+        def mock_post(*args, **kwargs):
+            calls.append(1)
+            raise requests.ConnectionError("down")
+
+        monkeypatch.setattr(conn.session, "post", mock_post)
+        monkeypatch.setattr("stash_connection_lib.core.time.sleep", lambda _: None)
+        try:
+            conn.query("{ ok }")
+        except requests.ConnectionError:
+            pass
+        else:
+            raise AssertionError("expected ConnectionError")
+        assert len(calls) == 3
+
+    def test_mutations_are_not_retried(self, monkeypatch):
+        """Test mutations are sent exactly once."""
+        conn = StashConnection("http://localhost:9999", requests.Session())
+        calls = []
+
+        def mock_post(*args, **kwargs):
+            calls.append(1)
+            raise requests.ConnectionError("down")
+
+        monkeypatch.setattr(conn.session, "post", mock_post)
+        try:
+            conn.query("  # comment\n  mutation { sceneDestroy(input: {id: 1}) }")
+        except requests.ConnectionError:
+            pass
+        assert len(calls) == 1
+
+    def test_connection_stats_counts_requests(self, monkeypatch):
+        """Test connection_stats reports requests and reused connections."""
+        conn = StashConnection("http://localhost:9999", requests.Session())
+        monkeypatch.setattr(conn.session, "post", lambda *a, **k: self._response())
+        for _ in range(3):
+            conn.query("{ ok }")
+        stats = conn.connection_stats()
+        assert stats["requests"] == 3
+        assert stats["connections_opened"] == 0
+        assert stats["connections_reused"] == 3
+
+
+class TestConnectionRegistry:
+    """Test the process‑wide connection registry used by the helpers."""
+
+    def _count_posts(self, monkeypatch, payload):
+        calls = []
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = payload
+
+        def mock_post(*args, **kwargs):
+            calls.append(kwargs["json"]["query"])
+            return response
+
+        monkeypatch.setattr("requests.Session.post", mock_post)
+        return calls
+
+    def test_get_connection_is_reused(self, monkeypatch):
+        """Test the same server yields the same authenticated connection."""
+        calls = self._count_posts(monkeypatch, {})
+        fragment = {"Host": "0.0.0.0", "Port": 9999}
+        conn = get_connection(fragment)
+        assert get_connection({"Host": "localhost", "Port": 9999}) is conn
+        assert len(calls) == 1
+
+    def test_helpers_authenticate_once(self, monkeypatch):
+        """Test several helpers share one authentication round trip."""
+        calls = self._count_posts(monkeypatch, {})
+        fragment = {"Host": "localhost", "Port": 9999}
+        GET_STASH_API_KEY(fragment)
+        GET_STASH_BOXES(fragment)
+        GET_STASHES(fragment)
+        GET_PATHS(fragment)
+        auth_calls = [q for q in calls if "apiKey" in q]
+        assert len(auth_calls) == 1
+
+    def test_cookie_change_replaces_connection(self, monkeypatch):
+        """Test a new session cookie builds a new connection."""
+        self._count_posts(monkeypatch, {})
+        fragment = {"SessionCookie": {"Name": "session", "Value": "one"}}
+        first = get_connection(fragment)
+        fragment = {"SessionCookie": {"Name": "session", "Value": "two"}}
+        second = get_connection(fragment)
+        assert second is not first
+        assert second.session.cookies["session"] == "two"
+        assert get_connection(fragment) is second
+
+    def test_invalidate_connection(self, monkeypatch):
+        """Test explicit invalidation forces re‑authentication."""
+        calls = self._count_posts(monkeypatch, {})
+        fragment = {"Host": "localhost"}
+        first = get_connection(fragment)
+        invalidate_connection(fragment)
+        assert get_connection(fragment) is not first
+        assert len(calls) == 2
+
+    def test_invalidate_other_server_keeps_connection(self, monkeypatch):
+        """Test invalidation only drops the matching server."""
+        self._count_posts(monkeypatch, {})
+        conn = get_connection({"Host": "localhost"})
+        invalidate_connection({"Host": "other"})
+        assert get_connection({"Host": "localhost"}) is conn
+
+
+class TestConfigSnapshot:
+    """Test the single‑query configuration snapshot."""
+
+    CONFIGURATION = {
+        "general": {
+            "apiKey": "snap_key",
+            "stashes": [{"path": "/videos", "excludeVideo": False}],
+            "stashBoxes": [{"endpoint": "https://stashdb.org", "name": "StashDB"}],
+            "databasePath": "/data/stash.db",
+            "logLevel": "Info",
+        },
+        "interface": {"language": "en-GB"},
+        "plugins": {"renamer": {"dryRun": True}},
+    }
+
+    def _count_posts(self, monkeypatch, configuration=None):
+        calls = []
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {
+            "data": {"configuration": configuration or self.CONFIGURATION}
+        }
+
+        def mock_post(*args, **kwargs):
+            calls.append(kwargs)
+            return response
+
+        monkeypatch.setattr("requests.Session.post", mock_post)
+        return calls
+
+    def test_helpers_share_one_request(self, monkeypatch):
+        """Test a cold start reads every helper with one GraphQL call."""
+        calls = self._count_posts(monkeypatch)
+        fragment = {"Host": "localhost"}
+        assert GET_STASH_API_KEY(fragment) == "snap_key"
+        assert GET_STASH_BOXES(fragment)[0]["name"] == "StashDB"
+        assert GET_STASHES(fragment)[0]["path"] == "/videos"
+        assert GET_PATHS(fragment) == {"databasePath": "/data/stash.db"}
+        assert GET_SCRAPER_SOURCES(fragment) == []
+        assert GET_PLUGIN_SOURCES(fragment) == []
+        assert len(calls) == 1
+
+    def test_snapshot_authenticates_shared_connection(self, monkeypatch):
+        """Test the snapshot's API key is reused by get_connection."""
+        calls = self._count_posts(monkeypatch)
+        fragment = {"Host": "localhost"}
+        get_config_snapshot(fragment)
+        conn = get_connection(fragment)
+        assert conn.api_key == "snap_key"
+        conn.query("query { stats { scene_count } }")
+        assert calls[-1]["headers"] == {"apiKey": "snap_key"}
+        assert len(calls) == 2
+
+    def test_snapshot_views(self):
+        """Test interface, plugin and settings accessors."""
+        snapshot = ConfigSnapshot(self.CONFIGURATION)
+        assert snapshot.interface["language"] == "en-GB"
+        assert snapshot.plugin_settings("renamer") == {"dryRun": True}
+        assert snapshot.plugin_settings("missing") == {}
+        assert ConfigSnapshot({}).general == {}
+
+    def test_refresh_refetches(self, monkeypatch):
+        """Test refresh=True bypasses the in‑process cache."""
+        calls = self._count_posts(monkeypatch)
+        fragment = {"Host": "localhost"}
+        first = get_config_snapshot(fragment)
+        assert get_config_snapshot(fragment) is first
+        assert get_config_snapshot(fragment, refresh=True) is not first
+        assert len(calls) == 2
+
+    def test_rotated_cookie_refetches(self, monkeypatch):
+        """Test a new SessionCookie replaces the cached snapshot and connection."""
+        calls = self._count_posts(monkeypatch)
+        old = {"Host": "localhost", "SessionCookie": {"Name": "s", "Value": "1"}}
+        new = {"Host": "localhost", "SessionCookie": {"Name": "s", "Value": "2"}}
+        first = get_config_snapshot(old)
+        assert get_config_snapshot(old) is first
+        assert get_config_snapshot(new) is not first
+        assert get_connection(new).session.cookies.get("s") == "2"
+        assert len(calls) == 2
+
+    def test_disk_cache_round_trip(self, monkeypatch, tmp_path):
+        """Test a persisted snapshot is reused by a later process."""
+        calls = self._count_posts(monkeypatch)
+        fragment = {"Host": "localhost"}
+        cache = tmp_path / "config.json"
+        get_config_snapshot(fragment, cache_path=cache, ttl=60)
+        assert cache.exists()
+
+        invalidate_connection()  # simulate a new process
+        snapshot = get_config_snapshot(fragment, cache_path=cache, ttl=60)
+        assert snapshot.api_key == "snap_key"
+        assert get_connection(fragment).api_key == "snap_key"
+        assert len(calls) == 1
+
+    def test_disk_cache_expires(self, monkeypatch, tmp_path):
+        """Test a snapshot older than the TTL is fetched again."""
+        calls = self._count_posts(monkeypatch)
+        cache = tmp_path / "config.json"
+        ConfigSnapshot({"general": {"apiKey": "old"}}, fetched_at=0).save(cache)
+        snapshot = get_config_snapshot({}, cache_path=cache, ttl=60)
+        assert snapshot.api_key == "snap_key"
+        assert ConfigSnapshot.load(cache).api_key == "snap_key"
+        assert len(calls) == 1
+
+    def test_load_ignores_corrupt_file(self, tmp_path):
+        """Test unreadable cache files are treated as missing."""
+        cache = tmp_path / "config.json"
+        cache.write_text("{not json")
+        assert ConfigSnapshot.load(cache) is None
+        assert ConfigSnapshot.load(tmp_path / "missing.json") is None
+
+    def test_failed_fetch_is_not_cached(self, monkeypatch):
+        """Test a failed fetch leaves no half‑built connection behind."""
+
+        def mock_post(*args, **kwargs):
+            raise requests.HTTPError("500")
+
+        monkeypatch.setattr("requests.Session.post", mock_post)
+        try:
+            get_config_snapshot({"Host": "localhost"})
+        except requests.HTTPError:
+            pass
+        calls = self._count_posts(monkeypatch)
+        assert get_connection({"Host": "localhost"}).api_key == "snap_key"
+        assert len(calls) == 1
+
+    def test_error_response_raises(self, monkeypatch, tmp_path):
+        """Test execution errors raise and are neither cached nor saved."""
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {
+            "data": None,
+            "errors": [{"message": "denied", "path": ["configuration"]}],
+        }
+        monkeypatch.setattr("requests.Session.post", lambda *a, **kw: response)
+        cache = tmp_path / "snapshot.json"
+        with pytest.raises(GraphQLError, match="denied"):
+            get_config_snapshot({"Host": "localhost"}, cache_path=cache)
+        assert not cache.exists()
+        calls = self._count_posts(monkeypatch)
+        assert get_config_snapshot({"Host": "localhost"}).api_key == "snap_key"
+        assert len(calls) == 1
+
+    def test_validation_error_falls_back_to_sections(self, monkeypatch):
+        """Test an older server is read with one narrow query per helper."""
+        queries = []
+
+        def mock_post(*args, **kwargs):
+            query = kwargs["json"]["query"]
+            queries.append(query)
+            response = Mock()
+            response.raise_for_status.return_value = None
+            if "ConfigSnapshot" in query or "pluginPackageSources" in query:
+                response.json.return_value = {
+                    "errors": [{"message": "Cannot query field"}]
+                }
+            elif "apiKey" in query:
+                general = {"apiKey": "old_key", "username": ""}
+                response.json.return_value = {
+                    "data": {"configuration": {"general": general}}
+                }
+            elif "stashes" in query:
+                stashes = [{"path": "/videos", "excludeVideo": False}]
+                response.json.return_value = {
+                    "data": {"configuration": {"general": {"stashes": stashes}}}
+                }
+            else:
+                response.json.return_value = {"data": {"configuration": {}}}
+            return response
+
+        monkeypatch.setattr("requests.Session.post", mock_post)
+        fragment = {"Host": "localhost"}
+        assert GET_STASH_API_KEY(fragment) == "old_key"
+        assert GET_STASHES(fragment)[0]["path"] == "/videos"
+        assert GET_PLUGIN_SOURCES(fragment) == []
+        assert len(queries) == 9
+        assert GET_STASHES(fragment)
+        assert len(queries) == 9
+
+
+class TestIterPages:
+    """Test the paginated find* iterator."""
+
+    QUERY = (
+        "query ($filter: FindFilterType) "
+        "{ findScenes(filter: $filter) { count scenes { id } } }"
+    )
+
+    def _library(self, monkeypatch, size, with_count=True):
+        conn = StashConnection("http://localhost:9999", requests.Session())
+        pages = []
+        lock = threading.Lock()
+
+        def mock_post(*args, **kwargs):
+            find_filter = kwargs["json"]["variables"]["filter"]
+            with lock:
+                pages.append(find_filter)
+            page, per_page = find_filter["page"], find_filter["per_page"]
+            start = (page - 1) * per_page
+            scenes = [{"id": str(i)} for i in range(start, min(start + per_page, size))]
+            result = {"scenes": scenes}
+            if with_count:
+                result["count"] = size
+            response = Mock()
+            response.raise_for_status.return_value = None
+            response.json.return_value = {"data": {"findScenes": result}}
+            return response
+
+        monkeypatch.setattr(conn.session, "post", mock_post)
+        return conn, pages
+
+    @pytest.mark.parametrize("prefetch", [0, 1, 3])
+    def test_yields_every_entity_in_order(self, monkeypatch, prefetch):
+        """Test all pages are walked exactly once."""
+        conn, pages = self._library(monkeypatch, 10)
+        scenes = conn.iter_pages(self.QUERY, per_page=3, prefetch=prefetch)
+        ids = [s["id"] for s in scenes]
+        assert ids == [str(i) for i in range(10)]
+        assert sorted(p["page"] for p in pages) == [1, 2, 3, 4]
+
+    @pytest.mark.parametrize("prefetch", [0, 2])
+    def test_without_count_stops_on_short_page(self, monkeypatch, prefetch):
+        """Test iteration ends on the first short page when count is absent."""
+        conn, pages = self._library(monkeypatch, 6, with_count=False)
+        items = list(conn.iter_pages(self.QUERY, per_page=3, prefetch=prefetch))
+        assert len(items) == 6
+        assert sorted(p["page"] for p in pages) == [1, 2, 3]
+
+    def test_default_sort_is_stable(self, monkeypatch):
+        """Test id ascending is used unless the caller sorts."""
+        conn, pages = self._library(monkeypatch, 1)
+        list(conn.iter_pages(self.QUERY))
+        assert pages[0]["sort"] == "id"
+        assert pages[0]["direction"] == "ASC"
+
+        conn, pages = self._library(monkeypatch, 1)
+        variables = {"filter": {"sort": "title", "q": "beach"}}
+        list(conn.iter_pages(self.QUERY, variables, per_page=5))
+        assert pages[0] == {
+            "sort": "title",
+            "q": "beach",
+            "direction": "ASC",
+            "per_page": 5,
+            "page": 1,
+        }
+        assert variables == {"filter": {"sort": "title", "q": "beach"}}
+
+    def test_empty_library(self, monkeypatch):
+        """Test an empty result yields nothing after one request."""
+        conn, pages = self._library(monkeypatch, 0)
+        assert list(conn.iter_pages(self.QUERY)) == []
+        assert len(pages) == 1
+
+    def test_prefetch_is_bounded(self, monkeypatch):
+        """Test stopping early leaves at most `prefetch` pages requested."""
+        conn, pages = self._library(monkeypatch, 1000)
+        iterator = conn.iter_pages(self.QUERY, per_page=10, prefetch=2)
+        for _ in range(5):
+            next(iterator)
+        iterator.close()
+        assert len(pages) <= 3
+
+    def test_graphql_errors_raise(self, monkeypatch):
+        """Test server errors surface as GraphQLError."""
+        conn = StashConnection("http://localhost:9999", requests.Session())
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {"data": None, "errors": [{"message": "boom"}]}
+        monkeypatch.setattr(conn.session, "post", lambda *a, **k: response)
+        with pytest.raises(GraphQLError, match="boom") as info:
+            list(conn.iter_pages(self.QUERY))
+        assert info.value.errors == [{"message": "boom"}]
+
+    def test_rejects_ambiguous_results(self, monkeypatch):
+        """Test responses without a single entity list are refused."""
+        conn = StashConnection("http://localhost:9999", requests.Session())
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {"data": {"a": {"count": 1}, "b": {}}}
+        monkeypatch.setattr(conn.session, "post", lambda *a, **k: response)
+        with pytest.raises(ValueError):
+            list(conn.iter_pages(self.QUERY))
@@ -0,0 +1,256 @@
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from stash_connection_lib import shim
+from stash_connection_lib.daemon import PluginDaemon, load_handler, run_inline
+from stash_connection_lib.testing import FakeStash
+
+HANDLERS = """
+import threading, time
+
+calls = []
+release = threading.Event()
+release.set()
+active = [0, 0]  # now, max
+lock = threading.Lock()
+
+def on_update(conn, payload):
+    with lock:
+        active[0] += 1
+        active[1] = max(active)
+    release.wait(5)
+    time.sleep(0.01)
+    with lock:
+        active[0] -= 1
+    calls.append(payload["args"].get("hookContext", {}).get("input"))
+    return "done"
+
+def title(conn, payload):
+    scene_id = payload["args"]["hookContext"]["id"]
+    query = "query ($id: ID!) { findScene(id: $id) { title } }"
+    return conn.query(query, {"id": scene_id})["data"]["findScene"]["title"]
+
+def broken(conn, payload):
+    raise KeyError("oops")
+"""
+
+
+def hook(scene_id, value=None, fragment=None):
+    payload = {
+        "args": {
+            "hookContext": {"type": "Scene.Update.Post", "id": scene_id, "input": value}
+        }
+    }
+    if fragment:
+        payload["server_connection"] = fragment
+    return payload
+
+
+@pytest.fixture
+def plugin_dir(tmp_path, monkeypatch):
+    (tmp_path / "handlers.py").write_text(HANDLERS)
+    monkeypatch.setenv("STASH_CONNECTION_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path
+
+
+@pytest.fixture
+def daemon(plugin_dir):
+    daemon = PluginDaemon(max_workers=2)
+    daemon.start_workers()
+    yield daemon
+    daemon.stop()
+
+
+class TestQueue:
+    """Test coalescing and bounded concurrency without sockets."""
+
+    def test_queued_duplicates_coalesce(self, daemon, plugin_dir):
+        module = load_handler("handlers.py:on_update", str(plugin_dir)).__globals__
+        module["release"].clear()
+        spec, cwd = "handlers.py:on_update", str(plugin_dir)
+        first = daemon.submit(spec, hook(1, "a"), cwd)
+        while daemon.stats()["running"] < 1:
+            time.sleep(0.01)
+        later = [daemon.submit(spec, hook(1, value), cwd) for value in "bcd"]
+        other = daemon.submit(spec, hook(2, "x"), cwd)
+        module["release"].set()
+        assert first.result(5) == {"output": "done"}
+        assert [f.result(5) for f in later] == [{"output": "done"}] * 3
+        assert other.result(5) == {"output": "done"}
+        assert sorted(module["calls"]) == ["a", "d", "x"]
+        stats = daemon.stats()
+        assert (stats["received"], stats["coalesced"], stats["processed"]) == (5, 2, 3)
+
+    def test_concurrency_is_bounded(self, daemon, plugin_dir):
+        spec, cwd = "handlers.py:on_update", str(plugin_dir)
+        futures = [daemon.submit(spec, hook(i), cwd) for i in range(8)]
+        for future in futures:
+            future.result(5)
+        assert load_handler(spec, cwd).__globals__["active"][1] == 2
+
+    def test_tasks_are_never_merged(self, daemon, plugin_dir):
+        spec, cwd = "handlers.py:on_update", str(plugin_dir)
+        futures = [
+            daemon.submit(spec, {"args": {"mode": "all"}}, cwd) for _ in range(3)
+        ]
+        assert all(f.result(5) == {"output": "done"} for f in futures)
+        assert daemon.stats()["coalesced"] == 0
+
+    def test_errors_are_replies(self, plugin_dir):
+        reply = run_inline("handlers.py:broken", {}, str(plugin_dir))
+        assert reply == {"error": "KeyError: 'oops'"}
+        with pytest.raises(ValueError):
+            load_handler("handlers.py", str(plugin_dir))
+
+    def test_plugins_with_the_same_module_name(self, tmp_path):
+        for plugin in ("a", "b"):
+            directory = tmp_path / plugin
+            directory.mkdir()
+            (directory / "helpers.py").write_text(f"NAME = {plugin.upper()!r}\n")
+            (directory / "handlers.py").write_text(
+                "from . import helpers\n\ndef h(conn, payload):\n"
+                "    return helpers.NAME\n"
+            )
+        path = list(sys.path)
+        for plugin, name in (("a", "A"), ("b", "B"), ("a", "A")):
+            reply = run_inline("handlers:h", {}, str(tmp_path / plugin))
+            assert reply == {"output": name}
+        assert run_inline("handlers.py:h", {}, str(tmp_path / "b")) == {"output": "B"}
+        assert sys.path == path
+
+    def test_changed_file_is_reloaded(self, plugin_dir):
+        first = load_handler("handlers.py:title", str(plugin_dir))
+        assert load_handler("handlers.py:title", str(plugin_dir)) is first
+        path = plugin_dir / "handlers.py"
+        path.write_text(HANDLERS + "\n# edited\n")
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        assert load_handler("handlers.py:title", str(plugin_dir)) is not first
+
+
+class TestShim:
+    """Test the shim against a daemon serving on a local socket."""
+
+    def _shim(self, monkeypatch, capsys, payload, *args):
+        monkeypatch.setattr(sys, "stdin", io.StringIO(json.dumps(payload)))
+        code = shim.main(list(args))
+        return code, json.loads(capsys.readouterr().out)
+
+    def test_events_through_the_socket(self, plugin_dir, monkeypatch, capsys):
+        monkeypatch.chdir(plugin_dir)
+        daemon = PluginDaemon(max_workers=2)
+        server = threading.Thread(target=daemon.serve)
+        server.start()
+        try:
+            with FakeStash(scenes=5) as stash:
+                payload = hook("3", fragment=stash.fragment)
+                while shim.forward({"command": "stats"}, start=False) is None:
+                    time.sleep(0.01)
+                code, out = self._shim(
+                    monkeypatch, capsys, payload, "handlers.py:title"
+                )
+                assert (code, out) == (0, {"output": "queued"})
+                code, out = self._shim(
+                    monkeypatch,
+                    capsys,
+                    hook("4", fragment=stash.fragment),
+                    "--wait",
+                    "handlers.py:title",
+                )
+                assert out == {"output": stash.tables["scenes"]["4"]["title"]}
+                code, out = self._shim(
+                    monkeypatch, capsys, {"args": {}}, "handlers.py:broken"
+                )
+                assert (code, out) == (1, {"error": "KeyError: 'oops'"})
+                while shim.request({"command": "stats"})["processed"] < 3:
+                    time.sleep(0.01)  # the queued event may still be running
+                # one snapshot + one findScene per event, on one warm connection
+                assert stash.stats()["operations"] == {
+                    "configuration": 1,
+                    "findScene": 2,
+                }
+            assert shim.request({"command": "stats"})["processed"] == 3
+            assert shim.request({"command": "stop"}) == {"stopping": True}
+        finally:
+            daemon.stop(wait=False)
+            server.join(10)
+        assert not server.is_alive()
+        assert not (plugin_dir / "cache" / "daemon" / "address.json").exists()
+
+    def test_bad_token_is_rejected(self, plugin_dir):
+        daemon = PluginDaemon()
+        assert daemon._reply({"command": "stats", "token": "x"}) == {
+            "error": "invalid daemon token"
+        }
+
+    def test_replies_are_newline_terminated(self, plugin_dir):
+        daemon = PluginDaemon()
+        server, client = socket.socketpair()
+        message = {"command": "stats", "token": daemon._token}
+        client.sendall(json.dumps(message).encode() + b"\n")
+        daemon._answer(server)
+        with client:
+            reply = client.recv(1 << 16)
+        assert reply.endswith(b"\n")
+        assert json.loads(reply)["processed"] == 0
+
+    def test_wait_is_bounded(self, plugin_dir):
+        daemon = PluginDaemon(wait_timeout=0.05)
+        daemon.start_workers()
+        module = load_handler("handlers.py:on_update", str(plugin_dir)).__globals__
+        module["release"].clear()
+        try:
+            reply = daemon._reply(
+                {
+                    "token": daemon._token,
+                    "handler": "handlers.py:on_update",
+                    "cwd": str(plugin_dir),
+                    "payload": hook(1, "slow"),
+                    "wait": True,
+                }
+            )
+            assert reply == {"error": "handler still running after 0.05s"}
+        finally:
+            module["release"].set()
+            daemon.stop()
+
+    def test_runs_inline_without_daemon(self, plugin_dir, monkeypatch, capsys):
+        monkeypatch.chdir(plugin_dir)
+        monkeypatch.setattr(shim, "_start_daemon", lambda: None)
+        monkeypatch.setattr(shim, "STARTUP_TIMEOUT", 0.1)
+        code, out = self._shim(
+            monkeypatch, capsys, hook(1, "z"), "handlers.py:on_update"
+        )
+        assert (code, out) == (0, {"output": "done"})
+
+    def test_shim_starts_daemon(self, plugin_dir):
+        env = dict(os.environ, PYTHONPATH=os.getcwd())
+        run = [
+            sys.executable,
+            "-m",
+            "stash_connection_lib.shim",
+            "handlers.py:on_update",
+        ]
+        proc = subprocess.run(
+            run,
+            input=json.dumps(hook(1, "v")),
+            capture_output=True,
+            text=True,
+            cwd=plugin_dir,
+            env=env,
+            timeout=30,
+        )
+        assert json.loads(proc.stdout) == {"output": "queued"}
+        stop = [sys.executable, "-m", "stash_connection_lib.daemon", "stop"]
+        subprocess.run(stop, cwd=plugin_dir, env=env, check=True, timeout=30)
+        deadline = time.monotonic() + 10
+        address = plugin_dir / "cache" / "daemon" / "address.json"
+        while address.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not address.exists()
@@ -0,0 +1,189 @@
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+import requests
+from stash_connection_lib.core import StashConnection
+from stash_connection_lib.dedupe import SingleFlight, TTLCache, request_key
+
+
+def _response(body=b'{"data": {"findStudio": {"id": "1"}}}'):
+    response = Mock()
+    response.raise_for_status.return_value = None
+    response.content = body
+    return response
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+QUERY = "query ($id: ID!) { findStudio(id: $id) { id } }"
+
+
+class TestSingleFlight:
+    """Test concurrent identical queries share one request."""
+
+    def _blocking(self, monkeypatch, conn, body=None, error=None):
+        release = threading.Event()
+        posts = []
+
+        def mock_post(*args, **kwargs):
+            posts.append(kwargs["json"])
+            release.wait(5)
+            if error is not None:
+                raise error
+            return _response(body) if body else _response()
+
+        monkeypatch.setattr(conn.session, "post", mock_post)
+        return release, posts
+
+    def _run(self, conn, count, variables=None):
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(conn.query(QUERY, variables or {"id": "1"}))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def test_concurrent_callers_share_one_request(self, monkeypatch):
+        conn = StashConnection(
+            "http://localhost:9999", requests.Session(), single_flight=True
+        )
+        release, posts = self._blocking(monkeypatch, conn)
+        threads, results, _ = self._run(conn, 8)
+        _wait_for(lambda: conn.dedupe_stats()["shared"] == 7)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(posts) == 1
+        assert results == [{"data": {"findStudio": {"id": "1"}}}] * 8
+        assert len({id(r) for r in results}) == 8
+        stats = conn.dedupe_stats()
+        assert stats["requests"] == 1
+        assert stats["saved"] == 7
+        assert conn.stats()["findStudio"]["count"] == 8
+
+    def test_leader_error_reaches_waiters(self, monkeypatch):
+        conn = StashConnection(
+            "http://localhost:9999",
+            requests.Session(),
+            single_flight=True,
+            max_retries=0,
+        )
+        release, posts = self._blocking(
+            monkeypatch, conn, error=requests.ConnectionError("down")
+        )
+        threads, results, errors = self._run(conn, 3)
+        _wait_for(lambda: conn.dedupe_stats()["shared"] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(posts) == 1
+        assert results == []
+        assert len(errors) == 3
+
+    def test_mutations_are_never_shared(self, monkeypatch):
+        conn = StashConnection(
+            "http://localhost:9999", requests.Session(), single_flight=True
+        )
+        posts = []
+        monkeypatch.setattr(
+            conn.session, "post", lambda *a, **k: posts.append(1) or _response()
+        )
+        for _ in range(2):
+            conn.query("mutation { metadataScan(input: {}) }")
+        assert len(posts) == 2
+        assert conn.dedupe_stats()["requests"] == 0
+
+    def test_sequential_calls_are_not_shared(self):
+        flights = SingleFlight()
+        assert flights.do(("q", ""), lambda: 1) == (1, False)
+        assert flights.do(("q", ""), lambda: 2) == (2, False)
+        assert flights.in_flight() == 0
+
+    def test_request_key_ignores_variable_order(self):
+        assert request_key("q", {"a": 1, "b": 2}) == request_key("q", {"b": 2, "a": 1})
+        assert request_key("q", {"a": 1}) != request_key("q", {"a": 2})
+        assert request_key("q", None) == request_key("q", {})
+
+
+class TestTTLCache:
+    """Test the short-lived response cache."""
+
+    @pytest.fixture
+    def conn(self, monkeypatch):
+        conn = StashConnection(
+            "http://localhost:9999", requests.Session(), cache_ttl=5.0
+        )
+        conn.posts = []
+
+        def mock_post(*args, **kwargs):
+            conn.posts.append(kwargs["json"])
+            return _response(conn.body)
+
+        conn.body = b'{"data": {"findStudio": {"id": "1"}}}'
+        monkeypatch.setattr(conn.session, "post", mock_post)
+        return conn
+
+    def test_repeated_queries_hit_cache(self, conn):
+        first = conn.query(QUERY, {"id": "1"})
+        first["data"]["findStudio"]["id"] = "changed"
+        assert conn.query(QUERY, {"id": "1"}) == {"data": {"findStudio": {"id": "1"}}}
+        conn.query(QUERY, {"id": "2"})
+        assert len(conn.posts) == 2
+        assert conn.dedupe_stats()["cache_hits"] == 1
+
+    def test_entries_expire(self, conn, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(
+            "stash_connection_lib.dedupe.time.monotonic", lambda: now[0]
+        )
+        conn.query(QUERY, {"id": "1"})
+        now[0] += 4.9
+        conn.query(QUERY, {"id": "1"})
+        now[0] += 0.2
+        conn.query(QUERY, {"id": "1"})
+        assert len(conn.posts) == 2
+
+    def test_errors_are_not_cached(self, conn):
+        conn.body = b'{"data": null, "errors": [{"message": "boom"}]}'
+        conn.query(QUERY, {"id": "1"})
+        conn.query(QUERY, {"id": "1"})
+        assert len(conn.posts) == 2
+
+    def test_mutation_clears_cache(self, conn):
+        conn.query(QUERY, {"id": "1"})
+        conn.query("mutation { studioUpdate(input: {id: 1}) { id } }")
+        conn.query(QUERY, {"id": "1"})
+        assert len(conn.posts) == 3
+
+    def test_disabled_by_default(self, monkeypatch):
+        conn = StashConnection("http://localhost:9999", requests.Session())
+        posts = []
+        monkeypatch.setattr(
+            conn.session, "post", lambda *a, **k: posts.append(1) or _response()
+        )
+        conn.query(QUERY, {"id": "1"})
+        conn.query(QUERY, {"id": "1"})
+        assert len(posts) == 2
+        assert conn.dedupe_stats()["saved"] == 0
+
+    def test_lru_bound(self):
+        cache = TTLCache(60, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put((key, ""), key)
+        assert len(cache) == 2
+        assert cache.get(("a", "")) is None
+        assert cache.get(("c", "")) == "c"
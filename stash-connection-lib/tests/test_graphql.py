@@ -0,0 +1,126 @@
+import pytest
+from stash_connection_lib.graphql import (
+    EnumValue,
+    Field,
+    FragmentSpread,
+    GraphQLSyntaxError,
+    InlineFragment,
+    Variable,
+    parse,
+    print_document,
+)
+
+
+class TestParse:
+    """Test cases for the GraphQL parser."""
+
+    def test_shorthand_query(self):
+        """Test an anonymous selection set is a query."""
+        op = parse("{ stats { scene_count } }").operation()
+        assert op.operation == "query"
+        assert op.name is None
+        assert op.selection_set[0].name == "stats"
+
+    def test_operation_with_variables(self):
+        """Test variable definitions, defaults and references."""
+        op = parse(
+            'query Find($filter: FindFilterType, $ids: [ID!]! = ["1"]) '
+            "{ findScenes(filter: $filter, ids: $ids) { count } }"
+        ).operation()
+        assert op.name == "Find"
+        assert [(v.name, v.type) for v in op.variable_definitions] == [
+            ("filter", "FindFilterType"),
+            ("ids", "[ID!]!"),
+        ]
+        assert not op.variable_definitions[0].has_default
+        assert op.variable_definitions[1].default_value == ["1"]
+        assert op.selection_set[0].arguments["filter"] == Variable("filter")
+
+    def test_literal_values(self):
+        """Test every literal kind is decoded."""
+        field = (
+            parse(
+                '{ f(i: -3, x: 1.5e2, s: "a\\"b", b: true, n: null, '
+                "e: EQUALS, l: [1, 2], o: {k: FALSE}) }"
+            )
+            .operation()
+            .selection_set[0]
+        )
+        assert field.arguments == {
+            "i": -3,
+            "x": 150.0,
+            "s": 'a"b',
+            "b": True,
+            "n": None,
+            "e": EnumValue("EQUALS"),
+            "l": [1, 2],
+            "o": {"k": EnumValue("FALSE")},
+        }
+
+    def test_block_string(self):
+        """Test block strings are dedented."""
+        field = (
+            parse('{ f(s: """\n    one\n      two\n  """) }')
+            .operation()
+            .selection_set[0]
+        )
+        assert field.arguments["s"] == "one\n  two"
+
+    def test_aliases_and_fragments(self):
+        """Test aliases, fragment spreads and inline fragments."""
+        doc = parse(
+            "query { s: findScene(id: 1) { ...F ... on Scene { id } } } "
+            "fragment F on Scene { title }"
+        )
+        field = doc.operation().selection_set[0]
+        assert isinstance(field, Field)
+        assert (field.alias, field.name, field.response_key) == ("s", "findScene", "s")
+        assert isinstance(field.selection_set[0], FragmentSpread)
+        assert isinstance(field.selection_set[1], InlineFragment)
+        assert doc.fragments["F"].type_condition == "Scene"
+
+    def test_operation_lookup(self):
+        """Test selecting operations by name."""
+        doc = parse("query A { a } mutation B { b }")
+        assert doc.operation("B").operation == "mutation"
+        with pytest.raises(ValueError):
+            doc.operation()
+        with pytest.raises(ValueError):
+            doc.operation("C")
+
+    @pytest.mark.parametrize(
+        "source",
+        [
+            "",
+            "{ }",
+            "query { a(",
+            "{ a(b: $) }",
+            "query ($x: Int = $y) { a }",
+            "{ a ~ }",
+        ],
+    )
+    def test_syntax_errors(self, source):
+        """Test malformed documents raise GraphQLSyntaxError."""
+        with pytest.raises(GraphQLSyntaxError):
+            parse(source)
+
+    def test_error_position(self):
+        """Test syntax errors report line and column."""
+        with pytest.raises(GraphQLSyntaxError, match="line 2, column 5"):
+            parse("{\n  a(}")
+
+
+class TestPrint:
+    """Test cases for the GraphQL printer."""
+
+    def test_round_trip(self):
+        """Test printing then parsing yields the same document."""
+        source = (
+            'query Q($f: FindFilterType = {per_page: 10, sort: "id"}) @cached { '
+            "findScenes(filter: $f) @include(if: true) "
+            "{ count s: scenes { id ...F } } }\n"
+            "fragment F on Scene { title }"
+        )
+        printed = print_document(parse(source))
+        assert printed == source
+        assert print_document(parse(printed)) == printed
@@ -0,0 +1,168 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+import requests
+from stash_connection_lib.core import STATS_FILE_ENV, StashConnection
+from stash_connection_lib.instrumentation import (
+    QueryEvent,
+    QueryStats,
+    append_stats,
+    operation_name,
+)
+
+
+def _connection(monkeypatch, payload=None, error=None):
+    conn = StashConnection("http://localhost:9999", requests.Session())
+
+    def mock_post(*args, **kwargs):
+        if error is not None:
+            raise error
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = payload or {"data": {}}
+        response.request.body = json.dumps(kwargs["json"]).encode()
+        response.content = json.dumps(response.json.return_value).encode()
+        return response
+
+    monkeypatch.setattr(conn.session, "post", mock_post)
+    return conn
+
+
+class TestOperationName:
+    """Test how queries are labelled."""
+
+    @pytest.mark.parametrize(
+        "query, expected",
+        [
+            (
+                "query FindScenes($f: FindFilterType) { findScenes { count } }",
+                "FindScenes",
+            ),
+            ("  mutation SceneUpdate { sceneUpdate { id } }", "SceneUpdate"),
+            ("{ stats { scene_count } }", "stats"),
+            ("query { s: findScene(id: 1) { id } }", "findScene"),
+            ("mutation($id: ID!) { sceneDestroy(id: $id) }", "sceneDestroy"),
+            ("# leading comment\nquery Named { a }", "Named"),
+            ("", "anonymous"),
+        ],
+    )
+    def test_operation_name(self, query, expected):
+        assert operation_name(query) == expected
+
+
+class TestConnectionStats:
+    """Test the stats surface of StashConnection."""
+
+    def test_counts_per_operation(self, monkeypatch):
+        """Test counts, bytes and latency are kept per operation."""
+        conn = _connection(monkeypatch)
+        for _ in range(3):
+            conn.query("query FindScenes { findScenes { count } }")
+        conn.query("{ stats { scene_count } }")
+
+        stats = conn.stats()
+        assert set(stats) == {"FindScenes", "stats"}
+        scenes = stats["FindScenes"]
+        assert scenes["count"] == 3
+        assert scenes["errors"] == 0
+        assert scenes["error_rate"] == 0
+        assert scenes["request_bytes"] > 0
+        assert scenes["response_bytes"] == 3 * len(b'{"data": {}}')
+        assert 0 <= scenes["p50_ms"] <= scenes["p99_ms"] <= scenes["max_ms"]
+
+    def test_graphql_errors_count_as_errors(self, monkeypatch):
+        """Test responses carrying errors raise the error rate."""
+        conn = _connection(monkeypatch, {"data": None, "errors": [{"message": "x"}]})
+        conn.query("{ broken }")
+        assert conn.stats()["broken"]["error_rate"] == 1
+
+    def test_transport_errors_are_recorded(self, monkeypatch):
+        """Test failed requests are counted before the error propagates."""
+        conn = _connection(monkeypatch, error=requests.HTTPError("400"))
+        with pytest.raises(requests.HTTPError):
+            conn.query("{ stats }")
+        assert conn.stats()["stats"]["errors"] == 1
+
+    def test_reset_stats(self, monkeypatch):
+        conn = _connection(monkeypatch)
+        conn.query("{ stats }")
+        conn.reset_stats()
+        assert conn.stats() == {}
+
+
+class TestHooks:
+    """Test pre/post instrumentation hooks."""
+
+    def test_pre_and_post_hooks(self, monkeypatch):
+        """Test hooks see the request before and the outcome after."""
+        conn = _connection(monkeypatch)
+        seen = []
+        conn.add_hook(
+            pre=lambda e: seen.append(("pre", e.operation, e.duration)),
+            post=lambda e: seen.append(("post", e.operation, e.attempts, e.failed)),
+        )
+        conn.query("query A { a }", {"x": 1})
+        assert seen == [("pre", "A", 0.0), ("post", "A", 1, False)]
+
+    def test_post_hook_runs_on_failure(self, monkeypatch):
+        """Test post hooks receive the exception."""
+        error = requests.HTTPError("400")
+        conn = _connection(monkeypatch, error=error)
+        events = []
+        conn.add_hook(post=events.append)
+        with pytest.raises(requests.HTTPError):
+            conn.query("{ a }")
+        assert events[0].error is error
+
+    def test_remove_hook(self, monkeypatch):
+        conn = _connection(monkeypatch)
+        events = []
+        conn.add_hook(pre=events.append, post=events.append)
+        conn.remove_hook(events.append)
+        conn.query("{ a }")
+        assert events == []
+
+
+class TestStatsDump:
+    """Test stats persistence."""
+
+    def test_append_stats_writes_json_lines(self, tmp_path):
+        path = tmp_path / "stats.jsonl"
+        append_stats(path, "http://a/graphql", {"a": {"count": 1}})
+        append_stats(path, "http://b/graphql", {})
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line["url"] for line in lines] == [
+            "http://a/graphql",
+            "http://b/graphql",
+        ]
+        assert lines[0]["stats"] == {"a": {"count": 1}}
+        assert "pid" in lines[0] and "argv" in lines[0]
+
+    def test_env_var_registers_exit_dump(self, monkeypatch, tmp_path):
+        """Test STASH_CONNECTION_STATS dumps stats when Python exits."""
+        registered = []
+        monkeypatch.setattr(
+            "stash_connection_lib.core.atexit.register", registered.append
+        )
+        monkeypatch.setenv(STATS_FILE_ENV, str(tmp_path / "stats.jsonl"))
+        conn = _connection(monkeypatch)
+        conn.query("{ a }")
+        assert len(registered) == 1
+        registered[0]()
+        record = json.loads((tmp_path / "stats.jsonl").read_text())
+        assert record["stats"]["a"]["count"] == 1
+
+
+class TestQueryStats:
+    """Test the aggregator directly."""
+
+    def test_reservoir_is_bounded(self):
+        stats = QueryStats(max_samples=10)
+        for i in range(100):
+            event = QueryEvent("{ a }")
+            event.duration = i / 1000
+            stats.record(event)
+        assert len(stats._ops["a"].samples) == 10
+        assert stats.snapshot()["a"]["count"] == 100
+        assert stats.snapshot()["a"]["max_ms"] == pytest.approx(99)
@@ -0,0 +1,237 @@
+import json
+import sys
+import types
+
+import pytest
+import requests
+from stash_connection_lib.core import StashConnection, build_session
+from stash_connection_lib.jobs import JobError, JobManager, _JobSocket, coalesce_paths
+
+
+class FakeJobs:
+    """Serves metadataScan/metadataGenerate and findJob from scripted states."""
+
+    def __init__(self):
+        self.inputs = []
+        self.states = {}  # job id -> list of statuses still to report
+        self.finds = 0
+
+    def query(self, query, variables=None):
+        if "findJob" in query:
+            self.finds += 1
+            job_id = variables["id"]
+            states = self.states.get(job_id)
+            if states is None:
+                return {"data": {"findJob": None}}
+            status = states.pop(0) if len(states) > 1 else states[0]
+            job = {"id": job_id, "status": status, "progress": 0.5, "error": None}
+            if status == "FAILED":
+                job["error"] = "disk full"
+            return {"data": {"findJob": job}}
+        job_id = str(len(self.inputs) + 1)
+        self.inputs.append(variables["input"])
+        self.states[job_id] = ["READY"]
+        root = "metadataScan" if "metadataScan" in query else "metadataGenerate"
+        return {"data": {root: job_id}}
+
+
+class FakeWebSocket:
+    """websocket-client stand-in replaying server messages."""
+
+    def __init__(self, messages):
+        self.messages = [json.dumps(m) for m in messages]
+        self.sent = []
+        self.closed = False
+
+    def send(self, raw):
+        self.sent.append(json.loads(raw))
+
+    def settimeout(self, timeout):
+        pass
+
+    def recv(self):
+        if not self.messages:
+            raise TimeoutError
+        return self.messages.pop(0)
+
+    def close(self):
+        self.closed = True
+
+
+def _update(kind, job_id, status, progress=None):
+    job = {"id": job_id, "status": status, "progress": progress}
+    data = {"jobsSubscribe": {"type": kind, "job": job}}
+    return {"id": "1", "type": "next", "payload": {"data": data}}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeJobs()
+    conn = StashConnection("http://localhost:9999", requests.Session())
+    monkeypatch.setattr(conn, "query", fake.query)
+    monkeypatch.setattr("stash_connection_lib.jobs.time.sleep", lambda _: None)
+    return fake, conn
+
+
+class TestCoalescing:
+    """Test overlapping requests collapse into few jobs."""
+
+    def test_nested_paths_are_dropped(self):
+        paths = [
+            "/media/a/",
+            "/media/a/sub",
+            "/media/ab",
+            "/media/a",
+            "C:\\x",
+            "C:\\x\\y",
+        ]
+        assert coalesce_paths(paths) == ["/media/a", "/media/ab", "C:\\x"]
+
+    def test_scan_sends_coalesced_paths(self, server):
+        fake, conn = server
+        JobManager(conn).scan(["/m/a/b", "/m/a"], rescan=True)
+        assert fake.inputs == [{"rescan": True, "paths": ["/m/a"]}]
+
+    def test_covered_request_reuses_queued_job(self, server):
+        fake, conn = server
+        jobs = JobManager(conn)
+        first = jobs.scan(["/m/a", "/m/b"])
+        assert jobs.scan(["/m/a/new"]) is first
+        assert jobs.scan(["/m/c"]) is not first
+        assert jobs.scan(["/m/a"], rescan=True) is not first
+        assert len(fake.inputs) == 3
+
+    def test_running_job_is_not_reused(self, server):
+        fake, conn = server
+        jobs = JobManager(conn)
+        first = jobs.scan(["/m/a"])
+        fake.states[first.id] = ["RUNNING"]
+        assert jobs.scan(["/m/a"]) is not first
+
+    def test_generate_merges_ids(self, server):
+        fake, conn = server
+        jobs = JobManager(conn)
+        job = jobs.generate(scene_ids=[3, "1", 2, 3], covers=True)
+        assert fake.inputs[0] == {"covers": True, "sceneIDs": ["1", "2", "3"]}
+        assert jobs.generate(scene_ids=["2"], covers=True) is job
+        assert jobs.generate(covers=True) is not job
+
+
+class TestWaiting:
+    """Test waiting by polling and over the subscription socket."""
+
+    def test_poll_until_finished(self, server):
+        fake, conn = server
+        job = JobManager(conn, subscriptions=False).scan(["/m"])
+        fake.states[job.id] = ["READY", "RUNNING", "RUNNING", "FINISHED"]
+        seen = []
+        assert (
+            job.wait(progress=lambda j: seen.append(j["status"]))["status"]
+            == "FINISHED"
+        )
+        assert seen == ["READY", "RUNNING", "RUNNING", "FINISHED"]
+
+    def test_failed_job_raises(self, server):
+        fake, conn = server
+        job = JobManager(conn, subscriptions=False).scan()
+        fake.states[job.id] = ["RUNNING", "FAILED"]
+        with pytest.raises(JobError, match="disk full"):
+            job.wait()
+        assert job.wait(raise_on_failure=False)["status"] == "FAILED"
+
+    def test_forgotten_job_counts_as_done(self, server):
+        fake, conn = server
+        job = JobManager(conn, subscriptions=False).scan()
+        del fake.states[job.id]
+        assert job.wait() == {"id": job.id, "status": None}
+
+    def test_timeout(self, server, monkeypatch):
+        fake, conn = server
+        clock = [0.0]
+        monkeypatch.setattr(
+            "stash_connection_lib.jobs.time.monotonic", lambda: clock[0]
+        )
+        monkeypatch.setattr(
+            "stash_connection_lib.jobs.time.sleep",
+            lambda s: clock.__setitem__(0, clock[0] + s),
+        )
+        job = JobManager(conn, subscriptions=False).scan()
+        fake.states[job.id] = ["RUNNING"]
+        with pytest.raises(TimeoutError):
+            job.wait(timeout=3)
+
+    def _socket(self, monkeypatch, messages):
+        ws = FakeWebSocket([{"type": "connection_ack"}, *messages])
+
+        def open_socket(manager):
+            socket = _JobSocket(ws)
+            socket.init("key")
+            return socket
+
+        monkeypatch.setattr(JobManager, "_open_socket", open_socket)
+        return ws
+
+    def test_subscription_updates(self, server, monkeypatch):
+        fake, conn = server
+        ws = self._socket(
+            monkeypatch,
+            [
+                {"type": "ping"},
+                _update("UPDATE", "99", "RUNNING"),
+                _update("UPDATE", "1", "RUNNING", 0.25),
+                _update("UPDATE", "1", "RUNNING", 0.75),
+                _update("REMOVE", "1", "FINISHED", 1.0),
+            ],
+        )
+        job = JobManager(conn).scan(["/m"])
+        progress = []
+        final = job.wait(progress=lambda j: progress.append(j.get("progress")))
+        assert final["status"] == "FINISHED"
+        assert progress == [0.5, 0.25, 0.75, 1.0]
+        assert fake.finds == 1  # only the check for jobs that ended before subscribing
+        assert ws.sent[0] == {"type": "connection_init", "payload": {"ApiKey": "key"}}
+        assert {"type": "pong"} in ws.sent
+        assert ws.sent[-1] == {"id": "1", "type": "complete"}
+        assert ws.closed
+
+    def test_quiet_socket_falls_back_to_polls(self, server, monkeypatch):
+        fake, conn = server
+        self._socket(monkeypatch, [])
+        job = JobManager(conn).scan()
+        fake.states[job.id] = ["RUNNING", "RUNNING", "FINISHED"]
+        assert job.wait()["status"] == "FINISHED"
+
+    def test_socket_error_falls_back_to_polling(self, server, monkeypatch):
+        fake, conn = server
+        self._socket(monkeypatch, [{"id": "1", "type": "error", "payload": []}])
+        job = JobManager(conn).scan()
+        fake.states[job.id] = ["RUNNING", "RUNNING", "FINISHED"]
+        assert job.wait()["status"] == "FINISHED"
+
+    @pytest.mark.parametrize("transport", ["requests", "stdlib"])
+    def test_socket_sends_session_cookies(self, monkeypatch, transport):
+        opened = []
+
+        def create_connection(url, **options):
+            opened.append((url, options))
+            return FakeWebSocket([{"type": "connection_ack"}])
+
+        module = types.SimpleNamespace(
+            create_connection=create_connection, WebSocketTimeoutException=TimeoutError
+        )
+        monkeypatch.setitem(sys.modules, "websocket", module)
+        session = build_session(transport=transport)
+        session.cookies.set("session", "abc")
+        conn = StashConnection("http://localhost:9999", session, "key")
+        assert JobManager(conn)._open_socket() is not None
+        url, options = opened[0]
+        assert url == "ws://localhost:9999/graphql"
+        assert options["cookie"] == "session=abc"
+
+    def test_missing_websocket_client_polls(self, server, monkeypatch):
+        fake, conn = server
+        monkeypatch.setitem(sys.modules, "websocket", None)
+        job = JobManager(conn).scan()
+        assert JobManager(conn)._open_socket() is None
+        fake.states[job.id] = ["FINISHED"]
+        assert job.wait()["status"] == "FINISHED"
@@ -0,0 +1,142 @@
+import pytest
+import requests
+from conftest import FakeLibrary
+from stash_connection_lib.core import StashConnection
+from stash_connection_lib.mirror import LibraryMirror
+from stash_connection_lib.models import Scene, Tag
+
+
+def _scene(i, tag="1", path=None):
+    return {
+        "id": str(i),
+        "title": f"Scene {i}",
+        "studio": {"id": "5"},
+        "tags": [{"id": tag}],
+        "performers": [{"id": "8"}],
+        "groups": [{"group": {"id": "9"}, "scene_index": 1}],
+        "files": [
+            {
+                "id": str(100 + i),
+                "path": path or f"/media/dir/{i}.mp4",
+                "fingerprints": [{"type": "oshash", "value": f"os{i}"}],
+            }
+        ],
+    }
+
+
+@pytest.fixture
+def library(monkeypatch):
+    fake = FakeLibrary()
+    fake.save("findTags", {"id": "1", "name": "Outdoor"})
+    fake.save("findTags", {"id": "2", "name": "Indoor"})
+    fake.save("findStudios", {"id": "5", "name": "Studio", "parent_studio": None})
+    fake.save("findPerformers", {"id": "8", "name": "Jane"})
+    fake.save("findGroups", {"id": "9", "name": "Group", "studio": {"id": "5"}})
+    for i in range(1, 8):
+        fake.save("findScenes", _scene(i))
+    fake.save(
+        "findSceneMarkers",
+        {"id": "20", "seconds": 3.0, "scene": {"id": "1"}, "primary_tag": {"id": "1"}},
+    )
+    conn = StashConnection("http://localhost:9999", requests.Session())
+    monkeypatch.setattr(conn, "query", fake.query)
+    return fake, conn
+
+
+class TestLibraryMirror:
+    """Test syncing and lookups against a fake server."""
+
+    def test_initial_sync_and_lookups(self, library):
+        fake, conn = library
+        with LibraryMirror(conn, per_page=3) as mirror:
+            changed = mirror.sync()
+            assert changed == {
+                "tag": 2,
+                "studio": 1,
+                "performer": 1,
+                "group": 1,
+                "scene": 7,
+                "marker": 1,
+            }
+            scene = mirror.scene(3)
+            assert isinstance(scene, Scene)
+            assert scene.title == "Scene 3"
+            assert mirror.scene_by_path("/media/dir/4.mp4").id == "4"
+            assert len(mirror.scenes_under("/media/dir")) == 7
+            assert mirror.scenes_under("/media/di") == []
+            assert [s.id for s in mirror.scenes_by_fingerprint("os2")] == ["2"]
+            assert len(mirror.scenes_with_tag(1)) == 7
+            assert len(mirror.scenes_with_performer("8")) == 7
+            assert len(mirror.scenes_in_group(9)) == 7
+            assert len(mirror.scenes_for_studio(5)) == 7
+            assert mirror.find("tag", "outdoor") == [
+                Tag.from_dict(fake.tables["findTags"]["1"])
+            ]
+            assert mirror.markers_for_scene(1)[0]["id"] == "20"
+            assert mirror.latest("scene")[0].id == "7"
+
+    def test_incremental_sync_pulls_only_changes(self, library):
+        fake, conn = library
+        with LibraryMirror(conn, per_page=3) as mirror:
+            mirror.sync()
+            fake.save("findScenes", _scene(2, tag="2", path="/media/other/2.mp4"))
+            fake.queries.clear()
+
+            changed = mirror.sync(["scene"])
+
+            assert changed == {"scene": 1}
+            assert mirror.scene_by_path("/media/dir/2.mp4") is None
+            assert mirror.scene_by_path("/media/other/2.mp4").id == "2"
+            assert [s.id for s in mirror.scenes_with_tag(2)] == ["2"]
+            assert (
+                mirror.cursor("scene") == fake.tables["findScenes"]["2"]["updated_at"]
+            )
+
+    def test_sync_is_idempotent(self, library):
+        _, conn = library
+        with LibraryMirror(conn) as mirror:
+            mirror.sync()
+            assert mirror.sync() == {name: 0 for name in mirror.sync()}
+
+    def test_deleted_objects_are_pruned(self, library):
+        fake, conn = library
+        with LibraryMirror(conn) as mirror:
+            mirror.sync()
+            del fake.tables["findScenes"]["4"]
+            mirror.sync(["scene"])
+            assert mirror.scene(4) is None
+            assert mirror.count("scene") == 6
+            assert mirror.execute("SELECT COUNT(*) FROM files")[0][0] == 6
+
+    def test_deleted_tags_lose_their_links(self, library):
+        fake, conn = library
+        with LibraryMirror(conn) as mirror:
+            mirror.sync()
+            del fake.tables["findTags"]["1"]
+            mirror.sync(["tag"])
+            assert mirror.get("tag", 1) is None
+            assert mirror.scenes_with_tag(1) == []
+            count = mirror.execute("SELECT COUNT(*) FROM scene_tags WHERE tag_id = 1")
+            assert count[0][0] == 0
+
+    def test_mirror_persists_cursor(self, library, tmp_path):
+        fake, conn = library
+        path = tmp_path / "mirror.sqlite"
+        with LibraryMirror(conn, path) as mirror:
+            mirror.sync()
+        fake.queries.clear()
+        with LibraryMirror(conn, path) as mirror:
+            assert mirror.sync(["tag"]) == {"tag": 0}
+            assert mirror.count("tag") == 2
+        since = fake.queries[0][1]["tag_filter"]["updated_at"]["value"]
+        assert since.startswith("2024-01-01T00:00:01")
+
+    def test_dense_timestamps_do_not_loop(self, library):
+        """Test more than a page of objects sharing one second are all synced."""
+        fake, conn = library
+        for i in range(10, 20):
+            obj = fake.save("findTags", {"id": str(i), "name": f"t{i}"})
+            obj["updated_at"] = "2024-01-01T01:00:00Z"
+        with LibraryMirror(conn, per_page=3) as mirror:
+            mirror.sync(["tag"])
+            assert mirror.count("tag") == 12
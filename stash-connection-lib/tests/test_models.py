@@ -0,0 +1,139 @@
+import copy
+import sys
+
+import pytest
+from stash_connection_lib.models import (
+    Group,
+    ModelPool,
+    Performer,
+    Scene,
+    SceneFile,
+    Studio,
+    Tag,
+    iter_models,
+)
+
+STUDIO = {
+    "id": "7",
+    "name": "Studio Seven",
+    "parent_studio": {"id": "1", "name": "Parent"},
+}
+TAGS = [{"id": "1", "name": "Outdoor"}, {"id": "2", "name": "Indoor"}]
+
+
+def _scene(i, **extra):
+    scene = {
+        "id": str(i),
+        "title": f"Scene {i}",
+        "date": "2024-01-01",
+        "rating100": None,
+        "organized": True,
+        "urls": ["https://example.com/a"],
+        "studio": copy.deepcopy(STUDIO),
+        "tags": copy.deepcopy(TAGS),
+        "performers": [{"id": "3", "name": "Jane", "alias_list": ["J"]}],
+        "files": [
+            {
+                "id": str(i),
+                "path": f"/media/{i}.mp4",
+                "video_codec": "h264",
+                "fingerprints": [
+                    {"type": "oshash", "value": "abc"},
+                    {"type": "phash", "value": "def"},
+                ],
+            }
+        ],
+        "groups": [{"group": {"id": "9", "name": "Group"}, "scene_index": 2}],
+    }
+    scene.update(extra)
+    return scene
+
+
+class TestDecoding:
+    """Test building models from response dicts."""
+
+    def test_round_trip(self):
+        """Test to_dict() reproduces the response object exactly."""
+        data = _scene(1, sceneStreams=[{"url": "x"}])
+        scene = Scene.from_dict(data)
+        assert scene.to_dict() == data
+        assert scene.extra == {"sceneStreams": [{"url": "x"}]}
+
+    def test_typed_access(self):
+        scene = Scene.from_dict(_scene(1))
+        assert isinstance(scene.studio, Studio)
+        assert isinstance(scene.studio.parent_studio, Studio)
+        assert [t.name for t in scene.tags] == ["Outdoor", "Indoor"]
+        assert isinstance(scene.performers[0], Performer)
+        assert scene.performers[0].alias_list == ("J",)
+        assert isinstance(scene.files[0], SceneFile)
+        assert scene.files[0].fingerprint("phash") == "def"
+        assert scene.files[0].fingerprint("md5") is None
+        assert scene.groups[0].scene_index == 2
+        assert scene.group_list == (Group.from_dict({"id": "9", "name": "Group"}),)
+
+    def test_unselected_fields_read_as_none(self):
+        scene = Scene.from_dict({"id": "1"})
+        assert scene.title is None
+        assert scene.tags is None
+        assert scene.selected() == ("id",)
+        assert scene.to_dict() == {"id": "1"}
+        with pytest.raises(AttributeError):
+            scene.not_a_field
+
+    def test_null_and_selected_differ(self):
+        scene = Scene.from_dict({"id": "1", "studio": None})
+        assert scene.to_dict() == {"id": "1", "studio": None}
+
+    def test_models_have_no_instance_dict(self):
+        for cls in (Scene, SceneFile, Performer, Tag, Studio, Group):
+            assert not hasattr(cls.from_dict({"id": "1"}), "__dict__")
+
+    def test_repeated_strings_are_interned(self):
+        first = Scene.from_dict(_scene(1))
+        second = Scene.from_dict(_scene(2))
+        assert first.tags[0].name is second.tags[0].name
+        assert first.files[0].video_codec is sys.intern("h264")
+
+    def test_keyword_construction(self):
+        tag = Tag(id="1", name="x")
+        assert tag.to_dict() == {"id": "1", "name": "x"}
+        with pytest.raises(TypeError):
+            Tag(colour="red")
+
+    def test_equality(self):
+        assert Scene.from_dict(_scene(1)) == Scene.from_dict(_scene(1))
+        assert Scene.from_dict(_scene(1)) != Scene.from_dict(_scene(2))
+
+
+class TestPooling:
+    """Test that referenced entities are shared."""
+
+    def test_iter_models_shares_references(self):
+        scenes = list(iter_models((_scene(i) for i in range(3)), Scene))
+        assert scenes[0].studio is scenes[2].studio
+        assert scenes[0].tags[1] is scenes[1].tags[1]
+        assert scenes[0].performers[0] is scenes[1].performers[0]
+        assert scenes[0].files[0] is not scenes[1].files[0]
+
+    def test_later_reference_adds_fields(self):
+        pool = ModelPool()
+        first = Scene.from_dict({"id": "1", "tags": [{"id": "1"}]}, pool)
+        second = Scene.from_dict(
+            {"id": "2", "tags": [{"id": "1", "name": "Outdoor"}]}, pool
+        )
+        assert first.tags[0] is second.tags[0]
+        assert first.tags[0].name == "Outdoor"
+        assert len(pool) == 1
+
+    def test_iter_models_is_lazy(self):
+        consumed = []
+
+        def items():
+            for i in range(3):
+                consumed.append(i)
+                yield _scene(i)
+
+        models = iter_models(items(), Scene)
+        next(models)
+        assert consumed == [0]
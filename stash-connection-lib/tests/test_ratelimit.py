@@ -0,0 +1,134 @@
+import subprocess
+import sys
+import time
+from email.utils import formatdate
+from unittest.mock import Mock
+
+import pytest
+import requests
+from stash_connection_lib.core import StashConnection
+from stash_connection_lib.ratelimit import RateLimiter, parse_retry_after
+
+ENDPOINT = "https://stashdb.org/graphql"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake time for the limiter module; sleeping advances it."""
+    now = [1_000_000.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr("stash_connection_lib.ratelimit.time.time", lambda: now[0])
+    monkeypatch.setattr("stash_connection_lib.ratelimit.time.sleep", sleep)
+    return now, sleeps
+
+
+class TestRateLimiter:
+    """Test the file-backed token bucket."""
+
+    def test_burst_then_rate(self, tmp_path, clock):
+        _, sleeps = clock
+        limiter = RateLimiter(ENDPOINT, rate=2.0, burst=3, path=tmp_path / "b.json")
+        waits = [limiter.acquire() for _ in range(5)]
+        assert waits[:3] == [0.0, 0.0, 0.0]
+        assert waits[3:] == pytest.approx([0.5, 0.5])
+        assert sum(sleeps) == pytest.approx(1.0)
+
+    def test_instances_share_one_budget(self, tmp_path, clock):
+        path = tmp_path / "b.json"
+        first = RateLimiter(ENDPOINT, rate=1.0, burst=2, path=path)
+        second = RateLimiter(ENDPOINT, rate=1.0, burst=2, path=path)
+        assert first.acquire() == 0.0
+        assert second.acquire() == 0.0
+        assert second.acquire() == pytest.approx(1.0)
+
+    def test_penalty_pauses_and_halves_rate(self, tmp_path, clock):
+        now, _ = clock
+        limiter = RateLimiter(
+            ENDPOINT, rate=4.0, burst=1, recovery=10.0, path=tmp_path / "b.json"
+        )
+        limiter.penalize(30)
+        state = limiter.state()
+        assert state["blocked_for"] == pytest.approx(30)
+        assert state["rate"] == pytest.approx(2.0)
+        assert limiter.acquire() == pytest.approx(30)
+        now[0] += 20
+        assert limiter.state()["rate"] == pytest.approx(4.0)
+
+    def test_in_process_bucket(self, clock):
+        limiter = RateLimiter(ENDPOINT, burst=1, shared=False)
+        assert limiter.path is None
+        limiter.acquire()
+        assert limiter.acquire() == pytest.approx(1.0)
+
+    def test_processes_share_budget(self, tmp_path):
+        """Test two processes together stay within one bucket's rate."""
+        path = tmp_path / "b.json"
+        script = (
+            "import sys; from stash_connection_lib.ratelimit import RateLimiter; "
+            f"l = RateLimiter('e', rate=50, burst=1, path={str(path)!r}); "
+            "[l.acquire() for _ in range(10)]"
+        )
+        start = time.monotonic()
+        workers = [subprocess.Popen([sys.executable, "-c", script]) for _ in range(2)]
+        assert [w.wait(30) for w in workers] == [0, 0]
+        assert time.monotonic() - start >= 19 / 50
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after("7") == 7.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("soon") is None
+        later = parse_retry_after(formatdate(time.time() + 60, usegmt=True))
+        assert 55 < later <= 60
+
+
+class TestTooManyRequests:
+    """Test StashConnection's handling of 429 responses."""
+
+    def _responses(self, monkeypatch, conn, statuses):
+        posts = []
+
+        def mock_post(*args, **kwargs):
+            posts.append(kwargs["json"])
+            response = Mock()
+            status = statuses.pop(0)
+            response.status_code = status
+            response.headers = {"Retry-After": "3"}
+            response.content = b'{"data": {"ok": true}}'
+            response.raise_for_status.side_effect = (
+                requests.HTTPError(response=response) if status >= 400 else None
+            )
+            return response
+
+        monkeypatch.setattr(conn.session, "post", mock_post)
+        return posts
+
+    def test_retry_after_is_honoured(self, monkeypatch):
+        conn = StashConnection("http://localhost:9999", requests.Session())
+        sleeps = []
+        monkeypatch.setattr("stash_connection_lib.core.time.sleep", sleeps.append)
+        posts = self._responses(monkeypatch, conn, [429, 200])
+        assert conn.query("mutation { ok }") == {"data": {"ok": True}}
+        assert len(posts) == 2
+        assert sleeps == [3.0]
+
+    def test_limiter_is_penalized(self, monkeypatch, tmp_path, clock):
+        limiter = RateLimiter(ENDPOINT, path=tmp_path / "b.json")
+        conn = StashConnection(ENDPOINT, requests.Session(), rate_limiter=limiter)
+        self._responses(monkeypatch, conn, [429, 429, 200])
+        conn.query("{ ok }")
+        assert limiter.throttled == 2
+        assert limiter.waited >= 6.0  # both pauses, then a token at the reduced rate
+
+    def test_gives_up_after_max_retries(self, monkeypatch):
+        conn = StashConnection(
+            "http://localhost:9999", requests.Session(), max_retries=1
+        )
+        monkeypatch.setattr("stash_connection_lib.core.time.sleep", lambda _: None)
+        self._responses(monkeypatch, conn, [429, 429])
+        with pytest.raises(requests.HTTPError):
+            conn.query("{ ok }")
@@ -0,0 +1,173 @@
+import pytest
+import requests
+from stash_connection_lib.core import StashConnection
+from stash_connection_lib.graphql import Variable, parse
+from stash_connection_lib.resolver import NameResolver
+
+PERFORMERS = [
+    {"id": "1", "name": "Jane Doe", "disambiguation": None, "alias_list": ["J. Doe"]},
+    {"id": "2", "name": "John Roe", "disambiguation": None, "alias_list": []},
+    {"id": "3", "name": "JANE DOE", "disambiguation": "II", "alias_list": []},
+    {"id": "4", "name": "Other", "disambiguation": None, "alias_list": ["Jane Doe"]},
+]
+
+
+def _resolve(value, variables):
+    if isinstance(value, Variable):
+        return variables.get(value.name)
+    if isinstance(value, dict):
+        return {k: _resolve(v, variables) for k, v in value.items()}
+    return value
+
+
+def _matches(row, entity_filter):
+    value = entity_filter["name"]["value"].casefold()
+    if value in row["name"].casefold():
+        return True
+    aliases = entity_filter.get("OR", {}).get("aliases")
+    return bool(aliases) and any(value in a.casefold() for a in row["alias_list"])
+
+
+class FakePerformers:
+    """Serves findPerformers by ids, by name/alias filter, or everything."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.requests = 0
+
+    def query(self, query, variables=None):
+        self.requests += 1
+        variables = variables or {}
+        data = {}
+        for field in parse(query).operation().selection_set:
+            args = _resolve(field.arguments, variables)
+            rows = self.rows
+            if args.get("ids") is not None:
+                rows = [r for r in rows if r["id"] in args["ids"]]
+            if args.get("performer_filter"):
+                rows = [r for r in rows if _matches(r, args["performer_filter"])]
+            find_filter = args.get("filter") or {}
+            per_page = find_filter.get("per_page", 25)
+            if per_page > 0:
+                page = find_filter.get("page", 1)
+                rows = rows[(page - 1) * per_page : page * per_page]
+            data[field.response_key] = {"count": len(self.rows), "performers": rows}
+        return {"data": data}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakePerformers(PERFORMERS)
+    conn = StashConnection("http://localhost:9999", requests.Session())
+    monkeypatch.setattr(conn, "query", fake.query)
+    return fake, conn
+
+
+class TestNameResolver:
+    """Test NameResolver lookups and caching."""
+
+    def test_resolve_many_in_one_request(self, server):
+        fake, conn = server
+        resolver = NameResolver(conn, "performer")
+        result = resolver.resolve_many(["jane doe", "J. DOE", "John Roe", "Nobody"])
+        assert result == {
+            "jane doe": "1",
+            "J. DOE": "1",
+            "John Roe": "2",
+            "Nobody": None,
+        }
+        assert fake.requests == 1
+
+    def test_repeat_lookups_are_local(self, server):
+        fake, conn = server
+        resolver = NameResolver(conn, "performer")
+        resolver.resolve_many(["Jane Doe", "Nobody"])
+        resolver.resolve_many(["jane doe", "nobody", "j. doe"])
+        assert fake.requests == 1
+
+    def test_primary_names_beat_aliases(self, server):
+        _, conn = server
+        resolver = NameResolver(conn, "performer")
+        assert resolver.candidates("Jane Doe") == ["1", "3", "4"]
+        assert resolver.resolve("Jane Doe") == "1"
+
+    def test_large_lookup_loads_everything_once(self, server):
+        fake, conn = server
+        resolver = NameResolver(conn, "performer", load_threshold=2)
+        names = ["Jane Doe", "John Roe", "Other", "Missing"]
+        assert resolver.resolve_many(names)["Other"] == "4"
+        before = fake.requests
+        assert resolver.resolve_many(["Someone else"]) == {"Someone else": None}
+        assert fake.requests == before
+
+    def test_add_after_create(self, server):
+        fake, conn = server
+        resolver = NameResolver(conn, "performer")
+        assert resolver.resolve("New Person") is None
+        resolver.add({"id": "9", "name": "New Person", "alias_list": ["NP"]})
+        assert resolver.resolve_many(["new person", "np"]) == {
+            "new person": "9",
+            "np": "9",
+        }
+        assert fake.requests == 1
+
+    def test_invalidate_drops_negative_cache(self, server):
+        fake, conn = server
+        resolver = NameResolver(conn, "performer")
+        assert resolver.resolve("Late") is None
+        fake.rows.append({"id": "10", "name": "Late", "alias_list": []})
+        assert resolver.resolve("Late") is None
+        resolver.invalidate(names=["Late"])
+        assert resolver.resolve("Late") == "10"
+
+    def test_rename_updates_index(self, server):
+        fake, conn = server
+        resolver = NameResolver(conn, "performer")
+        resolver.add({"id": "2", "name": "John Roe", "alias_list": []})
+        fake.rows[1] = {"id": "2", "name": "Johnny", "alias_list": []}
+        resolver.add(fake.rows[1])
+        assert resolver.candidates("Johnny") == ["2"]
+        assert "2" not in resolver.candidates("John Roe")
+
+    def test_find_many_caches_by_id(self, server):
+        fake, conn = server
+        resolver = NameResolver(conn, "performer", cache_size=2)
+        found = resolver.find_many(["1", "2", "99"])
+        assert found["1"]["name"] == "Jane Doe"
+        assert found["99"] is None
+        requests_before = fake.requests
+        assert resolver.find_many([2])["2"]["name"] == "John Roe"
+        assert fake.requests == requests_before
+
+    def test_find_many_beyond_cache_size(self, server):
+        fake, conn = server
+        fake.rows = [
+            {"id": str(i), "name": f"P{i}", "disambiguation": None, "alias_list": []}
+            for i in range(1, 31)
+        ]
+        resolver = NameResolver(conn, "performer", cache_size=10)
+        found = resolver.find_many(range(1, 31))
+        assert [found[str(i)]["name"] for i in range(1, 31)] == [
+            f"P{i}" for i in range(1, 31)
+        ]
+        assert fake.requests == 1
+
+    def test_find_many_caches_per_selection(self, server):
+        fake, conn = server
+        resolver = NameResolver(conn, "performer")
+        resolver.find_many(["1"], fields="id name")
+        found = resolver.find_many(["1"], fields="id name alias_list")
+        assert found["1"]["alias_list"] == ["J. Doe"]
+        assert fake.requests == 2
+        resolver.find_many(["1"], fields="id  name")
+        assert fake.requests == 2
+
+    def test_unknown_type(self, server):
+        _, conn = server
+        with pytest.raises(ValueError):
+            NameResolver(conn, "scene")
+
+    def test_connection_shares_resolvers(self, server):
+        _, conn = server
+        assert conn.resolver("tag") is conn.resolver("tag")
+        assert conn.resolver("tag") is not conn.resolver("studio")
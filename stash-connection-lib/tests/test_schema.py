@@ -0,0 +1,255 @@
+import pytest
+from stash_connection_lib.schema import QueryValidationError, Schema, load_schema
+from stash_connection_lib.testing import FakeStash
+
+SCALARS = ("ID", "String", "Int", "Float", "Boolean", "Time")
+TYPES = {
+    "Query": {
+        "findScene": ("Scene", {"id": "ID!"}),
+        "findScenes": (
+            "FindScenesResultType!",
+            {"filter": "FindFilterType", "scene_filter": "SceneFilterType"},
+        ),
+        "version": ("Version!", {}),
+    },
+    "Mutation": {"sceneUpdate": ("Scene", {"input": "SceneUpdateInput!"})},
+    "Scene": {
+        "id": ("ID!", {}),
+        "title": ("String", {}),
+        "rating100": ("Int", {}),
+        "updated_at": ("Time!", {}),
+        "tags": ("[Tag!]!", {}),
+        "studio": ("Studio", {}),
+    },
+    "Tag": {"id": ("ID!", {}), "name": ("String!", {})},
+    "Studio": {"id": ("ID!", {}), "name": ("String!", {})},
+    "FindScenesResultType": {"count": ("Int!", {}), "scenes": ("[Scene!]!", {})},
+    "Version": {"version": ("String", {}), "hash": ("String!", {})},
+}
+INPUTS = {
+    "FindFilterType": {
+        "q": "String",
+        "page": "Int",
+        "per_page": "Int",
+        "direction": "SortDirectionEnum",
+    },
+    "SceneFilterType": {"title": "StringCriterionInput"},
+    "StringCriterionInput": {"value": "String!", "modifier": "CriterionModifier!"},
+    "SceneUpdateInput": {"id": "ID!", "title": "String", "tag_ids": "[ID!]"},
+}
+ENUMS = {"SortDirectionEnum": ("ASC", "DESC"), "CriterionModifier": ("EQUALS",)}
+
+
+def _ref(type_ref):
+    if type_ref.endswith("!"):
+        return {"kind": "NON_NULL", "name": None, "ofType": _ref(type_ref[:-1])}
+    if type_ref.startswith("["):
+        return {"kind": "LIST", "name": None, "ofType": _ref(type_ref[1:-1])}
+    kind = "OBJECT"
+    if type_ref in SCALARS:
+        kind = "SCALAR"
+    elif type_ref in ENUMS:
+        kind = "ENUM"
+    elif type_ref in INPUTS:
+        kind = "INPUT_OBJECT"
+    return {"kind": kind, "name": type_ref, "ofType": None}
+
+
+def _introspection():
+    def inputs(fields):
+        return [
+            {"name": n, "defaultValue": None, "type": _ref(t)}
+            for n, t in fields.items()
+        ]
+
+    types = [{"kind": "SCALAR", "name": name} for name in SCALARS]
+    for name, fields in TYPES.items():
+        types.append(
+            {
+                "kind": "OBJECT",
+                "name": name,
+                "fields": [
+                    {"name": f, "type": _ref(t), "args": inputs(args)}
+                    for f, (t, args) in fields.items()
+                ],
+            }
+        )
+    for name, fields in INPUTS.items():
+        types.append(
+            {"kind": "INPUT_OBJECT", "name": name, "inputFields": inputs(fields)}
+        )
+    for name, values in ENUMS.items():
+        types.append(
+            {"kind": "ENUM", "name": name, "enumValues": [{"name": v} for v in values]}
+        )
+    return {
+        "__schema": {
+            "queryType": {"name": "Query"},
+            "mutationType": {"name": "Mutation"},
+            "subscriptionType": None,
+            "types": types,
+        }
+    }
+
+
+@pytest.fixture(scope="module")
+def schema():
+    return Schema(_introspection())
+
+
+class TestValidation:
+    """Test the offline rules against a small Stash‑like schema."""
+
+    def test_valid_documents(self, schema):
+        query = """
+        query Scenes($filter: FindFilterType, $title: String!, $full: Boolean!) {
+          findScenes(filter: $filter, scene_filter: {
+            title: {value: $title, modifier: EQUALS}
+          }) {
+            total: count
+            scenes { ...SceneParts tags @include(if: $full) { id name } }
+          }
+        }
+        fragment SceneParts on Scene {
+          __typename id title studio { ... on Studio { name } }
+        }
+        """
+        assert schema.validate(query) == []
+        mutation = (
+            "mutation ($input: SceneUpdateInput!) { sceneUpdate(input: $input) { id } }"
+        )
+        assert schema.check(mutation).operation().operation == "mutation"
+        assert (
+            schema.validate(
+                "{ findScenes(filter: {direction: DESC, page: 2}) { count } }"
+            )
+            == []
+        )
+
+    @pytest.mark.parametrize(
+        "query, error",
+        [
+            (
+                "{ findScene(id: 1) { titel } }",
+                "Scene has no field 'titel' (did you mean 'title'?)",
+            ),
+            (
+                "{ findScene(id: 1) }",
+                "field Query.findScene of type Scene needs a selection",
+            ),
+            (
+                "{ findScene(id: 1) { title { id } } }",
+                "field Scene.title is a scalar and takes no selection",
+            ),
+            (
+                "{ findScene { id } }",
+                "Query.findScene requires argument 'id' of type ID!",
+            ),
+            (
+                "{ findScene(id: 1, deep: true) { id } }",
+                "Query.findScene has no argument 'deep'",
+            ),
+            ("{ findScene(id: $id) { id } }", "variable $id is not defined"),
+            (
+                "query ($id: ID!, $x: Int) { findScene(id: $id) { id } }",
+                "variable $x is never used",
+            ),
+            (
+                "query ($id: ID) { findScene(id: $id) { id } }",
+                "variable $id of type ID cannot be used where ID! is expected",
+            ),
+            (
+                "query ($f: Filter) { findScenes(filter: $f) { count } }",
+                "variable $f has unknown type Filter",
+            ),
+            (
+                "{ findScenes(filter: {direction: UP}) { count } }",
+                "Query.findScenes(filter:).direction expects a SortDirectionEnum "
+                "value, got UP",
+            ),
+            (
+                '{ findScenes(filter: {per_page: "10"}) { count } }',
+                'Query.findScenes(filter:).per_page expects Int, got "10"',
+            ),
+            (
+                '{ findScenes(filter: {sort: "title"}) { count } }',
+                "FindFilterType has no field 'sort'",
+            ),
+            (
+                '{ findScenes(scene_filter: {title: {value: "a"}}) { count } }',
+                "Query.findScenes(scene_filter:).title requires field 'modifier' "
+                "of type CriterionModifier!",
+            ),
+            ("{ findScene(id: 1) { ...Missing } }", "unknown fragment Missing"),
+            (
+                "{ version { hash } } fragment F on Scene { id }",
+                "fragment F is never used",
+            ),
+            (
+                "{ findScene(id: 1) { ... on Performer { id } } }",
+                "inline fragment has unknown type condition Performer",
+            ),
+            ("subscription { x }", "schema does not support subscription operations"),
+            ("{ findScene(id: 1) { id }", "expected"),
+        ],
+    )
+    def test_errors(self, schema, query, error):
+        errors = schema.validate(query)
+        assert any(e == error or e.startswith(error) for e in errors), errors
+
+    def test_check_raises_graphql_shaped_errors(self, schema):
+        with pytest.raises(QueryValidationError) as info:
+            schema.check("{ findScene(id: 1) { nope } }")
+        assert info.value.errors == [{"message": "Scene has no field 'nope'"}]
+
+    def test_compiled_documents_are_cached(self, schema):
+        query = "query ($id: ID!) { findScene(id: $id) { id title } }"
+        first = schema.check(query)
+        hits = schema.compile.cache_info().hits
+        assert schema.check(query) is first
+        assert schema.compile.cache_info().hits == hits + 1
+
+
+class TestSchemaCache:
+    """Test introspection happens once per server version."""
+
+    @pytest.fixture
+    def stash(self):
+        with FakeStash(scenes=5, introspection=_introspection()) as stash:
+            yield stash
+
+    def test_loaded_from_disk_without_requests(self, stash, tmp_path, monkeypatch):
+        from stash_connection_lib import schema as schema_module
+
+        conn = stash.connect()
+        first = load_schema(conn, directory=str(tmp_path))
+        assert stash.stats()["operations"] == {"version": 1, "__schema": 1}
+        assert "Scene" in first.types
+        assert (tmp_path / "v0.27.0-fake-fake.json").exists()
+
+        monkeypatch.setattr(schema_module, "_SCHEMAS", {})  # a new process
+        stash.reset_stats()
+        second = load_schema(stash.connect(), directory=str(tmp_path))
+        assert stash.stats()["requests"] == 0
+        assert set(second.types) == set(first.types)
+
+        # once the version is stale it is asked again, but not re-introspected
+        load_schema(conn, directory=str(tmp_path), version_ttl=0)
+        assert stash.stats()["operations"] == {"version": 1}
+        load_schema(conn, directory=str(tmp_path), refresh=True)
+        assert stash.stats()["operations"] == {"version": 2, "__schema": 1}
+
+    def test_connection_validates_before_sending(self, stash, tmp_path, monkeypatch):
+        monkeypatch.setenv("STASH_CONNECTION_CACHE_DIR", str(tmp_path))
+        conn = stash.connect(validate_queries=True)
+        ok = "query ($id: ID!) { findScene(id: $id) { title } }"
+        assert conn.query(ok, {"id": "1"})["data"]["findScene"]["title"]
+        with pytest.raises(QueryValidationError, match="did you mean 'title'"):
+            conn.query("query ($id: ID!) { findScene(id: $id) { titl } }", {"id": "1"})
+        assert stash.stats()["operations"] == {
+            "version": 1,
+            "__schema": 1,
+            "findScene": 1,
+        }
+        assert conn.validate("{ version { nope } }") == ["Version has no field 'nope'"]
+        assert (tmp_path / "schema" / "versions.json").exists()
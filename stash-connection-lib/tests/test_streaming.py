@@ -0,0 +1,141 @@
+import json
+import random
+from unittest.mock import Mock
+
+import pytest
+import requests
+from stash_connection_lib.core import GraphQLError, StashConnection
+from stash_connection_lib.streaming import ItemScanner, iter_json_items
+
+SCENES = [
+    {"id": "1", "title": 'quote " bracket ] brace } backslash \\ é'},
+    {"id": "2", "files": [{"path": "/a"}, [1, [2, {"x": "}"}]]]},
+    -12.5e3,
+    10,
+    "s",
+    None,
+    True,
+    [],
+    {},
+]
+DOCUMENT = {
+    "errors": [{"message": "partial"}],
+    "data": {
+        "other": {"scenes": [1, 2]},
+        "findScenes": {"count": len(SCENES), "scenes": SCENES},
+        "tail": {},
+    },
+}
+PATH = "data.findScenes.scenes.item"
+
+
+def _chunks(raw, seed, largest=7):
+    rng = random.Random(seed)
+    pos = 0
+    while pos < len(raw):
+        size = rng.randint(1, largest)
+        yield raw[pos : pos + size]
+        pos += size
+
+
+class TestIterJsonItems:
+    """Test incremental extraction from chunked JSON."""
+
+    @pytest.mark.parametrize("seed", range(25))
+    def test_any_chunking_yields_the_same_items(self, seed):
+        """Test items survive splits inside strings, numbers and multi-byte chars."""
+        raw = json.dumps(DOCUMENT, ensure_ascii=False).encode()
+        assert list(iter_json_items(_chunks(raw, seed), PATH)) == SCENES
+
+    def test_single_chunk(self):
+        raw = json.dumps(DOCUMENT).encode()
+        assert list(iter_json_items([raw], PATH)) == SCENES
+
+    def test_whitespace_and_sequence_path(self):
+        raw = json.dumps(DOCUMENT, indent=4).encode()
+        path = ("errors", "item")
+        assert list(iter_json_items(_chunks(raw, 1), path)) == DOCUMENT["errors"]
+
+    def test_missing_path_yields_nothing(self):
+        raw = json.dumps(DOCUMENT).encode()
+        assert list(iter_json_items([raw], "data.findPerformers.item")) == []
+
+    def test_items_arrive_before_the_document_ends(self):
+        raw = json.dumps(DOCUMENT).encode()
+        scanner = ItemScanner([PATH])
+        cut = raw.index(b'{"id": "2"')
+        assert scanner.feed(raw[:cut]) == [(0, SCENES[0])]
+
+    def test_truncated_document(self):
+        raw = json.dumps(DOCUMENT).encode()
+        with pytest.raises(ValueError):
+            list(iter_json_items([raw[:-2]], PATH))
+
+    def test_malformed_document(self):
+        with pytest.raises(ValueError):
+            list(iter_json_items([b'{"data" 1}'], PATH))
+
+    def test_large_element_split_into_many_chunks(self):
+        """Test an element far bigger than the chunk size is decoded once."""
+        big = {"data": {"findScenes": {"scenes": [{"title": "x" * 200_000}, 1]}}}
+        raw = json.dumps(big).encode()
+        chunks = [raw[i : i + 512] for i in range(0, len(raw), 512)]
+        assert (
+            list(iter_json_items(chunks, PATH)) == big["data"]["findScenes"]["scenes"]
+        )
+
+
+class TestStreamItems:
+    """Test StashConnection.stream_items()."""
+
+    def _conn(self, monkeypatch, document):
+        raw = json.dumps(document).encode()
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.iter_content.side_effect = lambda size: (
+            raw[i : i + size] for i in range(0, len(raw), size)
+        )
+        calls = []
+
+        def post(*args, **kwargs):
+            calls.append(kwargs)
+            return response
+
+        conn = StashConnection("http://localhost:9999", requests.Session())
+        monkeypatch.setattr(conn.session, "post", post)
+        return conn, response, calls
+
+    def test_streams_items(self, monkeypatch):
+        document = {"data": {"findScenes": {"count": 9, "scenes": SCENES}}}
+        conn, response, calls = self._conn(monkeypatch, document)
+
+        query = "{ findScenes { scenes { id } } }"
+        items = list(conn.stream_items(query, path=PATH, chunk_size=16))
+
+        assert items == SCENES
+        assert calls[0]["stream"] is True
+        response.close.assert_called_once()
+        stats = conn.stats()["findScenes"]
+        assert stats["count"] == 1
+        assert stats["errors"] == 0
+        assert stats["response_bytes"] == len(json.dumps(document))
+
+    def test_graphql_errors_raise_after_items(self, monkeypatch):
+        conn, _, _ = self._conn(monkeypatch, DOCUMENT)
+        seen = []
+        with pytest.raises(GraphQLError, match="partial"):
+            for item in conn.stream_items(
+                "{ findScenes { scenes { id } } }", path=PATH
+            ):
+                seen.append(item)
+        assert seen == SCENES
+        assert conn.stats()["findScenes"]["errors"] == 1
+
+    def test_early_exit_closes_response(self, monkeypatch):
+        document = {"data": {"findScenes": {"scenes": SCENES}}}
+        conn, response, _ = self._conn(monkeypatch, document)
+        stream = conn.stream_items("{ findScenes { scenes { id } } }", path=PATH)
+        assert next(stream) == SCENES[0]
+        stream.close()
+        response.close.assert_called_once()
+        assert conn.stats()["findScenes"]["errors"] == 0
@@ -0,0 +1,190 @@
+import pytest
+import requests
+from stash_connection_lib import GET_STASHES, BulkWriter, JobManager, LibraryMirror
+from stash_connection_lib.testing import (
+    FakeStash,
+    NPlusOneError,
+    QueryRecorder,
+    assert_request_scaling,
+    query_shape,
+)
+
+FIND_SCENES = """
+query ($filter: FindFilterType, $scene_filter: SceneFilterType) {
+  findScenes(filter: $filter, scene_filter: $scene_filter) {
+    count
+    scenes { id title studio { id name } tags { id } files { path } }
+  }
+}
+"""
+
+
+@pytest.fixture
+def stash():
+    with FakeStash(scenes=200, seed=1) as stash:
+        yield stash
+
+
+class TestFakeStash:
+    """Test the fake server end to end over HTTP."""
+
+    def test_seeding_is_deterministic(self):
+        first, second = FakeStash(scenes=50, seed=7), FakeStash(scenes=50, seed=7)
+        assert first.tables == second.tables
+        assert len(first.tables["scenes"]) == 50
+        assert len(first.tables["performers"]) == 10
+
+    def test_config_helpers(self, stash):
+        assert GET_STASHES(stash.fragment)[0]["path"] == "/media"
+
+    def test_paging_and_counts(self, stash):
+        conn = stash.connect()
+        scenes = list(conn.iter_pages(FIND_SCENES, per_page=60))
+        assert [s["id"] for s in scenes] == [str(i) for i in range(1, 201)]
+        assert scenes[0]["files"][0]["path"].startswith("/media/")
+        assert stash.stats()["operations"] == {"findScenes": 4}
+        assert stash.stats()["response_bytes"] > stash.stats()["request_bytes"]
+
+    def test_filters(self, stash):
+        conn = stash.connect()
+        tag = next(iter(stash.tables["tags"]))
+        result = conn.query(
+            FIND_SCENES,
+            {
+                "filter": {"per_page": -1, "sort": "title", "direction": "DESC"},
+                "scene_filter": {"tags": {"value": [tag], "modifier": "INCLUDES"}},
+            },
+        )["data"]["findScenes"]
+        expected = [s for s in stash.tables["scenes"].values() if tag in s["_tags"]]
+        assert result["count"] == len(expected) > 0
+        titles = [s["title"] for s in result["scenes"]]
+        assert titles == sorted(titles, reverse=True)
+        assert all({"id": tag} in s["tags"] for s in result["scenes"])
+
+    def test_aliases_and_fragments(self, stash):
+        conn = stash.connect()
+        query = """
+        query { a: findScene(id: 1) { ...S } b: findScene(id: 2) { ...S } }
+        fragment S on Scene { id t: title }
+        """
+        data = conn.query(query)["data"]
+        assert data["a"] == {"id": "1", "t": stash.tables["scenes"]["1"]["title"]}
+        assert data["b"]["id"] == "2"
+
+    def test_unknown_fields_are_errors(self, stash):
+        result = stash.connect().query("{ findImages { count } }")
+        assert "findImages" in result["errors"][0]["message"]
+        result = stash.connect().query(
+            FIND_SCENES, {"scene_filter": {"interactive": True}}
+        )
+        assert "interactive" in result["errors"][0]["message"]
+
+    def test_mutations_bump_updated_at(self, stash):
+        conn = stash.connect()
+        conn.query(
+            "mutation ($input: SceneUpdateInput!) "
+            "{ sceneUpdate(input: $input) { id } }",
+            {"input": {"id": "5", "title": "Renamed", "tag_ids": ["1"]}},
+        )
+        scene = stash.tables["scenes"]["5"]
+        assert scene["title"] == "Renamed"
+        assert scene["_tags"] == ["1"]
+        assert scene["updated_at"] > "2025"
+        created = conn.query('mutation { tagCreate(input: {name: "New"}) { id name } }')
+        assert created["data"]["tagCreate"]["name"] == "New"
+        again = conn.query('mutation { tagCreate(input: {name: "new"}) { id } }')
+        assert "already exists" in again["errors"][0]["message"]
+
+    def test_library_features_against_fake(self, stash):
+        conn = stash.connect()
+        with LibraryMirror(conn) as mirror:
+            mirror.sync()
+            assert mirror.count("scene") == 200
+            report = BulkWriter(conn).run(
+                "sceneUpdate", [{"id": str(i), "rating100": 100} for i in range(1, 31)]
+            )
+            assert report.ok
+            assert stash.stats()["operations"]["bulkSceneUpdate"] == 1
+            assert mirror.sync(["scene"]) == {"scene": 30}
+        performer = stash.tables["performers"]["3"]
+        assert conn.resolver("performer").resolve(performer["name"].upper()) == "3"
+        job = JobManager(conn, subscriptions=False).scan(["/media"])
+        assert job.wait()["status"] == "FINISHED"
+
+    def test_api_key_is_required_when_set(self):
+        with FakeStash(scenes=1, api_key="secret") as stash:
+            conn = stash.connect()
+            assert conn.query("{ version { version } }")["data"]["version"]["version"]
+            conn.api_key = "wrong"
+            with pytest.raises(requests.HTTPError):
+                conn.query("{ version { version } }")
+
+
+TAGS = (
+    "query ($filter: FindFilterType) "
+    "{ findTags(filter: $filter) { count tags { id } } }"
+)
+MARKERS_FOR_TAG = """
+query ($id: ID!) {
+  findSceneMarkers(scene_marker_filter: {tags: {value: [$id], modifier: INCLUDES}}) {
+    count
+  }
+}
+"""
+
+
+def walk_scenes(stash):
+    conn = stash.connect()
+    conn.query("{ configuration { general { stashes { path } } } }")
+    list(conn.iter_pages(FIND_SCENES, per_page=100))
+
+
+def markers_per_tag(stash):
+    conn = stash.connect()
+    for tag in conn.iter_pages(TAGS):
+        conn.query(MARKERS_FOR_TAG, {"id": tag["id"]})
+
+
+class TestRequestCounting:
+    """Test N+1 detection on the client and against the fake server."""
+
+    def test_shape_ignores_literals_and_variables(self):
+        assert query_shape("{ findScene(id: 1) { id } }") == query_shape(
+            "query {\n  findScene(id: 22) { id }\n}"
+        )
+        assert query_shape('{ findTags(filter: {q: "a"}) { count } }') == query_shape(
+            '{ findTags(filter: {q: "b \\" c"}) { count } }'
+        )
+        assert query_shape("{ findScene(id: 1) { id } }") != query_shape(
+            "{ findScene(id: 1) { title } }"
+        )
+
+    def test_pages_count_once(self, stash):
+        conn = stash.connect()
+        with QueryRecorder(conn) as recorded:
+            list(conn.iter_pages(FIND_SCENES, per_page=20))
+        assert len(recorded) == 10
+        assert recorded.repeated(threshold=2) == []
+        assert stash.recorded.repeated(threshold=2) == []
+        assert conn._post_hooks == []
+
+    def test_per_entity_loop_is_flagged(self, stash):
+        conn = stash.connect()
+        with QueryRecorder(conn) as recorded:
+            for scene_id in range(1, 13):
+                conn.query(
+                    "query ($id: ID) { findScene(id: $id) { id } }", {"id": scene_id}
+                )
+        assert recorded.repeated() == [("findScene", 12)]
+        with pytest.raises(NPlusOneError, match="findScene ×12"):
+            recorded.assert_no_repeats(threshold=10)
+
+    def test_paged_walk_scales(self):
+        counts = assert_request_scaling(walk_scenes, sizes=(100, 1000))
+        assert counts == {100: 2, 1000: 11}
+
+    def test_loop_per_entity_fails_scaling(self):
+        with pytest.raises(NPlusOneError, match="findSceneMarkers ×"):
+            assert_request_scaling(markers_per_tag, sizes=(100, 2000))
+        with pytest.raises(NPlusOneError, match=r"O\(1\)"):
+            assert_request_scaling(walk_scenes, sizes=(100, 1000), allowed="constant")
@@ -0,0 +1,115 @@
+import subprocess
+import sys
+
+import pytest
+import stash_connection_lib
+from stash_connection_lib.core import StashConnection, build_session
+from stash_connection_lib.testing import FakeStash
+from stash_connection_lib.transport import HTTPError, Session
+
+FIND_SCENE = "query ($id: ID!) { findScene(id: $id) { id } }"
+
+
+@pytest.fixture
+def stash():
+    with FakeStash(scenes=30) as stash:
+        yield stash
+
+
+class _BrokenSocket:
+    def settimeout(self, timeout):
+        pass
+
+    def sendall(self, data):
+        raise BrokenPipeError
+
+    def close(self):
+        pass
+
+
+class TestStdlibTransport:
+    """Test the http.client session against a live local server."""
+
+    def test_queries_reuse_one_connection(self, stash):
+        conn = stash.connect(transport="stdlib")
+        assert isinstance(conn.session, Session)
+        for scene_id in ("1", "2", "3"):
+            assert conn.query(FIND_SCENE, {"id": scene_id})["data"]["findScene"] == {
+                "id": scene_id
+            }
+        assert conn.connection_stats() == {
+            "requests": 3,
+            "retries": 0,
+            "connections_opened": 1,
+            "connections_reused": 2,
+        }
+        assert conn.stats()["findScene"]["request_bytes"] > 0
+
+    def test_stream_items(self, stash):
+        conn = stash.connect(transport="stdlib")
+        query = "{ findScenes(filter: {per_page: -1}) { scenes { id } } }"
+        ids = [
+            s["id"]
+            for s in conn.stream_items(query, path="data.findScenes.scenes.item")
+        ]
+        assert ids == [str(i) for i in range(1, 31)]
+        assert conn.query(FIND_SCENE, {"id": "4"})["data"]["findScene"]["id"] == "4"
+        assert conn.session.connections_opened == 1
+
+    def test_stale_pooled_connection_is_replaced(self, stash):
+        conn = stash.connect(transport="stdlib")
+        conn.query(FIND_SCENE, {"id": "1"})
+        (idle,) = conn.session._idle.values()
+        idle[0].sock = _BrokenSocket()
+        assert conn.query(FIND_SCENE, {"id": "2"})["data"]["findScene"]["id"] == "2"
+        assert conn.connection_stats()["retries"] == 0
+
+    def test_http_errors(self):
+        with FakeStash(scenes=1, api_key="secret") as stash:
+            conn = stash.connect(transport="stdlib")
+            conn.api_key = "wrong"
+            with pytest.raises(HTTPError) as info:
+                conn.query(FIND_SCENE, {"id": "1"})
+            assert info.value.response.status_code == 401
+
+    def test_connection_errors_are_retried(self, stash):
+        port = stash.port
+        stash.stop()
+        conn = StashConnection(
+            f"http://127.0.0.1:{port}",
+            build_session(transport="stdlib"),
+            max_retries=2,
+            backoff_factor=0,
+        )
+        with pytest.raises(ConnectionError):
+            conn.query(FIND_SCENE, {"id": "1"})
+        assert conn.connection_stats()["retries"] == 2
+
+    def test_transport_from_environment(self, monkeypatch):
+        monkeypatch.setenv("STASH_CONNECTION_TRANSPORT", "stdlib")
+        assert isinstance(build_session(), Session)
+        with pytest.raises(ValueError, match="unknown transport"):
+            build_session(transport="curl")
+
+
+class TestLazyImports:
+    """Test the package only imports what a caller touches."""
+
+    def test_hook_path_skips_heavy_modules(self):
+        script = (
+            "import sys\n"
+            "from stash_connection_lib import get_connection\n"
+            "get_connection({'Port': 1}, transport='stdlib', max_retries=0)\n"
+            "heavy = {'requests', 'asyncio', 'sqlite3', 'concurrent.futures'}\n"
+            "print(sorted(heavy & set(sys.modules)))\n"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        ).stdout
+        assert out.strip() == "[]"
+
+    def test_exports_resolve_on_access(self):
+        assert "LibraryMirror" in dir(stash_connection_lib)
+        assert stash_connection_lib.StashConnection is StashConnection
+        with pytest.raises(AttributeError):
+            stash_connection_lib.missing
@@ -0,0 +1,128 @@
+import base64
+import functools
+import json
+import threading
+import tracemalloc
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from stash_connection_lib.testing import FakeStash
+from stash_connection_lib.uploads import Uploader
+
+SCENE_UPDATE = """
+mutation ($input: SceneUpdateInput!) { sceneUpdate(input: $input) { id } }
+"""
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+
+
+def _uri(data, content_type="image/png"):
+    return f"data:{content_type};base64,{base64.b64encode(data).decode()}"
+
+
+@pytest.fixture
+def stash():
+    with FakeStash(scenes=5) as stash:
+        yield stash
+
+
+@pytest.fixture
+def cover(tmp_path):
+    path = tmp_path / "cover.png"
+    path.write_bytes(PNG)
+    return path
+
+
+class TestUploads:
+    """Test images are streamed into mutations and encoded once per run."""
+
+    @pytest.mark.parametrize("transport", ["requests", "stdlib"])
+    def test_cover_image_is_sent_as_data_uri(self, stash, cover, transport):
+        conn = stash.connect(transport=transport)
+        with conn.uploader() as uploads:
+            variables = {"input": {"id": "2", "cover_image": uploads.image(cover)}}
+            result = uploads.mutate(SCENE_UPDATE, variables)
+        assert result == {"data": {"sceneUpdate": {"id": "2"}}}
+        assert stash.tables["scenes"]["2"]["cover_image"] == _uri(PNG)
+
+    def test_body_is_the_json_document(self, stash, tmp_path, cover):
+        odd = tmp_path / "odd.bin"
+        odd.write_bytes(b"\xff\xd8\xff" + b"x" * 100_001)
+        uploads = Uploader(stash.connect())
+        body, shown = uploads.body(
+            "query",
+            {"images": [uploads.image(cover), uploads.image(odd)], "n": "\x00é"},
+        )
+        raw = body.read()
+        assert len(raw) == len(body)
+        assert json.loads(raw)["variables"] == {
+            "images": [_uri(PNG), _uri(odd.read_bytes(), "image/jpeg")],
+            "n": "\x00é",
+        }
+        body.seek(0)
+        assert b"".join(body) == raw
+        assert shown["images"][0].startswith("<image 10248 bytes sha256:")
+
+    def test_repeated_images_are_encoded_once(self, stash, tmp_path, cover):
+        copy = tmp_path / "copy.png"
+        copy.write_bytes(PNG)
+        events = []
+        conn = stash.connect()
+        conn.add_hook(post=events.append)
+        uploads = conn.uploader()
+        for scene_id, path in (("1", cover), ("2", cover), ("3", copy)):
+            variables = {"input": {"id": scene_id, "cover_image": uploads.image(path)}}
+            uploads.mutate(SCENE_UPDATE, variables)
+        assert {stash.tables["scenes"][i]["cover_image"] for i in "123"} == {_uri(PNG)}
+        stats = uploads.stats()
+        assert (stats["uploads"], stats["encoded"], stats["reused"]) == (3, 1, 2)
+        assert stats["bytes_read"] == 2 * len(PNG)
+        assert events[0].variables["input"]["cover_image"].startswith("<image ")
+        assert events[0].request_bytes > len(_uri(PNG))
+
+    def test_memory_stays_bounded(self, stash, tmp_path):
+        big = tmp_path / "big.jpg"
+        with open(big, "wb") as fh:
+            fh.write(b"\xff\xd8\xff")
+            for _ in range(64):
+                fh.write(bytes(range(256)) * 256)  # 4 MiB
+        uploads = Uploader(stash.connect(), memory_limit=256 << 10)
+        tracemalloc.start()
+        try:
+            body, _ = uploads.body(
+                SCENE_UPDATE, {"input": {"cover_image": uploads.image(big)}}
+            )
+            total = sum(len(chunk) for chunk in body)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert total > 5 << 20
+        assert peak < 1 << 20
+        assert uploads.stats()["memory_bytes"] == 0  # spilled to disk
+
+    def test_cache_is_bounded(self, stash, tmp_path, cover):
+        other = tmp_path / "other.png"
+        other.write_bytes(PNG[::-1])
+        uploads = Uploader(stash.connect(), max_cached=1)
+        for path in (cover, other, cover):
+            uploads.body("q", {"i": uploads.image(path)})
+        assert uploads.stats()["encoded"] == 3
+        with pytest.raises(ValueError, match="larger than"):
+            Uploader(stash.connect(), max_size=100).body(
+                "q", {"i": Uploader.image(cover)}
+            )
+
+    def test_remote_image(self, stash, tmp_path, cover):
+        handler = functools.partial(SimpleHTTPRequestHandler, directory=str(tmp_path))
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/cover.png"
+            uploads = stash.connect().uploader()
+            variables = {"input": {"id": "4", "cover_image": uploads.image(url)}}
+            uploads.mutate(SCENE_UPDATE, variables)
+            uploads.mutate(SCENE_UPDATE, variables)
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert stash.tables["scenes"]["4"]["cover_image"] == _uri(PNG)
+        assert uploads.stats()["bytes_read"] == len(PNG)